@@ -1,80 +1,174 @@
+import asyncio
 import dashscope
 import json
-import re
-from config import DASHSCOPE_API_KEY, QWEN_MODEL, SYSTEM_PROMPT
+import time
+from async_utils import run_blocking
+from tracing import current_span, span, traced
+from app_logging import get_logger
+from intent_cache import get_intent_cache
+from intent_parser import IntentParser
+from incremental_json import IncrementalJSONParser
+from prompt_manager import get_prompt, system_message, usage_tokens
+from config import DASHSCOPE_API_KEY, DASHSCOPE_HTTP_BASE_URL, QWEN_MODEL, AI_TIMEOUT, AI_STREAMING
+
+logger = get_logger(__name__)
 
 class AIProcessor:
     def __init__(self):
         dashscope.api_key = DASHSCOPE_API_KEY
+        if DASHSCOPE_HTTP_BASE_URL:
+            dashscope.base_http_api_url = DASHSCOPE_HTTP_BASE_URL.rstrip('/')
+        self.intent_cache = get_intent_cache()
+        self.intent_parser = IntentParser()
+        self.prompt = get_prompt()
+        self.rate_limiter = None  # 可选的限流器（需提供 acquire()），批量解析时限制大模型调用速率
     
+    @traced("ai.parse")
     def process_navigation_request(self, user_input):
         """处理用户的导航请求"""
+        # 同一句话直接复用上次的解析结果，跳过大模型调用
+        cached = self.intent_cache.get(user_input)
+        if cached is not None:
+            logger.info("⚡ 命中意图缓存: %s", cached)
+            current_span().set(cache="hit")
+            return cached
+        
+        # 常见句式本地规则解析，置信度足够时不调用大模型
+        local = self.intent_parser.fast_path(user_input)
+        if local is not None:
+            logger.info("⚡ 本地解析 (%s, 置信度 %.2f): %s → %s",
+                        local.rule, local.confidence, local.origin, local.destination)
+            current_span().set(parser="local", rule=local.rule, confidence=local.confidence)
+            return local.to_request()
+        
+        return self.parse_with_llm(user_input)
+    
+    def parse_with_llm(self, user_input):
+        """调用千问解析（不查意图缓存和本地规则），失败时回退到本地规则提取"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
         try:
+            if AI_STREAMING:
+                return self._process_streaming(user_input)
+            
             from dashscope import Generation
             
-            response = Generation.call(
-                model=QWEN_MODEL,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_input}
-                ],
-                temperature=0.3,
-                max_tokens=200,
-                result_format='message'
-            )
+            with span("ai.llm", model=QWEN_MODEL, prompt=self.prompt.version) as llm_span:
+                response = Generation.call(
+                    model=QWEN_MODEL,
+                    messages=self._messages(user_input),
+                    temperature=0.3,
+                    max_tokens=200,
+                    result_format='message'
+                )
+                llm_span.set(status=response.status_code, **usage_tokens(response.usage))
             
             if response.status_code == 200:
                 result_text = response.output.choices[0].message.content.strip()
-                print(f"AI处理结果: {result_text}")
-                
-                # 尝试解析JSON
-                try:
-                    # 提取JSON部分（去除可能的markdown格式）
-                    if '```json' in result_text:
-                        json_start = result_text.find('{')
-                        json_end = result_text.rfind('}') + 1
-                        result_text = result_text[json_start:json_end]
-                    elif result_text.startswith('```') and result_text.endswith('```'):
-                        result_text = result_text.strip('`').strip()
-                    
-                    result = json.loads(result_text)
-                    return result
-                except json.JSONDecodeError:
-                    # 如果不是标准JSON，尝试提取地址信息
-                    return self._extract_addresses_fallback(user_input, result_text)
+                logger.debug("AI处理结果: %s", result_text)
+                return self._parse_result_text(user_input, result_text)
             else:
-                print(f"千问API调用失败: {response.message}")
+                logger.error("千问API调用失败: %s", response.message)
                 return self._extract_addresses_fallback(user_input, "")
                 
         except Exception as e:
-            print(f"AI处理错误: {e}")
+            logger.error("AI处理错误: %s", e)
             return self._extract_addresses_fallback(user_input, "")
     
-    def _extract_addresses_fallback(self, user_input, ai_response):
-        """备用地址提取方法"""
-        # 简单的正则表达式匹配
-        patterns = [
-            r'从(.+?)到(.+?)(?:导航|去|走)',
-            r'去(.+?)(?:怎么走|导航)',
-            r'(.+?)到(.+?)的路线',
-            r'导航到(.+?)(?:去|走)?'
+    def _process_streaming(self, user_input):
+        """流式调用千问：起点和终点一解析完整就返回，并关闭连接取消剩余的生成"""
+        from dashscope import Generation
+        
+        parser = IncrementalJSONParser()
+        chunks = []
+        result = None
+        with span("ai.llm", model=QWEN_MODEL, prompt=self.prompt.version, stream=True) as llm_span:
+            start = time.monotonic()
+            responses = Generation.call(
+                model=QWEN_MODEL,
+                messages=self._messages(user_input),
+                temperature=0.3,
+                max_tokens=200,
+                result_format='message',
+                stream=True,
+                incremental_output=True
+            )
+            try:
+                for response in responses:
+                    if response.status_code != 200:
+                        llm_span.set(status=response.status_code)
+                        logger.error("千问API调用失败: %s", response.message)
+                        return self._extract_addresses_fallback(user_input, "")
+                    chunk = response.output.choices[0].message.content or ""
+                    if not chunks:
+                        llm_span.set(first_chunk_ms=round((time.monotonic() - start) * 1000, 1))
+                    chunks.append(chunk)
+                    llm_span.set(**usage_tokens(response.usage))
+                    parser.feed(chunk)
+                    result = self._early_intent(parser.fields)
+                    if result is not None:
+                        break
+                llm_span.set(status=200, early=result is not None and not parser.done)
+            finally:
+                # 提前结束时关闭连接，服务端随之停止生成
+                responses.close()
+        
+        result_text = "".join(chunks).strip()
+        logger.debug("AI处理结果: %s", result_text)
+        if result is None:
+            return self._parse_result_text(user_input, result_text)
+        self.intent_cache.put(user_input, result)
+        return result
+    
+    def _messages(self, user_input):
+        """系统提示词固定作为第一条消息，便于服务端命中前缀缓存"""
+        return [
+            system_message(self.prompt),
+            {"role": "user", "content": user_input}
         ]
+    
+    @staticmethod
+    def _early_intent(fields):
+        """流式输出中起点和终点都已完整且非空时返回解析结果
         
-        for pattern in patterns:
-            match = re.search(pattern, user_input)
-            if match:
-                if len(match.groups()) == 2:
-                    return {
-                        "origin": match.group(1).strip(),
-                        "destination": match.group(2).strip(),
-                        "action": "navigation"
-                    }
-                elif len(match.groups()) == 1:
-                    return {
-                        "origin": "当前位置",
-                        "destination": match.group(1).strip(),
-                        "action": "navigation"
-                    }
+        起点或终点为空（{"origin": "", "destination": "", "error": ...}）时读完整个对象再解析，保留 error
+        """
+        origin, destination = fields.get("origin"), fields.get("destination")
+        if isinstance(origin, str) and isinstance(destination, str) and origin and destination:
+            return {"origin": origin, "destination": destination, "action": "navigation"}
+        return None
+    
+    def _parse_result_text(self, user_input, result_text):
+        """解析大模型返回的完整文本"""
+        try:
+            # 提取JSON部分（去除可能的markdown格式）
+            if '```json' in result_text:
+                json_start = result_text.find('{')
+                json_end = result_text.rfind('}') + 1
+                result_text = result_text[json_start:json_end]
+            elif result_text.startswith('```') and result_text.endswith('```'):
+                result_text = result_text.strip('`').strip()
+            
+            result = json.loads(result_text)
+            self.intent_cache.put(user_input, result)
+            return result
+        except json.JSONDecodeError:
+            # 如果不是标准JSON，尝试提取地址信息
+            return self._extract_addresses_fallback(user_input, result_text)
+    
+    async def process_navigation_request_async(self, user_input, timeout=AI_TIMEOUT):
+        """异步处理导航请求，超时后回退到本地规则提取"""
+        try:
+            return await run_blocking(self.process_navigation_request, user_input, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⏰ AI处理超过 %s 秒，使用备用地址提取", timeout)
+            return self._extract_addresses_fallback(user_input, "")
+    
+    def _extract_addresses_fallback(self, user_input, ai_response):
+        """备用地址提取方法：大模型不可用时按本地语法规则解析，不设置信度门限"""
+        local = self.intent_parser.parse(user_input)
+        if local is not None:
+            return local.to_request()
         
         # 如果都匹配不到，返回错误
         return {
@@ -82,6 +176,7 @@ class AIProcessor:
             "original_input": user_input
         }
     
+    @traced("ai.validate")
     def validate_addresses(self, origin, destination):
         """验证地址有效性"""
         if not origin or not destination:
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构化分级日志（异步输出）
+各模块通过 get_logger(__name__) 获取日志器。调用线程只负责格式化消息并无阻塞地放入有界队列，
+由后台线程统一写终端和文件，录音、识别、网络线程不会因为终端输出而阻塞；
+队列满时丢弃新日志并计数，而不是等待。
+
+控制台默认只输出消息本身（与原来的 print 一致），LOG_FORMAT=json 时输出JSON行；
+设置 LOG_FILE 后另外写入JSON行文件，extra 传入的字段会作为结构化字段一并记录：
+    logger.info("识别完成", extra={"source": "xfyun", "elapsed_ms": 812})
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Optional
+
+from config import LOG_FILE, LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE
+
+# 第三方库只输出警告以上，避免刷屏
+QUIET_LOGGERS = ("urllib3", "websocket", "asyncio", "dashscope")
+
+# LogRecord 自带的属性，其余属性视为 extra 传入的结构化字段
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行JSON：时间、级别、日志器、线程、消息以及 extra 字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """始终写当前的 sys.stdout（测试或重定向替换 stdout 后仍然有效）"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志而不是阻塞调用线程"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # 队列满时等待后台线程腾出位置，保证停止信号一定送达
+        self.queue.put(self._sentinel)
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[_Listener] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT,
+                  log_file: str = LOG_FILE, queue_size: int = LOG_QUEUE_SIZE):
+    """安装根日志器的队列处理器并启动后台输出线程；重复调用时按新参数重新配置"""
+    with _setup_lock:
+        _stop_listener()
+        _configure(level, fmt, log_file, queue_size)
+
+
+def _configure(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT,
+               log_file: str = LOG_FILE, queue_size: int = LOG_QUEUE_SIZE):
+    global _queue_handler, _listener
+    console = ConsoleHandler()
+    console.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+    handlers = [console]
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    _listener = _Listener(_queue_handler.queue, *handlers)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def _stop_listener():
+    global _queue_handler, _listener
+    if _listener is not None:
+        _listener.stop()  # 输出队列中剩余的日志后退出
+        for handler in _listener.handlers:
+            handler.close()
+        logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+    _listener = None
+
+
+def shutdown_logging():
+    """输出剩余日志并停止后台线程（进程退出时自动调用）"""
+    with _setup_lock:
+        _stop_listener()
+
+
+def dropped_count() -> int:
+    """因队列已满被丢弃的日志条数"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取日志器，首次调用时完成全局配置"""
+    if _listener is None:
+        with _setup_lock:
+            if _listener is None:
+                _configure()
+    return logging.getLogger(name)
+
+
+atexit.register(shutdown_logging)
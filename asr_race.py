@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行语音识别
+多个识别器各自从常驻录音打开读取游标，同时识别同一段语音，
+第一个给出可信结果的识别器胜出，其余识别器立即停止。用户只需说一遍。
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import speech_recognition as sr
+
+from app_logging import get_logger
+from vad import capture_utterance
+from xfyun_frames import SAMPLE_RATE, SAMPLE_WIDTH
+
+logger = get_logger(__name__)
+
+
+class RaceResult(NamedTuple):
+    """单个识别器的结果"""
+    text: Optional[str]
+    source: str  # 识别器名称
+    reason: str  # 触发原因：keyword / timeout / google / no_speech / error
+    confident: bool
+
+
+# 识别器：接收停止事件，返回识别结果
+Recognizer = Callable[[threading.Event], RaceResult]
+
+
+def race(recognizers: List[Tuple[str, Recognizer]], timeout: float) -> Optional[RaceResult]:
+    """并行运行识别器，返回第一个可信结果
+
+    没有可信结果时，按列表顺序返回第一个非空结果（列表靠前的识别器优先）；都为空时返回 None。
+    timeout 是整场竞速的截止时间，不因某个识别器先返回而重新计时。
+    """
+    deadline = time.monotonic() + timeout
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(recognizers), thread_name_prefix="asr-race")
+    pending = {executor.submit(func, stop): index for index, (_, func) in enumerate(recognizers)}
+    candidates = {}
+
+    try:
+        while pending:
+            remaining = max(deadline - time.monotonic(), 0)
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.warning("⏰ 并行识别超过 %s 秒", timeout)
+                break
+            for future in done:
+                index = pending.pop(future)
+                name = recognizers[index][0]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error("❌ %s 识别异常: %s", name, e)
+                    continue
+                if not result or not result.text:
+                    continue
+                if result.confident:
+                    logger.info("🏁 %s 率先给出结果: %s", name, result.text)
+                    return result
+                candidates[index] = result
+    finally:
+        # 通知其余识别器停止，不等待它们退出
+        stop.set()
+        executor.shutdown(wait=False)
+
+    if candidates:
+        result = candidates[min(candidates)]
+        logger.info("🤔 没有可信结果，采用 %s: %s", result.source, result.text)
+        return result
+    return None
+
+
+def xfyun_recognizer(asr, max_wait_time: float, session_type: str = "command") -> Recognizer:
+    """科大讯飞识别器：命中关键词或收到最终结果视为可信"""
+    def run(stop: threading.Event) -> RaceResult:
+        lock = threading.Lock()
+        running = [True]
+
+        def watch():
+            # 竞速结束时总会置位 stop；只有讯飞会话仍在进行（即落败）时才中止它，
+            # 讯飞自己胜出时会话已经结束，不能去取消共享实例上可能已开始的下一次会话
+            stop.wait()
+            with lock:
+                if running[0]:
+                    asr.cancel()
+
+        threading.Thread(target=watch, daemon=True).start()
+        try:
+            text, reason = asr.recognize_speech_with_smart_trigger(max_wait_time, session_type)
+        finally:
+            with lock:
+                running[0] = False
+        if stop.is_set():
+            return RaceResult(None, "xfyun", "cancelled", False)
+        confident = bool(text) and (reason == "keyword" or asr.final_received)
+        return RaceResult(text or None, "xfyun", reason, confident)
+    return run
+
+
+def google_recognizer(recognizer: sr.Recognizer, capture, language: str,
+                      timeout: float, preroll_ms: float, min_confidence: float) -> Recognizer:
+    """Google识别器：从共享录音截取一句话后整段上传"""
+    def run(stop: threading.Event) -> RaceResult:
+        reader = capture.open_reader(preroll_ms)
+        try:
+            pcm, _ = capture_utterance(reader, timeout=timeout, stop=stop)
+        finally:
+            reader.close()
+        if not pcm or stop.is_set():
+            return RaceResult(None, "google", "no_speech", False)
+
+        audio = sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
+        try:
+            response = recognizer.recognize_google(audio, language=language, show_all=True)
+        except sr.RequestError as e:
+            logger.error("❌ Google语音识别服务错误: %s", e)
+            return RaceResult(None, "google", "error", False)
+
+        alternatives = response.get("alternative") if isinstance(response, dict) else None
+        if not alternatives:
+            return RaceResult(None, "google", "no_speech", False)
+        best = alternatives[0]
+        # 只有一个候选时 Google 不返回置信度
+        confidence = best.get("confidence")
+        confident = confidence is None or confidence >= min_confidence
+        return RaceResult(best.get("transcript"), "google", "google", confident)
+    return run
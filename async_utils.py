@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步工具
+把阻塞的网络/语音调用放到线程池执行，避免冻结事件循环
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# 导航流水线（AI解析、地理编码、路线规划）共用的线程池
+_pipeline_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pipeline")
+
+
+async def run_blocking(func: Callable[..., Any], *args,
+                       timeout: Optional[float] = None,
+                       executor: Optional[ThreadPoolExecutor] = None,
+                       **kwargs) -> Any:
+    """在线程池中执行阻塞函数并等待结果
+
+    超时或任务被取消时抛出 asyncio.TimeoutError / CancelledError，
+    事件循环立即恢复；已经在线程中运行的调用会在后台自然结束，结果被丢弃。
+    调用在当前上下文的副本中执行，线程内记录的计时span会挂在调用方的span下。
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = loop.run_in_executor(
+        executor or _pipeline_executor,
+        functools.partial(context.run, func, *args, **kwargs)
+    )
+    if timeout is None:
+        return await call
+    return await asyncio.wait_for(call, timeout=timeout)
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻音频采集
+后台线程持续把麦克风PCM写入固定大小的环形缓冲区，
+识别会话开始时可以从过去一小段时间（预录窗口）开始读取，用户抢答不会被截断。
+整个进程只打开一次音频设备，讯飞、Google、VAD和录音存盘都从同一个缓冲区读取。
+"""
+
+import threading
+import time
+import wave
+from typing import List, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+from app_logging import get_logger
+from config import AUDIO_BUFFER_SECONDS
+from xfyun_frames import FRAME_SAMPLES, SAMPLE_RATE, SAMPLE_WIDTH
+
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+
+logger = get_logger(__name__)
+
+
+def ms_to_bytes(ms: float) -> int:
+    """毫秒数转换为按采样对齐的字节数"""
+    return int(ms * BYTES_PER_SECOND / 1000) // SAMPLE_WIDTH * SAMPLE_WIDTH
+
+
+class AudioRingBuffer:
+    """固定容量的PCM环形缓冲区
+
+    写入位置用累计写入字节数（绝对位置）表示，每个读取者维护自己的绝对位置，
+    因此多个读取者可以互不干扰地读取同一份音频。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity - capacity % SAMPLE_WIDTH
+        self._buf = bytearray(self.capacity)
+        self._written = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def written(self) -> int:
+        """累计写入的字节数（当前写入位置）"""
+        return self._written
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def oldest_position(self) -> int:
+        """缓冲区中仍然保留的最早数据位置"""
+        return max(0, self._written - self.capacity)
+
+    def write(self, data):
+        """写入PCM数据，超出容量时覆盖最旧的数据"""
+        size = len(data)
+        if size == 0:
+            return
+        with self._cond:
+            if size > self.capacity:
+                data = data[-self.capacity:]
+                self._written += size - self.capacity
+                size = self.capacity
+
+            start = self._written % self.capacity
+            first = min(size, self.capacity - start)
+            self._buf[start:start + first] = data[:first]
+            if first < size:
+                self._buf[0:size - first] = data[first:]
+
+            self._written += size
+            self._cond.notify_all()
+
+    def read_at(self, position: int, size: int, timeout: Optional[float] = None):
+        """从绝对位置读取 size 字节，数据不足时阻塞等待
+
+        返回 (数据, 实际起始位置)。读取者落后超过缓冲区容量时，
+        实际起始位置会被推进到仍保留的最早数据；超时或缓冲区关闭时返回已有的部分数据。
+        """
+        out = bytearray(size)
+        count, position = self.read_into(position, memoryview(out), timeout)
+        del out[count:]
+        return bytes(out), position
+
+    def read_into(self, position: int, out: memoryview, timeout: Optional[float] = None):
+        """与 read_at 相同，但直接复制到调用方提供的缓冲区 out 中，返回 (字节数, 实际起始位置)"""
+        size = len(out)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._written < position + size and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            position = max(position, self.oldest_position())
+            size = min(size, self._written - position)
+            if size <= 0:
+                return 0, position
+
+            start = position % self.capacity
+            first = min(size, self.capacity - start)
+            out[:first] = self._buf[start:start + first]
+            if first < size:
+                out[first:size] = self._buf[0:size - first]
+            return size, position
+
+    def close(self):
+        """关闭缓冲区，唤醒所有等待的读取者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class AudioReader:
+    """环形缓冲区上的独立读取游标"""
+
+    def __init__(self, ring: AudioRingBuffer, position: int):
+        self.ring = ring
+        self.position = position
+        self.overruns = 0  # 因读取过慢丢失数据的次数
+        self._closed = False
+        self._scratch = bytearray()
+
+    def read(self, size: int, timeout: Optional[float] = None) -> bytes:
+        """读取 size 字节音频，阻塞直到数据足够、超时或采集停止"""
+        if self._closed:
+            return b""
+        data, start = self.ring.read_at(self.position, size, timeout)
+        self._advance(start, len(data))
+        return data
+
+    def read_view(self, size: int, timeout: Optional[float] = None) -> memoryview:
+        """与 read 相同，但返回读取者自有缓冲区上的只读视图，不产生新的bytes对象
+
+        视图在下一次读取前有效，需要保留数据时调用 bytes(view)。
+        """
+        if self._closed:
+            return memoryview(b"")
+        if len(self._scratch) != size:
+            self._scratch = bytearray(size)
+        count, start = self.ring.read_into(self.position, memoryview(self._scratch), timeout)
+        self._advance(start, count)
+        return memoryview(self._scratch).toreadonly()[:count]
+
+    def read_samples(self, count: int, timeout: Optional[float] = None) -> np.ndarray:
+        """读取 count 个采样，返回共享读取者缓冲区的int16数组（同 read_view 只在下次读取前有效）"""
+        return np.frombuffer(self.read_view(count * SAMPLE_WIDTH, timeout), dtype=np.int16)
+
+    def _advance(self, start: int, size: int):
+        if start > self.position:
+            self.overruns += 1
+        self.position = start + size
+
+    def close(self):
+        self._closed = True
+
+
+class AudioCapture:
+    """常驻麦克风采集服务"""
+
+    def __init__(self, rate: int = SAMPLE_RATE, frame_samples: int = FRAME_SAMPLES,
+                 buffer_seconds: float = 10.0, source=None):
+        self.rate = rate
+        self.frame_samples = frame_samples
+        self.source = source  # 音频来源，默认打开麦克风；基准测试可传入 ReplaySource
+        self.ring = AudioRingBuffer(int(buffer_seconds * rate) * SAMPLE_WIDTH)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._mark = 0  # 最近一次标记的位置（如提示音播放结束）
+        self.mark_time = 0.0  # 最近一次标记的时刻(time.monotonic)
+        self.error = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> bool:
+        """启动后台采集线程，已在运行时直接返回"""
+        with self._lock:
+            if self._running:
+                return True
+            if self.ring.closed:
+                # stop() 关闭了旧缓冲区以唤醒读取者，重新启动时换一个新的，位置从0开始
+                self.ring = AudioRingBuffer(self.ring.capacity)
+                self._mark = 0
+            ready = threading.Event()
+            self._running = True
+            self._thread = threading.Thread(
+                target=self._capture_loop, args=(ready,), name="audio-capture", daemon=True
+            )
+            self._thread.start()
+        ready.wait(5)
+        return self._running
+
+    def _capture_loop(self, ready: threading.Event):
+        p = None
+        stream = None
+        try:
+            if self.source is not None:
+                stream = self.source
+            else:
+                import pyaudio
+                p = pyaudio.PyAudio()
+                stream = p.open(format=pyaudio.paInt16,
+                                channels=1,
+                                rate=self.rate,
+                                input=True,
+                                frames_per_buffer=self.frame_samples)
+            logger.info("🎙️ 常驻录音已启动")
+            ready.set()
+            while self._running:
+                self.ring.write(stream.read(self.frame_samples, exception_on_overflow=False))
+        except Exception as e:
+            logger.error("❌ 常驻录音失败: %s", e)
+            self.error = str(e)
+        finally:
+            self._running = False
+            ready.set()
+            if stream:
+                try:
+                    stream.stop_stream()
+                    stream.close()
+                except Exception:
+                    pass
+            if p:
+                try:
+                    p.terminate()
+                except Exception:
+                    pass
+
+    def stop(self):
+        """停止采集并唤醒所有读取者"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.ring.close()
+
+    def mark(self) -> int:
+        """标记当前位置（例如TTS播放结束），预录窗口不会早于最近的标记"""
+        self._mark = self.ring.written
+        self.mark_time = time.monotonic()
+        return self._mark
+
+    def preroll_position(self, preroll_ms: float, respect_mark: bool = True) -> int:
+        """计算预录窗口的起始位置"""
+        position = self.ring.written - ms_to_bytes(preroll_ms)
+        if respect_mark:
+            position = max(position, self._mark)
+        return max(position, self.ring.oldest_position())
+
+    def open_reader(self, preroll_ms: float = 0, respect_mark: bool = True) -> AudioReader:
+        """打开读取游标，从 preroll_ms 毫秒之前的音频开始读取"""
+        if not self._running:
+            self.start()
+        return AudioReader(self.ring, self.preroll_position(preroll_ms, respect_mark))
+
+
+class ReplayClip:
+    """排队回放的一段音频"""
+
+    def __init__(self, pcm):
+        self.pcm = bytes(pcm)
+        self.offset = 0
+        self.started_at: Optional[float] = None  # 第一帧被采集线程读到的时刻(time.monotonic)
+        self.done = threading.Event()
+
+
+class ReplaySource:
+    """回放音频来源：按音频时钟输出排队的PCM，没有排队的音频时输出静音
+
+    与 PyAudio 输入流接口一致，传给 AudioCapture(source=...) 后，
+    识别器、VAD 与录音存盘都像面对真实麦克风一样工作。speed > 1 时加速回放。
+    """
+
+    def __init__(self, rate: int = SAMPLE_RATE, speed: float = 1.0, noise_level: float = 0.0, seed: int = 0):
+        self.rate = rate
+        self.speed = speed
+        self.noise_level = noise_level
+        self._rng = np.random.default_rng(seed)
+        self._clips: List[ReplayClip] = []
+        self._lock = threading.Lock()
+        self._clock: Optional[float] = None
+
+    def play(self, pcm) -> ReplayClip:
+        """排队播放一段PCM，可通过返回值等待播放开始/结束"""
+        clip = ReplayClip(pcm)
+        with self._lock:
+            self._clips.append(clip)
+        return clip
+
+    def read(self, frames: int, exception_on_overflow: bool = False) -> bytes:
+        # 按音频时钟节拍输出，与声卡阻塞读取的节奏一致
+        now = time.monotonic()
+        if self._clock is None or self._clock < now - 0.2:
+            self._clock = now
+        self._clock += frames / self.rate / self.speed
+        delay = self._clock - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        size = frames * SAMPLE_WIDTH
+        chunks = []
+        with self._lock:
+            while size and self._clips:
+                clip = self._clips[0]
+                if clip.started_at is None:
+                    clip.started_at = time.monotonic()
+                chunk = clip.pcm[clip.offset:clip.offset + size]
+                clip.offset += len(chunk)
+                size -= len(chunk)
+                chunks.append(chunk)
+                if clip.offset >= len(clip.pcm):
+                    self._clips.pop(0)
+                    clip.done.set()
+        if size:
+            chunks.append(self._silence(size // SAMPLE_WIDTH))
+        return b"".join(chunks)
+
+    def _silence(self, frames: int) -> bytes:
+        if not self.noise_level:
+            return bytes(frames * SAMPLE_WIDTH)
+        return self._rng.normal(0, self.noise_level, frames).astype(np.int16).tobytes()
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CaptureSource(sr.AudioSource):
+    """把常驻录音包装成 speech_recognition 的音频源，替代 sr.Microphone
+
+    每次 with 进入时打开新的读取游标，listen / adjust_for_ambient_noise 等接口可以直接使用，
+    不会再次打开音频设备。
+    """
+
+    def __init__(self, capture: "AudioCapture", preroll_ms: float = 0):
+        self.capture = capture
+        self.preroll_ms = preroll_ms
+        self.SAMPLE_RATE = capture.rate
+        self.SAMPLE_WIDTH = SAMPLE_WIDTH
+        self.CHUNK = capture.frame_samples
+        self.stream = None
+
+    def __enter__(self):
+        reader = self.capture.open_reader(self.preroll_ms)
+        if not self.capture.running:
+            raise RuntimeError(self.capture.error or "常驻录音未启动")
+        self.stream = _ReaderStream(reader, self.SAMPLE_WIDTH)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream.close()
+        self.stream = None
+
+
+class _ReaderStream:
+    """CaptureSource 的流对象：read(采样数) 返回bytes，与 PyAudio 流接口一致"""
+
+    def __init__(self, reader: AudioReader, sample_width: int):
+        self.reader = reader
+        self.sample_width = sample_width
+
+    def read(self, frames: int) -> bytes:
+        return self.reader.read(frames * self.sample_width, timeout=1.0)
+
+    def close(self):
+        self.reader.close()
+
+
+class AudioRecorder:
+    """录音存盘：作为普通读取者把常驻录音写入WAV文件，不影响其他识别器"""
+
+    def __init__(self, capture: "AudioCapture", path: str, preroll_ms: float = 0):
+        self.capture = capture
+        self.path = path
+        self.preroll_ms = preroll_ms
+        self.bytes_written = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def seconds(self) -> float:
+        return self.bytes_written / (self.capture.rate * SAMPLE_WIDTH)
+
+    def start(self) -> "AudioRecorder":
+        reader = self.capture.open_reader(self.preroll_ms)
+        self._thread = threading.Thread(target=self._record, args=(reader,), name="audio-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def _record(self, reader: AudioReader):
+        chunk = self.capture.frame_samples * SAMPLE_WIDTH
+        with wave.open(self.path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(SAMPLE_WIDTH)
+            wf.setframerate(self.capture.rate)
+            while not self._stop.is_set():
+                view = reader.read_view(chunk, timeout=0.2)
+                if view:
+                    wf.writeframes(view)
+                    self.bytes_written += len(view)
+                elif reader.ring.closed:
+                    break
+        reader.close()
+
+    def stop(self) -> float:
+        """停止录音并关闭文件，返回录音时长（秒）"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        return self.seconds
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+_shared_capture: Optional[AudioCapture] = None
+_shared_lock = threading.Lock()
+
+
+def get_audio_capture() -> AudioCapture:
+    """获取进程内共享的采集服务"""
+    global _shared_capture
+    if _shared_capture is None:
+        with _shared_lock:
+            if _shared_capture is None:
+                _shared_capture = AudioCapture(buffer_seconds=AUDIO_BUFFER_SECONDS)
+    return _shared_capture
+
+
+def stop_audio_capture():
+    """停止进程内共享的采集服务（程序退出时调用）"""
+    if _shared_capture is not None:
+        _shared_capture.stop()
+
+
+def set_audio_capture(capture: AudioCapture) -> Optional[AudioCapture]:
+    """替换进程内共享的采集服务（如回放测试），返回原来的实例"""
+    global _shared_capture
+    with _shared_lock:
+        previous, _shared_capture = _shared_capture, capture
+    return previous
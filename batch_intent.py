@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量导航意图解析
+回放大量历史语音记录时使用：逐条读取输入（不必整个文件读入内存），
+意图缓存 / 本地规则能解析的直接返回，其余以有限并发调用千问，
+调用速率由令牌桶限制，同一句话（忽略标点、空白、全半角差异）只调用一次。
+结果按完成顺序流式输出为JSON行，附带输入序号、来源和单条耗时。
+
+用法: python batch_intent.py utterances.txt [-o results.jsonl] [--concurrency 8] [--rate 5]
+                             [--no-local] [--use-cache] [--limit 1000]
+输入每行一句话，或JSON行 {"text": "...", ...}；带 origin/destination（或 error: true）标注时统计准确率，
+无法解析或缺少 text 的JSON行跳过并计数。
+输入为 - 时从标准输入读取；结果默认写到标准输出，.env 提示、日志和汇总都写到标准错误。
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# 结果独占标准输出：作为脚本运行时在导入 config 之前把 sys.stdout 换成标准错误，
+# 加载 .env 的提示和运行日志都不会混进结果
+_RESULTS = sys.stdout
+if __name__ == "__main__":
+    sys.stdout = sys.stderr
+
+from ai_processor import AIProcessor
+from config import BATCH_CONCURRENCY, BATCH_RATE_LIMIT
+from intent_cache import IntentCache
+from tracing import percentile
+
+# 结果来源
+SOURCE_CACHE = "cache"
+SOURCE_LOCAL = "local"
+SOURCE_LLM = "llm"
+SOURCE_DUPLICATE = "duplicate"  # 与前面某句相同，复用其结果
+
+
+class BatchResult(NamedTuple):
+    index: int
+    text: str
+    result: Dict[str, Any]
+    source: str
+    latency_ms: float
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"index": self.index, "text": self.text, "source": self.source,
+                "latency_ms": round(self.latency_ms, 1), "result": self.result}
+
+
+class TokenBucket:
+    """令牌桶限流（线程安全）：平均每秒 rate 次，允许 burst 次突发"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """取出令牌，不足时等待；返回等待的秒数"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # 先预留再等待：余额可以为负，后来的调用按顺序排在后面
+            self._tokens -= tokens
+            wait_time = max(0.0, -self._tokens / self.rate)
+        if wait_time:
+            self._sleep(wait_time)
+        return wait_time
+
+
+class BatchIntentRunner:
+    """有限并发、去重、限流的批量意图解析"""
+
+    def __init__(self, processor: Optional[AIProcessor] = None,
+                 concurrency: int = BATCH_CONCURRENCY,
+                 rate: float = BATCH_RATE_LIMIT,
+                 use_local: bool = True,
+                 use_cache: bool = False):
+        if processor is None:
+            processor = AIProcessor()
+            if not use_cache:
+                # 回放评估需要大模型的真实结果，也不把回放结果写进线上缓存
+                processor.intent_cache = IntentCache(db_path=None, enabled=False)
+        self.processor = processor
+        self.concurrency = max(1, concurrency)
+        self.use_local = use_local
+        self.limiter = TokenBucket(rate) if rate > 0 else None
+        self.processor.rate_limiter = self.limiter
+        self.sources = Counter()
+        self.llm_latency: List[float] = []
+
+    def run(self, utterances: Iterable[str]) -> Iterator[BatchResult]:
+        """逐条解析，按完成顺序产出结果；输入按需读取，同时在途的大模型调用不超过 concurrency"""
+        pending = {}  # future -> 去重键
+        waiting: Dict[str, List[Tuple[int, str]]] = {}  # 去重键 -> 等待该结果的 (序号, 原话)
+        done: Dict[str, Dict[str, Any]] = {}
+
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="batch-intent") as pool:
+            for index, text in enumerate(utterances):
+                key = IntentCache.normalize_utterance(text) or f"#{index}"
+                if key in done:
+                    yield self._emit(index, text, done[key], SOURCE_DUPLICATE, 0.0)
+                    continue
+                if key in waiting:
+                    waiting[key].append((index, text))
+                    continue
+
+                start = time.perf_counter()
+                quick = self._quick(text)
+                if quick is not None:
+                    result, source = quick
+                    done[key] = result
+                    yield self._emit(index, text, result, source, (time.perf_counter() - start) * 1000)
+                    continue
+
+                while len(pending) >= self.concurrency:
+                    yield from self._collect(pending, waiting, done)
+                waiting[key] = [(index, text)]
+                pending[pool.submit(self._call_llm, text)] = key
+
+            while pending:
+                yield from self._collect(pending, waiting, done)
+
+    def _quick(self, text: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """意图缓存和本地规则，不占用并发和限流额度"""
+        cached = self.processor.intent_cache.get(text)
+        if cached is not None:
+            return cached, SOURCE_CACHE
+        if self.use_local:
+            local = self.processor.intent_parser.fast_path(text)
+            if local is not None:
+                return local.to_request(), SOURCE_LOCAL
+        return None
+
+    def _call_llm(self, text: str) -> Tuple[Dict[str, Any], float]:
+        start = time.perf_counter()
+        try:
+            result = self.processor.parse_with_llm(text)
+        except Exception as e:
+            result = {"error": str(e)}
+        return result, (time.perf_counter() - start) * 1000
+
+    def _collect(self, pending, waiting, done) -> Iterator[BatchResult]:
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            key = pending.pop(future)
+            result, latency_ms = future.result()
+            self.llm_latency.append(latency_ms)
+            done[key] = result
+            (index, text), *duplicates = waiting.pop(key)
+            yield self._emit(index, text, result, SOURCE_LLM, latency_ms)
+            for index, text in duplicates:
+                yield self._emit(index, text, result, SOURCE_DUPLICATE, 0.0)
+
+    def _emit(self, index: int, text: str, result: Dict[str, Any], source: str,
+              latency_ms: float) -> BatchResult:
+        self.sources[source] += 1
+        # 每条结果独立一份，调用方修改不影响重复句
+        return BatchResult(index, text, dict(result), source, latency_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        """来源分布与大模型调用耗时"""
+        summary: Dict[str, Any] = {"total": sum(self.sources.values()), "sources": dict(self.sources)}
+        if self.llm_latency:
+            summary["llm_p50_ms"] = round(percentile(self.llm_latency, 0.5), 1)
+            summary["llm_p95_ms"] = round(percentile(self.llm_latency, 0.95), 1)
+        return summary
+
+
+def read_utterances(lines: Iterable[str],
+                    skipped: Optional[List[int]] = None) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """逐行读取输入，返回 (原话, 标注)；纯文本行没有标注
+
+    skipped: 无法解析或缺少 text 的JSON行的行号（从1开始）追加到这里，这些行不返回
+    """
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            text = row.get("text") if isinstance(row, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                if skipped is not None:
+                    skipped.append(line_num)
+                continue
+            labels = {key: row[key] for key in ("origin", "destination", "error") if key in row}
+            yield text.strip(), labels or None
+        else:
+            yield line, None
+
+
+def matches(labels: Dict[str, Any], result: Dict[str, Any]) -> bool:
+    """结果是否与标注一致：非导航句应返回 error，导航句的起点、终点应相同"""
+    if labels.get("error"):
+        return "error" in result
+    return (labels.get("origin"), labels.get("destination")) == (result.get("origin"), result.get("destination"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导航意图解析（有限并发、去重、限流，JSONL流式输出）")
+    parser.add_argument("input", help="输入文件（每行一句话或JSON行），- 为标准输入")
+    parser.add_argument("-o", "--output", help="结果JSONL文件，默认标准输出")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="同时进行的大模型调用数")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_LIMIT, help="每秒最多调用大模型次数，0 为不限")
+    parser.add_argument("--no-local", action="store_true", help="不使用本地规则解析，全部交给大模型")
+    parser.add_argument("--use-cache", action="store_true", help="使用并写入意图缓存（默认不使用）")
+    parser.add_argument("--limit", type=int, help="只处理前N句")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else _RESULTS
+    runner = BatchIntentRunner(concurrency=args.concurrency, rate=args.rate,
+                               use_local=not args.no_local, use_cache=args.use_cache)
+
+    labels: Dict[int, Dict[str, Any]] = {}
+    judged = Counter()
+    skipped: List[int] = []
+
+    def utterances():
+        for index, (text, label) in enumerate(read_utterances(source, skipped)):
+            if args.limit is not None and index >= args.limit:
+                return
+            if label is not None:
+                labels[index] = label
+            yield text
+
+    start = time.monotonic()
+    try:
+        for item in runner.run(utterances()):
+            record = item.to_json()
+            label = labels.pop(item.index, None)
+            if label is not None:
+                record["match"] = matches(label, item.result)
+                judged[record["match"]] += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not _RESULTS:
+            output.close()
+    elapsed = time.monotonic() - start
+
+    summary = runner.summary()
+    summary["elapsed_s"] = round(elapsed, 2)
+    summary["per_second"] = round(summary["total"] / elapsed, 1) if elapsed else None
+    if judged:
+        summary["accuracy"] = round(judged[True] / sum(judged.values()), 3)
+    summary["skipped"] = len(skipped)
+
+    log = sys.stderr
+    print(f"\n=== 批量解析完成: {summary['total']} 句，用时 {elapsed:.1f}s ({summary['per_second']}/s) ===", file=log)
+    print("来源: " + ", ".join(f"{key} {value}" for key, value in sorted(summary["sources"].items())), file=log)
+    if "llm_p50_ms" in summary:
+        print(f"大模型调用: p50 {summary['llm_p50_ms']:.0f}ms  p95 {summary['llm_p95_ms']:.0f}ms", file=log)
+    if "accuracy" in summary:
+        print(f"准确率: {summary['accuracy']:.1%} ({judged[True]}/{sum(judged.values())})", file=log)
+    if skipped:
+        lines = ", ".join(map(str, skipped[:10])) + (" ..." if len(skipped) > 10 else "")
+        print(f"⚠️ 跳过 {len(skipped)} 行格式错误的输入（行号 {lines}）", file=log)
+
+
+if __name__ == "__main__":
+    main()
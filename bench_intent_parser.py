@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地意图解析准确率 / 延迟基准
+用标注语料 (intent_corpus.jsonl) 评估 IntentParser：
+
+- coverage:  置信度达到门限、直接在本地返回（不调用大模型）的比例
+- precision: 本地返回的结果中起点、终点与标注完全一致的比例（非导航句被本地返回也算错误）
+- fallback:  不设门限时（大模型失败兜底）导航句解析正确的比例
+- latency:   单句本地解析耗时（微秒）
+
+加 --llm 时同样测量大模型解析（AIProcessor，关闭意图缓存和本地解析）的准确率与耗时，
+可配合 mock_api_server.py 离线运行（设置 DASHSCOPE_HTTP_BASE_URL）。
+
+语料每行一个JSON：{"text": "...", "origin": "...", "destination": "..."}，非导航句为 {"text": "...", "error": true}
+
+用法: python bench_intent_parser.py [--corpus intent_corpus.jsonl] [--runs 200] [--llm]
+                                    [--min-precision 1.0] [--min-coverage 0.6] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from intent_parser import IntentParser
+from tracing import percentile
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.jsonl")
+THRESHOLDS = (0.6, 0.7, 0.8, 0.9)
+
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def expected(row: Dict) -> Optional[tuple]:
+    """标注的 (起点, 终点)，非导航句返回 None"""
+    return None if row.get("error") else (row["origin"], row["destination"])
+
+
+def evaluate(parser: IntentParser, corpus: List[Dict], thresholds=THRESHOLDS) -> Dict:
+    """按不同置信度门限统计本地返回比例与正确率"""
+    parsed = [(row, parser.parse(row["text"])) for row in corpus]
+    navigation = [item for item in parsed if expected(item[0]) is not None]
+
+    by_threshold = {}
+    for threshold in thresholds:
+        local = [(row, intent) for row, intent in parsed
+                 if intent is not None and intent.confidence >= threshold]
+        correct = sum(1 for row, intent in local if expected(row) == (intent.origin, intent.destination))
+        by_threshold[threshold] = {
+            "local": len(local),
+            "correct": correct,
+            "coverage": round(len(local) / len(corpus), 3) if corpus else 0.0,
+            "precision": round(correct / len(local), 3) if local else 1.0,
+        }
+
+    fallback_correct = sum(1 for row, intent in navigation
+                           if intent is not None and expected(row) == (intent.origin, intent.destination))
+    return {
+        "thresholds": by_threshold,
+        "fallback_accuracy": round(fallback_correct / len(navigation), 3) if navigation else 0.0,
+        "parsed": parsed,
+    }
+
+
+def measure_latency(parser: IntentParser, corpus: List[Dict], runs: int) -> Dict[str, float]:
+    """单句解析耗时（微秒）"""
+    samples = []
+    for _ in range(runs):
+        for row in corpus:
+            start = time.perf_counter()
+            parser.parse(row["text"])
+            samples.append((time.perf_counter() - start) * 1e6)
+    return {
+        "n": len(samples),
+        "p50_us": round(percentile(samples, 0.5), 1),
+        "p95_us": round(percentile(samples, 0.95), 1),
+        "max_us": round(max(samples), 1),
+    }
+
+
+def measure_llm(corpus: List[Dict]) -> Dict:
+    """逐句调用大模型，统计准确率与耗时（毫秒）"""
+    from ai_processor import AIProcessor
+    from intent_cache import IntentCache
+
+    processor = AIProcessor()
+    processor.intent_cache = IntentCache(db_path=None, enabled=False)
+    processor.intent_parser = IntentParser(enabled=False)
+
+    samples, correct = [], 0
+    for row in corpus:
+        start = time.perf_counter()
+        result = processor.process_navigation_request(row["text"])
+        samples.append((time.perf_counter() - start) * 1000)
+        if expected(row) is None:
+            correct += "error" in result
+        else:
+            correct += expected(row) == (result.get("origin"), result.get("destination"))
+    return {
+        "accuracy": round(correct / len(corpus), 3),
+        "mean_ms": round(sum(samples) / len(samples), 1),
+        "p50_ms": round(percentile(samples, 0.5), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地意图解析准确率/延迟基准")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="标注语料（JSONL）")
+    parser.add_argument("--city", help="默认城市，默认使用 DEFAULT_CITY")
+    parser.add_argument("--threshold", type=float, help="置信度门限，默认使用 LOCAL_INTENT_MIN_CONFIDENCE")
+    parser.add_argument("--runs", type=int, default=200, help="延迟测量时语料重复次数")
+    parser.add_argument("--llm", action="store_true", help="同时测量大模型解析的准确率与耗时")
+    parser.add_argument("--show-errors", action="store_true", help="列出本地返回但与标注不一致的句子")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--min-precision", type=float, help="回归门限：本地返回正确率低于该值时退出码为1")
+    parser.add_argument("--min-coverage", type=float, help="回归门限：本地返回比例低于该值时退出码为1")
+    args = parser.parse_args()
+
+    intent_parser = IntentParser(**{key: value for key, value in
+                                    (("city", args.city), ("min_confidence", args.threshold))
+                                    if value is not None})
+    threshold = intent_parser.min_confidence
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error("语料为空")
+
+    thresholds = sorted(set(THRESHOLDS) | {threshold})
+    report = evaluate(intent_parser, corpus, thresholds)
+    latency = measure_latency(intent_parser, corpus, args.runs)
+    current = report["thresholds"][threshold]
+
+    print(f"\n=== 本地意图解析 ({len(corpus)} 句，门限 {threshold:.2f}) ===")
+    print(f"{'门限':<6} {'本地返回':>8} {'coverage':>9} {'precision':>10}")
+    for value, row in report["thresholds"].items():
+        marker = " ←" if value == threshold else ""
+        print(f"{value:<8.2f} {row['local']:>8} {row['coverage']:>9.1%} {row['precision']:>10.1%}{marker}")
+    print(f"兜底解析正确率（不设门限）: {report['fallback_accuracy']:.1%}")
+    print(f"本地解析耗时: p50 {latency['p50_us']:.0f}µs  p95 {latency['p95_us']:.0f}µs  max {latency['max_us']:.0f}µs")
+
+    if args.show_errors:
+        for row, intent in report["parsed"]:
+            if intent is None or intent.confidence < threshold:
+                continue
+            if expected(row) != (intent.origin, intent.destination):
+                print(f"❌ {row['text']} -> {intent.origin} → {intent.destination} "
+                      f"({intent.rule}, {intent.confidence:.2f})，期望 {expected(row)}")
+
+    summary = {
+        "threshold": threshold,
+        "thresholds": {str(key): value for key, value in report["thresholds"].items()},
+        "fallback_accuracy": report["fallback_accuracy"],
+        "latency": latency,
+    }
+    if args.llm:
+        llm = measure_llm(corpus)
+        summary["llm"] = llm
+        # 混合链路：本地返回的句子只花本地解析的时间，其余仍走大模型
+        hybrid_ms = current["coverage"] * latency["p50_us"] / 1000 + (1 - current["coverage"]) * llm["mean_ms"]
+        summary["hybrid_mean_ms"] = round(hybrid_ms, 1)
+        print(f"大模型解析: 正确率 {llm['accuracy']:.1%}  p50 {llm['p50_ms']:.0f}ms  p95 {llm['p95_ms']:.0f}ms")
+        print(f"本地 + 大模型平均耗时: {hybrid_ms:.0f}ms（仅大模型 {llm['mean_ms']:.0f}ms）")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if args.min_precision is not None and current["precision"] < args.min_precision:
+        print(f"❌ precision {current['precision']:.1%} 低于门限 {args.min_precision:.1%}")
+        failed = True
+    if args.min_coverage is not None and current["coverage"] < args.min_coverage:
+        print(f"❌ coverage {current['coverage']:.1%} 低于门限 {args.min_coverage:.1%}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+系统提示词版本对比基准
+用标注语料 (intent_corpus.jsonl) 逐句调用千问，对比各版本提示词的：
+
+- prompt: 本地统计的提示词token数
+- input:  接口返回的平均输入token数，cached 为命中上下文缓存的平均token数
+- accuracy: 起点、终点与标注一致的比例（非导航句需返回 error）
+- latency: 单次解析耗时 p50/p95（毫秒）
+
+各版本按句交替调用，避免网络波动只影响其中一个版本。关闭意图缓存和本地规则解析，每句都走大模型。
+可配合 mock_api_server.py 离线运行（设置 DASHSCOPE_HTTP_BASE_URL，用 prefill_ms 模拟预填充耗时）。
+
+用法: python bench_prompt_variants.py [--versions v1,v2] [--runs 1] [--limit 20]
+                                      [--max-accuracy-drop 0.02] [--json out.json]
+      python bench_prompt_variants.py --tokens-only   # 只统计token数，不调用接口
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+from bench_intent_parser import DEFAULT_CORPUS, expected, load_corpus
+from prompt_manager import PROMPT_TEMPLATES, get_prompt
+from tracing import get_tracer, percentile
+
+
+def run_variants(versions: List[str], corpus: List[Dict], runs: int) -> Dict[str, Dict]:
+    """按句交替调用各版本，返回每个版本的耗时、token数与准确率"""
+    from ai_processor import AIProcessor
+    from intent_cache import IntentCache
+    from intent_parser import IntentParser
+
+    processors = {}
+    for version in versions:
+        processor = AIProcessor()
+        processor.intent_cache = IntentCache(db_path=None, enabled=False)
+        processor.intent_parser = IntentParser(enabled=False)
+        processor.prompt = get_prompt(version)
+        processors[version] = processor
+
+    tracer = get_tracer()
+    samples = {version: {"latency": [], "input": [], "cached": [], "correct": 0} for version in versions}
+    for _ in range(runs):
+        for row in corpus:
+            for version in versions:
+                tracer.reset()
+                start = time.perf_counter()
+                result = processors[version].process_navigation_request(row["text"])
+                elapsed = (time.perf_counter() - start) * 1000
+
+                sample = samples[version]
+                sample["latency"].append(elapsed)
+                llm = [span for span in tracer.spans() if span.name == "ai.llm"]
+                if llm:
+                    sample["input"].append(llm[-1].attrs.get("input_tokens", 0))
+                    sample["cached"].append(llm[-1].attrs.get("cached_tokens", 0))
+                if expected(row) is None:
+                    sample["correct"] += "error" in result
+                else:
+                    sample["correct"] += expected(row) == (result.get("origin"), result.get("destination"))
+
+    report = {}
+    for version, sample in samples.items():
+        latency = sample["latency"]
+        report[version] = {
+            "accuracy": round(sample["correct"] / len(latency), 3),
+            "input_tokens": round(sum(sample["input"]) / len(sample["input"]), 1) if sample["input"] else None,
+            "cached_tokens": round(sum(sample["cached"]) / len(sample["cached"]), 1) if sample["cached"] else None,
+            "p50_ms": round(percentile(latency, 0.5), 1),
+            "p95_ms": round(percentile(latency, 0.95), 1),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="系统提示词版本对比（token数、耗时、准确率）")
+    parser.add_argument("--versions", default=",".join(PROMPT_TEMPLATES), help="要对比的版本，逗号分隔")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="标注语料（JSONL）")
+    parser.add_argument("--runs", type=int, default=1, help="语料重复次数")
+    parser.add_argument("--limit", type=int, help="只使用语料的前N句")
+    parser.add_argument("--tokens-only", action="store_true", help="只统计提示词token数，不调用接口")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--max-accuracy-drop", type=float,
+                        help="回归门限：任一版本准确率比第一个版本低出该值时退出码为1")
+    args = parser.parse_args()
+
+    versions = [name.strip() for name in args.versions.split(",") if name.strip()]
+    unknown = set(versions) - set(PROMPT_TEMPLATES)
+    if unknown:
+        parser.error(f"未知的提示词版本: {', '.join(sorted(unknown))}")
+
+    prompts = {version: get_prompt(version) for version in versions}
+    summary = {version: {"prompt_tokens": prompt.tokens, "prompt_tokens_exact": prompt.exact}
+               for version, prompt in prompts.items()}
+
+    if not args.tokens_only:
+        corpus = load_corpus(args.corpus)[:args.limit]
+        if not corpus:
+            parser.error("语料为空")
+        for version, row in run_variants(versions, corpus, args.runs).items():
+            summary[version].update(row)
+
+    estimated = "" if all(prompt.exact for prompt in prompts.values()) else "（估算，安装 tiktoken 后精确统计）"
+    print(f"\n=== 提示词版本对比 {estimated}===")
+    print(f"{'版本':<6} {'prompt':>7} {'input':>7} {'cached':>7} {'accuracy':>9} {'p50':>9} {'p95':>9}")
+    for version, row in summary.items():
+        if args.tokens_only:
+            print(f"{version:<8} {row['prompt_tokens']:>7}")
+            continue
+        input_tokens = "-" if row["input_tokens"] is None else f"{row['input_tokens']:.0f}"
+        cached_tokens = "-" if row["cached_tokens"] is None else f"{row['cached_tokens']:.0f}"
+        print(f"{version:<8} {row['prompt_tokens']:>7} {input_tokens:>7} {cached_tokens:>7} "
+              f"{row['accuracy']:>9.1%} {row['p50_ms']:7.0f}ms {row['p95_ms']:7.0f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if args.max_accuracy_drop is not None and not args.tokens_only:
+        baseline = summary[versions[0]]["accuracy"]
+        for version in versions[1:]:
+            if summary[version]["accuracy"] < baseline - args.max_accuracy_drop:
+                print(f"❌ {version} 准确率 {summary[version]['accuracy']:.1%} "
+                      f"比 {versions[0]} 低出 {args.max_accuracy_drop:.1%} 以上")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
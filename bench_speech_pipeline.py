@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音识别链路延迟基准
+把WAV录音（或合成样本）经回放音频源送入常驻录音，对接本地模拟讯飞服务 (mock_xfyun_server.py)，
+不需要麦克风和网络即可测量三层接口的延迟：
+
+- xfyun:   XfyunASR.recognize_speech_with_smart_trigger
+- handler: SpeechHandler.listen_for_speech
+- confirm: NavigationApp.voice_confirm_navigation（播报结束后回放确认回答）
+
+指标（毫秒）：
+- first_partial: 开始说话 → 收到第一条中间结果
+- final:         说完 → 收到最终结果 (status=2)
+- keyword:       说完 → 命中触发关键词（负数表示用户还没说完就已触发）
+- return:        说完 → 接口返回
+
+用法: python bench_speech_pipeline.py [--fixtures DIR] [--runs 3] [--latency-ms 80]
+                                      [--json out.json] [--max-p95 return=1500]
+fixtures 目录中每个 WAV 需要同名 .txt 写明期望文本，文件名以 confirm_ 开头的样本用于确认环节
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+SCENARIOS = ("xfyun", "handler", "confirm")
+
+
+class Fixture(NamedTuple):
+    name: str
+    pcm: bytes
+    text: str
+    onset: float  # 开始说话时刻（秒，相对样本开头）
+    end: float  # 说完时刻
+    kind: str  # command / confirm
+
+
+def speech_bounds(samples: np.ndarray, vad_cls) -> tuple:
+    """用VAD离线标出说话起止（秒）"""
+    vad = vad_cls()
+    vad.process_samples(samples)
+    frame = vad.frame_ms / 1000
+    onset = (vad.speech_start_frame or 0) * frame
+    end = vad.speech_end_frame * frame if vad.speech_end_frame else len(samples) / 16000
+    return onset, end
+
+
+def load_fixtures(directory: str) -> List[Fixture]:
+    """读取目录中的 WAV + 同名 txt"""
+    from vad import EnergyVAD
+    from vad_eval import collect_wavs, read_wav
+
+    fixtures = []
+    for path in collect_wavs([directory]):
+        text_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(text_path):
+            print(f"⚠️ 跳过 {path}: 缺少 {os.path.basename(text_path)}")
+            continue
+        with open(text_path, encoding="utf-8") as f:
+            text = f.read().strip()
+        samples = read_wav(path)
+        onset, end = speech_bounds(samples, EnergyVAD)
+        name = os.path.basename(path)
+        kind = "confirm" if name.startswith("confirm_") else "command"
+        fixtures.append(Fixture(name, samples.astype(np.int16).tobytes(), text, onset, end, kind))
+    return fixtures
+
+
+COMMAND_TEXTS = ["从深圳湾科技生态园到学府路国兴苑", "从北京西站到天安门走吧",
+                 "去宝安机场出发", "从公司到家里"]
+CONFIRM_TEXTS = ["确认", "好的", "取消", "算了"]
+
+
+def synthesize_fixtures(char_ms: float, seed: int = 0) -> List[Fixture]:
+    """合成样本：每个字约 char_ms 毫秒的带音节包络谐波"语音"，前后留静音"""
+    rng = np.random.default_rng(seed)
+    fixtures = []
+    for kind, texts in (("command", COMMAND_TEXTS), ("confirm", CONFIRM_TEXTS)):
+        for i, text in enumerate(texts):
+            lead, speech, tail = 0.4, len(text) * char_ms / 1000 + 0.2, 1.5
+            t = np.arange(int(speech * 16000)) / 16000
+            pitch = rng.uniform(110, 240)
+            voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+            voice *= np.clip(np.sin(2 * np.pi * 4 * t), 0.2, None) * 5000
+            signal = np.concatenate([np.zeros(int(lead * 16000)), voice, np.zeros(int(tail * 16000))])
+            fixtures.append(Fixture(f"{kind}_{i:02d}", signal.astype(np.int16).tobytes(), text,
+                                    lead, lead + speech, kind))
+    return fixtures
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class PipelineBench:
+    """把回放、模拟服务与被测接口串起来，逐个样本采集延迟"""
+
+    def __init__(self, args):
+        from audio_capture import AudioCapture, ReplaySource, set_audio_capture
+        from mock_xfyun_server import MockXfyunServer
+
+        self.args = args
+        self.server = MockXfyunServer(char_ms=args.char_ms, latency_ms=args.latency_ms,
+                                      jitter_ms=args.jitter_ms, seed=args.seed).start()
+        self.source = ReplaySource(noise_level=args.noise)
+        self.capture = AudioCapture(source=self.source)
+        set_audio_capture(self.capture)
+        self.capture.start()
+        self.samples: Dict[str, Dict[str, List[float]]] = {name: {} for name in SCENARIOS}
+        self.failures: Dict[str, int] = {name: 0 for name in SCENARIOS}
+        self._app = None
+
+    @property
+    def app(self):
+        """NavigationApp（同时提供被测的 SpeechHandler 与 XfyunASR），指向模拟服务"""
+        if self._app is None:
+            from main import NavigationApp
+            self._app = NavigationApp()
+            asr = self._app.speech_handler.xfyun_asr
+            asr.url = self.server.url
+            asr.app_id = asr.api_key = asr.api_secret = "bench"
+        return self._app
+
+    def add(self, scenario: str, metric: str, seconds: Optional[float]):
+        if seconds is not None:
+            self.samples[scenario].setdefault(metric, []).append(seconds * 1000)
+
+    def _settle(self, clip):
+        """等样本放完，标记位置，避免下一次会话的预录窗口带上本次的尾音"""
+        clip.done.wait(30)
+        time.sleep(0.2)
+        self.capture.mark()
+
+    def _record_timings(self, scenario: str, timings: dict, onset_at: float, end_at: float):
+        if "first_partial" in timings:
+            self.add(scenario, "first_partial", timings["first_partial"] - onset_at)
+        if "final" in timings:
+            self.add(scenario, "final", timings["final"] - end_at)
+        if "keyword" in timings:
+            self.add(scenario, "keyword", timings["keyword"] - end_at)
+
+    def run_command(self, scenario: str, fixture: Fixture):
+        handler = self.app.speech_handler
+        asr = handler.xfyun_asr
+        self.server.expect(fixture.text)
+        handler.prewarm_recognition("command")
+        clip = self.source.play(fixture.pcm)
+
+        if scenario == "xfyun":
+            text, _ = asr.recognize_speech_with_smart_trigger(max_wait_time=12)
+        else:
+            text, _ = handler.listen_for_speech()
+        returned_at = time.monotonic()
+
+        onset_at, end_at = clip.started_at + fixture.onset, clip.started_at + fixture.end
+        self._record_timings(scenario, asr.timings, onset_at, end_at)
+        self.add(scenario, "return", returned_at - end_at)
+        if text != fixture.text:
+            self.failures[scenario] += 1
+            print(f"❌ {fixture.name}: 期望 {fixture.text}，得到 {text}")
+        self._settle(clip)
+
+    def run_confirm(self, fixture: Fixture):
+        from keyword_spotter import get_spotter
+
+        app = self.app
+        expected = get_spotter("confirm_reply").search(fixture.text).label == "confirm"
+        self.server.expect(fixture.text)
+        played = {}
+
+        async def confirm():
+            started = time.monotonic()
+
+            async def reply_after_prompt():
+                # 播报结束（常驻录音被标记）后用户才开口
+                while self.capture.mark_time < started:
+                    await asyncio.sleep(0.005)
+                played["clip"] = self.source.play(fixture.pcm)
+
+            reply = asyncio.ensure_future(reply_after_prompt())
+            try:
+                return await app.voice_confirm_navigation("起点", "终点")
+            finally:
+                reply.cancel()
+
+        # 识别失败时流程会请求手动输入：不提供输入，直接记为失败
+        stdin, sys.stdin = sys.stdin, io.StringIO("")
+        try:
+            decision = asyncio.run(confirm())
+        except EOFError:
+            decision = None
+        finally:
+            sys.stdin = stdin
+        returned_at = time.monotonic()
+
+        clip = played.get("clip")
+        if clip is None or clip.started_at is None:
+            self.failures["confirm"] += 1
+            return
+        onset_at, end_at = clip.started_at + fixture.onset, clip.started_at + fixture.end
+        self._record_timings("confirm", app.speech_handler.xfyun_asr.timings, onset_at, end_at)
+        # 决策后还会播报"收到确认指令"，这里测量的是从说完到整个确认流程返回
+        self.add("confirm", "return", returned_at - end_at)
+        if decision != expected:
+            self.failures["confirm"] += 1
+            print(f"❌ {fixture.name}: 期望 {'确认' if expected else '取消'}，得到 {decision}")
+        self._settle(clip)
+
+    def run(self, fixtures: List[Fixture], scenarios: List[str], runs: int):
+        for _ in range(runs):
+            for fixture in fixtures:
+                if fixture.kind == "confirm":
+                    if "confirm" in scenarios:
+                        self.run_confirm(fixture)
+                    continue
+                for scenario in scenarios:
+                    if scenario != "confirm":
+                        self.run_command(scenario, fixture)
+
+    def report(self) -> dict:
+        summary = {}
+        for scenario, metrics in self.samples.items():
+            for metric, values in metrics.items():
+                summary[f"{scenario}.{metric}"] = {
+                    "n": len(values),
+                    "p50_ms": round(percentile(values, 0.5), 1),
+                    "p95_ms": round(percentile(values, 0.95), 1),
+                }
+        return summary
+
+    def close(self):
+        if self._app is not None:
+            self._app.cleanup()
+        self.capture.stop()
+        self.server.stop()
+
+
+def parse_thresholds(items: List[str]) -> Dict[str, float]:
+    thresholds = {}
+    for item in items:
+        key, _, value = item.partition("=")
+        thresholds[key.strip()] = float(value)
+    return thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语音识别链路延迟基准（回放录音 + 模拟讯飞服务）")
+    parser.add_argument("--fixtures", help="WAV样本目录（同名 .txt 为期望文本），默认使用合成样本")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="要测量的层级，逗号分隔")
+    parser.add_argument("--runs", type=int, default=3, help="每个样本重复次数")
+    parser.add_argument("--char-ms", type=float, default=180, help="模拟服务每个字的说话时长")
+    parser.add_argument("--latency-ms", type=float, default=50, help="模拟服务单向网络延迟")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--noise", type=float, default=60, help="回放间隙的背景噪声幅度")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--max-p95", action="append", default=[],
+                        help="回归门限，如 handler.return=1500；超出时退出码为1")
+    args = parser.parse_args()
+
+    # 只测讯飞链路：不走Google并行识别和本地确认词识别
+    os.environ["ASR_MODE"] = "fallback"
+    os.environ["USE_XFYUN_ASR"] = "true"
+    os.environ["LOCAL_KWS_ENABLED"] = "false"
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知的层级: {', '.join(sorted(unknown))}")
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else synthesize_fixtures(args.char_ms, args.seed)
+    if not fixtures:
+        parser.error("没有可用的样本")
+
+    bench = PipelineBench(args)
+    try:
+        bench.run(fixtures, scenarios, args.runs)
+        summary = bench.report()
+    finally:
+        bench.close()
+
+    print(f"\n=== 语音识别链路延迟 ({len(fixtures)} 个样本 × {args.runs} 次，"
+          f"模拟网络延迟 {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms) ===")
+    print(f"{'指标':<24} {'n':>4} {'p50':>9} {'p95':>9}")
+    for key, row in summary.items():
+        print(f"{key:<26} {row['n']:>4} {row['p50_ms']:7.0f}ms {row['p95_ms']:7.0f}ms")
+    for scenario, count in bench.failures.items():
+        if count:
+            print(f"❌ {scenario}: {count} 次识别结果不符")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "failures": bench.failures}, f, ensure_ascii=False, indent=2)
+
+    exceeded = [(key, limit) for key, limit in parse_thresholds(args.max_p95).items()
+                if key in summary and summary[key]["p95_ms"] > limit]
+    for key, limit in exceeded:
+        print(f"❌ {key} p95 {summary[key]['p95_ms']:.0f}ms 超过门限 {limit:.0f}ms")
+    sys.exit(1 if exceeded or any(bench.failures.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科大讯飞音频帧发送基准测试
+
+1. 每帧CPU开销：旧实现（构造字典 + base64 + json.dumps）对比 XfyunFrameEncoder
+2. 端到端延迟：模拟声卡实时产生音频，比较旧的 "读1280采样(80ms) + sleep(0.04)" 节奏
+   与新的 "按音频时钟阻塞读取一帧(40ms)" 节奏下，每个数据包从采集到发送的延迟
+
+用法: python bench_xfyun_frames.py [--frames 20000] [--realtime-frames 100]
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+
+from xfyun_frames import (
+    DEFAULT_BUSINESS, FRAME_BYTES, FRAME_DURATION, FRAME_SAMPLES, SAMPLE_WIDTH,
+    STATUS_CONTINUE_FRAME, STATUS_FIRST_FRAME, XfyunFrameEncoder
+)
+
+
+def legacy_encode(app_id, status, buf):
+    """旧实现：每帧构造字典并序列化"""
+    if status == STATUS_FIRST_FRAME:
+        d = {"common": {"app_id": app_id},
+             "business": DEFAULT_BUSINESS,
+             "data": {"status": 0, "format": "audio/L16;rate=16000",
+                      "audio": str(base64.b64encode(buf), 'utf-8'),
+                      "encoding": "raw"}}
+    else:
+        d = {"data": {"status": status, "format": "audio/L16;rate=16000",
+                      "audio": str(base64.b64encode(buf), 'utf-8'),
+                      "encoding": "raw"}}
+    return json.dumps(d)
+
+
+def bench_cpu(frames):
+    """测量每帧编码CPU时间"""
+    pcm_frames = [os.urandom(FRAME_BYTES) for _ in range(64)]
+    encoder = XfyunFrameEncoder("bench-app-id")
+
+    # 两种实现的输出必须等价
+    for status in (STATUS_FIRST_FRAME, STATUS_CONTINUE_FRAME):
+        assert json.loads(encoder.encode(status, pcm_frames[0])) == \
+            json.loads(legacy_encode("bench-app-id", status, pcm_frames[0]))
+
+    results = {}
+    for name, func in (
+        ("legacy(dict+json.dumps)", lambda buf: legacy_encode("bench-app-id", STATUS_CONTINUE_FRAME, buf)),
+        ("XfyunFrameEncoder", lambda buf: encoder.encode(STATUS_CONTINUE_FRAME, buf)),
+    ):
+        start = time.process_time()
+        for i in range(frames):
+            func(pcm_frames[i & 63])
+        elapsed = time.process_time() - start
+        results[name] = elapsed / frames * 1e6
+
+    print("=== 每帧编码CPU开销 ===")
+    for name, us in results.items():
+        print(f"   {name:<26} {us:8.2f} µs/帧")
+    base, new = results["legacy(dict+json.dumps)"], results["XfyunFrameEncoder"]
+    if new > 0:
+        print(f"   加速比: {base / new:.2f}x")
+    return results
+
+
+class SimulatedStream:
+    """模拟声卡输入：音频按实时速率产生，read() 阻塞直到请求的采样全部就绪"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.samples_read = 0
+
+    def read(self, num_samples):
+        self.samples_read += num_samples
+        ready_at = self.start + self.samples_read / (FRAME_SAMPLES / FRAME_DURATION)
+        delay = ready_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return bytes(num_samples * SAMPLE_WIDTH)
+
+    def capture_time(self):
+        """最近读取的一帧音频末尾的采集时刻"""
+        return self.start + self.samples_read / (FRAME_SAMPLES / FRAME_DURATION)
+
+
+def bench_latency(frames, legacy):
+    """测量每个数据包中最早采样从采集到发送的延迟（秒）"""
+    stream = SimulatedStream()
+    encoder = XfyunFrameEncoder("bench-app-id")
+    lags = []
+    for _ in range(frames):
+        if legacy:
+            # 旧实现：stream.read(1280) 实际读取1280个采样(80ms)，随后再 sleep 40ms
+            buf = stream.read(1280)
+            legacy_encode("bench-app-id", STATUS_CONTINUE_FRAME, buf)
+            chunk_start = stream.capture_time() - 1280 / (FRAME_SAMPLES / FRAME_DURATION)
+            lags.append(time.perf_counter() - chunk_start)
+            time.sleep(FRAME_DURATION)
+        else:
+            buf = stream.read(FRAME_SAMPLES)
+            encoder.encode(STATUS_CONTINUE_FRAME, buf)
+            lags.append(time.perf_counter() - (stream.capture_time() - FRAME_DURATION))
+    audio_seconds = stream.samples_read / (FRAME_SAMPLES / FRAME_DURATION)
+    wall_seconds = time.perf_counter() - stream.start
+    return lags, audio_seconds, wall_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="科大讯飞音频帧发送基准测试")
+    parser.add_argument("--frames", type=int, default=20000, help="CPU测试帧数")
+    parser.add_argument("--realtime-frames", type=int, default=100, help="实时节奏测试帧数")
+    args = parser.parse_args()
+
+    bench_cpu(args.frames)
+
+    print("\n=== 最早采样到发送的延迟 (实时模拟) ===")
+    for name, legacy in (("legacy(read+sleep)", True), ("audio-clock", False)):
+        lags, audio_s, wall_s = bench_latency(args.realtime_frames, legacy)
+        lags_ms = [lag * 1000 for lag in lags]
+        print(f"   {name:<20} 音频 {audio_s:5.2f}s / 耗时 {wall_s:5.2f}s  "
+              f"延迟 p50={statistics.median(lags_ms):6.2f}ms  "
+              f"max={max(lags_ms):6.2f}ms  "
+              f"每帧间隔={(wall_s / len(lags)) * 1000:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
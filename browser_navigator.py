@@ -1,19 +1,45 @@
+import asyncio
 import webbrowser
 import urllib.parse
-import requests
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Tuple, Optional
-from config import AMAP_API_KEY
+from async_utils import run_blocking
+from config import AMAP_API_BASE_URL, AMAP_API_KEY, GEOCODE_DEADLINE
+from gazetteer import COARSE_GEOCODE_LEVELS, SOURCE_AMAP, get_gazetteer
+from geocode_cache import get_geocode_cache
+from http_session import get_http_session
+from tracing import span, traced
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 起点/终点地理编码共用的线程池
+_geocode_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="geocode")
 
 class BrowserNavigator:
     def __init__(self):
         self.amap_api_key = AMAP_API_KEY
-        self.geocode_api = "https://restapi.amap.com/v3/geocode/geo"
-        self.regeo_api = "https://restapi.amap.com/v3/geocode/regeo"
+        self.geocode_cache = get_geocode_cache()
+        self.gazetteer = get_gazetteer()
+        self.http = get_http_session()  # 复用keep-alive连接
+        self.amap_base_url = AMAP_API_BASE_URL.rstrip('/')
+        self.geocode_api = f"{self.amap_base_url}/geocode/geo"
+        self.regeo_api = f"{self.amap_base_url}/geocode/regeo"
     
     def geocode_address(self, address: str) -> Optional[Tuple[float, float]]:
         """地址转换为经纬度坐标"""
+        cached = self.geocode_cache.get_coords(address)
+        if cached:
+            logger.debug("地址 '%s' 命中缓存: (%s, %s)", address, cached[0], cached[1])
+            return cached
+        
+        place = self.gazetteer.lookup(address)
+        if place:
+            logger.debug("地址 '%s' 命中地名库 %s: (%s, %s)", address, place.name, place.lng, place.lat)
+            return place.coords
+        
         try:
             params = {
                 'key': self.amap_api_key,
@@ -21,37 +47,77 @@ class BrowserNavigator:
                 'output': 'json'
             }
             
-            response = requests.get(self.geocode_api, params=params, timeout=3)
+            response = self.http.get(self.geocode_api, params=params, timeout=3)
             data = response.json()
             
             if data['status'] == '1' and data['geocodes']:
-                location = data['geocodes'][0]['location']
-                lng, lat = map(float, location.split(','))
-                print(f"地址 '{address}' 转换为坐标: ({lng}, {lat})")
+                geocode = data['geocodes'][0]
+                lng, lat = map(float, geocode['location'].split(','))
+                logger.debug("地址 '%s' 转换为坐标: (%s, %s)", address, lng, lat)
+                self.geocode_cache.put(address, lng, lat, geocode.get('formatted_address', ''))
+                if geocode.get('level') not in COARSE_GEOCODE_LEVELS:
+                    self.gazetteer.add(address, lng, lat, geocode.get('formatted_address', ''), source=SOURCE_AMAP)
                 return lng, lat
             else:
-                print(f"地址 '{address}' 转换失败: {data.get('info', '未知错误')}")
+                logger.warning("地址 '%s' 转换失败: %s", address, data.get('info', '未知错误'))
                 return None
                 
         except Exception as e:
-            print(f"地址转换错误: {e}")
+            logger.error("地址转换错误: %s", e)
             return None
-    
-    def build_amap_url(self, origin: str, destination: str) -> str:
-        """构建高德地图导航URL"""
+
+    @traced("amap.geocode")
+    def geocode_pair(self, origin: str, destination: str,
+                     deadline: float = GEOCODE_DEADLINE) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+        """并发转换起点和终点坐标，两次查询共享同一个截止时间"""
+        futures = {}
+        if origin and origin != "当前位置":
+            futures['origin'] = _geocode_executor.submit(self.geocode_address, origin)
+        if destination:
+            futures['destination'] = _geocode_executor.submit(self.geocode_address, destination)
+
+        if not futures:
+            return None, None
+
+        done, not_done = wait(futures.values(), timeout=deadline)
+        if not_done:
+            logger.warning("⏰ 地址转换超过 %s 秒，忽略未完成的查询", deadline)
+
+        results = {}
+        for role, future in futures.items():
+            if future in done:
+                try:
+                    results[role] = future.result()
+                except Exception as e:
+                    logger.error("地址转换错误: %s", e)
+            else:
+                future.cancel()
+
+        return results.get('origin'), results.get('destination')
+
+    async def geocode_pair_async(self, origin: str, destination: str,
+                                 deadline: float = GEOCODE_DEADLINE) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+        """异步并发地理编码"""
         try:
-            # 获取起点和终点坐标
-            origin_coords = None
-            dest_coords = None
-            
-            # 处理起点
-            if origin and origin != "当前位置":
-                origin_coords = self.geocode_address(origin)
-            
-            # 处理终点
-            if destination:
-                dest_coords = self.geocode_address(destination)
-            
+            # geocode_pair 自身受 deadline 约束，这里多留一点调度余量
+            return await run_blocking(self.geocode_pair, origin, destination, deadline, timeout=deadline + 1)
+        except asyncio.TimeoutError:
+            logger.warning("⏰ 地址转换超过 %s 秒", deadline)
+            return None, None
+
+    def build_amap_url(self, origin: str, destination: str,
+                       coords: Optional[Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]] = None) -> str:
+        """构建高德地图导航URL
+        
+        coords: 已经获取到的 (起点坐标, 终点坐标)，提供时不再重复地理编码
+        """
+        try:
+            if coords and coords[1]:
+                origin_coords, dest_coords = coords
+            else:
+                # 并发获取起点和终点坐标
+                origin_coords, dest_coords = self.geocode_pair(origin, destination)
+
             if not dest_coords:
                 # 如果无法获取坐标，使用地址名称
                 base_url = "https://uri.amap.com/navigation"
@@ -87,22 +153,23 @@ class BrowserNavigator:
             return url
             
         except Exception as e:
-            print(f"构建导航URL失败: {e}")
+            logger.error("构建导航URL失败: %s", e)
             # 回退到简单URL
             simple_url = f"https://ditu.amap.com/search?query={urllib.parse.quote(destination)}"
             return simple_url
     
-    def open_navigation(self, origin: str, destination: str) -> Tuple[bool, str]:
+    def open_navigation(self, origin: str, destination: str, coords=None) -> Tuple[bool, str]:
         """打开浏览器进行导航"""
         try:
-            print(f"正在构建导航链接: {origin} -> {destination}")
+            logger.debug("正在构建导航链接: %s -> %s", origin, destination)
             
             # 构建高德地图导航URL
-            nav_url = self.build_amap_url(origin, destination)
-            print(f"导航URL: {nav_url}")
+            nav_url = self.build_amap_url(origin, destination, coords=coords)
+            logger.debug("导航URL: %s", nav_url)
             
             # 打开浏览器
-            success = webbrowser.open(nav_url)
+            with span("browser.open"):
+                success = webbrowser.open(nav_url)
             
             if success:
                 return True, "浏览器导航已启动"
@@ -110,7 +177,7 @@ class BrowserNavigator:
                 return False, "无法打开浏览器"
                 
         except Exception as e:
-            print(f"打开导航失败: {e}")
+            logger.error("打开导航失败: %s", e)
             return False, f"导航启动失败: {str(e)}"
     
     def open_simple_search(self, location: str) -> Tuple[bool, str]:
@@ -135,27 +202,27 @@ class BrowserNavigator:
             coords = self.geocode_address(test_address)
             
             if coords:
-                print("高德API连接测试成功")
+                logger.info("高德API连接测试成功")
                 return True
             else:
-                print("高德API连接测试失败")
+                logger.error("高德API连接测试失败")
                 return False
                 
         except Exception as e:
-            print(f"API连接测试错误: {e}")
+            logger.error("API连接测试错误: %s", e)
             return False
     
     def get_current_location(self) -> Optional[Tuple[float, float]]:
         """获取当前位置（基于IP的粗略定位）"""
         try:
             # 使用高德IP定位API
-            ip_api = "https://restapi.amap.com/v3/ip"
+            ip_api = f"{self.amap_base_url}/ip"
             params = {
                 'key': self.amap_api_key,
                 'output': 'json'
             }
             
-            response = requests.get(ip_api, params=params, timeout=5)
+            response = self.http.get(ip_api, params=params, timeout=5)
             data = response.json()
             
             if data['status'] == '1' and 'rectangle' in data:
@@ -163,11 +230,11 @@ class BrowserNavigator:
                 rectangle = data['rectangle']
                 coords = rectangle.split(';')[0].split(',')
                 lng, lat = map(float, coords)
-                print(f"当前大致位置: ({lng}, {lat}) - {data.get('city', '未知城市')}")
+                logger.info("当前大致位置: (%s, %s) - %s", lng, lat, data.get('city', '未知城市'))
                 return lng, lat
             
             return None
             
         except Exception as e:
-            print(f"获取当前位置失败: {e}")
+            logger.error("获取当前位置失败: %s", e)
             return None
\ No newline at end of file
@@ -41,7 +41,7 @@ def check_optional_dependencies():
         ('win32com.client', 'Windows SAPI语音'),
         ('pygame', '音频播放'),
         ('edge_tts', 'Edge TTS语音'),
-        ('pyaudio', '科大讯飞录音'),
+        ('pyaudio', '常驻录音'),
         ('dotenv', '环境变量加载'),
     ]
     
@@ -8,12 +8,20 @@ load_environment()
 # AI模型配置 - 阿里千问
 DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY', '')
 QWEN_MODEL = os.getenv('QWEN_MODEL', 'qwen-max')
+# DashScope服务地址，留空使用SDK默认地址；压测时可指向 mock_api_server.py
+DASHSCOPE_HTTP_BASE_URL = os.getenv('DASHSCOPE_HTTP_BASE_URL', '')
 
 # 高德地图配置
 AMAP_API_KEY = os.getenv('AMAP_API_KEY', '')
 AMAP_API_BASE_URL = os.getenv('AMAP_API_BASE_URL', 'https://restapi.amap.com/v3')
 AMAP_REQUEST_TIMEOUT = int(os.getenv('AMAP_REQUEST_TIMEOUT', '10'))
 
+# HTTP连接池配置
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))  # 主机连接池数量
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))  # 每个主机的最大keep-alive连接数
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.3'))
+
 # 语音识别配置
 SPEECH_RECOGNITION_LANGUAGE = os.getenv('SPEECH_RECOGNITION_LANGUAGE', 'zh-CN')
 SPEECH_TIMEOUT = int(os.getenv('SPEECH_TIMEOUT', '5'))
@@ -23,6 +31,30 @@ XFYUN_APP_ID = os.getenv('XFYUN_APP_ID', '')
 XFYUN_API_SECRET = os.getenv('XFYUN_API_SECRET', '')
 XFYUN_API_KEY = os.getenv('XFYUN_API_KEY', '')
 USE_XFYUN_ASR = os.getenv('USE_XFYUN_ASR', 'true').lower() == 'true'
+# 识别服务地址，基准测试时可指向本地模拟服务 (mock_xfyun_server.py)
+XFYUN_ASR_URL = os.getenv('XFYUN_ASR_URL', 'wss://ws-api.xfyun.cn/v2/iat')
+
+# 识别模式：fallback（默认）为讯飞失败后再用Google；
+# race 需显式开启：同一段录音同时上传科大讯飞和Google识别，先得到可信结果者胜出（多一路上传流量，录音也会发给Google）
+ASR_MODE = os.getenv('ASR_MODE', 'fallback')
+GOOGLE_MIN_CONFIDENCE = float(os.getenv('GOOGLE_MIN_CONFIDENCE', '0.6'))
+
+# 常驻录音配置：识别会话从提示音结束后的预录窗口开始读取
+AUDIO_PREROLL_MS = int(os.getenv('AUDIO_PREROLL_MS', '500'))
+AUDIO_BUFFER_SECONDS = float(os.getenv('AUDIO_BUFFER_SECONDS', '10'))
+
+# 语音活动检测（VAD）配置：语音后静音超过 VAD_HANGOVER_MS 即判定说完
+VAD_BACKEND = os.getenv('VAD_BACKEND', 'energy')
+VAD_HANGOVER_MS = int(os.getenv('VAD_HANGOVER_MS', '800'))
+VAD_MIN_SPEECH_MS = int(os.getenv('VAD_MIN_SPEECH_MS', '120'))
+VAD_THRESHOLD_RATIO = float(os.getenv('VAD_THRESHOLD_RATIO', '2.0'))
+
+# 本地确认词识别配置（MFCC + DTW 模板匹配，模板用 python local_kws.py enroll 录制）
+LOCAL_KWS_ENABLED = os.getenv('LOCAL_KWS_ENABLED', 'true').lower() == 'true'
+LOCAL_KWS_DIR = os.getenv('LOCAL_KWS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kws_templates'))
+LOCAL_KWS_THRESHOLD = float(os.getenv('LOCAL_KWS_THRESHOLD', '0'))  # 0 表示按模板自动校准
+LOCAL_KWS_MARGIN = float(os.getenv('LOCAL_KWS_MARGIN', '1.15'))  # 其他类别距离至少是最佳距离的倍数
+LOCAL_KWS_HANGOVER_MS = int(os.getenv('LOCAL_KWS_HANGOVER_MS', '400'))
 
 # 七牛云MCP配置
 OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
@@ -34,11 +66,61 @@ USE_QINIU_MCP = os.getenv('USE_QINIU_MCP', 'false').lower() == 'true'
 NAVIGATION_MODE = os.getenv('NAVIGATION_MODE', 'browser')
 BROWSER_NAVIGATION_ENABLED = os.getenv('BROWSER_NAVIGATION_ENABLED', 'true').lower() == 'true'
 
+# 异步导航流水线超时配置（秒）
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '15'))
+AI_STREAMING = os.getenv('AI_STREAMING', 'true').lower() == 'true'  # 流式解析，起点终点完整即返回
+NAVIGATION_TIMEOUT = float(os.getenv('NAVIGATION_TIMEOUT', '20'))
+TTS_TIMEOUT = float(os.getenv('TTS_TIMEOUT', '30'))
+
+# 语音确认期间提前进行地理编码/路线规划
+SPECULATIVE_NAVIGATION = os.getenv('SPECULATIVE_NAVIGATION', 'true').lower() == 'true'
+
 # 默认城市配置
 DEFAULT_CITY = os.getenv('DEFAULT_CITY', '深圳市')
 
-# 系统提示词
-SYSTEM_PROMPT = f"""
+# 本地缓存配置
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'navigation_cache.db'))
+GEOCODE_CACHE_ENABLED = os.getenv('GEOCODE_CACHE_ENABLED', 'true').lower() == 'true'
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '1024'))
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', '2592000'))  # 默认30天
+GEOCODE_CACHE_DISK_SIZE = int(os.getenv('GEOCODE_CACHE_DISK_SIZE', '20000'))  # 磁盘层最多条数，0 为不限
+GEOCODE_DEADLINE = float(os.getenv('GEOCODE_DEADLINE', '3.5'))  # 起点/终点并发地理编码的总截止时间（秒）
+
+# 本地地名库配置（常去地点离线解析，跳过高德地理编码和MCP大模型调用）
+GAZETTEER_ENABLED = os.getenv('GAZETTEER_ENABLED', 'true').lower() == 'true'
+GAZETTEER_MIN_SCORE = float(os.getenv('GAZETTEER_MIN_SCORE', '0.7'))  # 模糊匹配的最低相似度
+
+# 意图解析缓存配置（同一句话跳过大模型调用）
+INTENT_CACHE_ENABLED = os.getenv('INTENT_CACHE_ENABLED', 'true').lower() == 'true'
+INTENT_CACHE_SIZE = int(os.getenv('INTENT_CACHE_SIZE', '512'))
+INTENT_CACHE_TTL = int(os.getenv('INTENT_CACHE_TTL', '604800'))  # 默认7天
+INTENT_CACHE_DISK_SIZE = int(os.getenv('INTENT_CACHE_DISK_SIZE', '10000'))  # 磁盘层最多条数，0 为不限
+
+# 本地规则解析配置（常见句式置信度足够时跳过大模型调用）
+LOCAL_INTENT_ENABLED = os.getenv('LOCAL_INTENT_ENABLED', 'true').lower() == 'true'
+LOCAL_INTENT_MIN_CONFIDENCE = float(os.getenv('LOCAL_INTENT_MIN_CONFIDENCE', '0.8'))
+
+# 批量意图解析配置（batch_intent.py）
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))  # 同时进行的大模型调用数
+BATCH_RATE_LIMIT = float(os.getenv('BATCH_RATE_LIMIT', '5'))  # 每秒最多调用大模型次数，0 为不限
+
+# 链路计时配置
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', 'true').lower() == 'true'
+TRACE_FILE = os.getenv('TRACE_FILE', '')  # 退出时导出计时：.json 为Chrome Trace，其余为JSONL（追加）
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '5000'))
+
+# 日志配置
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # DEBUG 时输出逐条中间结果、发送帧等细节
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text 只输出消息；json 输出结构化JSON行
+LOG_FILE = os.getenv('LOG_FILE', '')  # 另外写入JSON行日志文件
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # 日志队列容量，满时丢弃
+
+# 提示词配置
+PROMPT_VERSION = os.getenv('PROMPT_VERSION', 'v1')  # v1 完整版；v2 精简版（更少的预填充token，准确率通过基准对比后再启用）
+PROMPT_CACHE = os.getenv('PROMPT_CACHE', 'auto')  # auto 依赖服务端隐式缓存；explicit 为足够长的提示词显式声明缓存
+
+# 系统提示词（完整版 v1；精简版及版本选择见 prompt_manager.py）
+SYSTEM_PROMPT_TEMPLATE = """
 你是一个导航助手，负责解析用户的导航需求。
 用户会说出从A地到B地的导航请求，你需要提取出起点和终点信息。
 
@@ -52,19 +134,20 @@ SYSTEM_PROMPT = f"""
 地址格式规则：
 1. 如果用户没有明确说明起点，使用"当前位置"作为起点
 2. 地址必须采用"城市+区域+具体地址"的格式
-3. 如果地址中缺少城市信息，必须在最前面加上"{DEFAULT_CITY}"
+3. 如果地址中缺少城市信息，必须在最前面加上"{city}"
 4. 正确格式示例：
-   - "{DEFAULT_CITY}南山区学府路国兴苑"
-   - "{DEFAULT_CITY}深圳湾科技生态园"
-   - "{DEFAULT_CITY}福田区市民中心"
+   - "{city}南山区学府路国兴苑"
+   - "{city}深圳湾科技生态园"
+   - "{city}福田区市民中心"
 5. 错误格式（禁止使用）：
-   - "学府路国兴苑, {DEFAULT_CITY}"
-   - "南山区学府路国兴苑, {DEFAULT_CITY}"
+   - "学府路国兴苑, {city}"
+   - "南山区学府路国兴苑, {city}"
 6. 只返回JSON格式，不要添加解释文字
 7. 如果无法解析，返回：{{"error": "无法解析导航请求"}}
 
-当前默认城市：{DEFAULT_CITY}
+当前默认城市：{city}
 """
+SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.format(city=DEFAULT_CITY)
 
 # 配置验证函数
 def validate_config():
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地地名库
+常去的地点（深圳湾科技生态园、宝安机场……）不必每次都请求高德地理编码或七牛云MCP大模型：
+地名、别名和坐标存放在SQLite表 places 中，启动时载入内存索引，离线亚毫秒级解析。
+
+- 精确匹配：地名和别名规范化后（去掉空白标点、省市前缀）按城市分别查表，不同城市的同名地点互不覆盖
+- 前缀补全：前缀树，输入只对应一个地点、且覆盖地名的比例达到 GAZETTEER_MIN_SCORE 时补全
+  （"深圳湾科技生态" -> 深圳湾科技生态园；"南山区科技园"不会补全成"南山区科技园腾讯大厦"）
+- 模糊匹配：字符二元组倒排索引，Dice相似度达到 GAZETTEER_MIN_SCORE 时采用（应对识别错字、多出区名）；
+  输入在地名之后还有内容（"科技园北区""国际机场T3"）时指的是更具体的地点，交给高德解析
+
+地名库由成功的地理编码自动积累，也可以从地理编码缓存或CSV文件导入。
+
+用法: python gazetteer.py import places.csv   # CSV列: name,lng,lat[,aliases,formatted_address,city]，别名以 | 分隔
+      python gazetteer.py seed                 # 从地理编码缓存导入
+      python gazetteer.py lookup 宝安机场
+      python gazetteer.py list
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app_logging import get_logger
+from config import CACHE_DB_PATH, DEFAULT_CITY, GAZETTEER_ENABLED, GAZETTEER_MIN_SCORE
+from intent_parser import CURRENT_LOCATION
+
+logger = get_logger(__name__)
+
+# 地点来源
+SOURCE_AMAP = "amap"
+SOURCE_MCP = "mcp"
+SOURCE_CSV = "csv"
+SOURCE_CACHE = "geocode_cache"
+
+# 高德地理编码结果的匹配级别：行政区划一级的结果只是区域中心点，不记入地名库
+COARSE_GEOCODE_LEVELS = frozenset(("国家", "省", "市", "城市", "区县", "开发区", "乡镇", "未知"))
+
+_PUNCT = re.compile(r'[\s,，.。、;；:：!！?？"\'“”‘’()（）\[\]【】<>《》·\-]+')
+_PROVINCE = re.compile(r'^[\u4e00-\u9fff]{2,3}(?:省|自治区)')
+# 城市名不含区县路街；超市、菜市、城市广场等也不是城市名
+_CITY = re.compile(r'^((?:(?![区县路街镇村])[\u4e00-\u9fff]){2,3}(?<![超菜夜集城股])市)')
+
+# 前缀补全的最短输入长度，太短的前缀（"深圳湾"）往往对应多个地点
+MIN_PREFIX_CHARS = 4
+
+
+class Place(NamedTuple):
+    name: str
+    lng: float
+    lat: float
+    formatted_address: str = ""
+    aliases: Tuple[str, ...] = ()
+    city: str = ""
+    source: str = ""
+
+    @property
+    def coords(self) -> Tuple[float, float]:
+        return self.lng, self.lat
+
+    @property
+    def location(self) -> str:
+        """高德接口使用的 "经度,纬度" 字符串"""
+        return f"{self.lng},{self.lat}"
+
+
+class Match(NamedTuple):
+    place: Place
+    score: float  # 1.0 为精确匹配
+    method: str   # exact / prefix / fuzzy
+
+
+def split_city(address: str) -> Tuple[str, str]:
+    """去掉空白标点和省份，拆出开头的城市：返回 (城市, 其余部分)"""
+    text = _PROVINCE.sub('', _PUNCT.sub('', address or ''))
+    match = _CITY.match(text)
+    if match and len(text) > len(match.group(1)):
+        return match.group(1), text[len(match.group(1)):]
+    return "", text
+
+
+def normalize_name(address: str) -> str:
+    """索引键：不含空白标点和省市前缀"""
+    return split_city(address)[1]
+
+
+def _adds_detail(key: str, candidate: str) -> bool:
+    """输入在候选地名结尾之后还有内容：候选是输入的前缀或中间一段"""
+    tail = candidate[-2:]
+    index = key.rfind(tail)
+    return index != -1 and index + len(tail) < len(key)
+
+
+def _bigrams(key: str) -> Set[str]:
+    if len(key) < 2:
+        return {key} if key else set()
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+class Gazetteer:
+    """地名、别名 -> 坐标 的本地索引（线程安全）"""
+
+    def __init__(self, db_path: Optional[str] = CACHE_DB_PATH,
+                 enabled: bool = GAZETTEER_ENABLED,
+                 min_score: float = GAZETTEER_MIN_SCORE,
+                 city: str = DEFAULT_CITY):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.min_score = min_score
+        self.city = city
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # 内存索引；键均带城市（"深圳市|宝安机场"），不同城市的同名地点分别索引
+        self._places: Dict[str, Place] = {}      # 地名键 -> 地点
+        self._keys: Dict[str, str] = {}          # 地名或别名键 -> 地名键
+        self._grams: Dict[str, Set[str]] = {}    # 二元组 -> 地名或别名键
+        self._gram_counts: Dict[str, int] = {}   # 地名或别名键 -> 二元组数
+        self._trie: Dict[str, Any] = {}          # 逐字前缀树（不含城市），节点的 "" 项为经过该节点的键
+
+        self.hits = 0
+        self.misses = 0
+
+        if enabled and db_path:
+            self._open_db()
+            self._load()
+
+    def _open_db(self):
+        """打开SQLite数据库，失败时只使用内存索引"""
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                "key TEXT PRIMARY KEY, "
+                "name TEXT NOT NULL, "
+                "aliases TEXT NOT NULL DEFAULT '[]', "
+                "city TEXT NOT NULL DEFAULT '', "
+                "lng REAL NOT NULL, "
+                "lat REAL NOT NULL, "
+                "formatted_address TEXT NOT NULL DEFAULT '', "
+                "source TEXT NOT NULL DEFAULT '', "
+                "updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning("⚠️ 地名库数据库不可用，仅使用内存索引: %s", e)
+            self._conn = None
+
+    def _load(self):
+        if self._conn is None:
+            return
+        try:
+            rows = self._conn.execute(
+                "SELECT key, name, lng, lat, formatted_address, aliases, city, source FROM places"
+            ).fetchall()
+        except Exception as e:
+            logger.warning("⚠️ 读取地名库失败: %s", e)
+            return
+        with self._lock:
+            for key, name, lng, lat, formatted_address, aliases, city, source in rows:
+                place = Place(name, lng, lat, formatted_address, tuple(json.loads(aliases)), city or self.city, source)
+                place_key = self._index(place)
+                if key != place_key:
+                    # 旧版本的键不含城市，按新键重写
+                    self._save(place_key, place)
+                    self._delete(key)
+        logger.debug("📍 地名库载入 %s 个地点", len(rows))
+
+    def _scoped(self, city: str, key: str) -> str:
+        """带城市的索引键，没有城市时属于默认城市"""
+        return f"{city or self.city}|{key}"
+
+    @staticmethod
+    def _text(scoped_key: str) -> str:
+        return scoped_key.split("|", 1)[1]
+
+    # ---- 索引 ----
+
+    def _index(self, place: Place) -> str:
+        place_key = self._scoped(place.city, normalize_name(place.name))
+        old = self._places.get(place_key)
+        if old is not None:
+            self._unindex(place_key, old)
+        self._places[place_key] = place
+        for alias in (place.name, place.formatted_address) + place.aliases:
+            text = normalize_name(alias)
+            if not text:
+                continue
+            key = self._scoped(place.city, text)
+            if key in self._keys:
+                # 正式名称优先于其他地点的同名别名；别名之间先到先得
+                if key == place_key:
+                    self._keys[key] = place_key
+                continue
+            self._keys[key] = place_key
+            grams = _bigrams(text)
+            self._gram_counts[key] = len(grams)
+            for gram in grams:
+                self._grams.setdefault(gram, set()).add(key)
+            node = self._trie
+            for char in text:
+                node = node.setdefault(char, {})
+                node.setdefault("", set()).add(key)
+        return place_key
+
+    def _unindex(self, place_key: str, place: Place):
+        for key in [key for key, owner in self._keys.items() if owner == place_key]:
+            text = self._text(key)
+            del self._keys[key]
+            del self._gram_counts[key]
+            for gram in _bigrams(text):
+                self._grams.get(gram, set()).discard(key)
+            node = self._trie
+            for char in text:
+                node = node.get(char)
+                if node is None:
+                    break
+                node.get("", set()).discard(key)
+
+    # ---- 查询 ----
+
+    def _same_city(self, city: str, place: Place) -> bool:
+        """没有说城市的地址属于默认城市"""
+        return (place.city or self.city) == (city or self.city)
+
+    def match(self, address: str) -> Optional[Match]:
+        """查找地点：精确 -> 唯一前缀 -> 模糊，未找到返回 None"""
+        if not self.enabled:
+            return None
+        city, key = split_city(address)
+        if not key:
+            return None
+        with self._lock:
+            result = self._match(city, key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def _match(self, city: str, key: str) -> Optional[Match]:
+        owner = self._keys.get(self._scoped(city, key))
+        if owner is not None:
+            return Match(self._places[owner], 1.0, "exact")
+
+        # 以输入为前缀的地名是更具体的地点（"科技园" -> "科技园腾讯大厦"），覆盖不够时也不参与模糊匹配
+        completions = self._completions(key)
+        if len(key) >= MIN_PREFIX_CHARS:
+            same_city = [completion for completion in completions
+                         if self._same_city(city, self._places[self._keys[completion]])]
+            if len({self._keys[completion] for completion in same_city}) == 1:
+                shortest = min(same_city, key=len)
+                score = len(key) / len(self._text(shortest))
+                if score >= self.min_score:
+                    return Match(self._places[self._keys[shortest]], round(score, 3), "prefix")
+
+        grams = _bigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        best: Optional[Match] = None
+        for candidate, count in shared.items():
+            if candidate in completions or _adds_detail(key, self._text(candidate)):
+                continue
+            score = 2 * count / (len(grams) + self._gram_counts[candidate])
+            place = self._places[self._keys[candidate]]
+            if score >= self.min_score and self._same_city(city, place) and (best is None or score > best.score):
+                best = Match(place, round(score, 3), "fuzzy")
+        return best
+
+    def _completions(self, prefix: str) -> Set[str]:
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get("", set())
+
+    def lookup(self, address: str) -> Optional[Place]:
+        """查找地点，返回 Place 或 None"""
+        result = self.match(address)
+        return result.place if result else None
+
+    def get_coords(self, address: str) -> Optional[Tuple[float, float]]:
+        """查找地点，返回 (lng, lat) 或 None"""
+        place = self.lookup(address)
+        return place.coords if place else None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Place]:
+        """按前缀列出同一城市的地点（地名或别名以该前缀开头）"""
+        city, key = split_city(prefix)
+        if not key:
+            return []
+        with self._lock:
+            owners = sorted({self._keys[completion] for completion in self._completions(key)
+                             if self._same_city(city, self._places[self._keys[completion]])})
+            return [self._places[owner] for owner in owners[:limit]]
+
+    # ---- 写入 ----
+
+    def add(self, name: str, lng: float, lat: float, formatted_address: str = "",
+            aliases: Iterable[str] = (), city: str = "", source: str = "") -> Optional[Place]:
+        """添加或更新地点；同名地点的别名合并"""
+        if not self.enabled:
+            return None
+        name_city, text = split_city(name)
+        if not text or text == CURRENT_LOCATION:
+            return None  # 当前位置随时在变，不能记入地名库
+        city = city or name_city or self.city
+        place_key = self._scoped(city, text)
+        with self._lock:
+            old = self._places.get(place_key)
+            merged = list(old.aliases) if old else []
+            for alias in aliases:
+                alias = alias.strip()
+                if alias and alias not in merged and normalize_name(alias) != text:
+                    merged.append(alias)
+            place = Place(name, float(lng), float(lat), formatted_address or (old.formatted_address if old else ""),
+                          tuple(merged), city, source)
+            self._index(place)
+            self._save(place_key, place)
+            return place
+
+    def _save(self, place_key: str, place: Place):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO places "
+                "(key, name, aliases, city, lng, lat, formatted_address, source, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (place_key, place.name, json.dumps(list(place.aliases), ensure_ascii=False), place.city,
+                 place.lng, place.lat, place.formatted_address, place.source, time.time())
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning("⚠️ 写入地名库失败: %s", e)
+
+    def _delete(self, place_key: str):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute("DELETE FROM places WHERE key = ?", (place_key,))
+            self._conn.commit()
+        except Exception as e:
+            logger.warning("⚠️ 删除地点失败: %s", e)
+
+    def remove(self, name: str):
+        """删除地点（地址不带城市时为默认城市的地点）"""
+        place_key = self._scoped(*split_city(name))
+        with self._lock:
+            place = self._places.pop(place_key, None)
+            if place is not None:
+                self._unindex(place_key, place)
+            self._delete(place_key)
+
+    def import_csv(self, path: str) -> int:
+        """从CSV导入地点，返回导入数量。列: name,lng,lat[,aliases,formatted_address,city]，别名以 | 分隔"""
+        count = 0
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    lng, lat = float(row["lng"]), float(row["lat"])
+                except (KeyError, TypeError, ValueError):
+                    logger.warning("⚠️ 跳过无效行: %s", row)
+                    continue
+                aliases = [alias for alias in (row.get("aliases") or "").split("|") if alias.strip()]
+                if self.add(row["name"], lng, lat, row.get("formatted_address") or "", aliases,
+                            row.get("city") or "", SOURCE_CSV):
+                    count += 1
+        return count
+
+    def seed_from_geocode_cache(self, db_path: Optional[str] = None) -> int:
+        """导入地理编码缓存中未过期的成功结果，返回导入数量"""
+        db_path = db_path or self.db_path
+        if not db_path or not os.path.exists(db_path):
+            return 0
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = conn.execute(
+                    "SELECT key, value FROM cache_entries WHERE namespace = 'geocode' "
+                    "AND (expires_at = 0 OR expires_at > ?)", (time.time(),)
+                ).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning("⚠️ 读取地理编码缓存失败: %s", e)
+            return 0
+        count = 0
+        for address, value in rows:
+            entry = json.loads(value)
+            if self.add(address, entry["lng"], entry["lat"], entry.get("formatted_address", ""), source=SOURCE_CACHE):
+                count += 1
+        return count
+
+    def places(self) -> List[Place]:
+        with self._lock:
+            return list(self._places.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "places": len(self._places),
+                "keys": len(self._keys),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "enabled": self.enabled,
+                "persistent": self._conn is not None
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+
+_shared_gazetteer: Optional[Gazetteer] = None
+_shared_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """获取进程内共享的地名库实例"""
+    global _shared_gazetteer
+    if _shared_gazetteer is None:
+        with _shared_lock:
+            if _shared_gazetteer is None:
+                _shared_gazetteer = Gazetteer()
+    return _shared_gazetteer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地地名库（导入、查询）")
+    parser.add_argument("--db", default=CACHE_DB_PATH, help="数据库文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("import", help="从CSV导入").add_argument("csv")
+    commands.add_parser("seed", help="从地理编码缓存导入")
+    commands.add_parser("lookup", help="查询地点").add_argument("address", nargs="+")
+    commands.add_parser("list", help="列出全部地点")
+    args = parser.parse_args()
+
+    gazetteer = Gazetteer(db_path=args.db, enabled=True)
+    if args.command == "import":
+        print(f"✅ 导入 {gazetteer.import_csv(args.csv)} 个地点，共 {len(gazetteer.places())} 个")
+    elif args.command == "seed":
+        print(f"✅ 从地理编码缓存导入 {gazetteer.seed_from_geocode_cache()} 个地点，共 {len(gazetteer.places())} 个")
+    elif args.command == "lookup":
+        for address in args.address:
+            start = time.perf_counter()
+            result = gazetteer.match(address)
+            elapsed = (time.perf_counter() - start) * 1000
+            if result is None:
+                print(f"❌ {address}: 未找到 ({elapsed:.3f}ms)")
+            else:
+                print(f"📍 {address} -> {result.place.name} ({result.place.location}) "
+                      f"{result.method} {result.score:.2f} ({elapsed:.3f}ms)")
+    else:
+        for place in sorted(gazetteer.places()):
+            aliases = f"  别名: {'、'.join(place.aliases)}" if place.aliases else ""
+            print(f"{place.name}\t{place.location}\t{place.source}{aliases}")
+    gazetteer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+地理编码缓存
+BrowserNavigator 和 MCPClient 共享的地址 -> 坐标缓存
+"""
+
+import re
+import threading
+from typing import Any, Dict, Optional
+
+from config import (
+    CACHE_DB_PATH, GEOCODE_CACHE_DISK_SIZE, GEOCODE_CACHE_ENABLED, GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL
+)
+from persistent_cache import PersistentLRUCache
+
+
+class GeocodeCache:
+    """地址地理编码结果缓存"""
+
+    def __init__(self, db_path: Optional[str] = CACHE_DB_PATH,
+                 max_entries: int = GEOCODE_CACHE_SIZE,
+                 ttl: float = GEOCODE_CACHE_TTL,
+                 enabled: bool = GEOCODE_CACHE_ENABLED,
+                 max_disk_entries: int = GEOCODE_CACHE_DISK_SIZE):
+        self.enabled = enabled
+        self._cache = PersistentLRUCache(
+            "geocode", db_path=db_path, max_entries=max_entries, ttl=ttl, max_disk_entries=max_disk_entries
+        )
+
+    @staticmethod
+    def normalize_address(address: str) -> str:
+        """规范化地址作为缓存键（去除所有空白字符）"""
+        return re.sub(r'\s+', '', address or '')
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，返回 {'lng', 'lat', 'formatted_address'} 或 None"""
+        if not self.enabled:
+            return None
+        key = self.normalize_address(address)
+        if not key:
+            return None
+        return self._cache.get(key)
+
+    def get_coords(self, address: str) -> Optional[tuple]:
+        """查询缓存，返回 (lng, lat) 或 None"""
+        entry = self.get(address)
+        if entry is None:
+            return None
+        return entry['lng'], entry['lat']
+
+    def put(self, address: str, lng: float, lat: float, formatted_address: str = ""):
+        """写入成功的地理编码结果"""
+        if not self.enabled:
+            return
+        key = self.normalize_address(address)
+        if not key:
+            return
+        self._cache.put(key, {
+            'lng': lng,
+            'lat': lat,
+            'formatted_address': formatted_address or address
+        })
+
+    def invalidate(self, address: str):
+        """删除单个地址的缓存"""
+        self._cache.invalidate(self.normalize_address(address))
+
+    def clear(self):
+        """清空地理编码缓存"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        stats = self._cache.get_stats()
+        stats['enabled'] = self.enabled
+        return stats
+
+
+_shared_cache: Optional[GeocodeCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """获取进程内共享的地理编码缓存实例"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = GeocodeCache()
+    return _shared_cache
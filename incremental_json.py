@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量JSON解析
+大模型流式输出时逐段喂入文本，边接收边解析顶层JSON对象：每个字段的值一完整就可以取用，
+不必等整段生成结束。对象之前的 ```json 代码块标记或说明文字会被跳过。
+
+    parser = IncrementalJSONParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if {"origin", "destination"} <= parser.fields.keys():
+            break
+"""
+
+import json
+from typing import Any, Dict
+
+# 解析状态
+_BEFORE = 0       # 等待顶层对象的 "{"
+_KEY = 1          # 等待字段名（或 "}"）
+_IN_KEY = 2       # 字段名字符串内
+_COLON = 3        # 等待 ":"
+_VALUE = 4        # 等待字段值
+_IN_STRING = 5    # 字符串值内
+_IN_SCALAR = 6    # 数字 / true / false / null
+_IN_NESTED = 7    # 嵌套的对象或数组（整体作为一个值）
+_AFTER_VALUE = 8  # 等待 "," 或 "}"
+_DONE = 9         # 顶层对象已结束
+
+
+class IncrementalJSONParser:
+    """逐段输入文本，解析顶层JSON对象中已经完整的字段"""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._state = _BEFORE
+        self._buffer = []      # 当前字段名或字段值的原始字符
+        self._key = None
+        self._escape = False   # 字符串内上一个字符是反斜杠
+        self._depth = 0        # 嵌套值的括号深度
+        self._nested_string = False
+        self.error = None      # 输入不是合法JSON时的错误说明
+
+    @property
+    def done(self) -> bool:
+        """顶层对象已经结束"""
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """输入一段文本，返回这段文本中新完成的字段"""
+        completed = {}
+        if self.error is not None:
+            return completed
+        for char in chunk:
+            if self._state == _DONE:
+                break
+            try:
+                self._step(char, completed)
+            except ValueError as e:
+                self.error = str(e)
+                break
+        return completed
+
+    def _step(self, char: str, completed: Dict[str, Any]):
+        state = self._state
+        if state == _BEFORE:
+            if char == "{":
+                self._state = _KEY
+        elif state in (_IN_KEY, _IN_STRING):
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                text = json.loads('"' + "".join(self._buffer) + '"')
+                self._buffer = []
+                if state == _IN_KEY:
+                    self._key = text
+                    self._state = _COLON
+                else:
+                    self._complete(text, completed)
+                return
+            self._buffer.append(char)
+        elif char.isspace() and state != _IN_NESTED:
+            if state == _IN_SCALAR:
+                self._finish_scalar(completed)
+        elif state == _KEY:
+            if char == '"':
+                self._state = _IN_KEY
+            elif char != "}":
+                raise ValueError(f"字段名应以引号开始，实际为 {char!r}")
+            else:
+                self._state = _DONE
+        elif state == _COLON:
+            if char != ":":
+                raise ValueError(f"字段名后应为冒号，实际为 {char!r}")
+            self._state = _VALUE
+        elif state == _VALUE:
+            if char == '"':
+                self._state = _IN_STRING
+            elif char in "{[":
+                self._buffer.append(char)
+                self._depth = 1
+                self._state = _IN_NESTED
+            else:
+                self._buffer.append(char)
+                self._state = _IN_SCALAR
+        elif state == _IN_SCALAR:
+            if char in ",}":
+                self._finish_scalar(completed)
+                self._after_value(char)
+            else:
+                self._buffer.append(char)
+        elif state == _IN_NESTED:
+            self._buffer.append(char)
+            if self._nested_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._nested_string = False
+            elif char == '"':
+                self._nested_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    value = json.loads("".join(self._buffer))
+                    self._buffer = []
+                    self._complete(value, completed)
+        elif state == _AFTER_VALUE:
+            self._after_value(char)
+
+    def _after_value(self, char: str):
+        if char == ",":
+            self._state = _KEY
+        elif char == "}":
+            self._state = _DONE
+        else:
+            raise ValueError(f"字段值后应为逗号或右括号，实际为 {char!r}")
+
+    def _finish_scalar(self, completed: Dict[str, Any]):
+        value = json.loads("".join(self._buffer))
+        self._buffer = []
+        self._complete(value, completed)
+
+    def _complete(self, value: Any, completed: Dict[str, Any]):
+        self.fields[self._key] = value
+        completed[self._key] = value
+        self._key = None
+        self._state = _AFTER_VALUE
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导航意图解析缓存
+AIProcessor 在调用千问之前查询：同一句话（忽略标点、空白、全半角差异）在相同默认城市、
+模型和提示词下直接复用上次的解析结果，省去一次1-3秒的大模型往返
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional
+
+from config import (
+    CACHE_DB_PATH, DEFAULT_CITY, INTENT_CACHE_DISK_SIZE, INTENT_CACHE_ENABLED, INTENT_CACHE_SIZE, INTENT_CACHE_TTL,
+    QWEN_MODEL
+)
+from persistent_cache import PersistentLRUCache
+from prompt_manager import get_prompt
+
+# 标点、符号和空白不影响解析结果（NFKC 规范化后，全角标点已转换为半角）
+_IGNORED = re.compile(r'[\s\W_]+')
+
+
+class IntentCache:
+    """用户原话 -> 导航意图 {'origin', 'destination', 'action'} 的缓存"""
+
+    def __init__(self, db_path: Optional[str] = CACHE_DB_PATH,
+                 max_entries: int = INTENT_CACHE_SIZE,
+                 ttl: float = INTENT_CACHE_TTL,
+                 enabled: bool = INTENT_CACHE_ENABLED,
+                 city: str = DEFAULT_CITY,
+                 model: str = QWEN_MODEL,
+                 prompt: Optional[str] = None,
+                 max_disk_entries: int = INTENT_CACHE_DISK_SIZE):
+        self.enabled = enabled
+        if prompt is None:
+            prompt = get_prompt(city=city).text
+        # 城市、模型或提示词变化后旧结果自动失效
+        prompt_digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        self._prefix = f"{model}|{city}|{prompt_digest}|"
+        self._cache = PersistentLRUCache(
+            "intent", db_path=db_path, max_entries=max_entries, ttl=ttl, max_disk_entries=max_disk_entries
+        )
+
+    @staticmethod
+    def normalize_utterance(text: str) -> str:
+        """规范化用户原话：全角转半角、英文小写、去除标点和空白"""
+        text = unicodedata.normalize('NFKC', text or '').lower()
+        return _IGNORED.sub('', text)
+
+    def _key(self, text: str) -> Optional[str]:
+        normalized = self.normalize_utterance(text)
+        return self._prefix + normalized if normalized else None
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，返回解析结果的副本或 None"""
+        if not self.enabled:
+            return None
+        key = self._key(text)
+        if key is None:
+            return None
+        intent = self._cache.get(key)
+        return dict(intent) if intent is not None else None
+
+    def put(self, text: str, intent: Dict[str, Any]):
+        """写入大模型成功解析的结果（错误结果不缓存）"""
+        if not self.enabled or not isinstance(intent, dict) or "error" in intent:
+            return
+        key = self._key(text)
+        if key is None:
+            return
+        self._cache.put(key, intent)
+
+    def invalidate(self, text: str):
+        """删除单句的缓存"""
+        key = self._key(text)
+        if key is not None:
+            self._cache.invalidate(key)
+
+    def clear(self):
+        """清空意图缓存"""
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        stats = self._cache.get_stats()
+        stats['enabled'] = self.enabled
+        return stats
+
+
+_shared_cache: Optional[IntentCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_intent_cache() -> IntentCache:
+    """获取进程内共享的意图缓存实例"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = IntentCache()
+    return _shared_cache
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地导航意图解析（规则语法）
+常见句式在本地直接解析并打分，置信度达到 LOCAL_INTENT_MIN_CONFIDENCE 时 AIProcessor 不再调用千问；
+置信度不足的交给大模型，大模型失败或超时时同样用它兜底。
+
+支持的句式（可带"请/帮我/我要"等前缀和"吧/谢谢"等语气词）：
+- 从A到B / 从A出发去B / 从A开车到B（可带"导航/怎么走/的路线"结尾）
+- A到B怎么走 / A到B的路线
+- 导航到B / 带我去B / 去B / 回B
+- B怎么走 / B怎么去
+
+地址按系统提示词的规则补全城市：缺少城市时在最前面加上 DEFAULT_CITY，
+"深圳湾""深圳北站"这类以默认城市简称开头的地名同样补全为"深圳市深圳湾"
+"""
+
+import re
+import unicodedata
+from typing import Dict, NamedTuple, Optional
+
+from config import DEFAULT_CITY, LOCAL_INTENT_ENABLED, LOCAL_INTENT_MIN_CONFIDENCE
+
+CURRENT_LOCATION = "当前位置"
+
+# 标点、符号和空白不影响解析（NFKC 规范化后，全角标点已转换为半角）
+_IGNORED = re.compile(r'[\s\W_]+')
+
+# 句首的称呼、礼貌语和意愿词，可以叠加出现："你好请帮我导航到…"
+_LEADING = re.compile(
+    r'^(?:你好|嗨|喂|嗯|呃|那个|小助手|麻烦你|麻烦|劳驾|请你|请|帮忙|帮我|给我|替我|能不能|能否|'
+    r'可不可以|可以|我现在要|我现在想|我想要|我要|我想|我得|我需要|现在|马上|立刻)+'
+)
+# 句尾的语气词和客套话
+_TRAILING = re.compile(r'(?:谢谢你|谢谢|好吗|好不好|可以吗|行吗|一下|(?<!酒)吧|啊|呀|呢|哦|喔|啦|嘛)+$')
+
+# 出行方式不属于地址："从公司开车到机场"
+_MODE = r'(?:开车|驾车|打车|坐车|步行|走路|骑车)?'
+# 去往："去一下""去一趟"中的量词不属于地址
+_GO = r'(?:到|去往|去|至|前往|回)(?:一下|一趟)?'
+# 可选的结尾：导航指令或问路
+_TAIL = (r'(?:(?:开始|进行)?导航|出发|走|(?:该|要)?(?:怎么|如何)(?:走|去|过去|到)|'
+         r'的路线|路线|的路|带路)?')
+# 问路结尾（没有"从/去"等引导词时必须出现）
+_ASK = r'(?:(?:该|要)?(?:怎么|如何)(?:走|去|过去|到)|的路线|的路|路线)'
+
+# (规则名, 正则, 基础置信度)；基础置信度再按地址的可信度修正
+_RULES = (
+    ("from_to", re.compile(rf'^(?:从|由)(?P<origin>.+?)(?:出发)?{_MODE}(?:导航)?{_GO}(?P<destination>.+?){_TAIL}$'), 0.95),
+    ("navigate_to", re.compile(rf'^(?:开始)?导航(?:{_GO})?(?P<destination>.+?){_TAIL}$'), 0.9),
+    ("take_me", re.compile(rf'^(?:带|送|载|领)我{_MODE}{_GO}(?P<destination>.+?){_TAIL}$'), 0.9),
+    ("go_to", re.compile(rf'^{_MODE}{_GO}(?P<destination>.+?){_TAIL}$'), 0.85),
+    ("route_between", re.compile(rf'^(?P<origin>.+?){_MODE}(?:到|去)(?P<destination>.+?){_ASK}$'), 0.85),
+    ("how_to_get", re.compile(rf'^(?P<destination>.+?){_ASK}$'), 0.8),
+    # 没有引导词也没有问路结尾，"到"可能是地名的一部分，只用于兜底
+    ("bare_to", re.compile(r'^(?P<origin>.+?)到(?P<destination>.+)$'), 0.6),
+)
+# 只靠"去/带我去"引导、没有起点佐证的规则，目的地须有地名结尾才可信
+_WEAK_RULES = frozenset(("go_to", "take_me"))
+
+# 指代当前位置的说法
+_HERE = frozenset((
+    "这", "这里", "这儿", "这边", "此地", "此处", "当前", "当前位置", "我这", "我这里", "我这儿",
+    "我的位置", "现在的位置", "我现在的位置", "我现在在的地方", "我在的地方", "所在位置",
+))
+# 地名后面多余的方位词："国兴苑那边" -> "国兴苑"
+_PLACE_SUFFIX_NOISE = re.compile(r'(?:那里|那儿|那边|这边|附近|一带)$')
+# 地址中出现说明这句话不是单纯的A到B：途经点、多个目的地、疑问或否定
+_MULTI_STOP = re.compile(r'然后|再去|再到|经过|途经|顺路|顺便|绕|或者|还是|到|去|从|导航')
+# "去吃饭""去超市买东西"：去做某件事而不是去某个地点
+_ACTIVITY = re.compile(
+    r'^(?:吃|喝|看|买|玩|逛)|吃饭|吃东西|喝茶|喝酒|买东西|买菜|看电影|看病|看医生|逛街|上班|上学|上课|下班|'
+    r'睡觉|洗澡|洗车|理发|剪头发|唱歌|健身|跑步|散步|旅游|购物|办事|取钱|取快递|接人|送人|接孩子'
+)
+_NOT_COMMAND = re.compile(r'吗|不|别|没|什么|哪|多远|多久|多少|几点|几公里|天气|堵不堵|要钱|收费')
+# 只有用户自己知道在哪的地点，交给大模型（或让用户说出具体地址）
+_PERSONAL = frozenset(("公司", "单位", "学校", "宿舍", "老家", "家里", "公司楼下"))
+# 常见地名结尾，命中时更可信
+_PLACE_ENDINGS = re.compile(
+    r'(?:站|机场|码头|口岸|港|大厦|大楼|中心|广场|公园|医院|学校|大学|学院|中学|小学|幼儿园|小区|花园|苑|'
+    r'园|城|村|路|街|道|巷|号|栋|楼|酒店|宾馆|商场|超市|市场|馆|院|寺|山|湖|湾|桥|岛|塔|店|公司|大道|'
+    r'总部|基地|科技园|产业园|工业区|社区|家|门|口|区|县|镇)$'
+)
+
+# 常见城市（省会、计划单列市和大湾区城市）：带"市"开头的地址不再补全默认城市；
+# 不带"市"时可能是外地地名（北京西站），也可能是本地地名（中山公园），降低置信度交给大模型
+_CITIES = (
+    "北京", "上海", "天津", "重庆", "广州", "深圳", "杭州", "南京", "苏州", "武汉", "成都", "西安",
+    "长沙", "郑州", "东莞", "佛山", "珠海", "惠州", "中山", "江门", "厦门", "福州", "泉州", "青岛",
+    "济南", "大连", "沈阳", "哈尔滨", "长春", "合肥", "南昌", "昆明", "贵阳", "南宁", "海口", "三亚",
+    "石家庄", "太原", "呼和浩特", "兰州", "西宁", "银川", "乌鲁木齐", "拉萨", "宁波", "无锡",
+    "温州", "香港", "澳门",
+)
+_PROVINCES = (
+    "河北", "山西", "辽宁", "吉林", "黑龙江", "江苏", "浙江", "安徽", "福建", "江西", "山东", "河南",
+    "湖北", "湖南", "广东", "海南", "四川", "贵州", "云南", "陕西", "甘肃", "青海", "台湾",
+    "内蒙古", "广西", "西藏", "宁夏", "新疆",
+)
+_EXPLICIT_CITY = re.compile(
+    rf'^(?:(?:{"|".join(_PROVINCES)})(?:省|自治区|壮族自治区|回族自治区|维吾尔自治区)|'
+    rf'(?:{"|".join(_CITIES)})(?:市|特别行政区))'
+)
+
+
+class LocalIntent(NamedTuple):
+    origin: str
+    destination: str
+    confidence: float
+    rule: str
+
+    def to_request(self) -> Dict[str, str]:
+        """转换为与大模型相同格式的解析结果"""
+        return {"origin": self.origin, "destination": self.destination, "action": "navigation"}
+
+
+class IntentParser:
+    """基于规则语法的中文导航意图解析器"""
+
+    def __init__(self, city: str = DEFAULT_CITY,
+                 min_confidence: float = LOCAL_INTENT_MIN_CONFIDENCE,
+                 enabled: bool = LOCAL_INTENT_ENABLED):
+        self.city = city
+        self.city_stem = city[:-1] if city.endswith("市") else city
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+
+    @staticmethod
+    def normalize_utterance(text: str) -> str:
+        """全角转半角，去除标点空白、句首礼貌语和句尾语气词"""
+        text = _IGNORED.sub('', unicodedata.normalize('NFKC', text or ''))
+        previous = None
+        while text != previous:
+            previous = text
+            text = _LEADING.sub('', text)
+            text = _TRAILING.sub('', text)
+        return text
+
+    def parse(self, text: str) -> Optional[LocalIntent]:
+        """按语法规则解析，返回置信度最高的结果；不是导航句式时返回 None"""
+        utterance = self.normalize_utterance(text)
+        if not utterance:
+            return None
+
+        best = None
+        for rule, pattern, base in _RULES:
+            match = pattern.match(utterance)
+            if not match:
+                continue
+            groups = match.groupdict()
+            intent = self._build(rule, base, groups.get("origin"), groups["destination"])
+            # 同一句话可能被多条规则匹配（"去机场怎么走"），取置信度最高的，相同时取靠前的规则
+            if intent is not None and (best is None or intent.confidence > best.confidence):
+                best = intent
+        return best
+
+    def fast_path(self, text: str) -> Optional[LocalIntent]:
+        """置信度达到门限时返回本地解析结果，否则返回 None（交给大模型）"""
+        if not self.enabled:
+            return None
+        intent = self.parse(text)
+        if intent is None or intent.confidence < self.min_confidence:
+            return None
+        return intent
+
+    def _build(self, rule: str, base: float, origin: Optional[str],
+               destination: str) -> Optional[LocalIntent]:
+        destination = self._clean_place(destination)
+        if not destination or destination in _HERE:
+            return None
+        origin = self._clean_place(origin) if origin else CURRENT_LOCATION
+        if not origin:
+            return None
+        if origin in _HERE:
+            origin = CURRENT_LOCATION
+
+        confidence = base
+        for place in (origin, destination):
+            if place == CURRENT_LOCATION:
+                continue
+            confidence += self._place_score(place)
+        # "去X""带我去X"只有一个引导词，X 不像地名时（"去吃饭""带我去看看"）不在本地返回
+        if rule in _WEAK_RULES and not _PLACE_ENDINGS.search(destination):
+            confidence -= 0.1
+
+        origin = self.normalize_place(origin)
+        destination = self.normalize_place(destination)
+        if origin == destination:
+            return None
+        return LocalIntent(origin, destination, round(max(0.0, min(1.0, confidence)), 2), rule)
+
+    @staticmethod
+    def _clean_place(place: str) -> str:
+        place = place.strip("的")
+        place = _PLACE_SUFFIX_NOISE.sub('', place)
+        return place if len(place) >= 2 or place in _HERE else ""
+
+    def _place_score(self, place: str) -> float:
+        """地址可信度修正：多目的地、疑问句、过长的地址降低置信度，常见地名结尾略微提高"""
+        score = 0.0
+        if place in _PERSONAL:
+            score -= 0.4
+        if _NOT_COMMAND.search(place):
+            score -= 0.5
+        if _ACTIVITY.search(place):
+            score -= 0.5
+        if _MULTI_STOP.search(place):
+            score -= 0.4
+        if len(place) > 25:
+            score -= 0.3
+        score += 0.05 if _PLACE_ENDINGS.search(place) else -0.05
+        if self._ambiguous_city(place):
+            score -= 0.25
+        return score
+
+    def _ambiguous_city(self, place: str) -> bool:
+        return (not place.startswith(self.city_stem) and place.startswith(_CITIES)
+                and not _EXPLICIT_CITY.match(place))
+
+    def normalize_place(self, place: str) -> str:
+        """缺少城市时在最前面加上默认城市"""
+        if place == CURRENT_LOCATION or place.startswith(self.city) or _EXPLICIT_CITY.match(place):
+            return place
+        # 以默认城市简称开头的也是地名的一部分，与提示词示例一致："深圳湾…" -> "深圳市深圳湾…"
+        return self.city + place
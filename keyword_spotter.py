@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键词检测
+用 Aho-Corasick 自动机一次扫描同时匹配全部关键词，支持流式输入（逐段喂入识别结果）
+和优先级分类（例如"取消"优先于"确认"）。关键词按会话类型组织为命名配置，按需编译一次。
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# 关键词分类的优先级：同一段话同时命中多个分类时取优先级高的
+CLASS_PRIORITIES = {
+    "cancel": 2,
+    "confirm": 1,
+    "trigger": 1,
+}
+
+# 各会话类型使用的关键词配置
+KEYWORD_PROFILES: Dict[str, Dict[str, List[str]]] = {
+    # 说出导航需求时，命中即结束录音并开始处理
+    "command": {
+        "trigger": ["开始导航", "导航", "开始", "走吧", "出发"],
+    },
+    # 导航确认录音期间：只用不易误触发的词提前结束录音
+    "confirm": {
+        "cancel": ["取消", "不要", "不用", "算了"],
+        "confirm": ["确认", "好的", "开始导航", "开始", "导航", "走吧", "出发"],
+    },
+    # 对完整的确认回答分类：包含单字应答
+    "confirm_reply": {
+        "cancel": ["取消", "不要", "不用", "算了", "no", "不", "不是", "不对"],
+        "confirm": ["确认", "好的", "是的", "开始导航", "开始", "导航", "走吧", "出发",
+                    "yes", "ok", "对", "嗯"],
+    },
+}
+
+
+class KeywordMatch(NamedTuple):
+    """一次关键词命中"""
+    label: str  # 关键词分类，如 cancel / confirm / trigger
+    keyword: str
+    end: int  # 关键词结束位置（在已输入文本中的偏移，不含）
+    priority: int
+
+
+def _better(candidate: KeywordMatch, current: Optional[KeywordMatch]) -> bool:
+    """优先级高者胜出，同优先级取先出现的"""
+    return current is None or candidate.priority > current.priority
+
+
+class KeywordSpotter:
+    """编译后的多关键词匹配器（只读，可在多个线程和会话间共享）"""
+
+    def __init__(self, classes: Dict[str, Iterable[str]],
+                 priorities: Dict[str, int] = None):
+        priorities = priorities or CLASS_PRIORITIES
+        self.classes = {label: [k.lower() for k in keywords] for label, keywords in classes.items()}
+        self.max_length = 0
+
+        # 构建字典树
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[KeywordMatch]] = [[]]
+        for label, keywords in self.classes.items():
+            priority = priorities.get(label, 0)
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                self.max_length = max(self.max_length, len(keyword))
+                state = 0
+                for ch in keyword:
+                    if ch not in self._goto[state]:
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output.append([])
+                        self._goto[state][ch] = len(self._goto) - 1
+                    state = self._goto[state][ch]
+                self._output[state].append(KeywordMatch(label, keyword, 0, priority))
+
+        # 广度优先建立失败指针，并合并后缀状态的输出
+        queue = deque(self._goto[0].values())  # 第一层的失败指针都指向根
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                self._fail[nxt] = self.step(self._fail[state], ch)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    @property
+    def keywords(self) -> List[str]:
+        """全部关键词"""
+        return [k for keywords in self.classes.values() for k in keywords]
+
+    def step(self, state: int, ch: str) -> int:
+        """自动机转移一步"""
+        while state and ch not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(ch, 0)
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """返回文本中所有关键词命中（按出现位置）"""
+        return self.stream().feed(text)
+
+    def search(self, text: str) -> Optional[KeywordMatch]:
+        """返回优先级最高的命中，没有命中时返回 None"""
+        stream = self.stream()
+        stream.feed(text)
+        return stream.best
+
+    def stream(self) -> "KeywordStream":
+        """创建流式匹配状态"""
+        return KeywordStream(self)
+
+
+class KeywordStream:
+    """流式匹配状态：逐段输入文本，自动机状态在段与段之间延续"""
+
+    def __init__(self, spotter: KeywordSpotter):
+        self.spotter = spotter
+        self.reset()
+
+    def reset(self):
+        self.state = 0
+        self.position = 0
+        self.best: Optional[KeywordMatch] = None
+
+    def feed(self, text: str) -> List[KeywordMatch]:
+        """输入一段文本，返回本段中新命中的关键词"""
+        spotter = self.spotter
+        matches = []
+        for ch in text.lower():
+            self.position += 1
+            self.state = spotter.step(self.state, ch)
+            for match in spotter._output[self.state]:
+                found = match._replace(end=self.position)
+                matches.append(found)
+                if _better(found, self.best):
+                    self.best = found
+        return matches
+
+
+_spotters: Dict[str, KeywordSpotter] = {}
+_spotters_lock = threading.Lock()
+
+
+def get_spotter(profile: str) -> KeywordSpotter:
+    """获取命名配置对应的匹配器（首次使用时编译）"""
+    spotter = _spotters.get(profile)
+    if spotter is None:
+        with _spotters_lock:
+            spotter = _spotters.get(profile)
+            if spotter is None:
+                if profile not in KEYWORD_PROFILES:
+                    raise KeyError(f"未知的关键词配置: {profile}")
+                spotter = KeywordSpotter(KEYWORD_PROFILES[profile])
+                _spotters[profile] = spotter
+    return spotter
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地确认词识别
+用录制的模板（每个短语几遍录音）做 MFCC + DTW 模板匹配，只区分十几个固定的确认/取消短语，
+不需要联网。所有模板在一次按反对角线推进的向量化DTW中同时计算。
+
+用法:
+    python local_kws.py enroll             # 依次录制默认短语，每个3遍
+    python local_kws.py enroll 确认 取消 --count 5
+    python local_kws.py list               # 查看已录制模板与自动校准的阈值
+    python local_kws.py test               # 实时识别测试
+"""
+
+import argparse
+import os
+import time
+import wave
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import (
+    LOCAL_KWS_DIR, LOCAL_KWS_HANGOVER_MS, LOCAL_KWS_MARGIN, LOCAL_KWS_THRESHOLD, AUDIO_PREROLL_MS
+)
+from keyword_spotter import get_spotter
+from vad import capture_utterance
+from xfyun_frames import SAMPLE_RATE, SAMPLE_WIDTH
+
+# 默认录制的确认/取消短语
+DEFAULT_PHRASES = ["确认", "好的", "是的", "开始导航", "走吧", "出发", "对",
+                   "取消", "不要", "不用", "算了", "不是"]
+
+MAX_UTTERANCE_MS = 2000  # 确认短语最长时长
+
+
+class MFCCExtractor:
+    """NumPy实现的MFCC特征提取（滤波器组与DCT矩阵预先计算）"""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: float = 25, hop_ms: float = 10,
+                 n_fft: int = 512, n_mels: int = 26, n_mfcc: int = 13):
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.hop = int(sample_rate * hop_ms / 1000)
+        self.n_fft = n_fft
+        self.window = np.hamming(self.frame_len).astype(np.float32)
+
+        # 梅尔滤波器组
+        def hz_to_mel(hz):
+            return 2595 * np.log10(1 + hz / 700)
+
+        def mel_to_hz(mel):
+            return 700 * (10 ** (mel / 2595) - 1)
+
+        mel_points = np.linspace(hz_to_mel(0), hz_to_mel(sample_rate / 2), n_mels + 2)
+        bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+        self.filterbank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left:
+                self.filterbank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                self.filterbank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+
+        # DCT-II 矩阵
+        k = np.arange(n_mfcc)[:, None]
+        n = np.arange(n_mels)[None, :]
+        self.dct = (np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2 / n_mels)).astype(np.float32)
+
+    def __call__(self, samples: np.ndarray) -> np.ndarray:
+        """计算MFCC，返回 (帧数, n_mfcc)，已做倒谱均值归一化"""
+        x = samples.astype(np.float32) / 32768
+        x = np.append(x[:1], x[1:] - 0.97 * x[:-1])  # 预加重
+        if len(x) < self.frame_len:
+            x = np.pad(x, (0, self.frame_len - len(x)))
+
+        count = 1 + (len(x) - self.frame_len) // self.hop
+        index = np.arange(self.frame_len)[None, :] + self.hop * np.arange(count)[:, None]
+        frames = x[index] * self.window
+        power = np.abs(np.fft.rfft(frames, self.n_fft)) ** 2 / self.n_fft
+        mfcc = np.log(power @ self.filterbank.T + 1e-10) @ self.dct.T
+        return mfcc - mfcc.mean(axis=0)
+
+
+def dtw_distances(query: np.ndarray, templates: List[np.ndarray]) -> np.ndarray:
+    """计算查询与每个模板的归一化DTW距离
+
+    模板补齐到相同长度后一起计算：同一条反对角线上的格子互不依赖，
+    每一步对所有模板、整条对角线做一次向量运算。补齐部分不会影响各模板终点的结果。
+    """
+    n = len(query)
+    lengths = np.array([len(t) for t in templates])
+    m = int(lengths.max())
+    padded = np.zeros((len(templates), m, query.shape[1]), dtype=np.float32)
+    for t, template in enumerate(templates):
+        padded[t, :len(template)] = template
+
+    # 帧间欧氏距离 (模板数, n, m)
+    cross = np.einsum('id,tjd->tij', query, padded)
+    cost = np.sqrt(np.maximum(
+        (query ** 2).sum(axis=1)[None, :, None] + (padded ** 2).sum(axis=2)[:, None, :] - 2 * cross, 0
+    ))
+
+    acc = np.full((len(templates), n + 1, m + 1), np.inf, dtype=np.float32)
+    acc[:, 0, 0] = 0
+    for k in range(2, n + m + 1):
+        i = np.arange(max(1, k - m), min(n, k - 1) + 1)
+        j = k - i
+        best = np.minimum(np.minimum(acc[:, i - 1, j], acc[:, i, j - 1]), acc[:, i - 1, j - 1])
+        acc[:, i, j] = cost[:, i - 1, j - 1] + best
+
+    return acc[np.arange(len(templates)), n, lengths] / (n + lengths)
+
+
+class KwsResult(NamedTuple):
+    """本地识别结果"""
+    phrase: Optional[str]
+    label: Optional[str]  # confirm / cancel
+    distance: float
+    margin: float  # 最近的其他类别距离 / 最佳距离
+    confident: bool
+    elapsed_ms: float
+
+
+class LocalKeywordRecognizer:
+    """确认词模板匹配识别器"""
+
+    def __init__(self, template_dir: str = LOCAL_KWS_DIR,
+                 threshold: float = LOCAL_KWS_THRESHOLD,
+                 margin: float = LOCAL_KWS_MARGIN):
+        self.template_dir = template_dir
+        self.margin = margin
+        self.extractor = MFCCExtractor()
+        self.templates: List[np.ndarray] = []
+        self.phrases: List[str] = []  # 与 templates 一一对应
+        self.labels: Dict[str, str] = {}
+        self.load()
+        self.threshold = threshold if threshold > 0 else self.calibrate()
+
+    @property
+    def ready(self) -> bool:
+        """确认和取消两类都有模板才能做判断"""
+        return {"confirm", "cancel"} <= set(self.labels.values())
+
+    def load(self):
+        """加载模板目录：<目录>/<短语>/*.wav"""
+        self.templates, self.phrases, self.labels = [], [], {}
+        if not os.path.isdir(self.template_dir):
+            return
+        spotter = get_spotter("confirm_reply")
+        for phrase in sorted(os.listdir(self.template_dir)):
+            phrase_dir = os.path.join(self.template_dir, phrase)
+            match = spotter.search(phrase)
+            if not os.path.isdir(phrase_dir) or not match:
+                continue
+            for name in sorted(os.listdir(phrase_dir)):
+                if name.lower().endswith('.wav'):
+                    self.add_template(phrase, read_pcm(os.path.join(phrase_dir, name)), match.label)
+
+    def add_template(self, phrase: str, pcm: bytes, label: str = None):
+        """添加一条模板录音"""
+        if label is None:
+            match = get_spotter("confirm_reply").search(phrase)
+            if not match:
+                raise ValueError(f"短语不属于确认/取消类别: {phrase}")
+            label = match.label
+        self.templates.append(self.features(pcm))
+        self.phrases.append(phrase)
+        self.labels[phrase] = label
+
+    def features(self, pcm: bytes) -> np.ndarray:
+        return self.extractor(np.frombuffer(pcm, dtype=np.int16))
+
+    def calibrate(self) -> float:
+        """留一法自动校准阈值：每条模板到同短语其他模板的最近距离，取最大值并留余量"""
+        nearest = []
+        for index, template in enumerate(self.templates):
+            others = [t for i, t in enumerate(self.templates)
+                      if i != index and self.phrases[i] == self.phrases[index]]
+            if others:
+                nearest.append(float(dtw_distances(template, others).min()))
+        return max(nearest) * 1.25 if nearest else float('inf')
+
+    def recognize(self, pcm: bytes) -> KwsResult:
+        """识别一段只包含短语本身的录音"""
+        start = time.perf_counter()
+        if not self.templates or not pcm:
+            return KwsResult(None, None, float('inf'), 0.0, False, 0.0)
+
+        distances = dtw_distances(self.features(pcm), self.templates)
+        best: Dict[str, float] = {}
+        for phrase, distance in zip(self.phrases, distances.tolist()):
+            best[phrase] = min(distance, best.get(phrase, float('inf')))
+
+        phrase = min(best, key=best.get)
+        label = self.labels[phrase]
+        other = min((d for p, d in best.items() if self.labels[p] != label), default=float('inf'))
+        distance = best[phrase]
+        margin = other / distance if distance > 0 else float('inf')
+        confident = self.ready and distance <= self.threshold and margin >= self.margin
+        elapsed = (time.perf_counter() - start) * 1000
+        return KwsResult(phrase, label, distance, margin, confident, elapsed)
+
+
+def read_pcm(path: str) -> bytes:
+    """读取16kHz单声道16bit WAV"""
+    with wave.open(path, 'rb') as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getnchannels() != 1 or wf.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"{path}: 模板需为16kHz单声道16bit WAV")
+        return wf.readframes(wf.getnframes())
+
+
+def write_pcm(path: str, pcm: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(pcm)
+
+
+def cmd_enroll(phrases: List[str], count: int):
+    from audio_capture import get_audio_capture
+
+    capture = get_audio_capture()
+    if not capture.start():
+        print(f"❌ 无法打开麦克风: {capture.error}")
+        return
+    for phrase in phrases:
+        match = get_spotter("confirm_reply").search(phrase)
+        if not match:
+            print(f"⚠️ 跳过 '{phrase}'：不属于确认/取消类别")
+            continue
+        phrase_dir = os.path.join(LOCAL_KWS_DIR, phrase)
+        existing = len(os.listdir(phrase_dir)) if os.path.isdir(phrase_dir) else 0
+        for n in range(count):
+            print(f"🎤 请说 '{phrase}' ({n + 1}/{count})...")
+            pcm, _ = capture_utterance(capture.open_reader(), timeout=5,
+                                       hangover_ms=LOCAL_KWS_HANGOVER_MS, max_ms=MAX_UTTERANCE_MS)
+            if not pcm:
+                print("🔇 未检测到语音，跳过")
+                continue
+            path = os.path.join(phrase_dir, f"{existing + n + 1:03d}.wav")
+            write_pcm(path, pcm)
+            print(f"✅ 已保存 {path} ({len(pcm) / SAMPLE_WIDTH / SAMPLE_RATE:.2f}s)")
+    capture.stop()
+
+
+def cmd_list():
+    recognizer = LocalKeywordRecognizer()
+    counts: Dict[str, int] = {}
+    for phrase in recognizer.phrases:
+        counts[phrase] = counts.get(phrase, 0) + 1
+    print(f"📁 模板目录: {LOCAL_KWS_DIR}")
+    for phrase, n in counts.items():
+        print(f"   {recognizer.labels[phrase]:<8} {phrase:<6} {n} 条")
+    print(f"🎯 距离阈值: {recognizer.threshold:.2f}  区分度: {recognizer.margin:.2f}  "
+          f"{'可用' if recognizer.ready else '确认/取消模板不全，不可用'}")
+
+
+def cmd_test():
+    from audio_capture import get_audio_capture
+
+    recognizer = LocalKeywordRecognizer()
+    capture = get_audio_capture()
+    if not capture.start():
+        print(f"❌ 无法打开麦克风: {capture.error}")
+        return
+    print("🎤 请说确认/取消短语，Ctrl+C 退出")
+    try:
+        while True:
+            pcm, _ = capture_utterance(capture.open_reader(AUDIO_PREROLL_MS), timeout=10,
+                                       hangover_ms=LOCAL_KWS_HANGOVER_MS, max_ms=MAX_UTTERANCE_MS)
+            if not pcm:
+                continue
+            r = recognizer.recognize(pcm)
+            status = "✅" if r.confident else "🤔"
+            print(f"{status} {r.phrase} ({r.label}) 距离={r.distance:.2f} "
+                  f"区分度={r.margin:.2f} 耗时={r.elapsed_ms:.1f}ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地确认词识别")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enroll = sub.add_parser("enroll", help="录制模板")
+    enroll.add_argument("phrases", nargs="*", default=DEFAULT_PHRASES)
+    enroll.add_argument("--count", type=int, default=3, help="每个短语录制次数")
+    sub.add_parser("list", help="查看模板")
+    sub.add_parser("test", help="实时识别测试")
+    args = parser.parse_args()
+
+    if args.command == "enroll":
+        cmd_enroll(args.phrases, args.count)
+    elif args.command == "list":
+        cmd_list()
+    else:
+        cmd_test()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 import asyncio
 import sys
 import os
+import threading
 from env_loader import load_environment, EnvLoader
 from speech_handler import SpeechHandler
 from ai_processor import AIProcessor
 from mcp_client import MCPClient
 from qiniu_mcp_client import QiniuMCPClient
+from http_session import close_http_session
+from app_logging import shutdown_logging
+from audio_capture import stop_audio_capture
+from async_utils import run_blocking
+from config import SPECULATIVE_NAVIGATION, TRACE_FILE
+from keyword_spotter import get_spotter
+from tracing import format_histogram, format_summary, get_tracer, span
+from gazetteer import get_gazetteer
+from geocode_cache import get_geocode_cache
+from intent_cache import get_intent_cache
 
 class NavigationApp:
     def __init__(self):
@@ -32,6 +43,7 @@ class NavigationApp:
         print("输入 'quit' 或 'exit' 退出程序")
         print("输入 'voice' 开始语音输入")
         print("输入 'client' 切换导航客户端")
+        print("输入 'stats' 查看各阶段耗时（stats 阶段名 查看直方图）")
         print("-" * 40)
         
         # 测试麦克风
@@ -84,6 +96,10 @@ class NavigationApp:
                 await self.switch_mcp_client()
                 return
             
+            elif user_input.lower().split()[:1] == ['stats']:
+                self.show_stage_timings(user_input.split()[1:])
+                return
+            
             if not user_input:
                 print("输入为空，请重新输入")
                 return
@@ -97,7 +113,9 @@ class NavigationApp:
     async def get_voice_input(self):
         """获取智能语音输入"""
         try:
-            self.speech_handler.speak("请说出您的导航需求，或说'开始导航'立即处理")
+            # 播报提示语期间预先建立识别连接
+            self.speech_handler.prewarm_recognition("command")
+            await self.speech_handler.speak_async("请说出您的导航需求，或说'开始导航'立即处理")
             
             # 在新线程中进行语音识别，避免阻塞
             loop = asyncio.get_event_loop()
@@ -117,36 +135,36 @@ class NavigationApp:
                     
             except asyncio.TimeoutError:
                 print("⏰ 语音输入总超时")
-                self.speech_handler.speak("语音输入超时，请重新尝试")
+                await self.speech_handler.speak_async("语音输入超时，请重新尝试")
                 return None, "timeout"
             
             # 处理不同的触发情况
             if trigger_reason == "keyword":
                 print("🎯 检测到关键词，立即开始处理")
-                self.speech_handler.speak("收到指令，开始处理导航")
+                await self.speech_handler.speak_async("收到指令，开始处理导航")
             elif trigger_reason == "timeout":
                 print("⏰ 超时自动触发，开始处理")
-                self.speech_handler.speak("自动开始处理导航")
+                await self.speech_handler.speak_async("自动开始处理导航")
             elif trigger_reason in ["google_fallback", "google"]:
                 print("🔄 使用Google语音识别")
             
             if text and len(text.strip()) > 0:
                 print(f"📝 语音识别结果: {text}")
                 if trigger_reason not in ["keyword", "timeout"]:
-                    self.speech_handler.speak(f"您说的是: {text}")
+                    await self.speech_handler.speak_async(f"您说的是: {text}")
                 return text, trigger_reason
             else:
                 if trigger_reason == "timeout":
                     print("🔇 超时期间未检测到语音，但仍然开始处理")
-                    self.speech_handler.speak("未检测到具体需求，请稍后手动输入")
+                    await self.speech_handler.speak_async("未检测到具体需求，请稍后手动输入")
                     return "", trigger_reason  # 返回空字符串，让用户后续手动输入
                 else:
-                    self.speech_handler.speak("没有听清楚，请重新输入")
+                    await self.speech_handler.speak_async("没有听清楚，请重新输入")
                     return None, "no_speech"
                 
         except Exception as e:
             print(f"语音输入错误: {e}")
-            self.speech_handler.speak("语音输入出现错误")
+            await self.speech_handler.speak_async("语音输入出现错误")
             return None, "error"
     
     async def process_navigation_request(self, user_input):
@@ -154,16 +172,17 @@ class NavigationApp:
         try:
             print(f"正在处理: {user_input}")
             
-            # 根据选择的客户端类型处理请求
-            if self.use_qiniu_mcp:
-                await self.process_with_qiniu_mcp(user_input)
-            else:
-                await self.process_with_traditional_mcp(user_input)
+            # 根据选择的客户端类型处理请求，各阶段耗时记在同一个trace下
+            with span("navigation", mode="qiniu" if self.use_qiniu_mcp else "amap"):
+                if self.use_qiniu_mcp:
+                    await self.process_with_qiniu_mcp(user_input)
+                else:
+                    await self.process_with_traditional_mcp(user_input)
                 
         except Exception as e:
             error_msg = f"处理导航请求时出错: {e}"
             print(error_msg)
-            self.speech_handler.speak("处理请求时出现错误")
+            await self.speech_handler.speak_async("处理请求时出现错误")
     
     async def process_with_qiniu_mcp(self, user_input):
         """使用七牛云MCP处理导航请求"""
@@ -172,12 +191,12 @@ class NavigationApp:
             print("   📡 直接调用七牛云MCP SERVER获取坐标")
             
             # 使用AI处理用户输入提取起点和终点
-            result = self.ai_processor.process_navigation_request(user_input)
+            result = await self.ai_processor.process_navigation_request_async(user_input)
             
             if "error" in result:
                 error_msg = result["error"]
                 print(f"处理失败: {error_msg}")
-                self.speech_handler.speak(error_msg)
+                await self.speech_handler.speak_async(error_msg)
                 return
             
             origin = result.get("origin", "")
@@ -186,29 +205,34 @@ class NavigationApp:
             print(f"起点: {origin}")
             print(f"终点: {destination}")
             
+            # 确认期间提前获取坐标，确认后可直接打开地图
+            speculative = self.start_speculative_navigation(origin, destination)
+            
             # 语音确认导航
             confirmed = await self.voice_confirm_navigation(origin, destination)
             if not confirmed:
+                self.cancel_speculative_navigation(speculative)
                 print("导航已取消")
-                self.speech_handler.speak("导航已取消")
+                await self.speech_handler.speak_async("导航已取消")
                 return
             
             # 调用七牛云MCP SERVER进行导航
-            success, message = self.qiniu_mcp_client.navigate_to_destination(origin, destination)
+            coords = await self.collect_speculative_navigation(speculative)
+            success, message = await self.qiniu_mcp_client.navigate_to_destination_async(origin, destination, coords)
             
             if success:
                 success_msg = f"七牛云MCP导航成功: {message}"
                 print(success_msg)
-                self.speech_handler.speak("导航已启动，请查看高德地图")
+                await self.speech_handler.speak_async("导航已启动，请查看高德地图")
             else:
                 error_msg = f"七牛云MCP导航失败: {message}"
                 print(error_msg)
-                self.speech_handler.speak("导航启动失败，请检查网络连接")
+                await self.speech_handler.speak_async("导航启动失败，请检查网络连接")
                 
         except Exception as e:
             error_msg = f"七牛云MCP处理失败: {e}"
             print(error_msg)
-            self.speech_handler.speak("七牛云MCP处理失败")
+            await self.speech_handler.speak_async("七牛云MCP处理失败")
     
     async def process_with_traditional_mcp(self, user_input):
         """使用传统MCP处理导航请求"""
@@ -217,12 +241,12 @@ class NavigationApp:
             print("   🗺️ 调用高德API获取坐标，通过浏览器打开导航")
             
             # 使用AI处理用户输入
-            result = self.ai_processor.process_navigation_request(user_input)
+            result = await self.ai_processor.process_navigation_request_async(user_input)
             
             if "error" in result:
                 error_msg = result["error"]
                 print(f"处理失败: {error_msg}")
-                self.speech_handler.speak(error_msg)
+                await self.speech_handler.speak_async(error_msg)
                 return
             
             origin = result.get("origin", "")
@@ -232,35 +256,77 @@ class NavigationApp:
             is_valid, message = self.ai_processor.validate_addresses(origin, destination)
             if not is_valid:
                 print(f"地址验证失败: {message}")
-                self.speech_handler.speak(message)
+                await self.speech_handler.speak_async(message)
                 return
             
             print(f"起点: {origin}")
             print(f"终点: {destination}")
             
+            # 确认期间提前进行地理编码和路线规划
+            speculative = self.start_speculative_navigation(origin, destination)
+            
             # 语音确认导航
             confirmed = await self.voice_confirm_navigation(origin, destination)
             if not confirmed:
+                self.cancel_speculative_navigation(speculative)
                 print("导航已取消")
-                self.speech_handler.speak("导航已取消")
+                await self.speech_handler.speak_async("导航已取消")
                 return
             
             # 调用传统高德API进行导航（包含浏览器打开步骤）
-            success, message = self.mcp_client.navigate_to_destination(origin, destination)
+            plan = await self.collect_speculative_navigation(speculative)
+            success, message = await self.mcp_client.navigate_to_destination_async(origin, destination, plan)
             
             if success:
                 success_msg = f"传统MCP导航成功: {message}"
                 print(success_msg)
-                self.speech_handler.speak("导航已启动，请查看高德地图")
+                await self.speech_handler.speak_async("导航已启动，请查看高德地图")
             else:
                 error_msg = f"传统MCP导航失败: {message}"
                 print(error_msg)
-                self.speech_handler.speak("导航启动失败，请检查网络连接")
+                await self.speech_handler.speak_async("导航启动失败，请检查网络连接")
                 
         except Exception as e:
             error_msg = f"传统MCP处理失败: {e}"
             print(error_msg)
-            self.speech_handler.speak("传统MCP处理失败")
+            await self.speech_handler.speak_async("传统MCP处理失败")
+    
+    def start_speculative_navigation(self, origin, destination):
+        """地址确定后立即在后台获取坐标（传统模式下还包括路线规划）"""
+        if not SPECULATIVE_NAVIGATION:
+            return None
+        
+        print("⚡ 确认期间提前获取坐标...")
+        # 取消任务只是不再等待，线程池中的请求仍会继续；用 cancel 通知后台线程跳过剩余步骤
+        cancel = threading.Event()
+        if self.use_qiniu_mcp:
+            coro = self.qiniu_mcp_client.get_coordinates_from_mcp_async(origin, destination)
+        else:
+            coro = self.mcp_client.prepare_navigation_async(origin, destination, cancel)
+        return asyncio.create_task(coro), cancel
+    
+    async def collect_speculative_navigation(self, speculative):
+        """获取预先计算的导航数据，失败时返回None由导航客户端重新获取"""
+        if speculative is None:
+            return None
+        task, _ = speculative
+        try:
+            return await task
+        except asyncio.CancelledError:
+            return None
+        except Exception as e:
+            print(f"⚠️ 预先获取坐标失败: {e}")
+            return None
+    
+    def cancel_speculative_navigation(self, speculative):
+        """用户取消导航时丢弃预先计算，并通知后台线程不再规划路线"""
+        if speculative is None:
+            return
+        task, cancel = speculative
+        cancel.set()
+        if not task.done():
+            task.cancel()
+            print("🛑 已取消预先获取的导航数据")
     
     async def voice_confirm_navigation(self, origin, destination):
         """语音确认导航"""
@@ -269,8 +335,12 @@ class NavigationApp:
             confirm_msg = f"即将导航从{origin}到{destination}，是否确认？"
             print(confirm_msg)
             
+            # 播报确认信息期间预先建立确认识别连接
+            self.speech_handler.prewarm_recognition("confirm")
+            
             print("🔊 正在播报确认信息...")
-            self.speech_handler.speak(confirm_msg)  # 同步播放，会等待播报完成
+            with span("confirm.tts"):
+                await self.speech_handler.speak_async(confirm_msg)  # 等待播报完成，但不阻塞事件循环
             
             # 播报完成后显示提示
             print("🎤 请说出确认指令:")
@@ -278,18 +348,14 @@ class NavigationApp:
             print("   ❌ 取消: '取消'、'不要'、'算了'")
             print("   ⏰ 10秒内无响应将提供手动选择")
             
-            # 减少等待时间，让用户能更快开始说话
-            import time
-            time.sleep(0.3)  # 从1秒减少到0.3秒
-            
+            # 立即开始识别：常驻录音的预录窗口会补上播报结束后到连接就绪之间的语音
             # 在新线程中进行语音识别，缩短超时时间
-            loop = asyncio.get_event_loop()
-            
             try:
-                result = await asyncio.wait_for(
-                    loop.run_in_executor(None, self.get_voice_confirmation),
-                    timeout=8.0  # 进一步缩短到8秒超时
-                )
+                with span("confirm.listen"):
+                    result = await run_blocking(
+                        self.get_voice_confirmation,
+                        timeout=8.0  # 进一步缩短到8秒超时
+                    )
                 
                 if isinstance(result, tuple):
                     confirmation_text, trigger_reason = result
@@ -298,44 +364,37 @@ class NavigationApp:
                     
             except asyncio.TimeoutError:
                 print("⏰ 语音确认超时，提供手动选项")
-                self.speech_handler.speak("语音确认超时，请手动选择")
+                await self.speech_handler.speak_async("语音确认超时，请手动选择")
                 
                 manual_confirm = input("请输入 Y 确认导航或 N 取消: ").strip().lower()
                 if manual_confirm in ['y', 'yes', '确认', '好的', '1']:
                     print("✅ 手动确认导航")
-                    self.speech_handler.speak("收到确认，开始导航")
+                    await self.speech_handler.speak_async("收到确认，开始导航")
                     return True
                 else:
                     print("❌ 手动取消导航")
-                    self.speech_handler.speak("导航已取消")
+                    await self.speech_handler.speak_async("导航已取消")
                     return False
             
             if confirmation_text:
                 print(f"📝 确认语音: {confirmation_text}")
                 
-                # 检查确认关键词
-                confirmation_keywords = ['确认', '好的', '是的', '开始导航', '开始', '导航', '走吧', '出发', 'yes', 'ok', '对', '嗯']
-                cancel_keywords = ['取消', '不要', '不用', '算了', 'no', '不', '不是', '不对']
-                
-                confirmation_lower = confirmation_text.lower().replace(' ', '')
+                # 一次扫描同时匹配确认/取消关键词，取消优先级更高
+                match = get_spotter("confirm_reply").search(confirmation_text.replace(' ', ''))
                 
-                # 检查取消关键词（优先级更高）
-                for cancel_word in cancel_keywords:
-                    if cancel_word in confirmation_lower:
-                        print("❌ 检测到取消指令")
-                        self.speech_handler.speak("收到取消指令")
-                        return False
+                if match and match.label == "cancel":
+                    print("❌ 检测到取消指令")
+                    await self.speech_handler.speak_async("收到取消指令")
+                    return False
                 
-                # 检查确认关键词
-                for confirm_word in confirmation_keywords:
-                    if confirm_word in confirmation_lower:
-                        print("✅ 检测到确认指令")
-                        self.speech_handler.speak("收到确认指令，开始导航")
-                        return True
+                if match and match.label == "confirm":
+                    print("✅ 检测到确认指令")
+                    await self.speech_handler.speak_async("收到确认指令，开始导航")
+                    return True
                 
                 # 如果没有明确的关键词，询问用户
                 print("🤔 未识别明确指令，请手动确认")
-                self.speech_handler.speak("未识别明确指令，请按Y确认或N取消")
+                await self.speech_handler.speak_async("未识别明确指令，请按Y确认或N取消")
                 
                 manual_confirm = input("请输入 Y 确认或 N 取消: ").strip().lower()
                 if manual_confirm in ['y', 'yes', '确认', '好的']:
@@ -344,14 +403,14 @@ class NavigationApp:
                     return False
             else:
                 print("🔇 未检测到语音，请手动确认")
-                self.speech_handler.speak("未检测到语音，请按Y确认或N取消")
+                await self.speech_handler.speak_async("未检测到语音，请按Y确认或N取消")
                 
                 manual_confirm = input("请输入 Y 确认或 N 取消: ").strip().lower()
                 return manual_confirm in ['y', 'yes', '确认', '好的']
                 
         except Exception as e:
             print(f"语音确认过程出错: {e}")
-            self.speech_handler.speak("确认过程出现错误，请手动确认")
+            await self.speech_handler.speak_async("确认过程出现错误，请手动确认")
             
             manual_confirm = input("请输入 Y 确认或 N 取消: ").strip().lower()
             return manual_confirm in ['y', 'yes', '确认', '好的']
@@ -363,34 +422,22 @@ class NavigationApp:
             
             # 只使用科大讯飞进行确认
             if self.speech_handler.use_xfyun and self.speech_handler.xfyun_asr:
-                print("🎤 使用科大讯飞进行语音确认...")
-                
-                # 为确认设置特殊的关键词
-                original_keywords = self.speech_handler.xfyun_asr.trigger_keywords
-                self.speech_handler.xfyun_asr.trigger_keywords = [
-                    '确认', '好的', '开始导航', '开始', '导航', '走吧', '出发',
-                    '取消', '不要', '不用', '算了'
-                ]
-                
                 try:
-                    # 使用智能触发进行确认，缩短等待时间
-                    result = self.speech_handler.xfyun_asr.recognize_speech_with_smart_trigger(max_wait_time=6)  # 从8秒减少到6秒
+                    # 优先本地确认词识别，不确定时才使用科大讯飞（confirm 关键词配置）
+                    result = self.speech_handler.listen_for_confirmation(max_wait_time=6)  # 从8秒减少到6秒
                     
                     if result and isinstance(result, tuple):
                         text, reason = result
                         if text and len(text.strip()) > 0:
-                            print(f"✅ 科大讯飞确认结果: {text}")
+                            print(f"✅ 确认结果: {text} ({reason})")
                             return result
                     
-                    print("🔇 科大讯飞未获得确认结果")
+                    print("🔇 未获得确认结果")
                     return None, "no_speech"
                     
                 except Exception as xf_error:
-                    print(f"❌ 科大讯飞确认失败: {xf_error}")
+                    print(f"❌ 语音确认失败: {xf_error}")
                     return None, "error"
-                finally:
-                    # 恢复原始关键词
-                    self.speech_handler.xfyun_asr.trigger_keywords = original_keywords
             else:
                 print("❌ 科大讯飞不可用")
                 return None, "no_xfyun"
@@ -463,31 +510,64 @@ class NavigationApp:
                 if qiniu_info['mcp_available']:
                     self.use_qiniu_mcp = True
                     print("✅ 已切换到七牛云MCP模式")
-                    self.speech_handler.speak("已切换到七牛云MCP模式")
+                    await self.speech_handler.speak_async("已切换到七牛云MCP模式")
                 else:
                     print("❌ 七牛云MCP不可用，请检查配置")
-                    self.speech_handler.speak("七牛云MCP不可用，请检查配置")
+                    await self.speech_handler.speak_async("七牛云MCP不可用，请检查配置")
             elif choice == '2':
                 self.use_qiniu_mcp = False
                 print("✅ 已切换到传统MCP模式")
-                self.speech_handler.speak("已切换到传统MCP模式")
+                await self.speech_handler.speak_async("已切换到传统MCP模式")
             else:
                 print("❌ 无效选择")
-                self.speech_handler.speak("无效选择")
+                await self.speech_handler.speak_async("无效选择")
                 
         except Exception as e:
             print(f"❌ 切换导航客户端时出错: {e}")
-            self.speech_handler.speak("切换导航客户端失败")
+            await self.speech_handler.speak_async("切换导航客户端失败")
     
 
     
+    def show_stage_timings(self, stages):
+        """打印各阶段耗时汇总和缓存命中率，指定阶段名时打印其耗时直方图"""
+        for name, cache in (("意图解析", get_intent_cache()), ("地理编码", get_geocode_cache())):
+            stats = cache.get_stats()
+            print(f"💾 {name}缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，"
+                  f"命中率 {stats['hit_rate']:.0%}")
+        stats = get_gazetteer().get_stats()
+        print(f"📍 地名库: {stats['places']} 个地点，命中 {stats['hits']} 次，未命中 {stats['misses']} 次，"
+              f"命中率 {stats['hit_rate']:.0%}")
+        
+        tracer = get_tracer()
+        if not tracer.enabled:
+            print("⚠️ 链路计时未启用 (TRACE_ENABLED=false)")
+            return
+        print("📊 各阶段耗时:")
+        print(format_summary(tracer.summary()))
+        for stage in stages:
+            print()
+            print(format_histogram(stage, tracer.durations(stage)))
+    
+    def export_trace(self):
+        """按 TRACE_FILE 导出本次运行的计时记录"""
+        tracer = get_tracer()
+        if TRACE_FILE and tracer.enabled:
+            count = tracer.export(TRACE_FILE)
+            print(f"💾 已导出 {count} 条计时记录到 {TRACE_FILE}")
+    
     def cleanup(self):
         """清理资源"""
         try:
             print("正在清理资源...")
+            self.export_trace()
             # 高德地图API是HTTP API，无需停止进程
             if hasattr(self.speech_handler, 'cleanup'):
                 self.speech_handler.cleanup()
+            stop_audio_capture()
+            # 释放共享HTTP连接池
+            close_http_session()
+            # 输出队列中剩余的日志，保证退出提示在最后
+            shutdown_logging()
             print("程序已退出")
         except Exception as e:
             print(f"⚠️ 清理资源时出错: {e}")
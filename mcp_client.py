@@ -2,20 +2,31 @@ import json
 import requests
 import asyncio
 import os
+import threading
 import urllib.parse
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from browser_navigator import BrowserNavigator
+from geocode_cache import get_geocode_cache
+from http_session import get_http_session
+from async_utils import run_blocking
+from tracing import span, traced
+from app_logging import get_logger
+from config import AMAP_API_BASE_URL, NAVIGATION_TIMEOUT
+
+logger = get_logger(__name__)
 
 class MCPClient:
     def __init__(self):
         self.browser_navigator = BrowserNavigator()
         self.use_browser_fallback = True  # 启用浏览器备选方案
+        self.geocode_cache = get_geocode_cache()  # 与BrowserNavigator共享
         
         # 高德地图API配置
         self.amap_key = os.getenv('AMAP_API_KEY', '')
-        self.amap_base_url = "https://restapi.amap.com/v3"
+        self.amap_base_url = AMAP_API_BASE_URL.rstrip('/')
         
         # 请求配置
+        self.http = get_http_session()  # 共享连接池，复用TCP/TLS连接
         self.timeout = 10  # 正常请求超时时间
         self.test_timeout = 3  # 测试连接超时时间
         self.headers = {
@@ -27,10 +38,10 @@ class MCPClient:
         """测试高德地图API连接"""
         try:
             if not self.amap_key:
-                print("❌ 未配置高德地图API密钥")
+                logger.error("❌ 未配置高德地图API密钥")
                 return False
             
-            print("🔍 测试高德地图API连接...")
+            logger.info("🔍 测试高德地图API连接...")
             
             # 使用简单的行政区查询测试连接
             test_url = f"{self.amap_base_url}/config/district"
@@ -40,23 +51,23 @@ class MCPClient:
                 'subdistrict': 0
             }
             
-            response = requests.get(test_url, params=params, timeout=self.test_timeout)
+            response = self.http.get(test_url, params=params, timeout=self.test_timeout)
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get('status') == '1':
-                    print("✅ 高德地图API连接成功")
+                    logger.info("✅ 高德地图API连接成功")
                     return True
                 else:
                     error_info = result.get('info', '未知错误')
-                    print(f"❌ 高德地图API错误: {error_info}")
+                    logger.error("❌ 高德地图API错误: %s", error_info)
                     return False
             else:
-                print(f"❌ 高德地图API响应异常: {response.status_code}")
+                logger.error("❌ 高德地图API响应异常: %s", response.status_code)
                 return False
                 
         except Exception as e:
-            print(f"❌ 高德地图API连接失败: {e}")
+            logger.error("❌ 高德地图API连接失败: %s", e)
             return False
     
     def send_amap_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -69,10 +80,10 @@ class MCPClient:
             params['key'] = self.amap_key
             params['output'] = 'json'
             
-            print(f"🌐 发送高德API请求: {endpoint}")
+            logger.debug("🌐 发送高德API请求: %s", endpoint)
             
             # 发送GET请求
-            response = requests.get(
+            response = self.http.get(
                 url, 
                 params=params, 
                 headers=self.headers, 
@@ -81,113 +92,247 @@ class MCPClient:
             
             if response.status_code == 200:
                 result = response.json()
-                print(f"✅ 高德API请求成功")
+                logger.debug("✅ 高德API请求成功")
                 return result
             else:
                 error_msg = f"HTTP {response.status_code}: {response.text}"
-                print(f"❌ 高德API请求失败: {error_msg}")
+                logger.error("❌ 高德API请求失败: %s", error_msg)
                 return {"error": error_msg}
                 
         except requests.exceptions.Timeout:
             error_msg = "请求超时"
-            print(f"❌ 高德API请求超时")
+            logger.error("❌ 高德API请求超时")
             return {"error": error_msg}
         except requests.exceptions.RequestException as e:
             error_msg = f"网络请求错误: {e}"
-            print(f"❌ 高德API网络错误: {error_msg}")
+            logger.error("❌ 高德API网络错误: %s", error_msg)
             return {"error": error_msg}
         except Exception as e:
             error_msg = f"高德API请求异常: {e}"
-            print(f"❌ 高德API请求异常: {error_msg}")
+            logger.error("❌ 高德API请求异常: %s", error_msg)
             return {"error": error_msg}
     
-    def navigate_to_destination(self, origin: str, destination: str):
-        """调用高德地图导航"""
+    @traced("amap.route")
+    def plan_route(self, origin_coords: Optional[Tuple[float, float]],
+                   dest_coords: Tuple[float, float]) -> Optional[Dict[str, Any]]:
+        """高德驾车路径规划，成功返回 {'distance': 米, 'duration': 秒}"""
+        # 构建坐标字符串
+        origin_coord_str = f"{origin_coords[0]},{origin_coords[1]}" if origin_coords else None
+        dest_coord_str = f"{dest_coords[0]},{dest_coords[1]}"
+        
+        logger.debug("   起点坐标: %s", origin_coord_str if origin_coord_str else '当前位置')
+        logger.debug("   终点坐标: %s", dest_coord_str)
+        
+        # 发送路径规划请求到高德API
+        api_params = {
+            "destination": dest_coord_str,
+            "strategy": 0,  # 0-速度优先，1-费用优先，2-距离优先，3-不走高速
+            "extensions": "all"
+        }
+        
+        # 如果有起点坐标，添加到参数中
+        if origin_coord_str:
+            api_params["origin"] = origin_coord_str
+        
+        response = self.send_amap_request("direction/driving", api_params)
+        
+        if "error" not in response and response.get("status") == "1":
+            route_info = response.get("route", {})
+            paths = route_info.get("paths", [])
+            
+            if paths:
+                path = paths[0]
+                distance = path.get("distance", "未知")
+                duration = path.get("duration", "未知")
+                
+                logger.info("✅ 高德API导航路线规划成功:")
+                logger.info("   📏 距离: %s米", distance)
+                logger.info("   ⏱️ 预计时间: %s分钟", int(float(duration))//60)
+                
+                return {"distance": distance, "duration": duration}
+            else:
+                logger.error("❌ 高德API导航未找到路线")
+        else:
+            error_msg = response.get("info", "未知错误")
+            logger.error("❌ 高德API导航失败: %s", error_msg)
+        
+        return None
+    
+    def open_route(self, origin: str, destination: str,
+                   origin_coords: Optional[Tuple[float, float]],
+                   dest_coords: Tuple[float, float], route: Dict[str, Any]):
+        """用已规划好的路线打开高德地图"""
+        import webbrowser
+        
+        origin_coord_str = f"{origin_coords[0]},{origin_coords[1]}" if origin_coords else None
+        dest_coord_str = f"{dest_coords[0]},{dest_coords[1]}"
+        
+        # 构建高德地图URL并打开（使用坐标）
+        if origin_coords:
+            map_url = f"https://uri.amap.com/navigation?from={origin_coord_str}&to={dest_coord_str}&fromname={urllib.parse.quote(origin)}&toname={urllib.parse.quote(destination)}&mode=car"
+        else:
+            map_url = f"https://uri.amap.com/navigation?to={dest_coord_str}&toname={urllib.parse.quote(destination)}&mode=car"
+        
+        logger.debug("🔗 导航URL: %s", map_url)
+        with span("browser.open"):
+            webbrowser.open(map_url)
+        
+        distance = route["distance"]
+        minutes = int(float(route["duration"])) // 60
+        return True, f"高德API导航成功，距离{distance}米，预计{minutes}分钟"
+    
+    @traced("amap.prepare")
+    def prepare_navigation(self, origin: str, destination: str,
+                           cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """提前完成地理编码和路线规划（API模式），结果可直接传给 navigate_to_destination
+        
+        cancel: 置位后跳过路线规划（用户已取消导航，后台线程不再请求高德）
+        """
+        origin_coords, dest_coords = self.browser_navigator.geocode_pair(origin, destination)
+        plan = {
+            "origin": origin,
+            "destination": destination,
+            "origin_coords": origin_coords,
+            "dest_coords": dest_coords
+        }
+        
+        if cancel is not None and cancel.is_set():
+            logger.info("⏹️ 预先准备已取消，跳过路线规划")
+            return plan
+        
+        if dest_coords and not self.use_browser_fallback and self.amap_key:
+            plan["route"] = self.plan_route(origin_coords, dest_coords)
+        
+        return plan
+    
+    async def prepare_navigation_async(self, origin: str, destination: str,
+                                       cancel: Optional[threading.Event] = None,
+                                       timeout: float = NAVIGATION_TIMEOUT) -> Dict[str, Any]:
+        """异步预先准备导航数据；取消任务不会停止线程池中的调用，需同时置位 cancel"""
+        cancel = cancel or threading.Event()
+        try:
+            return await run_blocking(self.prepare_navigation, origin, destination, cancel, timeout=timeout)
+        except asyncio.TimeoutError:
+            cancel.set()
+            raise
+    
+    @staticmethod
+    def _abandoned(cancel: Optional[threading.Event]) -> bool:
+        """调用方已放弃等待时不再打开导航，避免与回退导航各开一个页面"""
+        if cancel is not None and cancel.is_set():
+            logger.info("⏹️ 导航已被调用方放弃，不再打开浏览器")
+            return True
+        return False
+    
+    def _open_browser(self, origin: str, destination: str, cancel: Optional[threading.Event] = None,
+                      coords=None):
+        if self._abandoned(cancel):
+            return False, "导航已取消"
+        return self.browser_navigator.open_navigation(origin, destination, coords=coords)
+    
+    @traced("amap.navigate")
+    def navigate_to_destination(self, origin: str, destination: str,
+                                plan: Optional[Dict[str, Any]] = None,
+                                cancel: Optional[threading.Event] = None):
+        """调用高德地图导航
+        
+        plan: prepare_navigation 的结果，起点终点一致时直接复用其中的坐标和路线
+        cancel: 置位后不再打开浏览器（调用方已超时放弃）
+        """
+        if plan and (plan.get("origin"), plan.get("destination")) != (origin, destination):
+            plan = None
+        if plan and (not plan.get("dest_coords") or
+                     (origin and origin != "当前位置" and not plan.get("origin_coords"))):
+            # 预先地理编码超时或失败，不能据此放弃API导航，重新获取坐标
+            logger.info("🔄 预先获取的坐标不完整，重新转换地址")
+            plan = None
+        
         # 优先尝试高德API导航
         if not self.use_browser_fallback and self.amap_key:
-            print(f"🗺️ 使用高德地图API导航: {origin} -> {destination}")
+            logger.info("🗺️ 使用高德地图API导航: %s -> %s", origin, destination)
             
             try:
-                # 首先将地址转换为坐标
-                print("📍 转换地址为坐标...")
-                origin_coords = self.browser_navigator.geocode_address(origin) if origin != "当前位置" else None
-                dest_coords = self.browser_navigator.geocode_address(destination)
+                if plan:
+                    logger.info("⚡ 使用预先获取的坐标")
+                    origin_coords, dest_coords = plan["origin_coords"], plan["dest_coords"]
+                else:
+                    # 首先将地址转换为坐标
+                    logger.info("📍 并发转换起点和终点坐标...")
+                    origin_coords, dest_coords = self.browser_navigator.geocode_pair(origin, destination)
                 
                 if not dest_coords:
-                    print("❌ 无法获取终点坐标，切换到浏览器导航")
-                    return self.browser_navigator.open_navigation(origin, destination)
-                
-                # 构建坐标字符串
-                origin_coord_str = f"{origin_coords[0]},{origin_coords[1]}" if origin_coords else None
-                dest_coord_str = f"{dest_coords[0]},{dest_coords[1]}"
+                    logger.error("❌ 无法获取终点坐标，切换到浏览器导航")
+                    return self._open_browser(origin, destination, cancel)
                 
-                print(f"   起点坐标: {origin_coord_str if origin_coord_str else '当前位置'}")
-                print(f"   终点坐标: {dest_coord_str}")
-                
-                # 发送路径规划请求到高德API
-                api_params = {
-                    "destination": dest_coord_str,
-                    "strategy": 0,  # 0-速度优先，1-费用优先，2-距离优先，3-不走高速
-                    "extensions": "all"
-                }
-                
-                # 如果有起点坐标，添加到参数中
-                if origin_coord_str:
-                    api_params["origin"] = origin_coord_str
-                
-                response = self.send_amap_request("direction/driving", api_params)
-                
-                if "error" not in response and response.get("status") == "1":
-                    route_info = response.get("route", {})
-                    paths = route_info.get("paths", [])
-                    
-                    if paths:
-                        path = paths[0]
-                        distance = path.get("distance", "未知")
-                        duration = path.get("duration", "未知")
-                        
-                        print(f"✅ 高德API导航路线规划成功:")
-                        print(f"   📏 距离: {distance}米")
-                        print(f"   ⏱️ 预计时间: {int(float(duration))//60}分钟")
-                        
-                        # 构建高德地图URL并打开（使用坐标）
-                        import webbrowser
-                        
-                        if origin_coords:
-                            map_url = f"https://uri.amap.com/navigation?from={origin_coord_str}&to={dest_coord_str}&fromname={urllib.parse.quote(origin)}&toname={urllib.parse.quote(destination)}&mode=car"
-                        else:
-                            map_url = f"https://uri.amap.com/navigation?to={dest_coord_str}&toname={urllib.parse.quote(destination)}&mode=car"
-                        
-                        print(f"🔗 导航URL: {map_url}")
-                        webbrowser.open(map_url)
-                        
-                        return True, f"高德API导航成功，距离{distance}米，预计{int(float(duration))//60}分钟"
-                    else:
-                        print("❌ 高德API导航未找到路线")
+                if plan and "route" in plan:
+                    route = plan["route"]
+                elif self._abandoned(cancel):
+                    return False, "导航已取消"
                 else:
-                    error_msg = response.get("info", "未知错误")
-                    print(f"❌ 高德API导航失败: {error_msg}")
+                    route = self.plan_route(origin_coords, dest_coords)
+                if route:
+                    if self._abandoned(cancel):
+                        return False, "导航已取消"
+                    return self.open_route(origin, destination, origin_coords, dest_coords, route)
                 
                 # API失败，切换到浏览器导航
-                print("🔄 切换到浏览器导航")
-                return self.browser_navigator.open_navigation(origin, destination)
+                logger.info("🔄 切换到浏览器导航")
+                return self._open_browser(origin, destination, cancel)
                 
             except Exception as e:
-                print(f"❌ 高德API导航调用异常: {e}")
-                print("🔄 切换到浏览器导航")
-                return self.browser_navigator.open_navigation(origin, destination)
+                logger.error("❌ 高德API导航调用异常: %s", e)
+                logger.info("🔄 切换到浏览器导航")
+                return self._open_browser(origin, destination, cancel)
         else:
             # 直接使用浏览器导航
-            print("🌐 使用浏览器导航模式")
-            return self.browser_navigator.open_navigation(origin, destination)
+            logger.info("🌐 使用浏览器导航模式")
+            coords = (plan["origin_coords"], plan["dest_coords"]) if plan else None
+            return self._open_browser(origin, destination, cancel, coords=coords)
+    
+    async def navigate_to_destination_async(self, origin: str, destination: str,
+                                            plan: Optional[Dict[str, Any]] = None,
+                                            timeout: float = NAVIGATION_TIMEOUT):
+        """异步导航：地理编码、路线规划在线程池中执行，不阻塞事件循环"""
+        cancel = threading.Event()
+        try:
+            return await run_blocking(self.navigate_to_destination, origin, destination, plan, cancel,
+                                      timeout=timeout)
+        except asyncio.TimeoutError:
+            # 后台线程仍在运行，通知它不要再打开页面，由下面的浏览器导航接手
+            cancel.set()
+            logger.warning("⏰ 高德导航超过 %s 秒，切换到浏览器导航", timeout)
+        try:
+            return await run_blocking(self.browser_navigator.open_navigation, origin, destination, timeout=timeout)
+        except asyncio.TimeoutError:
+            error_msg = f"浏览器导航超时 ({timeout}秒)"
+            logger.error("❌ %s", error_msg)
+            return False, error_msg
+    
+    async def plan_route_async(self, origin_coords: Optional[Tuple[float, float]],
+                               dest_coords: Tuple[float, float],
+                               timeout: float = NAVIGATION_TIMEOUT) -> Optional[Dict[str, Any]]:
+        """异步路线规划"""
+        return await run_blocking(self.plan_route, origin_coords, dest_coords, timeout=timeout)
     
     def search_location(self, address: str):
         """搜索地址位置"""
         # 优先使用高德API搜索
         if not self.use_browser_fallback and self.amap_key:
-            print(f"🔍 使用高德地图API搜索: {address}")
+            logger.info("🔍 使用高德地图API搜索: %s", address)
             
             try:
+                cached = self.geocode_cache.get(address)
+                if cached:
+                    formatted_address = cached["formatted_address"]
+                    location_coords = f"{cached['lng']},{cached['lat']}"
+                    logger.info("⚡ 命中地理编码缓存: %s (%s)", formatted_address, location_coords)
+                    
+                    search_url = f"https://uri.amap.com/marker?position={location_coords}&name={formatted_address}"
+                    import webbrowser
+                    webbrowser.open(search_url)
+                    
+                    return formatted_address, "高德API搜索成功(缓存)"
+                
                 # 发送地理编码请求到高德API
                 response = self.send_amap_request(
                     "geocode/geo",
@@ -205,9 +350,13 @@ class MCPClient:
                         formatted_address = location.get("formatted_address", address)
                         location_coords = location.get("location", "")
                         
-                        print(f"✅ 高德API搜索成功:")
-                        print(f"   📍 地址: {formatted_address}")
-                        print(f"   🌐 坐标: {location_coords}")
+                        if location_coords:
+                            lng, lat = map(float, location_coords.split(','))
+                            self.geocode_cache.put(address, lng, lat, formatted_address)
+                        
+                        logger.info("✅ 高德API搜索成功:")
+                        logger.info("   📍 地址: %s", formatted_address)
+                        logger.info("   🌐 坐标: %s", location_coords)
                         
                         # 构建高德地图搜索URL并打开
                         search_url = f"https://uri.amap.com/marker?position={location_coords}&name={formatted_address}"
@@ -216,32 +365,32 @@ class MCPClient:
                         
                         return formatted_address, "高德API搜索成功"
                     else:
-                        print("❌ 高德API搜索未找到结果")
+                        logger.error("❌ 高德API搜索未找到结果")
                 else:
                     error_msg = response.get("info", "未知错误")
-                    print(f"❌ 高德API搜索失败: {error_msg}")
+                    logger.error("❌ 高德API搜索失败: %s", error_msg)
                 
                 # API失败，切换到浏览器搜索
-                print("🔄 切换到浏览器搜索")
+                logger.info("🔄 切换到浏览器搜索")
                 return self.browser_navigator.open_simple_search(address)
                 
             except Exception as e:
-                print(f"❌ 高德API搜索调用异常: {e}")
-                print("🔄 切换到浏览器搜索")
+                logger.error("❌ 高德API搜索调用异常: %s", e)
+                logger.info("🔄 切换到浏览器搜索")
                 return self.browser_navigator.open_simple_search(address)
         else:
             # 直接使用浏览器搜索
-            print("🌐 使用浏览器搜索模式")
+            logger.info("🌐 使用浏览器搜索模式")
             return self.browser_navigator.open_simple_search(address)
     
     def get_weather_info(self, city: str) -> Optional[Dict[str, Any]]:
         """获取天气信息"""
         if not self.amap_key:
-            print("❌ 未配置高德地图API密钥，无法获取天气信息")
+            logger.error("❌ 未配置高德地图API密钥，无法获取天气信息")
             return None
             
         try:
-            print(f"🌤️ 获取{city}天气信息...")
+            logger.info("🌤️ 获取%s天气信息...", city)
             
             # 发送天气请求到高德API
             response = self.send_amap_request(
@@ -266,16 +415,16 @@ class MCPClient:
                         "reporttime": weather.get("reporttime", "未知")
                     }
             
-            print(f"❌ 获取{city}天气信息失败")
+            logger.error("❌ 获取%s天气信息失败", city)
             return None
             
         except Exception as e:
-            print(f"❌ 天气信息获取异常: {e}")
+            logger.error("❌ 天气信息获取异常: %s", e)
             return None
     
     def test_navigation_methods(self):
         """测试可用的导航方法"""
-        print("🔍 正在测试导航方法...")
+        logger.info("🔍 正在测试导航方法...")
         
         # 测试高德API连接
         amap_available = self.test_amap_connection()
@@ -284,15 +433,15 @@ class MCPClient:
         browser_available = self.browser_navigator.test_api_connection()
         
         if amap_available:
-            print("✅ 高德地图API可用，优先使用API导航")
+            logger.info("✅ 高德地图API可用，优先使用API导航")
             self.use_browser_fallback = False
             return True
         elif browser_available:
-            print("✅ 浏览器导航可用，使用浏览器导航")
+            logger.info("✅ 浏览器导航可用，使用浏览器导航")
             self.use_browser_fallback = True
             return True
         else:
-            print("❌ 所有导航方法都不可用")
+            logger.error("❌ 所有导航方法都不可用")
             self.use_browser_fallback = True  # 默认使用浏览器
             return False
     
@@ -300,7 +449,7 @@ class MCPClient:
         """设置导航模式"""
         self.use_browser_fallback = use_browser
         mode = "浏览器导航" if use_browser else "高德地图API导航"
-        print(f"🔧 导航模式已设置为: {mode}")
+        logger.info("🔧 导航模式已设置为: %s", mode)
     
     def get_navigation_info(self) -> Dict[str, Any]:
         """获取导航配置信息"""
@@ -310,7 +459,7 @@ class MCPClient:
             try:
                 amap_available = self.test_amap_connection()
             except Exception as e:
-                print(f"⚠️ 测试高德API连接时出错: {e}")
+                logger.warning("⚠️ 测试高德API连接时出错: %s", e)
                 amap_available = False
         
         # 安全地测试浏览器导航
@@ -318,7 +467,7 @@ class MCPClient:
         try:
             browser_available = self.browser_navigator.test_api_connection()
         except Exception as e:
-            print(f"⚠️ 测试浏览器导航时出错: {e}")
+            logger.warning("⚠️ 测试浏览器导航时出错: %s", e)
             browser_available = False
         
         return {
@@ -326,6 +475,7 @@ class MCPClient:
             "browser_available": browser_available,
             "current_mode": "浏览器导航" if self.use_browser_fallback else "高德地图API导航",
             "amap_key_configured": bool(self.amap_key),
-            "amap_base_url": self.amap_base_url if self.amap_key else "未配置"
+            "amap_base_url": self.amap_base_url if self.amap_key else "未配置",
+            "geocode_cache": self.geocode_cache.get_stats()
         }
      
\ No newline at end of file
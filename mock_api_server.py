@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟API服务（仅依赖标准库）
+实现程序用到的高德REST接口、七牛云MCP对话接口 (/v1/chat/completions + tool_references)
+和 DashScope 文本生成接口（含 SSE 流式输出），结果确定可复现，并支持按服务注入延迟、错误和卡顿，
+用于离线压测与尾延迟实验。
+
+用法: python mock_api_server.py [--port 8766] [--latency-ms 30] [--jitter-ms 10] [--error-rate 0.01]
+                               [--service amap:latency_ms=80,stall_rate=0.01]
+然后设置:
+    AMAP_API_BASE_URL=http://127.0.0.1:8766/v3
+    OPENAI_BASE_URL=http://127.0.0.1:8766
+    DASHSCOPE_HTTP_BASE_URL=http://127.0.0.1:8766/api/v1
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, fields, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# 常用地点的固定坐标，其余地址按名称哈希落在城市范围内，保证同一地址结果稳定
+PLACES = {
+    "深圳湾科技生态园": ("113.944610,22.525580", "广东省深圳市南山区深圳湾科技生态园"),
+    "学府路国兴苑": ("113.924950,22.523010", "广东省深圳市南山区学府路国兴苑"),
+    "市民中心": ("114.059560,22.543340", "广东省深圳市福田区市民中心"),
+    "宝安机场": ("113.814829,22.633236", "广东省深圳市宝安区深圳宝安国际机场"),
+    "深圳北站": ("114.029893,22.609725", "广东省深圳市龙华区深圳北站"),
+    "北京西站": ("116.321592,39.894793", "北京市丰台区北京西站"),
+    "天安门": ("116.397455,39.909187", "北京市东城区天安门"),
+}
+CITY_BOUNDS = (113.75, 22.45, 114.62, 22.86)  # 深圳市范围（经度、纬度）
+DEFAULT_CITY = "深圳市"
+
+AMAP_ENDPOINTS = {"geocode/geo", "geocode/regeo", "direction/driving", "weather/weatherInfo",
+                  "config/district", "ip"}
+DASHSCOPE_PATH = "/api/v1/services/aigc/text-generation/generation"
+STREAM_CHUNK_CHARS = 4  # 流式输出每段的字符数
+
+
+@dataclass
+class FaultProfile:
+    """单个服务的延迟与故障注入参数"""
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    error_rate: float = 0  # 返回 HTTP 503 的概率
+    stall_rate: float = 0  # 卡住 stall_ms 后才响应的概率（模拟尾延迟/超时）
+    stall_ms: float = 5000
+    token_ms: float = 0  # 流式输出时相邻两段之间的生成间隔
+    prefill_ms: float = 0  # 每千字输入（含系统提示词）的预填充耗时
+
+
+def geocode(address: str) -> Tuple[str, str]:
+    """地址 → (经纬度字符串, 规范地址)"""
+    for name, (location, formatted) in PLACES.items():
+        if name in address:
+            return location, formatted
+    digest = hashlib.md5(address.encode("utf-8")).digest()
+    west, south, east, north = CITY_BOUNDS
+    lng = west + (east - west) * int.from_bytes(digest[:4], "big") / 2 ** 32
+    lat = south + (north - south) * int.from_bytes(digest[4:8], "big") / 2 ** 32
+    formatted = address if address.startswith(("广东", DEFAULT_CITY)) else f"广东省{DEFAULT_CITY}{address}"
+    return f"{lng:.6f},{lat:.6f}", formatted
+
+
+def parse_location(value: str) -> Tuple[float, float]:
+    lng, lat = value.split(",")
+    return float(lng), float(lat)
+
+
+def distance_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """两点球面距离（米）"""
+    lng1, lat1, lng2, lat2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def extract_route(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """从 "从A到B" / "从A导航到B" / "去B" 中提取起点和终点"""
+    match = re.search(r"从(.+?)(?:导航)?到(.+?)(?:[,，。]|给出|$)", text)
+    if match:
+        return match.group(1).strip(), match.group(2).strip()
+    match = re.search(r"(?:去|到|导航到)(.+?)(?:[,，。]|$)", text)
+    if match:
+        return None, match.group(1).strip()
+    return None, None
+
+
+def with_city(address: str) -> str:
+    return address if "市" in address[:4] else f"{DEFAULT_CITY}{address}"
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    server: "_HTTPServer"
+    protocol_version = "HTTP/1.1"  # 支持keep-alive，压测时与真实服务一样复用连接
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- 路由 ----
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/__stats":
+            return self._send_json(200, self.server.mock.snapshot())
+        endpoint = url.path[len("/v3/"):] if url.path.startswith("/v3/") else None
+        if endpoint not in AMAP_ENDPOINTS:
+            return self._send_json(404, {"error": f"unknown path {url.path}"})
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self._dispatch("amap", endpoint, lambda: self._amap(endpoint, params))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": "invalid json"})
+
+        if url.path == "/v1/chat/completions":
+            self._dispatch("qiniu", "chat/completions", lambda: self._chat_completions(body))
+        elif url.path == DASHSCOPE_PATH:
+            if self.headers.get("X-DashScope-SSE") == "enable":
+                incremental = bool((body.get("parameters") or {}).get("incremental_output"))
+                self._dispatch("dashscope", "generation/stream", lambda: self._generation(body),
+                               send=lambda status, payload: self._send_stream(status, payload, incremental))
+            else:
+                self._dispatch("dashscope", "generation", lambda: self._generation(body),
+                               send=self._send_generation)
+        else:
+            self._send_json(404, {"error": f"unknown path {url.path}"})
+
+    def _dispatch(self, service: str, endpoint: str, handler, send=None):
+        mock = self.server.mock
+        start = time.monotonic()
+        fault = mock.draw_fault(service)
+        if fault.get("delay"):
+            time.sleep(fault["delay"])
+        if fault.get("error"):
+            status, payload = 503, {"error": "injected failure", "service": service}
+        else:
+            status, payload = handler()
+        if send is None:
+            self._send_json(status, payload)
+        else:
+            status = send(status, payload)
+        mock.record(service, endpoint, status, time.monotonic() - start)
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream_chunks(self, payload: dict) -> Tuple[str, int, float]:
+        """生成结果文本、分段数和相邻两段的生成间隔"""
+        content = payload["output"]["choices"][0]["message"]["content"]
+        count = max(1, math.ceil(len(content) / STREAM_CHUNK_CHARS))
+        return content, count, self.server.mock.profile("dashscope").token_ms / 1000
+
+    def _send_generation(self, status: int, payload: dict) -> int:
+        """非流式调用同样要等全部分段生成完才返回"""
+        if status == 200:
+            _, count, interval = self._stream_chunks(payload)
+            time.sleep((count - 1) * interval)
+        self._send_json(status, payload)
+        return status
+
+    def _send_stream(self, status: int, payload: dict, incremental: bool) -> int:
+        """按 DashScope 的 SSE 格式分段返回生成结果（分块传输）；客户端中途断开时返回499"""
+        if status != 200:
+            self._send_json(status, payload)
+            return status
+        content, count, interval = self._stream_chunks(payload)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream;charset=UTF-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for index in range(1, count + 1):
+                if index > 1 and interval:
+                    time.sleep(interval)
+                end = index * STREAM_CHUNK_CHARS
+                text = content[end - STREAM_CHUNK_CHARS:end] if incremental else content[:end]
+                message = {
+                    "request_id": payload["request_id"],
+                    "output": {"choices": [{"finish_reason": "stop" if index == count else "null",
+                                            "message": {"role": "assistant", "content": text}}]},
+                    "usage": payload["usage"],
+                }
+                event = (f"id:{index}\nevent:result\n:HTTP_STATUS/200\n"
+                         f"data:{json.dumps(message, ensure_ascii=False)}\n\n")
+                self._write_chunk(event.encode("utf-8"))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return 499  # 客户端提前关闭连接，生成被取消
+        return 200
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    # ---- 高德 REST ----
+
+    def _amap(self, endpoint: str, params: Dict[str, str]):
+        if not params.get("key"):
+            return 200, {"status": "0", "info": "INVALID_USER_KEY", "infocode": "10001"}
+        ok = {"status": "1", "info": "OK", "infocode": "10000"}
+
+        if endpoint == "geocode/geo":
+            address = params.get("address", "")
+            if not address:
+                return 200, {"status": "0", "info": "INVALID_PARAMS", "infocode": "20000"}
+            location, formatted = geocode(address)
+            level = "区县" if address.endswith(("区", "县")) else "兴趣点"
+            return 200, dict(ok, count="1", geocodes=[{
+                "formatted_address": formatted, "country": "中国", "province": "广东省",
+                "city": DEFAULT_CITY, "location": location, "level": level,
+            }])
+
+        if endpoint == "geocode/regeo":
+            location = params.get("location", "")
+            return 200, dict(ok, regeocode={"formatted_address": f"广东省{DEFAULT_CITY}({location})",
+                                            "addressComponent": {"city": DEFAULT_CITY}})
+
+        if endpoint == "direction/driving":
+            try:
+                origin = parse_location(params["origin"])
+                destination = parse_location(params["destination"])
+            except (KeyError, ValueError):
+                return 200, {"status": "0", "info": "INVALID_PARAMS", "infocode": "20000"}
+            distance = distance_m(origin, destination) * 1.3  # 路网距离约为直线距离的1.3倍
+            duration = distance / (30 / 3.6) + 60  # 平均30km/h
+            return 200, dict(ok, count="1", route={
+                "origin": params["origin"], "destination": params["destination"],
+                "paths": [{"distance": str(int(distance)), "duration": str(int(duration)),
+                           "strategy": "速度最快", "tolls": "0", "steps": []}],
+            })
+
+        if endpoint == "weather/weatherInfo":
+            city = params.get("city", DEFAULT_CITY)
+            return 200, dict(ok, count="1", lives=[{
+                "province": "广东", "city": city, "weather": "晴", "temperature": "26",
+                "winddirection": "东南", "windpower": "≤3", "humidity": "70",
+                "reporttime": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }])
+
+        if endpoint == "config/district":
+            keywords = params.get("keywords", "中国")
+            return 200, dict(ok, count="1", districts=[{
+                "name": keywords, "level": "country" if keywords == "中国" else "city",
+                "center": "116.3683244,39.915085", "districts": [],
+            }])
+
+        # ip 定位
+        west, south, east, north = CITY_BOUNDS
+        return 200, dict(ok, province="广东省", city=DEFAULT_CITY, adcode="440300",
+                         rectangle=f"{west},{south};{east},{north}")
+
+    # ---- 七牛云MCP ----
+
+    def _chat_completions(self, body: dict):
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"error": {"message": "missing api key", "type": "invalid_request_error"}}
+
+        content = self._last_user_message(body.get("messages", []))
+        origin, destination = extract_route(content)
+        tool_references = []
+        lines = []
+        for name in (origin, destination):
+            if not name:
+                continue
+            location, formatted = geocode(name)
+            result = {"return": [{"location": location, "formatted_address": formatted}]}
+            tool_references.append({
+                "name": "maps_geo",
+                "content": json.dumps({"content": [{"type": "text", "text": json.dumps(result, ensure_ascii=False)}]},
+                                      ensure_ascii=False),
+            })
+            lines.append(f"{name}: `{location}`")
+        reply = "\n".join(lines) if lines else "请告诉我起点和终点"
+
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "deepseek-v3-tool"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": reply}}],
+            "tool_references": tool_references,
+            "usage": {"prompt_tokens": len(content), "completion_tokens": len(reply),
+                      "total_tokens": len(content) + len(reply)},
+        }
+
+    # ---- DashScope ----
+
+    def _generation(self, body: dict):
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"code": "InvalidApiKey", "message": "Invalid API-key provided.",
+                         "request_id": uuid.uuid4().hex}
+
+        messages = (body.get("input") or {}).get("messages", [])
+        content = self._last_user_message(messages)
+        input_chars = sum(len(self._message_text(message)) for message in messages)
+        prefill_ms = self.server.mock.profile("dashscope").prefill_ms
+        if prefill_ms:
+            time.sleep(prefill_ms * input_chars / 1000 / 1000)
+        origin, destination = extract_route(content)
+        if destination:
+            reply = json.dumps({"origin": with_city(origin) if origin else "当前位置",
+                                "destination": with_city(destination), "action": "navigation"},
+                               ensure_ascii=False)
+        else:
+            reply = json.dumps({"error": "无法解析导航请求"}, ensure_ascii=False)
+
+        return 200, {
+            "request_id": uuid.uuid4().hex,
+            "output": {"choices": [{"finish_reason": "stop",
+                                    "message": {"role": "assistant", "content": reply}}]},
+            "usage": {"input_tokens": input_chars, "output_tokens": len(reply),
+                      "total_tokens": input_chars + len(reply)},
+        }
+
+    @staticmethod
+    def _message_text(message: dict) -> str:
+        """消息文本；显式缓存时 content 为分段列表"""
+        content = message.get("content", "")
+        if isinstance(content, list):
+            return "".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        return str(content)
+
+    @staticmethod
+    def _last_user_message(messages) -> str:
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return str(message.get("content", ""))
+        return ""
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    mock: "MockAPIServer"
+
+
+class MockAPIServer:
+    """高德 / 七牛云MCP / DashScope 模拟服务
+
+    default 为所有服务的故障注入参数，profiles 可按服务名 (amap / qiniu / dashscope) 单独覆盖。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, default: FaultProfile = None,
+                 profiles: Dict[str, FaultProfile] = None, seed: int = 0):
+        self.default = default or FaultProfile()
+        self.profiles = dict(profiles or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+        self._server = _HTTPServer((host, port), MockAPIHandler)
+        self._server.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def amap_base_url(self) -> str:
+        return f"{self.base_url}/v3"
+
+    @property
+    def dashscope_base_url(self) -> str:
+        return f"{self.base_url}/api/v1"
+
+    def profile(self, service: str) -> FaultProfile:
+        return self.profiles.get(service, self.default)
+
+    def draw_fault(self, service: str) -> dict:
+        """按服务的故障参数抽取本次请求的延迟和是否失败"""
+        profile = self.profile(service)
+        with self._lock:
+            delay = profile.latency_ms
+            if profile.jitter_ms:
+                delay += self._random.uniform(-profile.jitter_ms, profile.jitter_ms)
+            if profile.stall_rate and self._random.random() < profile.stall_rate:
+                delay += profile.stall_ms
+            error = bool(profile.error_rate) and self._random.random() < profile.error_rate
+        return {"delay": max(0.0, delay) / 1000, "error": error}
+
+    def record(self, service: str, endpoint: str, status: int, elapsed: float):
+        key = f"{service}/{endpoint}"
+        with self._lock:
+            entry = self._stats.setdefault(key, {"requests": 0, "errors": 0, "cancelled": 0,
+                                                 "total_ms": 0.0, "max_ms": 0.0})
+            entry["requests"] += 1
+            entry["cancelled"] += status == 499
+            entry["errors"] += status >= 400 and status != 499
+            entry["total_ms"] += elapsed * 1000
+            entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """各接口的请求数、错误数、被客户端取消的流式请求数和平均/最大服务耗时"""
+        with self._lock:
+            return {key: {"requests": entry["requests"], "errors": entry["errors"],
+                          "cancelled": entry["cancelled"],
+                          "mean_ms": round(entry["total_ms"] / entry["requests"], 1),
+                          "max_ms": round(entry["max_ms"], 1)}
+                    for key, entry in self._stats.items()}
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "MockAPIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def parse_service_profile(value: str, default: FaultProfile) -> Tuple[str, FaultProfile]:
+    """解析 "amap:latency_ms=80,error_rate=0.05" """
+    service, _, options = value.partition(":")
+    names = {field.name for field in fields(FaultProfile)}
+    overrides = {}
+    for option in filter(None, options.split(",")):
+        key, _, number = option.partition("=")
+        if key not in names:
+            raise ValueError(f"未知参数 {key}，可选: {', '.join(sorted(names))}")
+        overrides[key] = float(number)
+    return service, replace(default, **overrides)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="高德 / 七牛云MCP / DashScope 本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的基础延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="返回503的概率")
+    parser.add_argument("--stall-rate", type=float, default=0, help="卡顿请求的概率")
+    parser.add_argument("--stall-ms", type=float, default=5000)
+    parser.add_argument("--token-ms", type=float, default=0, help="流式输出相邻两段之间的间隔")
+    parser.add_argument("--prefill-ms", type=float, default=0, help="每千字输入的预填充耗时")
+    parser.add_argument("--service", action="append", default=[],
+                        help="按服务覆盖，如 amap:latency_ms=80,stall_rate=0.01（服务: amap/qiniu/dashscope）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    default = FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.stall_rate, args.stall_ms,
+                           args.token_ms, args.prefill_ms)
+    profiles = dict(parse_service_profile(value, default) for value in args.service)
+    server = MockAPIServer(args.host, args.port, default, profiles, args.seed)
+
+    print(f"🧪 模拟API服务已启动: {server.base_url}")
+    print(f"   AMAP_API_BASE_URL={server.amap_base_url}")
+    print(f"   OPENAI_BASE_URL={server.base_url}")
+    print(f"   DASHSCOPE_HTTP_BASE_URL={server.dashscope_base_url}")
+    print(f"   统计: {server.base_url}/__stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n模拟服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科大讯飞iat模拟服务（仅依赖标准库 + NumPy）
+实现WebSocket握手与帧收发，按讯飞iat协议接收音频帧、返回动态修正(wpgs)结果：
+对收到的音频做VAD，说话期间每 char_ms 毫秒追加一个字，收到最后一帧或静音超过 vad_eos 时
+用 rpl 整段替换并返回最终结果。用于在没有麦克风和网络的环境下测试、测量识别链路延迟。
+
+用法: python mock_xfyun_server.py [--port 8765] [--text 从北京到上海开始导航] [--latency-ms 50]
+然后设置 XFYUN_ASR_URL=ws://127.0.0.1:8765/v2/iat
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import queue
+import random
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from vad import EnergyVAD
+from xfyun_frames import FRAME_DURATION, STATUS_FIRST_FRAME, STATUS_LAST_FRAME
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def read_frame(rfile):
+    """读取一个WebSocket帧，返回 (opcode, payload)；连接关闭时返回 (None, b"")"""
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None, b""
+    opcode = header[0] & 0x0F
+    masked = header[1] & 0x80
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if masked else b""
+    payload = rfile.read(length)
+    if masked:
+        # 按整数异或解掩码，比逐字节循环快得多
+        key = int.from_bytes((mask * (length // 4 + 1))[:length], "big")
+        payload = (int.from_bytes(payload, "big") ^ key).to_bytes(length, "big")
+    return opcode, payload
+
+
+def encode_frame(opcode: int, payload: bytes) -> bytes:
+    """编码服务端帧（不加掩码）"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def result_message(sn: int, text: str, status: int, pgs: str = "apd", rg: List[int] = None,
+                   sid: str = "mock") -> str:
+    """构造一条iat识别结果消息"""
+    result = {"sn": sn, "ls": status == 2, "pgs": pgs,
+              "ws": [{"bg": 0, "cw": [{"sc": 0, "w": text}]}]}
+    if rg:
+        result["rg"] = rg
+    return json.dumps({"code": 0, "message": "success", "sid": sid,
+                       "data": {"status": status, "result": result}}, ensure_ascii=False)
+
+
+class IatSession:
+    """单个连接上的识别会话：根据收到的音频决定何时返回哪些字"""
+
+    def __init__(self, text: str, char_ms: float, vad_eos_ms: float):
+        self.text = text
+        self.char_ms = char_ms
+        self.vad = EnergyVAD(hangover_ms=vad_eos_ms)
+        self.sn = 0
+        self.emitted = 0  # 已返回的字数
+        self.speech_frames = 0
+        self.frames = 0
+        self.finished = False
+
+    def feed(self, pcm: bytes) -> List[str]:
+        """处理一帧音频，返回需要发送的消息"""
+        self.frames += 1
+        self.vad.process(pcm)
+        if self.vad.has_speech:
+            self.speech_frames += 1
+        if self.vad.has_speech and not self.vad.in_speech:
+            return self.finish()  # 服务端VAD判定说话结束(vad_eos)
+
+        # 最后一个字留到最终结果中返回
+        due = min(int(self.speech_frames * FRAME_DURATION * 1000 / self.char_ms), len(self.text) - 1)
+        messages = []
+        if due > self.emitted:
+            self.sn += 1
+            messages.append(result_message(self.sn, self.text[self.emitted:due], 1))
+            self.emitted = due
+        return messages
+
+    def finish(self) -> List[str]:
+        """返回最终结果：用 rpl 把之前的片段整体替换为完整文本"""
+        if self.finished:
+            return []
+        self.finished = True
+        self.sn += 1
+        if self.sn > 1 and self.text:
+            return [result_message(self.sn, self.text, 2, pgs="rpl", rg=[1, self.sn - 1])]
+        return [result_message(self.sn, self.text, 2)]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_TCPServer"
+
+    def handle(self):
+        mock = self.server.mock
+        if not self._handshake():
+            return
+
+        outbox: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        sender = threading.Thread(target=self._send_loop, args=(outbox,), daemon=True)
+        sender.start()
+
+        session = None
+        stats = {"frames": 0, "text": None, "first_frame_at": None, "last_frame_at": None, "error": None}
+        try:
+            while True:
+                opcode, payload = read_frame(self.rfile)
+                if opcode is None or opcode == OP_CLOSE:
+                    break
+                if opcode == OP_PING:
+                    outbox.put((time.monotonic(), OP_PONG, payload, False))
+                    continue
+                if opcode != OP_TEXT:
+                    continue
+
+                frame = json.loads(payload)
+                data = frame.get("data", {})
+                status = data.get("status")
+                if status == STATUS_FIRST_FRAME:
+                    stats["first_frame_at"] = time.monotonic()
+                    error = mock.next_error()
+                    if error:
+                        stats["error"] = error[0]
+                        outbox.put((mock.due(), OP_TEXT, json.dumps(
+                            {"code": error[0], "message": error[1], "sid": "mock"}).encode("utf-8"), True))
+                        break
+                    business = frame.get("business", {})
+                    session = IatSession(mock.next_text(), mock.char_ms, business.get("vad_eos", 5000))
+                    stats["text"] = session.text
+                if session is None or session.finished:
+                    continue
+
+                stats["frames"] += 1
+                messages = session.feed(base64.b64decode(data.get("audio", "")))
+                if status == STATUS_LAST_FRAME:
+                    stats["last_frame_at"] = time.monotonic()
+                    messages += session.finish()
+                for message in messages:
+                    outbox.put((mock.due(), OP_TEXT, message.encode("utf-8"), session.finished))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            outbox.put(None)
+            sender.join(timeout=5)
+            mock.record(stats)
+
+    def _handshake(self) -> bool:
+        """完成WebSocket握手，并像真实服务一样检查鉴权参数"""
+        request_line = self.rfile.readline().decode("latin-1").strip()
+        headers: Dict[str, str] = {}
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        parts = request_line.split()
+        query = parse_qs(urlparse(parts[1]).query) if len(parts) > 1 else {}
+        key = headers.get("sec-websocket-key")
+        if not key or not all(name in query for name in ("authorization", "date", "host")):
+            self.wfile.write(b"HTTP/1.1 401 Unauthorized\r\nContent-Length: 0\r\n\r\n")
+            return False
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+    def _send_loop(self, outbox: "queue.Queue[Optional[tuple]]"):
+        """按注入的网络延迟发送消息；最终结果或错误发送后关闭连接"""
+        try:
+            while True:
+                item = outbox.get()
+                if item is None:
+                    break
+                due, opcode, payload, close = item
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.wfile.write(encode_frame(opcode, payload))
+                if close:
+                    self.wfile.write(encode_frame(OP_CLOSE, struct.pack(">H", 1000)))
+        except OSError:
+            pass
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    mock: "MockXfyunServer"
+
+
+class MockXfyunServer:
+    """本地iat模拟服务
+
+    expect(text) 为后续会话排队期望的识别文本（按会话顺序取用，未排队时使用 default_text）；
+    latency_ms / jitter_ms 为每条结果注入的网络延迟，error_rate 为会话开始即返回错误的概率。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, char_ms: float = 180,
+                 latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 default_text: str = "", seed: int = 0):
+        self.char_ms = char_ms
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.default_text = default_text
+        self.sessions: List[dict] = []
+        self._texts: Deque[str] = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _TCPServer((host, port), _Handler)
+        self._server.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}/v2/iat"
+
+    def expect(self, text: str):
+        with self._lock:
+            self._texts.append(text)
+
+    def next_text(self) -> str:
+        with self._lock:
+            return self._texts.popleft() if self._texts else self.default_text
+
+    def next_error(self):
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 10165, "invalid handle"
+        return None
+
+    def due(self) -> float:
+        """注入网络延迟后消息应发出的时刻"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return time.monotonic() + max(0.0, self.latency_ms + jitter) / 1000
+
+    def record(self, stats: dict):
+        with self._lock:
+            self.sessions.append(stats)
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> "MockXfyunServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-xfyun", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="科大讯飞iat模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--text", default="从北京到上海开始导航", help="每次会话返回的识别文本")
+    parser.add_argument("--char-ms", type=float, default=180, help="说话期间每隔多少毫秒返回一个字")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每条结果注入的网络延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="会话返回错误的概率")
+    args = parser.parse_args()
+
+    server = MockXfyunServer(args.host, args.port, args.char_ms, args.latency_ms,
+                             args.jitter_ms, args.error_rate, default_text=args.text)
+    print(f"🧪 模拟讯飞服务已启动: {server.url}")
+    print(f"💡 设置 XFYUN_ASR_URL={server.url} 后运行程序")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n模拟服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+两级持久化缓存
+内存LRU + SQLite磁盘缓存，支持TTL过期和命中率统计
+
+磁盘层按命名空间限制条数：打开缓存时以及每写入 MAINTENANCE_INTERVAL 次，
+清理已过期的条目，并按写入时间淘汰超出 max_disk_entries 的最旧条目。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 每写入多少次清理一次磁盘层
+MAINTENANCE_INTERVAL = 100
+
+
+class PersistentLRUCache:
+    """内存LRU + SQLite两级缓存
+
+    同一个数据库文件可以被多个命名空间共享，每个命名空间的数据互不干扰。
+    值以JSON格式存储，因此只能缓存可JSON序列化的数据。
+    """
+
+    def __init__(self, namespace: str, db_path: Optional[str] = None,
+                 max_entries: int = 1024, ttl: float = 0, persist: bool = True,
+                 max_disk_entries: int = 10000):
+        self.namespace = namespace
+        self.db_path = db_path
+        self.max_entries = max(1, max_entries)
+        self.max_disk_entries = max_disk_entries  # 0 表示磁盘层不限条数
+        self.ttl = ttl  # 秒，0 表示永不过期
+        self.persist = persist and bool(db_path)
+
+        # 内存层：key -> (value, expires_at)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+        # 命中统计
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.persist:
+            self._open_db()
+            self._maintain()
+
+    def _open_db(self):
+        """打开SQLite数据库，失败时退化为纯内存缓存"""
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, "
+                "key TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache_entries)")}
+            if "updated_at" not in columns:
+                # 旧版本的表没有写入时间，已有条目视为最旧
+                self._conn.execute("ALTER TABLE cache_entries ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_updated ON cache_entries (namespace, updated_at)"
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning("⚠️ 缓存数据库不可用，仅使用内存缓存: %s", e)
+            self._conn = None
+            self.persist = False
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl if self.ttl > 0 else 0
+
+    @staticmethod
+    def _expired(expires_at: float) -> bool:
+        return expires_at > 0 and expires_at < time.time()
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        """写入内存层并执行LRU淘汰"""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if not self._expired(expires_at):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, expires_at FROM cache_entries "
+                        "WHERE namespace = ? AND key = ?",
+                        (self.namespace, key)
+                    ).fetchone()
+                    if row is not None:
+                        if not self._expired(row[1]):
+                            value = json.loads(row[0])
+                            self._remember(key, value, row[1])
+                            self.disk_hits += 1
+                            return value
+                        self._delete_from_db(key)
+                except Exception as e:
+                    logger.warning("⚠️ 读取缓存数据库失败: %s", e)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """写入缓存（内存和磁盘）"""
+        with self._lock:
+            expires_at = self._expires_at()
+            self._remember(key, value, expires_at)
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cache_entries "
+                        "(namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at, time.time())
+                    )
+                    self._conn.commit()
+                except Exception as e:
+                    logger.warning("⚠️ 写入缓存数据库失败: %s", e)
+                    return
+                self._writes += 1
+                if self._writes % MAINTENANCE_INTERVAL == 0:
+                    self._maintain()
+
+    def invalidate(self, key: str):
+        """删除单个缓存项"""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._delete_from_db(key)
+
+    def _delete_from_db(self, key: str):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning("⚠️ 删除缓存项失败: %s", e)
+
+    def clear(self):
+        """清空当前命名空间的所有缓存"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ?",
+                        (self.namespace,)
+                    )
+                    self._conn.commit()
+                except Exception as e:
+                    logger.warning("⚠️ 清空缓存失败: %s", e)
+
+    def purge_expired(self) -> int:
+        """清理磁盘上已过期的缓存项，返回删除数量"""
+        with self._lock:
+            if self._conn is None:
+                return 0
+            try:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? "
+                    "AND expires_at > 0 AND expires_at < ?",
+                    (self.namespace, time.time())
+                )
+                self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                logger.warning("⚠️ 清理过期缓存失败: %s", e)
+                return 0
+
+    def trim(self) -> int:
+        """磁盘层超过 max_disk_entries 条时删除最早写入的条目，返回删除数量"""
+        with self._lock:
+            if self._conn is None or self.max_disk_entries <= 0:
+                return 0
+            try:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                    "SELECT key FROM cache_entries WHERE namespace = ? "
+                    "ORDER BY updated_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.max_disk_entries)
+                )
+                self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                logger.warning("⚠️ 淘汰磁盘缓存失败: %s", e)
+                return 0
+
+    def _maintain(self):
+        """清理过期条目并限制磁盘层条数"""
+        purged, trimmed = self.purge_expired(), self.trim()
+        if purged or trimmed:
+            logger.debug("🧹 缓存 %s 清理过期 %s 条，淘汰 %s 条", self.namespace, purged, trimmed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+                "persistent": self._conn is not None
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
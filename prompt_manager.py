@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+系统提示词管理
+每次调用千问都要重新发送系统提示词，提示词越长预填充越慢、费用越高。这里按版本管理提示词：
+
+- v1: 完整版（config.SYSTEM_PROMPT_TEMPLATE）
+- v2: 精简版，保留全部地址规则和输出格式，token数约为完整版的40%（99 vs 248）
+
+PROMPT_VERSION 选择版本（默认 v1），切换版本后意图缓存自动失效。v2 需先用
+bench_prompt_variants.py --max-accuracy-drop 对真实模型验证准确率不下降，再改为默认。提示词按版本和城市固定生成，
+始终作为第一条消息原样发送，便于服务端按前缀命中隐式上下文缓存；
+PROMPT_CACHE=explicit 时，提示词达到显式缓存的最低长度后额外声明 cache_control。
+
+用法: python prompt_manager.py   # 打印各版本提示词与token数
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Tuple
+
+from config import DEFAULT_CITY, PROMPT_CACHE, PROMPT_VERSION, QWEN_MODEL, SYSTEM_PROMPT_TEMPLATE
+
+# 精简版：去掉角色说明、重复的示例和反例，规则逐条保留
+COMPACT_PROMPT_TEMPLATE = (
+    '提取导航请求的起点和终点，只输出JSON：{{"origin":"起点","destination":"终点","action":"navigation"}}\n'
+    '规则：没说起点用"当前位置"；地址写成"城市+区域+地点"，缺城市时在最前面加"{city}"，'
+    '如"{city}南山区学府路国兴苑"，不要写成"学府路国兴苑, {city}"；'
+    '无法解析输出{{"error":"无法解析导航请求"}}'
+)
+
+PROMPT_TEMPLATES = {
+    "v1": SYSTEM_PROMPT_TEMPLATE,
+    "v2": COMPACT_PROMPT_TEMPLATE,
+}
+
+# 百炼上下文缓存的最低提示词长度（token）：隐式缓存自动生效，显式缓存需要声明 cache_control
+IMPLICIT_CACHE_MIN_TOKENS = 256
+EXPLICIT_CACHE_MIN_TOKENS = 1024
+
+_CJK = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+_OTHER_TOKENS = re.compile(r'[A-Za-z]+|\d+|\S')
+
+
+class Prompt(NamedTuple):
+    version: str
+    text: str
+    tokens: int
+    exact: bool  # token数由千问分词器统计；False 时为估算值
+    digest: str
+
+    @property
+    def cacheable(self) -> bool:
+        """是否达到服务端隐式缓存的最低长度"""
+        return self.tokens >= IMPLICIT_CACHE_MIN_TOKENS
+
+
+def build_prompt(version: str = PROMPT_VERSION, city: str = DEFAULT_CITY) -> str:
+    """生成指定版本的系统提示词"""
+    if version not in PROMPT_TEMPLATES:
+        raise ValueError(f"未知的提示词版本: {version}，可选: {', '.join(PROMPT_TEMPLATES)}")
+    return PROMPT_TEMPLATES[version].format(city=city)
+
+
+@lru_cache(maxsize=None)
+def _tokenizer(model: str):
+    try:
+        from dashscope import get_tokenizer
+        return get_tokenizer(model)
+    except Exception:
+        # 本地分词需要 tiktoken（可选依赖），非千问模型也没有本地分词器
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（按千问分词器在本项目提示词上的统计校准）：
+    每个汉字或全角标点约0.8个，英文单词、数字串和其余符号约0.5个"""
+    cjk = len(_CJK.findall(text))
+    other = len(_OTHER_TOKENS.findall(_CJK.sub(' ', text)))
+    return round(cjk * 0.8 + other * 0.5)
+
+
+def count_tokens(text: str, model: str = QWEN_MODEL) -> Tuple[int, bool]:
+    """统计token数，返回 (数量, 是否为分词器精确统计)"""
+    tokenizer = _tokenizer(model)
+    if tokenizer is None:
+        return estimate_tokens(text), False
+    return len(tokenizer.encode(text)), True
+
+
+@lru_cache(maxsize=None)
+def get_prompt(version: str = PROMPT_VERSION, city: str = DEFAULT_CITY) -> Prompt:
+    """获取（并缓存）指定版本的提示词及其token数"""
+    text = build_prompt(version, city)
+    tokens, exact = count_tokens(text)
+    return Prompt(version, text, tokens, exact, hashlib.sha1(text.encode('utf-8')).hexdigest()[:8])
+
+
+def system_message(prompt: Prompt, cache: str = PROMPT_CACHE) -> Dict[str, Any]:
+    """系统消息；显式缓存模式下，足够长的提示词附带 cache_control"""
+    if cache == "explicit" and prompt.tokens >= EXPLICIT_CACHE_MIN_TOKENS:
+        return {"role": "system", "content": [
+            {"type": "text", "text": prompt.text, "cache_control": {"type": "ephemeral"}}
+        ]}
+    return {"role": "system", "content": prompt.text}
+
+
+def usage_tokens(usage) -> Dict[str, int]:
+    """从接口返回的 usage 中取输入token数与命中缓存的token数"""
+    if not usage:
+        return {}
+    details = usage.get("prompt_tokens_details") or {}
+    result = {"input_tokens": usage.get("input_tokens", 0)}
+    if details.get("cached_tokens"):
+        result["cached_tokens"] = details["cached_tokens"]
+    return result
+
+
+def main():
+    for version in PROMPT_TEMPLATES:
+        prompt = get_prompt(version)
+        unit = "tokens" if prompt.exact else "tokens (估算)"
+        marker = " ← 当前" if version == PROMPT_VERSION else ""
+        print(f"=== {version}: {prompt.tokens} {unit}, {len(prompt.text)} 字{marker} ===")
+        print(prompt.text.strip())
+        print()
+
+
+if __name__ == "__main__":
+    main()
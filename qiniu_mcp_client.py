@@ -1,9 +1,18 @@
+import asyncio
 import json
 import requests
 import webbrowser
 import urllib.parse
 import os
 from typing import Dict, Any, Optional, Tuple
+from http_session import get_http_session
+from async_utils import run_blocking
+from config import NAVIGATION_TIMEOUT
+from gazetteer import SOURCE_MCP, get_gazetteer
+from tracing import span, traced
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 class QiniuMCPClient:
     """基于七牛云高德MCP SERVER的导航客户端"""
@@ -16,6 +25,8 @@ class QiniuMCPClient:
         self.use_qiniu_mcp = os.getenv('USE_QINIU_MCP', 'true').lower() == 'true'
         
         # 请求配置
+        self.http = get_http_session()  # 共享连接池，复用TCP/TLS连接
+        self.gazetteer = get_gazetteer()
         self.timeout = 15  # 正常请求超时时间
         self.test_timeout = 5  # 测试连接超时时间
         self.headers = {
@@ -26,23 +37,23 @@ class QiniuMCPClient:
         # 打印配置信息（隐藏敏感信息）
         if self.openai_base_url and self.openai_api_key:
             masked_key = self.openai_api_key[:8] + '...' + self.openai_api_key[-4:] if len(self.openai_api_key) > 12 else '***'
-            print(f"🔧 七牛云MCP配置:")
-            print(f"   服务地址: {self.openai_base_url}")
-            print(f"   API密钥: {masked_key}")
-            print(f"   模型: {self.model}")
-            print(f"   启用状态: {self.use_qiniu_mcp}")
+            logger.debug("🔧 七牛云MCP配置:")
+            logger.debug("   服务地址: %s", self.openai_base_url)
+            logger.debug("   API密钥: %s", masked_key)
+            logger.debug("   模型: %s", self.model)
+            logger.debug("   启用状态: %s", self.use_qiniu_mcp)
         else:
-            print("⚠️ 七牛云MCP配置不完整")
+            logger.warning("⚠️ 七牛云MCP配置不完整")
     
     def test_mcp_connection(self) -> bool:
         """测试七牛云MCP SERVER连接"""
         try:
             if not self.openai_base_url or not self.openai_api_key:
-                print("❌ 未配置七牛云MCP SERVER环境变量")
-                print("   需要设置: OPENAI_BASE_URL 和 OPENAI_API_KEY")
+                logger.error("❌ 未配置七牛云MCP SERVER环境变量")
+                logger.info("   需要设置: OPENAI_BASE_URL 和 OPENAI_API_KEY")
                 return False
             
-            print("🔍 测试七牛云MCP SERVER连接...")
+            logger.info("🔍 测试七牛云MCP SERVER连接...")
             
             # 使用简单的连接测试
             test_payload = {
@@ -56,7 +67,7 @@ class QiniuMCPClient:
                 "max_tokens": 1  # 限制响应长度以加快测试
             }
             
-            response = requests.post(
+            response = self.http.post(
                 f"{self.openai_base_url}/v1/chat/completions",
                 headers=self.headers,
                 json=test_payload,
@@ -66,26 +77,33 @@ class QiniuMCPClient:
             if response.status_code == 200:
                 result = response.json()
                 if 'choices' in result and len(result['choices']) > 0:
-                    print("✅ 七牛云MCP SERVER连接成功")
+                    logger.info("✅ 七牛云MCP SERVER连接成功")
                     return True
                 else:
-                    print("❌ 七牛云MCP SERVER响应格式异常")
+                    logger.error("❌ 七牛云MCP SERVER响应格式异常")
                     return False
             else:
-                print(f"❌ 七牛云MCP SERVER响应异常: {response.status_code}")
-                print(f"   响应内容: {response.text}")
+                logger.error("❌ 七牛云MCP SERVER响应异常: %s", response.status_code)
+                logger.debug("   响应内容: %s", response.text)
                 return False
                 
         except Exception as e:
-            print(f"❌ 七牛云MCP SERVER连接失败: {e}")
+            logger.error("❌ 七牛云MCP SERVER连接失败: %s", e)
             return False
     
+    @traced("qiniu.coordinates")
     def get_coordinates_from_mcp(self, origin: str, destination: str) -> Tuple[Optional[str], Optional[str]]:
-        """通过七牛云MCP SERVER获取起点和终点坐标"""
+        """通过七牛云MCP SERVER获取起点和终点坐标（两者都在本地地名库中时不调用）"""
         try:
-            print(f"🌐 调用七牛云MCP SERVER获取坐标...")
-            print(f"   起点: {origin}")
-            print(f"   终点: {destination}")
+            origin_place = self.gazetteer.lookup(origin)
+            dest_place = self.gazetteer.lookup(destination)
+            if origin_place and dest_place:
+                logger.info("⚡ 起点和终点命中地名库，跳过MCP调用")
+                return origin_place.location, dest_place.location
+            
+            logger.info("🌐 调用七牛云MCP SERVER获取坐标...")
+            logger.debug("   起点: %s", origin)
+            logger.debug("   终点: %s", destination)
             
             # 构建请求内容
             content = f"从{origin}导航到{destination},给出源地址和目标地址的坐标"
@@ -101,7 +119,7 @@ class QiniuMCPClient:
             }
             
             # 发送请求到七牛云MCP SERVER
-            response = requests.post(
+            response = self.http.post(
                 f"{self.openai_base_url}/v1/chat/completions",
                 headers=self.headers,
                 json=payload,
@@ -109,15 +127,15 @@ class QiniuMCPClient:
             )
             
             if response.status_code != 200:
-                print(f"❌ MCP SERVER请求失败: {response.status_code}")
-                print(f"   响应内容: {response.text}")
+                logger.error("❌ MCP SERVER请求失败: %s", response.status_code)
+                logger.debug("   响应内容: %s", response.text)
                 return None, None
             
             result = response.json()
             
             # 解析响应
             if 'choices' not in result or len(result['choices']) == 0:
-                print("❌ MCP SERVER响应格式异常")
+                logger.error("❌ MCP SERVER响应格式异常")
                 return None, None
             
             choice = result['choices'][0]
@@ -126,13 +144,14 @@ class QiniuMCPClient:
             # 提取坐标信息
             origin_coords = None
             dest_coords = None
+            from_tools = set()  # 来自高德工具调用的坐标，可以记入地名库
             
             # 从tool_references中提取坐标
             if 'tool_references' in result:
-                print(f"   📋 找到 {len(result['tool_references'])} 个工具调用结果")
+                logger.debug("   📋 找到 %s 个工具调用结果", len(result['tool_references']))
                 for i, tool_ref in enumerate(result['tool_references']):
                     try:
-                        print(f"   🔍 解析工具调用 {i+1}...")
+                        logger.debug("   🔍 解析工具调用 %s...", i+1)
                         content_data = json.loads(tool_ref['content'])
                         if 'content' in content_data:
                             for content_item in content_data['content']:
@@ -144,24 +163,26 @@ class QiniuMCPClient:
                                             # 根据工具调用的顺序分配坐标
                                             if origin_coords is None:
                                                 origin_coords = location
-                                                print(f"   ✅ 起点坐标: {origin_coords}")
+                                                from_tools.add('origin')
+                                                logger.debug("   ✅ 起点坐标: %s", origin_coords)
                                             elif dest_coords is None:
                                                 dest_coords = location
-                                                print(f"   ✅ 终点坐标: {dest_coords}")
+                                                from_tools.add('destination')
+                                                logger.debug("   ✅ 终点坐标: %s", dest_coords)
                                         else:
-                                            print(f"   ⚠️ 工具调用 {i+1} 未返回location字段")
+                                            logger.debug("   ⚠️ 工具调用 %s 未返回location字段", i+1)
                                     else:
-                                        print(f"   ⚠️ 工具调用 {i+1} 未返回有效的return数据")
+                                        logger.debug("   ⚠️ 工具调用 %s 未返回有效的return数据", i+1)
                     except (json.JSONDecodeError, KeyError) as e:
-                        print(f"   ⚠️ 解析工具结果 {i+1} 时出错: {e}")
+                        logger.debug("   ⚠️ 解析工具结果 %s 时出错: %s", i+1, e)
                         # 打印原始数据用于调试
-                        print(f"   📄 原始数据: {tool_ref.get('content', 'N/A')[:200]}...")
+                        logger.debug("   📄 原始数据: %s...", tool_ref.get('content', 'N/A')[:200])
                         continue
             
             # 如果没有从tool_references获取到坐标，尝试从消息内容中提取
             if not origin_coords or not dest_coords:
                 content_text = message.get('content', '')
-                print(f"   📝 MCP响应内容: {content_text}")
+                logger.debug("   📝 MCP响应内容: %s", content_text)
                 
                 # 使用多种正则表达式模式提取坐标
                 import re
@@ -187,47 +208,66 @@ class QiniuMCPClient:
                 if not coords and len(lngs) >= 2 and len(lats) >= 2:
                     coords = [f"{lngs[0]},{lats[0]}", f"{lngs[1]},{lats[1]}"]
                 
-                print(f"   🔍 提取到 {len(coords)} 个坐标: {coords}")
+                logger.debug("   🔍 提取到 %s 个坐标: %s", len(coords), coords)
                 
                 if len(coords) >= 2:
                     if not origin_coords:
                         origin_coords = coords[0]
-                        print(f"   ✅ 从内容提取起点坐标: {origin_coords}")
+                        logger.debug("   ✅ 从内容提取起点坐标: %s", origin_coords)
                     if not dest_coords:
                         dest_coords = coords[1]
-                        print(f"   ✅ 从内容提取终点坐标: {dest_coords}")
+                        logger.debug("   ✅ 从内容提取终点坐标: %s", dest_coords)
                 elif len(coords) == 1:
                     if not origin_coords:
                         origin_coords = coords[0]
-                        print(f"   ✅ 从内容提取起点坐标: {origin_coords}")
+                        logger.debug("   ✅ 从内容提取起点坐标: %s", origin_coords)
                     elif not dest_coords:
                         dest_coords = coords[0]
-                        print(f"   ✅ 从内容提取终点坐标: {dest_coords}")
+                        logger.debug("   ✅ 从内容提取终点坐标: %s", dest_coords)
                 else:
-                    print(f"   ⚠️ 未能从响应内容中提取坐标")
+                    logger.debug("   ⚠️ 未能从响应内容中提取坐标")
+            
+            # 地名库中的地点以本地坐标为准
+            if origin_place:
+                origin_coords = origin_place.location
+            if dest_place:
+                dest_coords = dest_place.location
             
             if origin_coords and dest_coords:
-                print("✅ 成功获取坐标信息")
+                logger.info("✅ 成功获取坐标信息")
+                # 从回复文字中提取的坐标可能张冠李戴，只记录工具调用返回的结果
+                for key, address, place, coords in (('origin', origin, origin_place, origin_coords),
+                                                    ('destination', destination, dest_place, dest_coords)):
+                    if key in from_tools and not place:
+                        self._remember_place(address, coords)
                 return origin_coords, dest_coords
             else:
-                print("❌ 未能获取完整的坐标信息")
+                logger.error("❌ 未能获取完整的坐标信息")
                 return None, None
                 
         except requests.exceptions.Timeout:
-            print("❌ MCP SERVER请求超时")
+            logger.error("❌ MCP SERVER请求超时")
             return None, None
         except requests.exceptions.RequestException as e:
-            print(f"❌ MCP SERVER网络请求错误: {e}")
+            logger.error("❌ MCP SERVER网络请求错误: %s", e)
             return None, None
         except Exception as e:
-            print(f"❌ MCP SERVER调用异常: {e}")
+            logger.error("❌ MCP SERVER调用异常: %s", e)
             return None, None
     
+    def _remember_place(self, address: str, location: str):
+        """把MCP返回的 "经度,纬度" 记入地名库"""
+        try:
+            lng, lat = map(float, location.split(','))
+        except ValueError:
+            return
+        self.gazetteer.add(address, lng, lat, source=SOURCE_MCP)
+    
     def build_amap_navigation_url(self, origin_coords: str, dest_coords: str, 
                                  origin_name: str = "", dest_name: str = "") -> str:
         """构建高德地图导航URL"""
         try:
-            print("🔗 构建高德地图导航URL...")
+            logger.debug("🔗 构建高德地图导航URL...")
             
             # 高德地图导航URL基础地址
             base_url = "https://uri.amap.com/navigation"
@@ -253,32 +293,41 @@ class QiniuMCPClient:
             # 构建完整URL
             url = f"{base_url}?" + urllib.parse.urlencode(params, encoding='utf-8')
             
-            print(f"   📍 起点坐标: {origin_coords}")
-            print(f"   📍 终点坐标: {dest_coords}")
-            print(f"   🔗 导航URL: {url}")
+            logger.debug("   📍 起点坐标: %s", origin_coords)
+            logger.debug("   📍 终点坐标: %s", dest_coords)
+            logger.debug("   🔗 导航URL: %s", url)
             
             return url
             
         except Exception as e:
-            print(f"❌ 构建导航URL失败: {e}")
+            logger.error("❌ 构建导航URL失败: %s", e)
             # 回退到简单搜索URL
             if dest_name:
                 fallback_url = f"https://ditu.amap.com/search?query={urllib.parse.quote(dest_name)}"
-                print(f"   🔄 使用回退URL: {fallback_url}")
+                logger.debug("   🔄 使用回退URL: %s", fallback_url)
                 return fallback_url
             return ""
     
-    def navigate_to_destination(self, origin: str, destination: str) -> Tuple[bool, str]:
-        """执行导航功能"""
+    @traced("qiniu.navigate")
+    def navigate_to_destination(self, origin: str, destination: str,
+                                coords: Optional[Tuple[Optional[str], Optional[str]]] = None) -> Tuple[bool, str]:
+        """执行导航功能
+        
+        coords: 预先获取的 (起点坐标, 终点坐标)，完整时跳过MCP调用
+        """
         try:
-            print(f"🗺️ 开始导航: {origin} -> {destination}")
+            logger.info("🗺️ 开始导航: %s -> %s", origin, destination)
             
             # 1. 通过七牛云MCP SERVER获取坐标
-            origin_coords, dest_coords = self.get_coordinates_from_mcp(origin, destination)
+            if coords and coords[0] and coords[1]:
+                logger.info("⚡ 使用预先获取的坐标")
+                origin_coords, dest_coords = coords
+            else:
+                origin_coords, dest_coords = self.get_coordinates_from_mcp(origin, destination)
             
             if not origin_coords or not dest_coords:
                 error_msg = "无法获取地址坐标，请检查地址是否正确"
-                print(f"❌ {error_msg}")
+                logger.error("❌ %s", error_msg)
                 return False, error_msg
             
             # 2. 构建高德地图导航URL
@@ -288,31 +337,52 @@ class QiniuMCPClient:
             
             if not nav_url:
                 error_msg = "构建导航URL失败"
-                print(f"❌ {error_msg}")
+                logger.error("❌ %s", error_msg)
                 return False, error_msg
             
             # 3. 打开浏览器进行导航
-            print("🌐 打开浏览器导航...")
-            success = webbrowser.open(nav_url)
+            logger.info("🌐 打开浏览器导航...")
+            with span("browser.open"):
+                success = webbrowser.open(nav_url)
             
             if success:
                 success_msg = f"导航成功启动，从 {origin}({origin_coords}) 到 {destination}({dest_coords})"
-                print(f"✅ {success_msg}")
+                logger.info("✅ %s", success_msg)
                 return True, success_msg
             else:
                 error_msg = "无法打开浏览器"
-                print(f"❌ {error_msg}")
+                logger.error("❌ %s", error_msg)
                 return False, error_msg
                 
         except Exception as e:
             error_msg = f"导航执行失败: {e}"
-            print(f"❌ {error_msg}")
+            logger.error("❌ %s", error_msg)
+            return False, error_msg
+    
+    async def get_coordinates_from_mcp_async(self, origin: str, destination: str,
+                                             timeout: float = NAVIGATION_TIMEOUT) -> Tuple[Optional[str], Optional[str]]:
+        """异步获取起点和终点坐标"""
+        try:
+            return await run_blocking(self.get_coordinates_from_mcp, origin, destination, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error("❌ MCP SERVER请求超过 %s 秒", timeout)
+            return None, None
+    
+    async def navigate_to_destination_async(self, origin: str, destination: str,
+                                            coords: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                                            timeout: float = NAVIGATION_TIMEOUT) -> Tuple[bool, str]:
+        """异步执行导航，不阻塞事件循环"""
+        try:
+            return await run_blocking(self.navigate_to_destination, origin, destination, coords, timeout=timeout)
+        except asyncio.TimeoutError:
+            error_msg = f"导航执行超时 ({timeout}秒)"
+            logger.error("❌ %s", error_msg)
             return False, error_msg
     
     def search_location(self, address: str) -> Tuple[bool, str]:
         """搜索地址位置"""
         try:
-            print(f"🔍 搜索地址: {address}")
+            logger.info("🔍 搜索地址: %s", address)
             
             # 通过MCP SERVER获取地址坐标
             coords, _ = self.get_coordinates_from_mcp(address, address)
@@ -321,25 +391,25 @@ class QiniuMCPClient:
                 # 构建高德地图标记URL
                 marker_url = f"https://uri.amap.com/marker?position={coords}&name={urllib.parse.quote(address)}"
                 
-                print(f"🌐 打开地址搜索结果...")
+                logger.info("🌐 打开地址搜索结果...")
                 success = webbrowser.open(marker_url)
                 
                 if success:
                     success_msg = f"地址搜索成功: {address}({coords})"
-                    print(f"✅ {success_msg}")
+                    logger.info("✅ %s", success_msg)
                     return True, success_msg
                 else:
                     error_msg = "无法打开浏览器"
-                    print(f"❌ {error_msg}")
+                    logger.error("❌ %s", error_msg)
                     return False, error_msg
             else:
                 error_msg = f"未找到地址: {address}"
-                print(f"❌ {error_msg}")
+                logger.error("❌ %s", error_msg)
                 return False, error_msg
                 
         except Exception as e:
             error_msg = f"地址搜索失败: {e}"
-            print(f"❌ {error_msg}")
+            logger.error("❌ %s", error_msg)
             return False, error_msg
     
     def get_client_info(self) -> Dict[str, Any]:
@@ -349,7 +419,7 @@ class QiniuMCPClient:
         try:
             mcp_available = self.test_mcp_connection()
         except Exception as e:
-            print(f"⚠️ 测试MCP连接时出错: {e}")
+            logger.warning("⚠️ 测试MCP连接时出错: %s", e)
         
         return {
             "mcp_available": mcp_available,
@@ -17,6 +17,7 @@ setup(
         "pyaudio>=0.2.11",
         "urllib3>=2.0.0",
         "websocket-client>=1.0.0",
+        "numpy>=1.22.0",
     ],
     python_requires=">=3.8",
     classifiers=[
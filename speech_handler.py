@@ -1,30 +1,75 @@
+import asyncio
 import speech_recognition as sr
 import threading
-from config import SPEECH_RECOGNITION_LANGUAGE, SPEECH_TIMEOUT, USE_XFYUN_ASR
-from xfyun_asr import XfyunASR
+import time
+from concurrent.futures import ThreadPoolExecutor
+from async_utils import run_blocking
+from config import (
+    SPEECH_RECOGNITION_LANGUAGE, SPEECH_TIMEOUT, USE_XFYUN_ASR, TTS_TIMEOUT, LOCAL_KWS_ENABLED,
+    LOCAL_KWS_HANGOVER_MS, AUDIO_PREROLL_MS, ASR_MODE, GOOGLE_MIN_CONFIDENCE
+)
+from xfyun_asr import XfyunASR, RESULT_TIMEOUT
+from audio_capture import get_audio_capture, CaptureSource, BYTES_PER_SECOND
+from local_kws import LocalKeywordRecognizer, MAX_UTTERANCE_MS
+from vad import capture_utterance
+from asr_race import race, xfyun_recognizer, google_recognizer
 from tts_engine import TTSEngine
+from tracing import traced
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 本地识别不确定后，剩余时间不足此值（秒）就不再启动云端识别
+MIN_CLOUD_CONFIRM_SECONDS = 1.0
+
+
+def _init_tts_thread():
+    """TTS线程初始化：SAPI等COM组件需要在所属线程中初始化"""
+    try:
+        import pythoncom
+        pythoncom.CoInitialize()
+    except ImportError:
+        pass
+
 
 class SpeechHandler:
     def __init__(self):
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
         
         # 使用优化后的TTS引擎
         self.tts_engine = TTSEngine()
+        # 异步播报固定在单个线程执行，保证TTS引擎实例始终在同一线程使用
+        self.tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts",
+                                               initializer=_init_tts_thread)
         
         # 初始化科大讯飞ASR
         self.xfyun_asr = XfyunASR() if USE_XFYUN_ASR else None
         self.use_xfyun = USE_XFYUN_ASR
         
+        # 常驻录音：整个进程只打开一次麦克风，所有识别器从同一缓冲区读取
+        self.audio_capture = get_audio_capture()
+        self.audio_capture.start()
+        self.microphone = CaptureSource(self.audio_capture, preroll_ms=AUDIO_PREROLL_MS)
+        
+        # 本地确认词识别（需先用 python local_kws.py enroll 录制模板）
+        self.local_kws = None
+        if LOCAL_KWS_ENABLED and self.audio_capture:
+            self.local_kws = LocalKeywordRecognizer()
+            if self.local_kws.ready:
+                logger.info("🗣️ 本地确认词识别已启用 (%s 条模板)", len(self.local_kws.templates))
+        
         # 调整麦克风（仅在使用Google ASR时需要）
         if not self.use_xfyun:
             with self.microphone as source:
                 self.recognizer.adjust_for_ambient_noise(source)
         
-        print(f"🔊 {self.tts_engine.get_engine_info()}")
+        logger.info("🔊 %s", self.tts_engine.get_engine_info())
     
+    @traced("speech.listen")
     def listen_for_speech(self):
         """监听语音输入"""
+        if ASR_MODE == "race" and self.use_xfyun and self.xfyun_asr and self.audio_capture:
+            return self._listen_with_race()
         if self.use_xfyun and self.xfyun_asr:
             result = self._listen_with_xfyun()
             # 如果返回的是元组（包含触发原因），直接返回
@@ -36,88 +81,162 @@ class SpeechHandler:
             result = self._listen_with_google()
             return result, "google" if result else "no_speech"
     
+    def prewarm_recognition(self, session_type="command"):
+        """播报提示语之前预热科大讯飞连接，播报结束即可直接开始识别"""
+        if self.use_xfyun and self.xfyun_asr:
+            self.xfyun_asr.prewarm(session_type)
+    
+    @traced("speech.confirm")
+    def listen_for_confirmation(self, max_wait_time=6):
+        """语音确认：先用本地确认词识别，不确定时再交给科大讯飞
+        
+        max_wait_time 是本地识别和云端识别合计的时间预算：云端只使用本地识别后剩余的时间，
+        不会超出调用方的等待期限而在后台继续占用录音。
+        返回 (文本, 触发原因)，本地识别成功时原因为 "local_kws"
+        """
+        deadline = time.monotonic() + max_wait_time
+        if self.local_kws and self.local_kws.ready:
+            reader = self.audio_capture.open_reader(AUDIO_PREROLL_MS)
+            try:
+                pcm, speech_start = capture_utterance(reader, timeout=max_wait_time, deadline=deadline,
+                                                      hangover_ms=LOCAL_KWS_HANGOVER_MS, max_ms=MAX_UTTERANCE_MS)
+            finally:
+                reader.close()
+            if not pcm:
+                logger.info("🔇 未检测到确认语音")
+                return None, "no_speech"
+            
+            result = self.local_kws.recognize(pcm)
+            if result.confident:
+                logger.info("🗣️ 本地识别: %s (%.0fms)", result.phrase, result.elapsed_ms)
+                return result.phrase, "local_kws"
+            
+            logger.info("🤔 本地识别不确定 (%s, 区分度 %.2f)，交给云端识别...", result.phrase, result.margin)
+            if not (self.use_xfyun and self.xfyun_asr):
+                return None, "no_speech"
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_CLOUD_CONFIRM_SECONDS:
+                logger.info("⏰ 确认时间已用完，不再启动云端识别")
+                return None, "timeout"
+            # 从短语开头重新送入云端识别，用户无需重复
+            behind_ms = (self.audio_capture.ring.written - speech_start) * 1000 / BYTES_PER_SECOND
+            return self.xfyun_asr.recognize_speech_with_smart_trigger(
+                max_wait_time=remaining, session_type="confirm", preroll_ms=behind_ms + 100
+            )
+        
+        if self.use_xfyun and self.xfyun_asr:
+            return self.xfyun_asr.recognize_speech_with_smart_trigger(
+                max_wait_time=max_wait_time, session_type="confirm"
+            )
+        return None, "no_xfyun"
+    
+    def _listen_with_race(self, max_wait_time=12):
+        """科大讯飞与Google同时识别同一段录音，先给出可信结果者胜出"""
+        logger.info("使用并行语音识别（科大讯飞 + Google）...")
+        result = race([
+            ("xfyun", xfyun_recognizer(self.xfyun_asr, max_wait_time)),
+            ("google", google_recognizer(self.recognizer, self.audio_capture, SPEECH_RECOGNITION_LANGUAGE,
+                                         max_wait_time, AUDIO_PREROLL_MS, GOOGLE_MIN_CONFIDENCE)),
+        ], timeout=max_wait_time + RESULT_TIMEOUT + 2)
+        
+        if result is None:
+            logger.info("🔇 未识别到语音内容")
+            return None, "no_speech"
+        logger.info("✅ 识别结果: %s (%s)", result.text, result.source)
+        return result.text, result.reason
+    
     def _listen_with_xfyun(self):
         """使用科大讯飞语音识别"""
         try:
-            print("使用科大讯飞智能语音识别...")
+            logger.info("使用科大讯飞智能语音识别...")
             text, trigger_reason = self.xfyun_asr.recognize_speech_with_smart_trigger()
             
             if trigger_reason == "keyword":
-                print("🎯 关键词触发模式")
+                logger.info("🎯 关键词触发模式")
             elif trigger_reason == "timeout":
-                print("⏰ 超时自动触发模式")
+                logger.info("⏰ 超时自动触发模式")
             elif trigger_reason == "error":
-                print("❌ 识别出错，切换到Google语音识别...")
+                logger.error("❌ 识别出错，切换到Google语音识别...")
                 return self._listen_with_google()
             
             if text and len(text.strip()) > 0:
-                print(f"✅ 识别结果: {text}")
+                logger.info("✅ 识别结果: %s", text)
                 return text, trigger_reason
             else:
-                print("🔇 未识别到语音内容，切换到Google语音识别...")
+                logger.info("🔇 未识别到语音内容，切换到Google语音识别...")
                 google_result = self._listen_with_google()
                 return google_result, "google_fallback" if google_result else "no_speech"
                 
         except Exception as e:
-            print(f"科大讯飞语音识别错误: {e}")
-            print("自动切换到Google语音识别...")
+            logger.error("科大讯飞语音识别错误: %s", e)
+            logger.info("自动切换到Google语音识别...")
             google_result = self._listen_with_google()
             return google_result, "google_fallback" if google_result else "error"
     
     def _listen_with_google(self):
         """使用Google语音识别（备选方案）"""
         try:
-            print("🎤 Google语音识别，请说话...")
+            logger.info("🎤 Google语音识别，请说话...")
             with self.microphone as source:
                 # 监听语音，增加超时时间用于确认
                 audio = self.recognizer.listen(source, timeout=8, phrase_time_limit=10)
             
-            print("正在识别...")
+            logger.debug("正在识别...")
             # 使用Google语音识别
             text = self.recognizer.recognize_google(audio, language=SPEECH_RECOGNITION_LANGUAGE)
-            print(f"✅ Google识别结果: {text}")
+            logger.info("✅ Google识别结果: %s", text)
             return text
             
         except sr.WaitTimeoutError:
-            print("⏰ Google语音输入超时")
+            logger.info("⏰ Google语音输入超时")
             return None
         except sr.UnknownValueError:
-            print("🔇 Google无法识别语音")
+            logger.info("🔇 Google无法识别语音")
             return None
         except sr.RequestError as e:
-            print(f"❌ Google语音识别服务错误: {e}")
+            logger.error("❌ Google语音识别服务错误: %s", e)
             return None
     
+    @traced("tts.speak")
     def speak(self, text):
         """文字转语音 - 使用优化的多引擎TTS"""
         try:
             success = self.tts_engine.speak(text)
             if success:
-                print("✅ 播报完成")
-                # 短暂延迟确保播报完成
-                import time
-                time.sleep(0.1)
+                logger.debug("✅ 播报完成")
             else:
-                print("❌ 播报失败")
+                logger.error("❌ 播报失败")
                 # 尝试切换引擎重试
-                print("🔄 尝试切换引擎重试...")
+                logger.info("🔄 尝试切换引擎重试...")
                 if self.tts_engine.switch_engine():
                     success = self.tts_engine.speak(text)
                     if success:
-                        print("✅ 切换引擎后播报成功")
+                        logger.info("✅ 切换引擎后播报成功")
                     else:
-                        print(f"📢 所有引擎失败，控制台输出: {text}")
+                        logger.warning("📢 所有引擎失败，控制台输出: %s", text)
                 else:
-                    print(f"📢 无可用引擎，控制台输出: {text}")
+                    logger.warning("📢 无可用引擎，控制台输出: %s", text)
         except Exception as e:
-            print(f"❌ 语音播报异常: {e}")
+            logger.error("❌ 语音播报异常: %s", e)
             # 备选方案：控制台输出
-            print(f"📢 播报内容: {text}")
+            logger.warning("📢 播报内容: %s", text)
+        finally:
+            # 预录窗口不早于播报结束，避免把扬声器里的提示音送去识别
+            if getattr(self, 'audio_capture', None):
+                self.audio_capture.mark()
     
 
     
 
     
+    async def speak_async(self, text, timeout=TTS_TIMEOUT):
+        """异步文字转语音，播报期间事件循环可以继续处理其他阶段"""
+        try:
+            await run_blocking(self.speak, text, timeout=timeout, executor=self.tts_executor)
+        except asyncio.TimeoutError:
+            logger.warning("⏰ 语音播报超过 %s 秒", timeout)
+            logger.warning("📢 播报内容: %s", text)
+    
     def test_microphone(self):
         """测试麦克风是否可用"""
         try:
@@ -125,68 +244,73 @@ class SpeechHandler:
                 # 测试科大讯飞API连接
                 success, message = self.xfyun_asr.test_connection()
                 if success:
-                    print("科大讯飞语音识别API连接正常")
+                    logger.info("科大讯飞语音识别API连接正常")
                     return True
                 else:
-                    print(f"科大讯飞API测试失败: {message}")
-                    print("将使用Google语音识别作为备选")
+                    logger.error("科大讯飞API测试失败: %s", message)
+                    logger.info("将使用Google语音识别作为备选")
                     self.use_xfyun = False
             
             # 测试Google语音识别的麦克风
             with self.microphone as source:
-                print("测试麦克风...")
+                logger.debug("测试麦克风...")
                 self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            print("麦克风测试成功")
+            logger.info("麦克风测试成功")
             return True
             
         except Exception as e:
-            print(f"麦克风测试失败: {e}")
+            logger.error("麦克风测试失败: %s", e)
             return False
     
     def test_tts(self):
         """测试TTS引擎"""
         try:
-            print("=== TTS引擎测试 ===")
-            print(f"{self.tts_engine.get_engine_info()}")
+            logger.info("=== TTS引擎测试 ===")
+            logger.info("%s", self.tts_engine.get_engine_info())
             
             # 获取可用引擎
             available = self.tts_engine.get_available_engines()
-            print(f"📋 可用引擎: {available}")
+            logger.info("📋 可用引擎: %s", available)
             
             # 测试播报
             test_success = self.tts_engine.speak("TTS引擎测试成功")
             if test_success:
-                print("✅ TTS引擎测试通过")
+                logger.info("✅ TTS引擎测试通过")
                 return True
             else:
-                print("❌ TTS引擎测试失败")
+                logger.error("❌ TTS引擎测试失败")
                 return False
                 
         except Exception as e:
-            print(f"❌ TTS测试异常: {e}")
+            logger.error("❌ TTS测试异常: %s", e)
             return False
     
     def switch_tts_engine(self, engine_name: str = None):
         """切换TTS引擎"""
         try:
             if self.tts_engine.switch_engine(engine_name):
-                print(f"✅ TTS引擎切换成功")
+                logger.info("✅ TTS引擎切换成功")
                 return True
             else:
-                print(f"❌ TTS引擎切换失败")
+                logger.error("❌ TTS引擎切换失败")
                 return False
         except Exception as e:
-            print(f"❌ 切换TTS引擎异常: {e}")
+            logger.error("❌ 切换TTS引擎异常: %s", e)
             return False
     
     def cleanup(self):
         """清理资源"""
         try:
+            if hasattr(self, 'tts_executor') and self.tts_executor:
+                self.tts_executor.shutdown(wait=False)
+            if getattr(self, 'xfyun_asr', None):
+                self.xfyun_asr.connection_pool.close_all()
+            # 常驻录音是进程内共享的，由主程序退出时统一停止（stop_audio_capture）
             if hasattr(self, 'tts_engine') and self.tts_engine:
                 self.tts_engine.cleanup()
-                print("🧹 SpeechHandler资源清理完成")
+                logger.info("🧹 SpeechHandler资源清理完成")
         except Exception as e:
-            print(f"⚠️ SpeechHandler清理资源时出错: {e}")
+            logger.warning("⚠️ SpeechHandler清理资源时出错: %s", e)
     
     def __del__(self):
         """析构函数"""
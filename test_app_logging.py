@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试结构化异步日志
+"""
+
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+
+from app_logging import JsonFormatter, NonBlockingQueueHandler, get_logger, setup_logging, shutdown_logging
+
+
+def test_levels_and_structured_file():
+    """测试按级别过滤，并把 extra 字段写入JSON行文件"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "app.log")
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            setup_logging(level="INFO", log_file=path)
+            logger = get_logger("test.levels")
+            logger.debug("当前识别结果: %s", "不应输出")
+            logger.info("✅ 识别结果: %s", "去机场", extra={"source": "xfyun", "elapsed_ms": 812})
+            shutdown_logging()
+            console = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+            setup_logging()
+
+        assert console == "✅ 识别结果: 去机场\n"  # 控制台输出与原来的 print 一致
+        with open(path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        assert len(entries) == 1
+        entry = entries[0]
+        assert entry["level"] == "INFO" and entry["logger"] == "test.levels"
+        assert entry["msg"] == "✅ 识别结果: 去机场"
+        assert entry["source"] == "xfyun" and entry["elapsed_ms"] == 812
+
+
+def test_full_queue_never_blocks():
+    """测试队列满时丢弃日志并计数，调用线程不等待"""
+    handler = NonBlockingQueueHandler(queue.Queue(2))
+    logger = logging.getLogger("test.full_queue")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        done = threading.Event()
+
+        def flood():
+            for i in range(100):
+                logger.warning("frame %d", i)
+            done.set()
+
+        threading.Thread(target=flood, daemon=True).start()
+        assert done.wait(2), "日志调用被阻塞"
+        assert handler.queue.qsize() == 2 and handler.dropped == 98
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_json_formatter_lazy_args():
+    """测试参数只在输出时格式化"""
+    calls = []
+
+    class Expensive:
+        def __str__(self):
+            calls.append(1)
+            return "拼接后的文本"
+
+    logger = logging.getLogger("test.lazy")
+    logger.setLevel(logging.INFO)
+    logger.debug("当前识别结果: %s", Expensive())
+    assert calls == []
+
+    record = logger.makeRecord("test.lazy", logging.INFO, __file__, 1, "结果: %s", (Expensive(),), None)
+    assert json.loads(JsonFormatter().format(record))["msg"] == "结果: 拼接后的文本"
+    assert calls == [1]
+
+
+if __name__ == "__main__":
+    print("=== 结构化日志测试 ===")
+    for test in [test_levels_and_structured_file, test_full_queue_never_blocks, test_json_formatter_lazy_args]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
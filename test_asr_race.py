@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试并行语音识别
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from asr_race import RaceResult, google_recognizer, race, xfyun_recognizer
+from audio_capture import AudioReader, AudioRingBuffer
+
+
+def make_recognizer(name, delay, text, confident, log=None):
+    def run(stop):
+        stopped = stop.wait(delay)
+        if log is not None:
+            log.append((name, stopped))
+        if stopped:
+            return RaceResult(None, name, "cancelled", False)
+        return RaceResult(text, name, name, confident)
+    return run
+
+
+def test_first_confident_wins():
+    """测试先给出可信结果的识别器胜出，其余被停止"""
+    log = []
+    start = time.monotonic()
+    result = race([
+        ("slow", make_recognizer("slow", 2.0, "慢", True, log)),
+        ("fast", make_recognizer("fast", 0.05, "快", True, log)),
+    ], timeout=5)
+    assert result.source == "fast"
+    assert time.monotonic() - start < 1.0
+
+    time.sleep(0.05)
+    assert ("slow", True) in log  # 落后的识别器收到停止信号
+
+
+def test_unconfident_fallback_by_order():
+    """测试没有可信结果时按优先级取非空结果"""
+    result = race([
+        ("xfyun", make_recognizer("xfyun", 0.1, "从北京到上海", False)),
+        ("google", make_recognizer("google", 0.01, "从北京到上", False)),
+    ], timeout=5)
+    assert result.source == "xfyun"
+
+    assert race([("empty", make_recognizer("empty", 0.01, None, False))], timeout=5) is None
+
+
+def test_failed_recognizer_ignored():
+    """测试识别器异常不影响其他识别器"""
+    def broken(stop):
+        raise RuntimeError("network down")
+
+    result = race([("broken", broken), ("ok", make_recognizer("ok", 0.05, "好的", True))], timeout=5)
+    assert result.text == "好的"
+
+
+def test_overall_deadline():
+    """测试超时是整场竞速的截止时间，不因陆续返回的结果而重新计时"""
+    start = time.monotonic()
+    result = race([
+        ("first", make_recognizer("first", 0.3, "第一", False)),
+        ("second", make_recognizer("second", 0.6, "第二", False)),
+        ("slow", make_recognizer("slow", 2.0, "慢", True)),
+    ], timeout=0.5)
+    assert result.source == "first"
+    assert time.monotonic() - start < 0.8
+
+
+class FakeXfyun:
+    """记录 cancel 调用的讯飞识别器替身"""
+
+    def __init__(self, delay, text):
+        self.delay = delay
+        self.text = text
+        self.final_received = True
+        self.cancelled = 0
+        self._cancel = threading.Event()
+
+    def recognize_speech_with_smart_trigger(self, max_wait_time, session_type):
+        if self._cancel.wait(self.delay):
+            return "", "timeout"
+        return self.text, "keyword"
+
+    def cancel(self):
+        self.cancelled += 1
+        self._cancel.set()
+
+
+def test_xfyun_cancelled_only_when_losing():
+    """测试讯飞胜出时不取消会话，落败时才中止"""
+    winner = FakeXfyun(0.05, "确认")
+    result = race([("xfyun", xfyun_recognizer(winner, 1))], timeout=1)
+    time.sleep(0.05)
+    assert result.source == "xfyun" and winner.cancelled == 0
+
+    loser = FakeXfyun(2.0, "确认")
+    result = race([("xfyun", xfyun_recognizer(loser, 3)),
+                   ("google", make_recognizer("google", 0.05, "好的", True))], timeout=3)
+    time.sleep(0.05)
+    assert result.source == "google" and loser.cancelled == 1
+
+
+class FakeCapture:
+    def __init__(self, ring):
+        self.ring = ring
+
+    def open_reader(self, preroll_ms=0):
+        return AudioReader(self.ring, 0)
+
+
+class FakeGoogle:
+    def __init__(self, response):
+        self.response = response
+        self.audio = None
+
+    def recognize_google(self, audio, language=None, show_all=False):
+        self.audio = audio
+        return self.response
+
+
+def test_google_uses_shared_capture():
+    """测试Google识别器从共享录音截取语音并按置信度判断"""
+    rng = np.random.default_rng(0)
+    t = np.arange(16000) / 16000
+    speech = (np.sin(2 * np.pi * 180 * t) * 6000).astype(np.int16).tobytes()
+    noise = lambda seconds: rng.normal(0, 60, int(seconds * 16000)).astype(np.int16).tobytes()
+
+    ring = AudioRingBuffer(16000 * 2 * 10)
+    ring.write(noise(0.5) + speech + noise(1.5))
+
+    google = FakeGoogle({"alternative": [{"transcript": "去机场", "confidence": 0.92}]})
+    result = google_recognizer(google, FakeCapture(ring), "zh-CN", 3, 0, 0.6)(threading.Event())
+    assert result == RaceResult("去机场", "google", "google", True)
+    assert google.audio.sample_rate == 16000 and 0.9 < len(google.audio.frame_data) / 32000 < 1.3
+
+    google = FakeGoogle({"alternative": [{"transcript": "去几场", "confidence": 0.3}]})
+    result = google_recognizer(google, FakeCapture(ring), "zh-CN", 3, 0, 0.6)(threading.Event())
+    assert not result.confident
+
+
+if __name__ == "__main__":
+    print("=== 并行语音识别测试 ===")
+    for test in [test_first_confident_wins, test_unconfident_fallback_by_order,
+                 test_failed_recognizer_ignored, test_overall_deadline, test_xfyun_cancelled_only_when_losing,
+                 test_google_uses_shared_capture]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
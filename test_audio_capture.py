@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试常驻录音环形缓冲区与预录窗口
+"""
+
+import os
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+import speech_recognition as sr
+
+from audio_capture import (
+    AudioCapture, AudioReader, AudioRecorder, AudioRingBuffer, CaptureSource, ReplaySource, ms_to_bytes
+)
+
+
+def test_ring_wraparound():
+    """测试环形缓冲区回绕写入与读取"""
+    ring = AudioRingBuffer(10)
+    ring.write(b"abcdef")
+    ring.write(b"ghijkl")  # 回绕，覆盖最早的 ab
+    assert ring.written == 12
+    assert ring.oldest_position() == 2
+
+    data, start = ring.read_at(2, 10, timeout=0)
+    assert data == b"cdefghijkl" and start == 2
+
+
+def test_reader_overrun():
+    """测试读取者落后超过容量时跳到最早数据"""
+    ring = AudioRingBuffer(8)
+    reader = AudioReader(ring, 0)
+    ring.write(b"0123456789ab")
+    assert reader.read(4, timeout=0) == b"4567"
+    assert reader.overruns == 1
+    assert reader.read(4, timeout=0) == b"89ab"
+
+
+def test_blocking_read():
+    """测试数据不足时阻塞等待写入"""
+    ring = AudioRingBuffer(64)
+    reader = AudioReader(ring, 0)
+    threading.Timer(0.05, ring.write, args=(b"x" * 16,)).start()
+
+    start = time.monotonic()
+    assert reader.read(16, timeout=1) == b"x" * 16
+    assert time.monotonic() - start >= 0.04
+
+    # 超时返回已有的部分数据
+    ring.write(b"yy")
+    assert reader.read(16, timeout=0.01) == b"yy"
+
+
+def test_preroll_respects_mark():
+    """测试预录窗口不早于播报结束标记"""
+    capture = AudioCapture(buffer_seconds=2)
+    capture.ring.write(bytes(ms_to_bytes(1000)))
+    written = capture.ring.written
+
+    # 无标记时从 500ms 之前开始
+    assert capture.preroll_position(500) == written - ms_to_bytes(500)
+
+    # 播报在 200ms 之前结束，预录只回溯到标记处
+    capture._mark = written - ms_to_bytes(200)
+    assert capture.preroll_position(500) == capture._mark
+    assert capture.preroll_position(500, respect_mark=False) == written - ms_to_bytes(500)
+
+    # 预录窗口不能超出缓冲区保留的数据
+    assert capture.preroll_position(5000, respect_mark=False) == capture.ring.oldest_position()
+
+
+def test_read_view_reuses_buffer():
+    """测试视图读取复用读取者缓冲区并可转换为NumPy采样"""
+    ring = AudioRingBuffer(64)
+    reader = AudioReader(ring, 0)
+    ring.write(np.arange(16, dtype=np.int16).tobytes())
+
+    first = reader.read_view(8, timeout=0)
+    assert first.readonly and bytes(first) == np.arange(4, dtype=np.int16).tobytes()
+    samples = reader.read_samples(4, timeout=0)
+    assert samples.tolist() == [4, 5, 6, 7]
+    # 同一读取者的视图共享底层缓冲区，不产生新的bytes对象
+    assert np.shares_memory(samples, np.frombuffer(first, dtype=np.int16))
+
+    # 回绕读取，读取者落后超过容量时跳到最早数据
+    ring.write(np.arange(16, 48, dtype=np.int16).tobytes())
+    assert reader.read_samples(8, timeout=0).tolist() == list(range(16, 24))
+    assert reader.overruns == 1
+
+
+def _running_capture(seconds=2):
+    """不打开声卡的采集服务，由测试直接写入缓冲区"""
+    capture = AudioCapture(buffer_seconds=seconds)
+    capture._running = True
+    return capture
+
+
+def test_capture_source_for_speech_recognition():
+    """测试常驻录音作为 speech_recognition 音频源"""
+    capture = _running_capture()
+    source = CaptureSource(capture)
+    recognizer = sr.Recognizer()
+    recognizer.dynamic_energy_threshold = False
+    recognizer.energy_threshold = 300
+    recognizer.pause_threshold = 0.3
+    recognizer.non_speaking_duration = 0.2
+
+    t = np.arange(8000) / 16000
+    tone = (np.sin(2 * np.pi * 300 * t) * 8000).astype(np.int16).tobytes()
+    with source:
+        capture.ring.write(bytes(ms_to_bytes(200)) + tone + bytes(ms_to_bytes(600)))
+        audio = recognizer.listen(source, timeout=1, phrase_time_limit=3)
+    assert source.stream is None
+    assert audio.sample_rate == 16000 and audio.sample_width == 2
+    assert 0.4 < len(audio.frame_data) / 32000 < 1.6
+
+
+def test_recorder_writes_wav():
+    """测试录音存盘作为独立读取者，与其他读取者互不影响"""
+    capture = _running_capture()
+    other = capture.open_reader()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "session.wav")
+        with AudioRecorder(capture, path) as recorder:
+            capture.ring.write(bytes(ms_to_bytes(500)))
+            time.sleep(0.3)
+        assert recorder.seconds == 0.5
+        with wave.open(path, "rb") as wf:
+            assert wf.getframerate() == 16000 and wf.getnframes() == 8000
+    assert len(other.read(ms_to_bytes(500), timeout=0)) == ms_to_bytes(500)
+
+
+def test_restart_after_stop():
+    """测试停止后重新启动，新的读取者仍能读到音频"""
+    capture = AudioCapture(buffer_seconds=1, source=ReplaySource())
+    assert capture.start()
+    capture.stop()
+    assert capture.ring.closed
+
+    assert capture.start()
+    try:
+        assert not capture.ring.closed
+        reader = capture.open_reader()
+        assert len(reader.read(ms_to_bytes(100), timeout=2)) == ms_to_bytes(100)
+    finally:
+        capture.stop()
+
+
+if __name__ == "__main__":
+    print("=== 常驻录音缓冲区测试 ===")
+    for test in [test_ring_wraparound, test_reader_overrun, test_blocking_read, test_preroll_respects_mark,
+                 test_read_view_reuses_buffer, test_capture_source_for_speech_recognition,
+                 test_recorder_writes_wav, test_restart_after_stop]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
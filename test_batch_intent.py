@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量导航意图解析
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import dashscope
+import requests
+
+from ai_processor import AIProcessor
+from batch_intent import BatchIntentRunner, TokenBucket, matches, read_utterances
+from intent_cache import IntentCache
+from intent_parser import IntentParser
+from mock_api_server import FaultProfile, MockAPIServer
+
+
+def test_token_bucket():
+    """测试令牌桶允许突发，之后按速率排队"""
+    now = [0.0]
+    slept = []
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0], sleep=slept.append)
+    waits = [bucket.acquire() for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.1, 0.2], waits
+
+    now[0] = 10.0  # 空闲足够久后令牌回满，但不超过 burst
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() > 0
+
+
+def test_dedup_and_sources():
+    """测试本地规则直接返回、重复句只调用一次大模型，并逐条带序号输出"""
+    lines = [
+        json.dumps({"text": "从深圳湾科技生态园到学府路国兴苑", "origin": "深圳市深圳湾科技生态园",
+                    "destination": "深圳市学府路国兴苑"}, ensure_ascii=False),
+        "海岸城到欢乐谷",
+        "",
+        "海岸城，到欢乐谷。",
+        "从深圳湾科技生态园到学府路国兴苑",
+        json.dumps({"text": "你好", "error": True}, ensure_ascii=False),
+    ]
+    utterances = list(read_utterances(lines))
+    assert len(utterances) == 5 and utterances[4] == ("你好", {"error": True})
+
+    with MockAPIServer(profiles={"dashscope": FaultProfile(latency_ms=50)}) as server:
+        original = dashscope.base_http_api_url, dashscope.api_key
+        try:
+            processor = AIProcessor()
+            processor.intent_cache = IntentCache(db_path=None, enabled=False)
+            processor.intent_parser = IntentParser(city="深圳市", min_confidence=0.8)
+            dashscope.base_http_api_url = server.dashscope_base_url
+            dashscope.api_key = "test"
+            runner = BatchIntentRunner(processor, concurrency=4, rate=0)
+            results = {item.index: item for item in runner.run(text for text, _ in utterances)}
+        finally:
+            dashscope.base_http_api_url, dashscope.api_key = original
+        stats = requests.get(f"{server.base_url}/__stats").json()
+
+    assert sorted(results) == [0, 1, 2, 3, 4]
+    assert [results[i].source for i in range(5)] == ["local", "llm", "duplicate", "duplicate", "llm"]
+    assert results[2].result == results[1].result and results[1].result["destination"] == "深圳市欢乐谷"
+    assert matches(utterances[0][1], results[0].result) and matches(utterances[4][1], results[4].result)
+    assert sum(row["requests"] for key, row in stats.items() if key.startswith("dashscope")) == 2
+    assert runner.summary()["sources"] == {"local": 1, "llm": 2, "duplicate": 2}
+
+
+def test_concurrency_and_rate_limit():
+    """测试同时在途的大模型调用不超过并发数，调用速率不超过限流"""
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    class SlowProcessor(AIProcessor):
+        def parse_with_llm(self, user_input):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return {"origin": "当前位置", "destination": user_input, "action": "navigation"}
+
+    processor = SlowProcessor()
+    processor.intent_cache = IntentCache(db_path=None, enabled=False)
+    runner = BatchIntentRunner(processor, concurrency=3, rate=5, use_local=False)
+    start = time.monotonic()
+    results = list(runner.run(f"地点{i}" for i in range(8)))
+    elapsed = time.monotonic() - start
+
+    assert len(results) == 8 and peak[0] <= 3
+    # 前5次用突发额度，其余3次按每秒5次排队
+    assert elapsed >= 0.55, elapsed
+
+
+def test_malformed_rows_and_clean_stdout():
+    """测试格式错误的JSON行被跳过并计数，标准输出只有结果（.env 提示写到标准错误）"""
+    lines = ["导航到宝安机场", '{"text": "去欢乐谷"', '{"origin": "当前位置"}', '{"text": ""}',
+             json.dumps({"text": "带我去梧桐山"}, ensure_ascii=False)]
+    skipped = []
+    assert [text for text, _ in read_utterances(lines, skipped)] == ["导航到宝安机场", "带我去梧桐山"]
+    assert skipped == [2, 3, 4]
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_intent.py")
+    with tempfile.TemporaryDirectory() as tmp_dir:  # 没有 .env，config 会打印提示
+        env = dict(os.environ, INTENT_CACHE_ENABLED="false", GAZETTEER_ENABLED="false", PYTHONIOENCODING="utf-8")
+        proc = subprocess.run([sys.executable, script, "-", "--rate", "0"], input="\n".join(lines) + "\n",
+                              capture_output=True, text=True, encoding="utf-8", cwd=tmp_dir, env=env, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    records = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert sorted(record["text"] for record in records) == ["导航到宝安机场", "带我去梧桐山"], proc.stdout
+    assert {record["source"] for record in records} == {"local"}
+    assert "跳过 3 行" in proc.stderr and ".env" in proc.stderr, proc.stderr
+
+
+if __name__ == "__main__":
+    print("=== 批量意图解析测试 ===")
+    for test in [test_token_bucket, test_dedup_and_sources, test_concurrency_and_rate_limit,
+                 test_malformed_rows_and_clean_stdout]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地地名库
+"""
+
+import os
+import tempfile
+import time
+
+import requests
+
+from browser_navigator import BrowserNavigator
+from gazetteer import Gazetteer, split_city
+from geocode_cache import GeocodeCache
+from mock_api_server import MockAPIServer
+from qiniu_mcp_client import QiniuMCPClient
+
+PLACES = """name,lng,lat,aliases,formatted_address,city
+深圳宝安国际机场,113.814829,22.633236,宝安机场|深圳机场,广东省深圳市宝安区深圳宝安国际机场,深圳市
+深圳湾科技生态园,113.944610,22.525580,,广东省深圳市南山区深圳湾科技生态园,深圳市
+深圳湾公园,113.952860,22.509600,,,深圳市
+天虹超市南山店,113.930000,22.520000,,,深圳市
+首都国际机场,116.603039,40.080525,首都机场,,北京市
+坏数据,abc,22.5,,,
+"""
+
+
+def _write_csv(tmp_dir: str) -> str:
+    path = os.path.join(tmp_dir, "places.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(PLACES)
+    return path
+
+
+def test_lookup_methods():
+    """测试精确、别名、前缀、模糊匹配，以及城市不符时不匹配"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gazetteer = Gazetteer(db_path=None, enabled=True, min_score=0.7, city="深圳市")
+        assert gazetteer.import_csv(_write_csv(tmp_dir)) == 5
+
+    assert split_city("广东省深圳市南山区学府路") == ("深圳市", "南山区学府路")
+    assert split_city("天虹超市南山店") == ("", "天虹超市南山店")
+
+    airport = (113.814829, 22.633236)
+    assert gazetteer.get_coords("宝安机场") == airport
+    assert gazetteer.get_coords("深圳市 宝安机场") == airport
+    assert gazetteer.match("广东省深圳市宝安区深圳宝安国际机场").method == "exact"
+    assert gazetteer.lookup("天虹超市南山店").name == "天虹超市南山店"
+
+    prefix = gazetteer.match("深圳湾科技生态")
+    assert prefix.method == "prefix" and prefix.place.name == "深圳湾科技生态园"
+    assert gazetteer.match("深圳湾") is None  # 前缀对应多个地点
+    assert gazetteer.match("深圳湾科技") is None  # 前缀只覆盖地名的一小部分
+
+    gazetteer.add("深圳市南山区科技园腾讯大厦", 113.934, 22.540)
+    assert gazetteer.match("深圳市南山区科技园") is None  # 更大的区域，不是这座大厦
+
+    fuzzy = gazetteer.match("深圳市南山区深圳湾科技生太园")
+    assert fuzzy.method == "fuzzy" and fuzzy.place.name == "深圳湾科技生态园", fuzzy
+    assert gazetteer.match("深圳湾科技馆") is None
+    # 输入在地名之后还有内容时是更具体的地点，不模糊匹配成整个园区或机场
+    assert gazetteer.match("深圳市宝安国际机场T3") is None
+    gazetteer.add("深圳市南山区科技园", 113.953, 22.538)
+    assert gazetteer.match("深圳市南山区科技园北区") is None
+
+    assert gazetteer.match("北京市宝安机场") is None
+    assert gazetteer.lookup("北京市首都机场").name == "首都国际机场"
+    assert gazetteer.lookup("当前位置") is None
+    assert [place.name for place in gazetteer.complete("深圳湾")] == ["深圳湾公园", "深圳湾科技生态园"]
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        gazetteer.match("深圳湾科技生太园")
+        gazetteer.match("欢乐谷")
+    per_lookup_ms = (time.perf_counter() - start) * 1000 / 2000
+    assert per_lookup_ms < 1.0, per_lookup_ms
+
+
+def test_persistence_and_seed():
+    """测试地点持久化、别名合并，以及从地理编码缓存导入"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "cache.db")
+        cache = GeocodeCache(db_path=db_path, enabled=True)
+        cache.put("深圳市福田区市民中心", 114.05956, 22.54334, "广东省深圳市福田区市民中心")
+
+        gazetteer = Gazetteer(db_path=db_path, enabled=True)
+        assert gazetteer.seed_from_geocode_cache() == 1
+        gazetteer.add("深圳北站", 114.029, 22.609, aliases=["北站"])
+        gazetteer.add("深圳北站", 114.0295, 22.6095, aliases=["深圳北高铁站"])
+        assert gazetteer.add("当前位置", 113.9, 22.5) is None
+        gazetteer.close()
+
+        reopened = Gazetteer(db_path=db_path, enabled=True)
+        assert reopened.get_coords("福田区市民中心") == (114.05956, 22.54334)
+        north = reopened.lookup("北站")
+        assert north.coords == (114.0295, 22.6095) and north.aliases == ("北站", "深圳北高铁站")
+        reopened.remove("深圳北站")
+        assert reopened.lookup("深圳北高铁站") is None
+        assert reopened.get_stats()["places"] == 1
+        reopened.close()
+
+    assert Gazetteer(db_path=None, enabled=False).add("深圳北站", 114.0, 22.6) is None
+
+
+def test_same_name_in_two_cities():
+    """测试不同城市的同名地点分别保存，不带城市的地址按默认城市查找"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "cache.db")
+        gazetteer = Gazetteer(db_path=db_path, enabled=True, city="深圳市")
+        gazetteer.add("上海市万象城", 121.387, 31.166)
+        gazetteer.add("深圳市万象城", 114.111, 22.539)
+        gazetteer.add("上海市万象城", 121.388, 31.167, source="amap")  # 再次写入只更新上海的地点
+        assert len(gazetteer.places()) == 2
+        assert gazetteer.get_coords("上海市万象城") == (121.388, 31.167)
+        assert gazetteer.get_coords("万象城") == (114.111, 22.539)
+        assert gazetteer.match("广州市万象城") is None
+        gazetteer.close()
+
+        reopened = Gazetteer(db_path=db_path, enabled=True, city="上海市")
+        assert reopened.get_coords("万象城") == (121.388, 31.167)
+        assert reopened.get_coords("深圳市万象城") == (114.111, 22.539)
+        reopened.remove("万象城")
+        assert reopened.lookup("万象城") is None and reopened.lookup("深圳市万象城") is not None
+        reopened.close()
+
+
+def test_navigators_use_gazetteer():
+    """测试地名库命中时不请求高德和七牛云MCP，未命中时把成功结果记入地名库"""
+    with MockAPIServer() as server:
+        gazetteer = Gazetteer(db_path=None, enabled=True)
+
+        navigator = BrowserNavigator()
+        navigator.amap_api_key = "test"
+        navigator.geocode_cache = GeocodeCache(db_path=None, enabled=False)
+        navigator.gazetteer = gazetteer
+        navigator.geocode_api = f"{server.amap_base_url}/geocode/geo"
+        assert navigator.geocode_address("深圳市福田区市民中心") == (114.05956, 22.54334)
+        assert navigator.geocode_address("深圳市 福田区市民中心") == (114.05956, 22.54334)
+        assert navigator.geocode_address("深圳市南山区") is not None
+        assert gazetteer.lookup("深圳市南山区") is None  # 区县级结果不记入地名库
+
+        client = QiniuMCPClient()
+        client.openai_base_url = server.base_url
+        client.openai_api_key = "test"
+        client.headers["Authorization"] = "Bearer test"
+        client.gazetteer = gazetteer
+        first = client.get_coordinates_from_mcp("深圳湾科技生态园", "宝安机场")
+        assert first == ("113.944610,22.525580", "113.814829,22.633236")
+        assert client.get_coordinates_from_mcp("深圳市深圳湾科技生态园", "宝安机场") == \
+            ("113.94461,22.52558", "113.814829,22.633236")
+
+        stats = requests.get(f"{server.base_url}/__stats").json()
+        assert stats["amap/geocode/geo"]["requests"] == 2
+        assert stats["qiniu/chat/completions"]["requests"] == 1
+        assert {place.source for place in gazetteer.places()} == {"amap", "mcp"}
+
+
+if __name__ == "__main__":
+    print("=== 本地地名库测试 ===")
+    for test in [test_lookup_methods, test_persistence_and_seed, test_same_name_in_two_cities,
+                 test_navigators_use_gazetteer]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
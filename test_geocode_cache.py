@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试地理编码缓存（内存LRU + SQLite持久化）
+"""
+
+import os
+import tempfile
+import time
+
+from persistent_cache import MAINTENANCE_INTERVAL, PersistentLRUCache
+from geocode_cache import GeocodeCache
+
+
+def test_memory_and_disk_tiers():
+    """测试内存层和磁盘层命中"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "cache.db")
+
+        cache = GeocodeCache(db_path=db_path, max_entries=8, ttl=3600, enabled=True)
+        assert cache.get("深圳市福田区市民中心") is None
+        cache.put("深圳市福田区市民中心", 114.059560, 22.543099, "广东省深圳市福田区市民中心")
+
+        # 空白字符不影响缓存键
+        assert cache.get_coords(" 深圳市 福田区市民中心 ") == (114.059560, 22.543099)
+        stats = cache.get_stats()
+        assert stats["memory_hits"] == 1 and stats["misses"] == 1
+
+        # 新实例从磁盘读取
+        reopened = GeocodeCache(db_path=db_path, max_entries=8, ttl=3600, enabled=True)
+        entry = reopened.get("深圳市福田区市民中心")
+        assert entry["formatted_address"] == "广东省深圳市福田区市民中心"
+        assert reopened.get_stats()["disk_hits"] == 1
+
+
+def test_lru_eviction():
+    """测试LRU淘汰"""
+    cache = PersistentLRUCache("test", db_path=None, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_expiry():
+    """测试TTL过期"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "cache.db")
+        cache = PersistentLRUCache("test", db_path=db_path, ttl=0.05)
+        cache.put("key", {"value": 1})
+        assert cache.get("key") == {"value": 1}
+
+        time.sleep(0.1)
+        assert cache.get("key") is None
+        cache.close()
+
+
+def test_disk_maintenance():
+    """测试打开缓存时清理过期条目，磁盘层超过上限时淘汰最早写入的条目"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "cache.db")
+        expiring = PersistentLRUCache("test", db_path=db_path, ttl=0.05)
+        expiring.put("old", 1)
+        expiring.close()
+        time.sleep(0.1)
+
+        cache = PersistentLRUCache("test", db_path=db_path, max_entries=2, max_disk_entries=3)
+        assert cache._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] == 0
+        for i in range(5):
+            cache.put(f"key{i}", i)
+        assert cache.trim() == 2
+        keys = [row[0] for row in cache._conn.execute("SELECT key FROM cache_entries ORDER BY key")]
+        assert keys == ["key2", "key3", "key4"]
+
+        # 其他命名空间不受影响，写满 MAINTENANCE_INTERVAL 次后自动淘汰
+        other = PersistentLRUCache("other", db_path=db_path, max_disk_entries=10)
+        for i in range(MAINTENANCE_INTERVAL):
+            other.put(f"key{i}", i)
+        rows = dict(cache._conn.execute("SELECT namespace, COUNT(*) FROM cache_entries GROUP BY namespace"))
+        assert rows == {"test": 3, "other": 10}, rows
+        cache.close()
+        other.close()
+
+
+def test_disabled_cache():
+    """测试关闭缓存"""
+    cache = GeocodeCache(db_path=None, enabled=False)
+    cache.put("深圳湾科技生态园", 113.95, 22.52)
+    assert cache.get("深圳湾科技生态园") is None
+
+
+if __name__ == "__main__":
+    print("=== 地理编码缓存测试 ===")
+    for test in [test_memory_and_disk_tiers, test_lru_eviction, test_ttl_expiry, test_disk_maintenance,
+                 test_disabled_cache]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
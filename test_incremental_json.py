@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量JSON解析与流式意图解析
+"""
+
+import time
+
+import dashscope
+import requests
+
+import ai_processor
+from ai_processor import AIProcessor
+from incremental_json import IncrementalJSONParser
+from intent_cache import IntentCache
+from intent_parser import IntentParser
+from mock_api_server import FaultProfile, MockAPIServer
+
+REPLY = ('```json\n{\n    "origin": "深圳市深圳湾科技生态园",\n    "destination": "深圳市\\"国兴苑\\"",\n'
+         '    "distance": 12.5, "via": [{"name": "科技园}"}], "ok": true,\n    "action": "navigation"\n}\n```')
+FIELDS = {"origin": "深圳市深圳湾科技生态园", "destination": '深圳市"国兴苑"', "distance": 12.5,
+          "via": [{"name": "科技园}"}], "ok": True, "action": "navigation"}
+
+
+def test_any_split():
+    """测试任意切分位置都能得到与完整解析相同的字段"""
+    for size in (1, 2, 3, 7, len(REPLY)):
+        parser = IncrementalJSONParser()
+        for i in range(0, len(REPLY), size):
+            parser.feed(REPLY[i:i + size])
+        assert parser.fields == FIELDS, size
+        assert parser.done and parser.error is None
+
+
+def test_fields_ready_before_end():
+    """测试字段在对象结束前就可以取用"""
+    parser = IncrementalJSONParser()
+    prefix = REPLY[:REPLY.index('"distance"')]
+    completed = {}
+    for char in prefix:
+        completed.update(parser.feed(char))
+    assert completed == {"origin": "深圳市深圳湾科技生态园", "destination": '深圳市"国兴苑"'}
+    assert not parser.done
+
+    # 未结束的字符串不算完整
+    partial = IncrementalJSONParser()
+    partial.feed('{"origin": "深圳市深圳')
+    assert partial.fields == {}
+
+    broken = IncrementalJSONParser()
+    broken.feed('{origin: 1}')
+    assert broken.error and broken.fields == {}
+
+
+def test_streaming_returns_early():
+    """测试流式调用在起点终点完整后立即返回，并取消剩余生成"""
+    with MockAPIServer(profiles={"dashscope": FaultProfile(token_ms=40)}) as server:
+        original = dashscope.base_http_api_url, dashscope.api_key, ai_processor.AI_STREAMING
+        try:
+            processor = AIProcessor()
+            processor.intent_cache = IntentCache(db_path=None, enabled=False)
+            processor.intent_parser = IntentParser(enabled=False)
+            dashscope.base_http_api_url = server.dashscope_base_url
+            dashscope.api_key = "test"
+            expected = {"origin": "深圳市深圳湾科技生态园", "destination": "深圳市学府路国兴苑",
+                        "action": "navigation"}
+
+            timings = {}
+            for streaming in (True, False):
+                ai_processor.AI_STREAMING = streaming
+                start = time.monotonic()
+                assert processor.process_navigation_request("从深圳湾科技生态园到学府路国兴苑") == expected
+                timings[streaming] = time.monotonic() - start
+            ai_processor.AI_STREAMING = True
+            assert processor.process_navigation_request("你好") == {"error": "无法解析导航请求"}
+        finally:
+            dashscope.base_http_api_url, dashscope.api_key, ai_processor.AI_STREAMING = original
+
+        # 剩余的 "action" 字段约需 7 段 × 40ms，提前返回至少省下其中一部分
+        assert timings[True] < timings[False] - 0.1, timings
+        time.sleep(0.2)  # 等服务端发现连接已关闭
+        stats = requests.get(f"{server.base_url}/__stats").json()
+        assert stats["dashscope/generation/stream"]["requests"] == 2
+        assert stats["dashscope/generation/stream"]["cancelled"] == 1  # 错误回复读到结尾
+
+
+def test_empty_fields_wait_for_error():
+    """测试起点或终点为空时不提前返回，完整解析后保留 error"""
+    reply = '{"origin": "", "destination": "", "error": "请说出目的地"}'
+    parser = IncrementalJSONParser()
+    for char in reply[:reply.index('"error"')]:
+        parser.feed(char)
+        assert AIProcessor._early_intent(parser.fields) is None
+    assert AIProcessor._early_intent({"origin": "当前位置", "destination": "深圳市欢乐谷"}) == \
+        {"origin": "当前位置", "destination": "深圳市欢乐谷", "action": "navigation"}
+
+    processor = AIProcessor()
+    processor.intent_cache = IntentCache(db_path=None, enabled=False)
+    assert processor._parse_result_text("带我去", reply)["error"] == "请说出目的地"
+
+
+if __name__ == "__main__":
+    print("=== 增量JSON解析测试 ===")
+    for test in [test_any_split, test_fields_ready_before_end, test_streaming_returns_early,
+                 test_empty_fields_wait_for_error]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试导航意图解析缓存
+"""
+
+import os
+import tempfile
+
+import dashscope
+import requests
+
+from ai_processor import AIProcessor
+from intent_cache import IntentCache
+from intent_parser import IntentParser
+from mock_api_server import MockAPIServer
+
+INTENT = {"origin": "深圳市深圳湾科技生态园", "destination": "深圳市学府路国兴苑", "action": "navigation"}
+
+
+def test_normalized_key():
+    """测试标点、空白、全半角差异不影响缓存键"""
+    cache = IntentCache(db_path=None, enabled=True)
+    assert cache.normalize_utterance(" 从深圳湾，到 国兴苑。") == "从深圳湾到国兴苑"
+    assert cache.normalize_utterance("去ＫＫ　Ｍａｌｌ！") == "去kkmall"
+
+    cache.put("从深圳湾科技生态园到学府路国兴苑", INTENT)
+    assert cache.get("从深圳湾科技生态园，到学府路国兴苑！") == INTENT
+    assert cache.get("从深圳湾科技生态园到国兴苑") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+    # 返回副本，调用方修改结果不影响缓存
+    cache.get("从深圳湾科技生态园到学府路国兴苑")["origin"] = "当前位置"
+    assert cache.get("从深圳湾科技生态园到学府路国兴苑") == INTENT
+
+    cache.put("你好", {"error": "无法解析导航请求"})
+    assert cache.get("你好") is None
+
+
+def test_persistence_and_scope():
+    """测试磁盘持久化，城市或模型变化后不复用旧结果"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "cache.db")
+        IntentCache(db_path=db_path, enabled=True, city="深圳市", model="qwen-max").put("去机场", INTENT)
+
+        assert IntentCache(db_path=db_path, enabled=True, city="深圳市", model="qwen-max").get("去机场") == INTENT
+        assert IntentCache(db_path=db_path, enabled=True, city="北京市", model="qwen-max").get("去机场") is None
+        assert IntentCache(db_path=db_path, enabled=True, city="深圳市", model="qwen-plus").get("去机场") is None
+        assert IntentCache(db_path=db_path, enabled=True, prompt="新提示词").get("去机场") is None
+
+
+def test_processor_skips_llm_on_repeat():
+    """测试重复的导航请求只调用一次大模型"""
+    with MockAPIServer() as server:
+        original = dashscope.base_http_api_url, dashscope.api_key
+        try:
+            processor = AIProcessor()
+            processor.intent_cache = IntentCache(db_path=None, enabled=True)
+            processor.intent_parser = IntentParser(enabled=False)
+            dashscope.base_http_api_url = server.dashscope_base_url
+            dashscope.api_key = "test"
+
+            first = processor.process_navigation_request("从深圳湾科技生态园到学府路国兴苑")
+            second = processor.process_navigation_request("从深圳湾科技生态园 到 学府路国兴苑。")
+            assert first == second == INTENT
+        finally:
+            dashscope.base_http_api_url, dashscope.api_key = original
+
+        stats = requests.get(f"{server.base_url}/__stats").json()
+        assert sum(row["requests"] for key, row in stats.items() if key.startswith("dashscope")) == 1
+
+
+if __name__ == "__main__":
+    print("=== 意图解析缓存测试 ===")
+    for test in [test_normalized_key, test_persistence_and_scope, test_processor_skips_llm_on_repeat]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
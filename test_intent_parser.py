@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地导航意图解析
+"""
+
+import dashscope
+import requests
+
+from ai_processor import AIProcessor
+from bench_intent_parser import DEFAULT_CORPUS, evaluate, load_corpus
+from intent_cache import IntentCache
+from intent_parser import IntentParser
+from mock_api_server import MockAPIServer
+
+
+def test_grammar_rules():
+    """测试各类句式的起点、终点和城市补全"""
+    parser = IntentParser(city="深圳市", min_confidence=0.8)
+    cases = {
+        "从深圳湾科技生态园到学府路国兴苑": ("深圳市深圳湾科技生态园", "深圳市学府路国兴苑", "from_to"),
+        "请帮我从会展中心导航到深圳湾公园，谢谢": ("深圳市会展中心", "深圳市深圳湾公园", "from_to"),
+        "从这里开车到南山医院": ("当前位置", "深圳市南山医院", "from_to"),
+        "导航到宝安机场": ("当前位置", "深圳市宝安机场", "navigate_to"),
+        "带我去梧桐山": ("当前位置", "深圳市梧桐山", "take_me"),
+        "去往东门": ("当前位置", "深圳市东门", "go_to"),
+        "我要去一下福田高铁站吧": ("当前位置", "深圳市福田高铁站", "go_to"),
+        "去广州市天河区珠江新城": ("当前位置", "广州市天河区珠江新城", "go_to"),
+        "海岸城到欢乐谷怎么走": ("深圳市海岸城", "深圳市欢乐谷", "route_between"),
+        "国兴苑怎么走？": ("当前位置", "深圳市国兴苑", "how_to_get"),
+    }
+    for text, (origin, destination, rule) in cases.items():
+        intent = parser.fast_path(text)
+        assert intent is not None, text
+        assert (intent.origin, intent.destination, intent.rule) == (origin, destination, rule), intent
+        assert intent.to_request() == {"origin": origin, "destination": destination, "action": "navigation"}
+
+    beijing = IntentParser(city="北京市").fast_path("去西单大悦城")
+    assert beijing.destination == "北京市西单大悦城"
+
+
+def test_low_confidence_defers():
+    """测试疑问句、多目的地、外地简称和个人地点不在本地返回"""
+    parser = IntentParser(min_confidence=0.8)
+    for text in ["去机场要多久", "从深圳北站到机场然后去酒店", "去机场还是去高铁站",
+                 "去北京西站", "去公司", "海岸城到欢乐谷", "今天天气怎么样", "回家",
+                 "带我去吃饭", "我要去看电影", "去超市买东西"]:
+        assert parser.fast_path(text) is None, text
+
+    # 没有问路结尾的"A到B"只用于大模型失败时兜底
+    assert parser.parse("海岸城到欢乐谷").to_request()["destination"] == "深圳市欢乐谷"
+    assert IntentParser(enabled=False).fast_path("导航到宝安机场") is None
+
+
+def test_corpus_precision():
+    """测试标注语料上本地返回的结果全部正确"""
+    report = evaluate(IntentParser(city="深圳市"), load_corpus(DEFAULT_CORPUS), thresholds=(0.8,))
+    row = report["thresholds"][0.8]
+    assert row["precision"] == 1.0, row
+    assert row["coverage"] >= 0.6, row
+
+
+def test_processor_fast_path():
+    """测试高置信度句子不调用大模型，低置信度句子仍交给大模型"""
+    with MockAPIServer() as server:
+        original = dashscope.base_http_api_url, dashscope.api_key
+        try:
+            processor = AIProcessor()
+            processor.intent_cache = IntentCache(db_path=None, enabled=False)
+            processor.intent_parser = IntentParser(city="深圳市", min_confidence=0.8)
+            dashscope.base_http_api_url = server.dashscope_base_url
+            dashscope.api_key = "test"
+
+            result = processor.process_navigation_request("从深圳湾科技生态园到学府路国兴苑")
+            assert result == {"origin": "深圳市深圳湾科技生态园",
+                              "destination": "深圳市学府路国兴苑", "action": "navigation"}
+            stats = requests.get(f"{server.base_url}/__stats").json()
+            assert not any(key.startswith("dashscope") for key in stats)
+
+            processor.process_navigation_request("海岸城到欢乐谷")
+        finally:
+            dashscope.base_http_api_url, dashscope.api_key = original
+
+        stats = requests.get(f"{server.base_url}/__stats").json()
+        assert sum(row["requests"] for key, row in stats.items() if key.startswith("dashscope")) == 1
+
+
+if __name__ == "__main__":
+    print("=== 本地意图解析测试 ===")
+    for test in [test_grammar_rules, test_low_confidence_defers, test_corpus_precision, test_processor_fast_path]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试关键词检测（Aho-Corasick）
+"""
+
+from keyword_spotter import KeywordSpotter, get_spotter
+
+
+def test_find_all_overlapping():
+    """测试重叠关键词全部命中"""
+    spotter = KeywordSpotter({"trigger": ["开始导航", "导航", "开始"]})
+    found = [(m.keyword, m.end) for m in spotter.find_all("现在开始导航")]
+    assert found == [("开始", 4), ("开始导航", 6), ("导航", 6)]
+
+
+def test_cancel_beats_confirm():
+    """测试取消优先于确认"""
+    spotter = get_spotter("confirm_reply")
+    assert spotter.search("好的").label == "confirm"
+    assert spotter.search("不是的").label == "cancel"
+    assert spotter.search("导航吧，算了").label == "cancel"
+    assert spotter.search("OK").keyword == "ok"
+    assert spotter.search("随便") is None
+
+
+def test_streaming_across_chunks():
+    """测试关键词跨越多段输入时仍能命中"""
+    stream = get_spotter("command").stream()
+    assert stream.feed("我们现在出") == []
+    assert [m.keyword for m in stream.feed("发吧")] == ["出发"]
+    assert stream.best.label == "trigger"
+
+    stream.reset()
+    assert stream.best is None and stream.feed("发") == []
+
+
+def test_profiles_compiled_once():
+    """测试命名配置只编译一次"""
+    assert get_spotter("confirm") is get_spotter("confirm")
+    assert "嗯" not in get_spotter("confirm").keywords  # 录音期间不因单字应答提前结束
+    try:
+        get_spotter("unknown")
+        assert False, "未知配置应抛出 KeyError"
+    except KeyError:
+        pass
+
+
+if __name__ == "__main__":
+    print("=== 关键词检测测试 ===")
+    for test in [test_find_all_overlapping, test_cancel_beats_confirm,
+                 test_streaming_across_chunks, test_profiles_compiled_once]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
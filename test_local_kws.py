@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地确认词识别（MFCC + DTW）
+用不同"音节"频率组合合成的短语代替真实录音
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from audio_capture import AudioCapture, AudioReader, AudioRingBuffer
+from local_kws import KwsResult, LocalKeywordRecognizer, dtw_distances, write_pcm
+from vad import capture_utterance
+
+# 每个短语由若干音节组成，每个音节用两个共振频率模拟
+PATTERNS = {
+    "确认": [(300, 2300), (700, 1200)],
+    "好的": [(500, 900), (400, 2000)],
+    "取消": [(350, 2100), (600, 1700)],
+    "不要": [(400, 800), (650, 1100)],
+}
+
+
+def synthesize(syllables, rng, stretch=1.0):
+    parts = []
+    for f1, f2 in syllables:
+        n = int(0.22 * stretch * 16000)
+        t = np.arange(n) / 16000
+        jitter = rng.uniform(0.97, 1.03)
+        envelope = np.sin(np.pi * np.arange(n) / n)
+        parts.append((np.sin(2 * np.pi * f1 * jitter * t) + 0.6 * np.sin(2 * np.pi * f2 * jitter * t)) * envelope)
+        parts.append(np.zeros(640))
+    signal = np.concatenate(parts) * 6000
+    signal += rng.normal(0, 60, len(signal))
+    return signal.astype(np.int16).tobytes()
+
+
+def build_recognizer(tmp_dir, rng, patterns=PATTERNS, count=3):
+    for phrase, syllables in patterns.items():
+        for i in range(count):
+            pcm = synthesize(syllables, rng, rng.uniform(0.9, 1.1))
+            write_pcm(os.path.join(tmp_dir, phrase, f"{i:03d}.wav"), pcm)
+    return LocalKeywordRecognizer(template_dir=tmp_dir, threshold=0, margin=1.15)
+
+
+def test_dtw_time_warp():
+    """测试DTW对语速变化不敏感"""
+    base = np.sin(np.linspace(0, 6, 60))[:, None].repeat(3, axis=1)
+    slow = np.sin(np.linspace(0, 6, 90))[:, None].repeat(3, axis=1)
+    other = np.cos(np.linspace(0, 6, 60))[:, None].repeat(3, axis=1)
+    distances = dtw_distances(base, [slow, other])
+    assert distances[0] < distances[1]
+
+
+def test_recognize_enrolled_phrases():
+    """测试识别已录制短语（语速变化±15%）"""
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recognizer = build_recognizer(tmp_dir, rng)
+        assert recognizer.ready
+        for phrase, syllables in PATTERNS.items():
+            result = recognizer.recognize(synthesize(syllables, rng, rng.uniform(0.85, 1.15)))
+            assert result.phrase == phrase and result.confident, result
+        assert recognizer.labels["取消"] == "cancel" and recognizer.labels["好的"] == "confirm"
+
+
+def test_unknown_phrase_not_confident():
+    """测试未录制的短语交给云端识别"""
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recognizer = build_recognizer(tmp_dir, rng)
+        result = recognizer.recognize(synthesize([(1500, 3000), (200, 3500), (900, 2600)], rng))
+        assert not result.confident
+
+
+def test_capture_utterance_endpoints():
+    """测试从录音中截取短语（去掉前后静音）"""
+    rng = np.random.default_rng(3)
+    phrase = synthesize(PATTERNS["确认"], rng)
+    silence = lambda seconds: rng.normal(0, 60, int(seconds * 16000)).astype(np.int16).tobytes()
+
+    ring = AudioRingBuffer(16000 * 2 * 10)
+    ring.write(silence(0.6) + phrase + silence(1.0))
+    pcm, start = capture_utterance(AudioReader(ring, 0), timeout=3, hangover_ms=400)
+
+    assert pcm is not None
+    duration = len(pcm) / 32000
+    assert abs(duration - len(phrase) / 32000) < 0.2, duration
+    assert abs(start / 32000 - 0.6) < 0.15, start / 32000
+
+
+def test_capture_utterance_deadline():
+    """测试到达截止时刻时即使还在说话也结束截取"""
+    ring = AudioRingBuffer(16000 * 2 * 10)
+    t = np.arange(640) / 16000
+    frame = (np.sin(2 * np.pi * 300 * t) * 6000).astype(np.int16).tobytes()
+    stop = threading.Event()
+    ring.write(np.random.default_rng(5).normal(0, 60, 8000).astype(np.int16).tobytes())
+
+    def speak():  # 静音之后按实时节奏持续说话
+        while not stop.wait(0.04):
+            ring.write(frame)
+
+    threading.Thread(target=speak, daemon=True).start()
+    start = time.monotonic()
+    try:
+        pcm, _ = capture_utterance(AudioReader(ring, 0), timeout=3, max_ms=10000, deadline=start + 0.5)
+    finally:
+        stop.set()
+    assert pcm and time.monotonic() - start < 0.8
+
+
+class FakeKWS:
+    ready = True
+
+    def recognize(self, pcm):
+        return KwsResult("确认", "confirm", 1.0, 1.05, False, 1.0)  # 区分度不足，不确定
+
+
+class FakeXfyun:
+    def __init__(self):
+        self.max_wait_time = None
+
+    def recognize_speech_with_smart_trigger(self, max_wait_time, session_type, preroll_ms=None):
+        self.max_wait_time = max_wait_time
+        return "确认", "keyword"
+
+
+def test_confirmation_shares_one_budget():
+    """测试本地识别不确定时，云端识别只使用剩余的时间预算"""
+    from speech_handler import SpeechHandler
+
+    rng = np.random.default_rng(4)
+    capture = AudioCapture(buffer_seconds=10)
+    capture._running = True  # 不打开声卡，由测试直接写入缓冲区
+    silence = rng.normal(0, 60, 16000).astype(np.int16).tobytes()
+    speak = lambda: capture.ring.write(silence + synthesize(PATTERNS["确认"], rng) + silence)
+
+    handler = SpeechHandler.__new__(SpeechHandler)
+    handler.local_kws = FakeKWS()
+    handler.audio_capture = capture
+    handler.use_xfyun = True
+    handler.xfyun_asr = FakeXfyun()
+
+    threading.Timer(0.1, speak).start()  # 开始监听后才说话
+    start = time.monotonic()
+    assert handler.listen_for_confirmation(max_wait_time=3) == ("确认", "keyword")
+    spent = time.monotonic() - start
+    assert handler.xfyun_asr.max_wait_time <= 3 - spent + 0.05
+
+    # 预算在本地识别阶段就已用完时不再启动云端识别
+    handler.xfyun_asr = FakeXfyun()
+    threading.Timer(0.45, speak).start()
+    assert handler.listen_for_confirmation(max_wait_time=0.5) == (None, "timeout")
+    assert handler.xfyun_asr.max_wait_time is None
+    handler.xfyun_asr = None  # 析构时不清理替身
+
+
+def test_decision_latency():
+    """测试十几个短语、每个3条模板时的判定耗时"""
+    rng = np.random.default_rng(2)
+    phrases = ["确认", "好的", "是的", "开始导航", "走吧", "出发", "对",
+               "取消", "不要", "不用", "算了", "不是"]
+    patterns = {p: [tuple(rng.uniform(250, 2500, 2)) for _ in range(len(p))] for p in phrases}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recognizer = build_recognizer(tmp_dir, rng, patterns)
+        assert len(recognizer.templates) == 36
+        recognizer.recognize(synthesize(patterns["开始导航"], rng))  # 预热
+        result = recognizer.recognize(synthesize(patterns["开始导航"], rng))
+        assert result.phrase == "开始导航"
+        assert result.elapsed_ms < 200, f"{result.elapsed_ms:.1f}ms"
+
+
+if __name__ == "__main__":
+    print("=== 本地确认词识别测试 ===")
+    for test in [test_dtw_time_warp, test_recognize_enrolled_phrases,
+                 test_unknown_phrase_not_confident, test_capture_utterance_endpoints,
+                 test_capture_utterance_deadline, test_confirmation_shares_one_budget, test_decision_latency]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
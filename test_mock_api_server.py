@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地模拟API服务（高德 / 七牛云MCP / DashScope）
+"""
+
+import asyncio
+import time
+import webbrowser
+
+import dashscope
+import requests
+
+from ai_processor import AIProcessor
+from browser_navigator import BrowserNavigator
+from gazetteer import Gazetteer
+from geocode_cache import GeocodeCache
+from intent_cache import IntentCache
+from intent_parser import IntentParser
+from main import NavigationApp
+from mcp_client import MCPClient
+from mock_api_server import FaultProfile, MockAPIServer, parse_service_profile
+from qiniu_mcp_client import QiniuMCPClient
+
+
+def test_amap_endpoints():
+    """测试高德接口：地理编码、路径规划、天气、IP定位"""
+    with MockAPIServer() as server:
+        client = MCPClient()
+        client.amap_base_url = server.amap_base_url
+        client.amap_key = "test"
+        assert client.test_amap_connection()
+
+        route = client.plan_route((113.944610, 22.525580), (114.059560, 22.543340))
+        assert route and 10000 < float(route["distance"]) < 20000
+        assert client.get_weather_info("深圳")["weather"] == "晴"
+
+        navigator = BrowserNavigator()
+        navigator.amap_api_key = "test"
+        navigator.geocode_cache = GeocodeCache(db_path=None, enabled=False)
+        navigator.gazetteer = Gazetteer(db_path=None, enabled=False)
+        navigator.geocode_api = f"{server.amap_base_url}/geocode/geo"
+        navigator.amap_base_url = server.amap_base_url
+        assert navigator.geocode_address("深圳市福田区市民中心") == (114.05956, 22.54334)
+        # 未收录的地址结果稳定且落在城市范围内
+        first = navigator.geocode_address("南山区某某大厦")
+        assert first == navigator.geocode_address("南山区某某大厦")
+        assert 113.75 < first[0] < 114.62
+        assert navigator.get_current_location() == (113.75, 22.45)
+
+        # 缺少key时与真实服务一样返回业务错误
+        data = requests.get(f"{server.amap_base_url}/geocode/geo", params={"address": "x"}).json()
+        assert data["status"] == "0" and data["infocode"] == "10001"
+
+
+def test_qiniu_tool_references():
+    """测试七牛云MCP对话接口返回可解析的tool_references"""
+    with MockAPIServer() as server:
+        client = QiniuMCPClient()
+        client.openai_base_url = server.base_url
+        client.openai_api_key = "test"
+        client.headers["Authorization"] = "Bearer test"
+        client.gazetteer = Gazetteer(db_path=None, enabled=False)
+        assert client.test_mcp_connection()
+        origin, destination = client.get_coordinates_from_mcp("深圳湾科技生态园", "宝安机场")
+        assert origin == "113.944610,22.525580"
+        assert destination == "113.814829,22.633236"
+
+
+def test_dashscope_generation():
+    """测试DashScope文本生成接口驱动AIProcessor"""
+    with MockAPIServer() as server:
+        original = dashscope.base_http_api_url, dashscope.api_key
+        try:
+            processor = AIProcessor()
+            processor.intent_cache = IntentCache(db_path=None, enabled=False)
+            processor.intent_parser = IntentParser(enabled=False)
+            dashscope.base_http_api_url = server.dashscope_base_url
+            dashscope.api_key = "test"
+            result = processor.process_navigation_request("从深圳湾科技生态园到学府路国兴苑")
+            assert result == {"origin": "深圳市深圳湾科技生态园",
+                              "destination": "深圳市学府路国兴苑", "action": "navigation"}
+        finally:
+            dashscope.base_http_api_url, dashscope.api_key = original
+
+
+def test_fault_injection():
+    """测试按服务注入延迟、错误，并统计各接口请求"""
+    profiles = {"amap": FaultProfile(latency_ms=80), "qiniu": FaultProfile(error_rate=1.0)}
+    with MockAPIServer(profiles=profiles) as server:
+        start = time.monotonic()
+        requests.get(f"{server.amap_base_url}/ip", params={"key": "test"})
+        assert time.monotonic() - start >= 0.08
+
+        response = requests.post(f"{server.base_url}/v1/chat/completions",
+                                 headers={"Authorization": "Bearer test"}, json={"messages": []})
+        assert response.status_code == 503
+
+        stats = requests.get(f"{server.base_url}/__stats").json()
+        assert stats["amap/ip"]["requests"] == 1 and stats["amap/ip"]["mean_ms"] >= 80
+        assert stats["qiniu/chat/completions"]["errors"] == 1
+
+    service, profile = parse_service_profile("dashscope:latency_ms=200,stall_rate=0.1", FaultProfile(jitter_ms=5))
+    assert service == "dashscope" and profile == FaultProfile(200, 5, 0, 0.1, 5000)
+
+
+def _api_client(server) -> MCPClient:
+    """走高德API模式、不使用本地缓存的导航客户端"""
+    client = MCPClient()
+    client.amap_base_url = server.amap_base_url
+    client.amap_key = "test"
+    client.use_browser_fallback = False
+    navigator = client.browser_navigator
+    navigator.amap_api_key = "test"
+    navigator.geocode_cache = GeocodeCache(db_path=None, enabled=False)
+    navigator.gazetteer = Gazetteer(db_path=None, enabled=False)
+    navigator.geocode_api = f"{server.amap_base_url}/geocode/geo"
+    return client
+
+
+def test_navigation_timeout_opens_one_page():
+    """测试高德导航超时后只由浏览器导航打开一次页面，后台线程不再重复打开"""
+    opened = []
+    original = webbrowser.open
+    webbrowser.open = lambda url, *args, **kwargs: opened.append(url) or True
+    try:
+        with MockAPIServer(profiles={"amap": FaultProfile(latency_ms=200)}) as server:
+            client = _api_client(server)
+            # 地理编码 + 路线规划约 400ms，超过 300ms 的期限；回退的浏览器导航只需地理编码
+            success, _ = asyncio.run(client.navigate_to_destination_async(
+                "深圳湾科技生态园", "深圳市福田区市民中心", timeout=0.3))
+            assert success
+            time.sleep(0.4)  # 等超时的后台线程跑完
+    finally:
+        webbrowser.open = original
+    assert len(opened) == 1, opened
+    assert opened[0].startswith("https://uri.amap.com/navigation")
+
+
+def test_cancelled_speculation_skips_route():
+    """测试用户取消导航后，预先准备的后台线程地理编码完成后不再规划路线"""
+    async def confirm_then_cancel(app):
+        speculative = app.start_speculative_navigation("深圳湾科技生态园", "深圳市福田区市民中心")
+        await asyncio.sleep(0.1)  # 地理编码进行中，用户说"取消"
+        app.cancel_speculative_navigation(speculative)
+        assert await app.collect_speculative_navigation(speculative) is None
+
+    with MockAPIServer(profiles={"amap": FaultProfile(latency_ms=200)}) as server:
+        app = NavigationApp.__new__(NavigationApp)
+        app.use_qiniu_mcp = False
+        app.mcp_client = _api_client(server)
+        asyncio.run(confirm_then_cancel(app))
+        time.sleep(0.4)  # 等后台线程跑完地理编码
+        stats = requests.get(f"{server.base_url}/__stats").json()
+    assert stats["amap/geocode/geo"]["requests"] == 2
+    assert "amap/direction/driving" not in stats, stats
+
+
+def test_timed_out_speculation_geocodes_again():
+    """测试预先地理编码超时得到的空坐标不被复用，确认后重新地理编码并走高德API导航"""
+    opened = []
+    original = webbrowser.open
+    webbrowser.open = lambda url, *args, **kwargs: opened.append(url) or True
+    try:
+        with MockAPIServer(profiles={"amap": FaultProfile(latency_ms=200)}) as server:
+            client = _api_client(server)
+            navigator = client.browser_navigator
+            geocode_pair = navigator.geocode_pair
+            navigator.geocode_pair = lambda origin, destination: geocode_pair(origin, destination, deadline=0.05)
+            plan = client.prepare_navigation("深圳湾科技生态园", "深圳市福田区市民中心")
+            assert plan["dest_coords"] is None and "route" not in plan
+            navigator.geocode_pair = geocode_pair
+
+            success, _ = client.navigate_to_destination("深圳湾科技生态园", "深圳市福田区市民中心", plan)
+            assert success
+            stats = requests.get(f"{server.base_url}/__stats").json()
+    finally:
+        webbrowser.open = original
+    assert stats["amap/geocode/geo"]["requests"] == 4  # 超时的2次 + 重新转换的2次
+    assert stats["amap/direction/driving"]["requests"] == 1
+    assert len(opened) == 1 and "to=114.05956,22.54334" in opened[0], opened
+
+
+if __name__ == "__main__":
+    print("=== 模拟API服务测试 ===")
+    for test in [test_amap_endpoints, test_qiniu_tool_references,
+                 test_dashscope_generation, test_fault_injection, test_navigation_timeout_opens_one_page,
+                 test_cancelled_speculation_skips_route, test_timed_out_speculation_geocodes_again]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试讯飞模拟服务与录音回放
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import websocket
+
+from audio_capture import AudioCapture, ReplaySource, set_audio_capture
+from local_kws import write_pcm
+from mock_xfyun_server import MockXfyunServer
+from xfyun_asr import XfyunASR
+
+
+def make_utterance(speech_seconds=1.5, lead=0.4, tail=1.5):
+    t = np.arange(int(speech_seconds * 16000)) / 16000
+    voice = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 6))
+    voice *= np.clip(np.sin(2 * np.pi * 4 * t), 0.2, None) * 5000
+    return np.concatenate([np.zeros(int(lead * 16000)), voice, np.zeros(int(tail * 16000))]).astype(np.int16).tobytes()
+
+
+def test_replay_source_clock():
+    """测试回放音频源按音频时钟输出并记录开始时刻"""
+    source = ReplaySource()
+    clip = source.play(b"\x01\x00" * 960)
+    start = time.monotonic()
+    first = source.read(640)
+    second = source.read(640)
+    assert first == b"\x01\x00" * 640
+    assert second == b"\x01\x00" * 320 + bytes(640)  # 放完后补静音
+    assert clip.done.is_set() and clip.started_at >= start
+    assert time.monotonic() - start >= 0.07
+
+
+def test_handshake_requires_auth():
+    """测试缺少鉴权参数时拒绝握手，错误注入时返回错误码"""
+    with MockXfyunServer(error_rate=1.0) as server:
+        try:
+            websocket.create_connection(server.url, timeout=2)
+            assert False, "应当拒绝握手"
+        except websocket.WebSocketBadStatusException as e:
+            assert e.status_code == 401
+
+        ws = websocket.create_connection(server.url + "?authorization=a&date=b&host=c", timeout=2)
+        ws.send(json.dumps({"common": {"app_id": "x"}, "business": {}, "data": {"status": 0, "audio": ""}}))
+        assert json.loads(ws.recv())["code"] == 10165
+        ws.close()
+
+
+def test_asr_session_against_mock():
+    """测试XfyunASR通过回放录音对接模拟服务：流式结果、关键词触发与会话计时"""
+    source = ReplaySource(noise_level=60)
+    capture = AudioCapture(source=source)
+    previous = set_audio_capture(capture)
+    capture.start()
+    try:
+        with MockXfyunServer(latency_ms=20) as server:
+            asr = XfyunASR()
+            asr.url = server.url
+            asr.app_id = asr.api_key = asr.api_secret = "test"
+
+            server.expect("去宝安机场出发")
+            clip = source.play(make_utterance())
+            text, reason = asr.recognize_speech_with_smart_trigger(max_wait_time=8)
+            assert text == "去宝安机场出发" and reason == "keyword", (text, reason)
+            assert asr.timings["first_partial"] - clip.started_at < 1.0
+            assert "keyword" in asr.timings
+
+            clip.done.wait(5)
+            capture.mark()
+            server.expect("从公司到家里")
+            source.play(make_utterance())
+            text, reason = asr.recognize_speech_with_smart_trigger(max_wait_time=8)
+            assert text == "从公司到家里" and asr.final_received
+    finally:
+        capture.stop()
+        set_audio_capture(previous)
+
+
+def test_load_fixtures():
+    """测试读取WAV样本与期望文本，并标出说话起止"""
+    from bench_speech_pipeline import load_fixtures
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_pcm(os.path.join(tmp_dir, "confirm_ok.wav"), make_utterance(0.8, lead=0.5))
+        with open(os.path.join(tmp_dir, "confirm_ok.txt"), "w", encoding="utf-8") as f:
+            f.write("好的\n")
+        write_pcm(os.path.join(tmp_dir, "no_text.wav"), make_utterance())
+
+        fixtures = load_fixtures(tmp_dir)
+        assert len(fixtures) == 1
+        fixture = fixtures[0]
+        assert fixture.kind == "confirm" and fixture.text == "好的"
+        assert abs(fixture.onset - 0.5) < 0.15, fixture.onset
+        assert fixture.end > fixture.onset + 0.5
+
+
+if __name__ == "__main__":
+    print("=== 讯飞模拟服务测试 ===")
+    for test in [test_replay_source_clock, test_handshake_requires_auth,
+                 test_asr_session_against_mock, test_load_fixtures]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试系统提示词版本管理
+"""
+
+import dashscope
+
+from ai_processor import AIProcessor
+from config import DEFAULT_CITY, SYSTEM_PROMPT
+from intent_cache import IntentCache
+from intent_parser import IntentParser
+from mock_api_server import MockAPIServer
+from prompt_manager import Prompt, build_prompt, get_prompt, system_message, usage_tokens
+from tracing import get_tracer
+
+
+def test_versions():
+    """测试完整版与原提示词一致，精简版保留规则且token数不到一半"""
+    assert build_prompt("v1", DEFAULT_CITY) == SYSTEM_PROMPT
+    full, compact = get_prompt("v1", "深圳市"), get_prompt("v2", "深圳市")
+    assert compact.tokens * 2 < full.tokens
+    for text in (full.text, compact.text):
+        for rule in ('"origin"', '"destination"', '"action"', "当前位置", "深圳市南山区学府路国兴苑",
+                     "无法解析导航请求"):
+            assert rule in text, rule
+
+    beijing = build_prompt("v2", "北京市")
+    assert "北京市南山区学府路国兴苑" in beijing and "深圳市" not in beijing
+    try:
+        build_prompt("v9")
+        assert False, "未知版本应报错"
+    except ValueError:
+        pass
+
+
+def test_system_message_cache():
+    """测试只有足够长的提示词才显式声明缓存"""
+    short = get_prompt("v2", "深圳市")
+    assert system_message(short, cache="explicit") == {"role": "system", "content": short.text}
+
+    long_prompt = Prompt("v1", "提示词" * 1000, 2000, False, "0")
+    message = system_message(long_prompt, cache="explicit")
+    assert message["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert system_message(long_prompt, cache="auto")["content"] == long_prompt.text
+
+    assert usage_tokens({"input_tokens": 300, "prompt_tokens_details": {"cached_tokens": 256}}) == \
+        {"input_tokens": 300, "cached_tokens": 256}
+    assert usage_tokens(None) == {}
+
+
+def test_processor_sends_selected_prompt():
+    """测试AIProcessor按所选版本发送提示词，精简版输入token更少"""
+    tracer = get_tracer()
+    with MockAPIServer() as server:
+        original = dashscope.base_http_api_url, dashscope.api_key
+        try:
+            processor = AIProcessor()
+            processor.intent_cache = IntentCache(db_path=None, enabled=False)
+            processor.intent_parser = IntentParser(enabled=False)
+            dashscope.base_http_api_url = server.dashscope_base_url
+            dashscope.api_key = "test"
+
+            input_tokens = {}
+            for version in ("v1", "v2"):
+                processor.prompt = get_prompt(version)
+                tracer.reset()
+                result = processor.process_navigation_request("从深圳湾科技生态园到学府路国兴苑")
+                assert result["destination"] == "深圳市学府路国兴苑"
+                llm = [span for span in tracer.spans() if span.name == "ai.llm"][-1]
+                assert llm.attrs["prompt"] == version
+                input_tokens[version] = llm.attrs["input_tokens"]
+        finally:
+            dashscope.base_http_api_url, dashscope.api_key = original
+
+    assert input_tokens["v2"] < input_tokens["v1"] / 2, input_tokens
+
+
+if __name__ == "__main__":
+    print("=== 系统提示词版本测试 ===")
+    for test in [test_versions, test_system_message_cache, test_processor_sends_selected_prompt]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试导航链路分段计时
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from async_utils import run_blocking
+from tracing import Tracer, histogram, load_jsonl, traced
+
+
+def test_nested_spans_across_threads():
+    """测试span嵌套：异步阶段与线程池中的阶段共享同一个trace"""
+    tracer = Tracer()
+
+    @traced("ai.parse", tracer=tracer)
+    def parse():
+        time.sleep(0.02)
+        return "ok"
+
+    @traced("navigation", tracer=tracer)
+    async def navigate():
+        with tracer.span("confirm.tts") as tts:
+            tts.set(chars=12)
+        return await run_blocking(parse)
+
+    assert asyncio.run(navigate()) == "ok"
+    spans = {span.name: span for span in tracer.spans()}
+    root = spans["navigation"]
+    assert root.parent_id is None
+    assert spans["ai.parse"].parent_id == root.span_id and spans["ai.parse"].trace_id == root.trace_id
+    assert spans["ai.parse"].thread != root.thread
+    assert spans["confirm.tts"].attrs == {"chars": 12}
+    assert spans["ai.parse"].duration_ms >= 20
+
+
+def test_error_and_record():
+    """测试异常记录与补记外部测得的区间"""
+    tracer = Tracer()
+    try:
+        with tracer.span("amap.route"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    start = time.monotonic()
+    tracer.record("asr.final", start, start + 0.3, session="confirm")
+
+    route, final = tracer.spans()
+    assert route.attrs["error"] == "ValueError"
+    assert abs(final.duration_ms - 300) < 1 and final.attrs["session"] == "confirm"
+
+
+def test_summary_and_histogram():
+    """测试按阶段汇总百分位和分桶直方图"""
+    tracer = Tracer(histogram_size=100)
+    start = time.monotonic()
+    for ms in range(1, 201):
+        tracer.record("amap.geocode", start, start + ms / 1000)
+    row = tracer.summary()["amap.geocode"]
+    assert row["n"] == 100  # 只保留最近的记录
+    assert row["p50_ms"] == 151 and row["max_ms"] == 200
+    assert histogram([5, 10, 11, 20000]) == [2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1]
+
+
+def test_export_formats():
+    """测试导出JSONL与Chrome Trace"""
+    tracer = Tracer()
+    with tracer.span("navigation", mode="amap"):
+        with tracer.span("browser.open"):
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonl_path = os.path.join(tmp_dir, "trace.jsonl")
+        assert tracer.export(jsonl_path) == 2
+        tracer.export(jsonl_path)  # JSONL追加写入，可累积多次运行
+        records = load_jsonl(jsonl_path)
+        assert len(records) == 4
+        assert records[0]["name"] == "browser.open" and records[0]["parent"] == records[1]["id"]
+        assert records[1]["attrs"] == {"mode": "amap"} and records[1]["ts"] > 1e9
+
+        chrome_path = os.path.join(tmp_dir, "trace.json")
+        tracer.export(chrome_path)
+        with open(chrome_path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+        complete = [event for event in events if event["ph"] == "X"]
+        assert [event["name"] for event in complete] == ["browser.open", "navigation"]
+        assert complete[1]["ts"] <= complete[0]["ts"] and complete[1]["dur"] >= complete[0]["dur"]
+        assert any(event["ph"] == "M" for event in events)
+
+
+def test_disabled_tracer():
+    """测试关闭追踪时不记录任何内容"""
+    tracer = Tracer(enabled=False)
+    with tracer.span("navigation") as span:
+        span.set(mode="amap")
+    tracer.record("asr.final", 0, 1)
+    assert tracer.spans() == [] and tracer.summary() == {}
+
+
+if __name__ == "__main__":
+    print("=== 链路计时测试 ===")
+    for test in [test_nested_spans_across_threads, test_error_and_record, test_summary_and_histogram,
+                 test_export_formats, test_disabled_tracer]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
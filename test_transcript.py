@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试科大讯飞动态修正(wpgs)结果拼装
+"""
+
+import json
+
+from transcript import TranscriptBuffer
+
+
+def make_result(sn, text, pgs="apd", rg=None):
+    result = {"sn": sn, "ls": False, "pgs": pgs, "ws": [{"cw": [{"w": ch}]} for ch in text]}
+    if rg:
+        result["rg"] = rg
+    return result
+
+
+class DummyWS:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_append_and_replace():
+    """测试追加与范围替换"""
+    buffer = TranscriptBuffer()
+    buffer.apply(make_result(1, "从北京"))
+    buffer.apply(make_result(2, "西站"))
+    assert buffer.text == "从北京西站"
+
+    # sn=3 替换 1~2 两个片段，修正后的文字不应重复
+    assert buffer.apply(make_result(3, "从北京西站到", pgs="rpl", rg=[1, 2])) == [3]
+    assert buffer.text == "从北京西站到"
+    assert len(buffer) == 1
+
+    buffer.apply(make_result(4, "天安门"))
+    assert buffer.text == "从北京西站到天安门"
+
+
+def test_result_without_pgs():
+    """测试未开启动态修正时按顺序追加"""
+    buffer = TranscriptBuffer()
+    buffer.apply({"sn": 1, "ws": [{"cw": [{"w": "好的"}]}]})
+    buffer.apply({"sn": 2, "ws": [{"cw": [{"w": "走吧"}]}]})
+    assert buffer.text == "好的走吧"
+
+
+def test_window_covers_segment_boundary():
+    """测试关键词跨片段时窗口带上前文"""
+    buffer = TranscriptBuffer()
+    buffer.apply(make_result(1, "我们开始"))
+    changed = buffer.apply(make_result(2, "导航吧"))
+    assert buffer.window(changed) == "导航吧"
+    assert buffer.window(changed, context=2) == "开始导航吧"
+
+
+def test_asr_keyword_on_revision():
+    """测试修正后的片段触发关键词，且结果不重复"""
+    from xfyun_asr import XfyunASR
+
+    asr = XfyunASR()
+    asr.use_keyword_profile("confirm")
+    ws = DummyWS()
+    for result in (make_result(1, "现在"), make_result(2, "确认", pgs="rpl", rg=[1, 1])):
+        asr.on_message(ws, json.dumps({"code": 0, "data": {"status": 1, "result": result}}))
+
+    assert asr.result == "确认"
+    assert asr.keyword_detected and asr.is_finished
+    assert asr.keyword_match.label == "confirm"
+
+
+def test_stale_session_callbacks():
+    """测试上一会话迟到的结果和关闭回调不影响新会话"""
+    from xfyun_asr import XfyunASR
+
+    asr = XfyunASR()
+    old = asr._reset_session()
+    new = asr._reset_session(session_type="confirm")
+    ws = DummyWS()
+    asr.on_message(ws, json.dumps({"code": 0, "data": {"status": 2, "result": make_result(1, "上一句话")}}), old)
+    asr.on_close(ws, None, None, old)
+
+    assert old.finished.is_set() and old.transcript.text == "上一句话"
+    assert asr._session is new and not asr.is_finished
+    assert asr.result == "" and not asr.final_received
+
+
+if __name__ == "__main__":
+    print("=== 动态修正结果拼装测试 ===")
+    for test in [test_append_and_replace, test_result_without_pgs,
+                 test_window_covers_segment_boundary, test_asr_keyword_on_revision,
+                 test_stale_session_callbacks]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试语音活动检测（EnergyVAD）
+"""
+
+import numpy as np
+
+from vad import SPEECH_END, SPEECH_START, EnergyVAD, create_vad, register_vad, VoiceActivityDetector
+
+FRAME = 640  # 40ms @ 16kHz
+
+
+def make_noise(frames, level, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = np.convolve(rng.normal(0, 1, frames * FRAME), np.ones(8) / 8, mode='same')
+    return noise / noise.std() * level
+
+
+def make_voice(frames, level, pitch=150.0):
+    t = np.arange(frames * FRAME) / 16000
+    voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5))
+    return voice / voice.std() * level
+
+
+def to_pcm(samples):
+    return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+
+def test_speech_start_and_end():
+    """测试语音开始与拖尾结束"""
+    vad = EnergyVAD(hangover_ms=400, min_speech_ms=120, threshold_ratio=2.0)
+    signal = make_noise(60, 300)
+    signal[10 * FRAME:30 * FRAME] += make_voice(20, 3000)
+
+    events = vad.process_samples(signal.astype(np.float32))
+    assert [event for _, event in events] == [SPEECH_START, SPEECH_END]
+
+    # 结束事件在最后一个语音帧之后 hangover 帧触发
+    end_frame = events[1][0]
+    assert vad.speech_end_frame == 30
+    assert end_frame == 30 + 10
+
+
+def test_frame_by_frame_matches_batch():
+    """测试逐帧处理与批量处理结果一致"""
+    signal = make_noise(50, 200, seed=1)
+    signal[8 * FRAME:20 * FRAME] += make_voice(12, 2500)
+
+    batch = EnergyVAD(hangover_ms=400).process_samples(signal.astype(np.float32))
+
+    vad = EnergyVAD(hangover_ms=400)
+    streamed = []
+    pcm = to_pcm(signal)
+    for i in range(50):
+        event = vad.process(pcm[i * FRAME * 2:(i + 1) * FRAME * 2])
+        if event:
+            streamed.append((vad.frames, event))
+    assert streamed == batch
+
+
+def test_adaptive_noise_floor():
+    """测试嘈杂车内噪声不会被持续判为语音"""
+    vad = EnergyVAD(hangover_ms=400)
+    # 旧的固定阈值(800)会把这种噪声一直当作语音
+    events = vad.process_samples(make_noise(100, 1500, seed=2).astype(np.float32))
+    assert not any(event == SPEECH_START for _, event in events)
+    assert 1000 < vad.noise_floor < 2000
+
+    # 新会话保留噪声基底，噪声之上的语音仍能检测到
+    vad.reset()
+    signal = make_noise(40, 1500, seed=3)
+    signal[5 * FRAME:20 * FRAME] += make_voice(15, 8000)
+    events = vad.process_samples(signal.astype(np.float32))
+    assert [event for _, event in events] == [SPEECH_START, SPEECH_END]
+
+
+def test_pluggable_backend():
+    """测试注册自定义VAD实现"""
+    class AlwaysSpeech(VoiceActivityDetector):
+        def is_speech_frame(self, pcm):
+            return True
+
+    register_vad("always", AlwaysSpeech)
+    vad = create_vad("always", min_speech_ms=40)
+    assert vad.process(b"\x00" * FRAME * 2) == SPEECH_START
+    assert isinstance(create_vad("energy"), EnergyVAD)
+
+
+if __name__ == "__main__":
+    print("=== 语音活动检测测试 ===")
+    for test in [test_speech_start_and_end, test_frame_by_frame_matches_batch,
+                 test_adaptive_noise_floor, test_pluggable_backend]:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            print(f"✗ {test.__doc__}: {e}")
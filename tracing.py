@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导航链路分段计时
+按阶段记录耗时区间(span)：语音监听、识别结果、AI解析、地址验证、确认播报、确认监听、
+地理编码、路线规划、打开浏览器。span 通过 contextvars 自动嵌套（run_blocking 会把上下文
+带进线程池），同一次导航请求下的所有阶段共享一个 trace id。
+
+记录只做一次计时和一次有界队列追加，关闭时 span() 直接返回空对象。
+进程内按阶段汇总 p50/p95 与分桶直方图（主程序中输入 stats 查看），
+可导出为 JSONL（每行一个span）或 Chrome Trace（chrome://tracing、Perfetto 打开）。
+
+用法: python tracing.py trace.jsonl [--stage ai.parse] [--chrome trace.json]
+"""
+
+import argparse
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from config import TRACE_BUFFER_SIZE, TRACE_ENABLED
+
+# 直方图分桶上界（毫秒），最后一个桶收集超过 10 秒的记录
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class Span:
+    """一个阶段的耗时区间，时刻为 time.perf_counter() 秒"""
+
+    __slots__ = ("name", "span_id", "trace_id", "parent_id", "start", "end", "thread", "attrs")
+
+    def __init__(self, name: str, span_id: int, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = span_id
+        self.trace_id = parent.trace_id if parent else span_id
+        self.parent_id = parent.span_id if parent else None
+        self.thread = threading.get_ident()
+        self.attrs = attrs
+        self.end = None
+        self.start = time.perf_counter()
+
+    def set(self, **attrs):
+        """补充属性，如识别触发原因、是否命中缓存"""
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+
+class _NullSpan:
+    """追踪关闭时返回的空span"""
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(durations: Dict[str, Iterable[float]]) -> Dict[str, Dict[str, float]]:
+    """按阶段汇总耗时（毫秒）"""
+    summary = {}
+    for name, values in durations.items():
+        values = list(values)
+        if not values:
+            continue
+        summary[name] = {
+            "n": len(values),
+            "mean_ms": round(sum(values) / len(values), 1),
+            "p50_ms": round(percentile(values, 0.5), 1),
+            "p95_ms": round(percentile(values, 0.95), 1),
+            "max_ms": round(max(values), 1),
+        }
+    return summary
+
+
+def histogram(values: Iterable[float], buckets=HISTOGRAM_BUCKETS_MS) -> List[int]:
+    """按分桶上界统计个数，返回长度为 len(buckets) + 1 的计数"""
+    counts = [0] * (len(buckets) + 1)
+    for value in values:
+        index = 0
+        while index < len(buckets) and value > buckets[index]:
+            index += 1
+        counts[index] += 1
+    return counts
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    if not summary:
+        return "暂无计时记录"
+    lines = [f"{'阶段':<20} {'n':>5} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}"]
+    for name, row in sorted(summary.items()):
+        lines.append(f"{name:<22} {row['n']:>5} {row['mean_ms']:7.0f}ms {row['p50_ms']:7.0f}ms "
+                     f"{row['p95_ms']:7.0f}ms {row['max_ms']:7.0f}ms")
+    return "\n".join(lines)
+
+
+def format_histogram(name: str, values: List[float], width: int = 40) -> str:
+    counts = histogram(values)
+    peak = max(counts) or 1
+    lines = [f"{name} ({len(values)} 次)"]
+    for index, count in enumerate(counts):
+        label = f"≤{HISTOGRAM_BUCKETS_MS[index]}ms" if index < len(HISTOGRAM_BUCKETS_MS) \
+            else f">{HISTOGRAM_BUCKETS_MS[-1]}ms"
+        lines.append(f"  {label:>9} {'█' * round(count * width / peak):<{width}} {count}")
+    return "\n".join(lines)
+
+
+def chrome_trace(records: List[dict]) -> dict:
+    """把JSONL记录转换为Chrome Trace事件（完整事件 ph=X，时间单位微秒）"""
+    origin = min((record["ts"] for record in records), default=0)
+    pid = os.getpid()
+    events = []
+    threads = {}
+    for record in records:
+        threads.setdefault(record["thread"], record.get("thread_name", str(record["thread"])))
+        args = dict(record.get("attrs", {}), trace=record["trace"], id=record["id"])
+        if record.get("parent"):
+            args["parent"] = record["parent"]
+        events.append({
+            "name": record["name"], "cat": record["name"].split(".")[0], "ph": "X",
+            "ts": round((record["ts"] - origin) * 1e6), "dur": round(record["dur_ms"] * 1000),
+            "pid": pid, "tid": record["thread"], "args": args,
+        })
+    for tid, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def load_jsonl(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Tracer:
+    """进程内追踪器：最近 buffer_size 个span用于导出，每个阶段最近 histogram_size 个耗时用于汇总"""
+
+    def __init__(self, enabled: bool = True, buffer_size: int = 5000, histogram_size: int = 1000):
+        self.enabled = enabled
+        self._ids = itertools.count(1)
+        self._spans: Deque[Span] = deque(maxlen=buffer_size)
+        self._durations: Dict[str, Deque[float]] = {}
+        self._histogram_size = histogram_size
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # perf_counter 与墙上时钟的对应关系，导出时换算成绝对时间
+        self._wall_offset = time.time() - time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """记录一个阶段；嵌套在其他span内时自动成为其子阶段，异常时记录异常类型"""
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, next(self._ids), _current_span.get(), attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """装饰器：把整个函数（同步或异步）记录为一个阶段"""
+        return traced(name, tracer=self)
+
+    def record(self, name: str, start: float, end: float, **attrs):
+        """补记在别处测得的区间，start / end 为 time.monotonic() 时刻（如识别会话的 timings）"""
+        if not self.enabled:
+            return
+        shift = time.perf_counter() - time.monotonic()
+        span = Span(name, next(self._ids), _current_span.get(), attrs)
+        span.start, span.end = start + shift, end + shift
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            durations = self._durations.get(span.name)
+            if durations is None:
+                durations = self._durations[span.name] = deque(maxlen=self._histogram_size)
+            durations.append(span.duration_ms)
+            if span.thread not in self._thread_names:
+                self._thread_names[span.thread] = threading.current_thread().name
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def durations(self, name: str) -> List[float]:
+        with self._lock:
+            return list(self._durations.get(name, ()))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+        return summarize(durations)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._durations.clear()
+
+    def records(self) -> List[dict]:
+        """span的导出格式：ts 为开始时刻（Unix秒），dur_ms 为耗时"""
+        with self._lock:
+            spans = list(self._spans)
+            thread_names = dict(self._thread_names)
+        return [{
+            "name": span.name, "trace": span.trace_id, "id": span.span_id, "parent": span.parent_id,
+            "ts": round(span.start + self._wall_offset, 6), "dur_ms": round(span.duration_ms, 3),
+            "thread": span.thread, "thread_name": thread_names.get(span.thread, ""), "attrs": span.attrs,
+        } for span in spans]
+
+    def export(self, path: str) -> int:
+        """导出到文件：.json 为Chrome Trace，其余为JSONL（追加写入），返回span数量"""
+        records = self.records()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if path.endswith(".json"):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(chrome_trace(records), f, ensure_ascii=False)
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        return len(records)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(TRACE_ENABLED, TRACE_BUFFER_SIZE)
+    return _tracer
+
+
+def span(name: str, **attrs):
+    """在全局追踪器上记录一个阶段: with span("ai.parse") as s: ..."""
+    return get_tracer().span(name, **attrs)
+
+
+def current_span():
+    """当前所在的span（不在任何span内时返回空span），用于补充属性"""
+    return _current_span.get() or _NULL_SPAN
+
+
+def traced(name: Optional[str] = None, tracer: Optional[Tracer] = None) -> Callable:
+    """装饰器：把函数记录为一个阶段，默认以函数限定名命名"""
+    def decorator(func):
+        stage = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with (tracer or get_tracer()).span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with (tracer or get_tracer()).span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总导出的导航链路计时")
+    parser.add_argument("path", help="tracing导出的JSONL文件")
+    parser.add_argument("--stage", action="append", default=[], help="显示指定阶段的耗时直方图")
+    parser.add_argument("--chrome", help="同时转换为Chrome Trace文件")
+    args = parser.parse_args()
+
+    records = load_jsonl(args.path)
+    durations: Dict[str, List[float]] = {}
+    for record in records:
+        durations.setdefault(record["name"], []).append(record["dur_ms"])
+
+    print(f"📊 {args.path}: {len(records)} 个span，{len({r['trace'] for r in records})} 次请求")
+    print(format_summary(summarize(durations)))
+    for stage in args.stage:
+        print()
+        print(format_histogram(stage, durations.get(stage, [])))
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(records), f, ensure_ascii=False)
+        print(f"\n💾 已写入 {args.chrome}，可在 chrome://tracing 或 https://ui.perfetto.dev 打开")
+
+
+if __name__ == "__main__":
+    main()
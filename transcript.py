@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科大讯飞流式识别结果拼装
+开启动态修正(dwa=wpgs)后，每条结果带有序号 sn，pgs=apd 表示追加新片段，
+pgs=rpl 表示用当前片段替换 rg=[起, 止] 范围内的旧片段。
+"""
+
+from typing import Dict, List, Optional
+
+
+def result_text(result: Dict) -> str:
+    """提取一条识别结果中的文字"""
+    return "".join(cw["w"] for item in result.get("ws", []) for cw in item.get("cw", []))
+
+
+class TranscriptBuffer:
+    """按片段序号索引的识别文本，原地应用修正"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._segments: Dict[int, str] = {}
+        self._order: List[int] = []  # 当前有效片段序号（升序）
+        self._text: Optional[str] = ""
+        self._next_sn = 1
+
+    def apply(self, result: Dict) -> List[int]:
+        """应用一条识别结果，返回内容发生变化的片段序号"""
+        sn = result.get("sn")
+        if sn is None:
+            sn = self._next_sn
+        self._next_sn = max(self._next_sn, sn + 1)
+
+        if result.get("pgs") == "rpl":
+            start, end = result.get("rg", [sn, sn])
+            for old in [s for s in self._order if start <= s <= end]:
+                del self._segments[old]
+            self._order = [s for s in self._order if not start <= s <= end]
+
+        if sn not in self._segments:
+            # 新片段通常在末尾，只有乱序到达时才需要插入
+            if self._order and self._order[-1] > sn:
+                self._order.append(sn)
+                self._order.sort()
+            else:
+                self._order.append(sn)
+        self._segments[sn] = result_text(result)
+        self._text = None
+        return [sn]
+
+    @property
+    def text(self) -> str:
+        """当前完整识别文本（只在内容变化后重新拼接）"""
+        if self._text is None:
+            self._text = "".join(self._segments[sn] for sn in self._order)
+        return self._text
+
+    def __str__(self) -> str:
+        return self.text
+
+    def window(self, changed: List[int], context: int = 0) -> str:
+        """返回变化片段的文本，并带上前一片段末尾 context 个字符
+
+        关键词可能跨越片段边界，上下文长度取最长关键词长度减一即可。
+        """
+        if not changed:
+            return ""
+        first = min(changed)
+        index = self._order.index(first) if first in self._order else 0
+        parts = [self._segments[sn] for sn in self._order[index:] if sn in changed]
+        prefix = ""
+        if context > 0:
+            for sn in reversed(self._order[:index]):
+                prefix = self._segments[sn] + prefix
+                if len(prefix) >= context:
+                    break
+            prefix = prefix[-context:]
+        return prefix + "".join(parts)
+
+    @property
+    def last_sn(self) -> Optional[int]:
+        """当前最后一个片段的序号"""
+        return self._order[-1] if self._order else None
+
+    def __len__(self) -> int:
+        return len(self._order)
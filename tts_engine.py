@@ -7,6 +7,9 @@ import tempfile
 import time
 import hashlib
 from typing import Optional, Dict, Any
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 class TTSEngine:
     """多引擎语音播报类 - 优化版"""
@@ -21,16 +24,16 @@ class TTSEngine:
     
     def test_engines(self):
         """测试可用的TTS引擎"""
-        print("🔍 测试可用的TTS引擎...")
+        logger.info("🔍 测试可用的TTS引擎...")
         
         for engine in self.engines:
             if self._test_engine(engine):
                 self.current_engine = engine
-                print(f"✅ 选择引擎: {engine}")
+                logger.info("✅ 选择引擎: %s", engine)
                 break
         
         if not self.current_engine:
-            print("❌ 未找到可用的TTS引擎")
+            logger.error("❌ 未找到可用的TTS引擎")
             self.current_engine = 'fallback'
     
     def _test_engine(self, engine_name: str) -> bool:
@@ -44,7 +47,7 @@ class TTSEngine:
                 return self._test_pyttsx3()
             return False
         except Exception as e:
-            print(f"   ❌ {engine_name} 测试失败: {e}")
+            logger.info("   ❌ %s 测试失败: %s", engine_name, e)
             return False
     
     def _test_sapi(self) -> bool:
@@ -53,20 +56,20 @@ class TTSEngine:
             import win32com.client
             sapi = win32com.client.Dispatch("SAPI.SpVoice")
             # 不实际播放，只测试创建
-            print("   ✅ Windows SAPI 可用")
+            logger.info("   ✅ Windows SAPI 可用")
             return True
         except Exception:
-            print("   ❌ Windows SAPI 不可用")
+            logger.info("   ❌ Windows SAPI 不可用")
             return False
     
     def _test_edge_tts(self) -> bool:
         """测试Edge TTS"""
         try:
             import edge_tts
-            print("   ✅ Edge TTS 可用")
+            logger.info("   ✅ Edge TTS 可用")
             return True
         except Exception:
-            print("   ❌ Edge TTS 不可用")
+            logger.info("   ❌ Edge TTS 不可用")
             return False
     
     def _test_pyttsx3(self) -> bool:
@@ -75,15 +78,15 @@ class TTSEngine:
             import pyttsx3
             engine = pyttsx3.init()
             engine.stop()
-            print("   ✅ pyttsx3 可用")
+            logger.info("   ✅ pyttsx3 可用")
             return True
         except Exception:
-            print("   ❌ pyttsx3 不可用")
+            logger.info("   ❌ pyttsx3 不可用")
             return False
     
     def speak(self, text: str) -> bool:
         """语音播报"""
-        print(f"🔊 [{self.current_engine}] 播报: {text}")
+        logger.info("🔊 [%s] 播报: %s", self.current_engine, text)
         
         try:
             if self.current_engine == 'sapi':
@@ -94,10 +97,10 @@ class TTSEngine:
                 return self._speak_pyttsx3(text)
             else:
                 # 备选方案：控制台输出
-                print(f"📢 播报内容: {text}")
+                logger.warning("📢 播报内容: %s", text)
                 return True
         except Exception as e:
-            print(f"❌ 播报失败: {e}")
+            logger.error("❌ 播报失败: %s", e)
             # 尝试下一个引擎
             return self._try_next_engine(text)
     
@@ -130,7 +133,7 @@ class TTSEngine:
                 
                 if best_voice:
                     sapi.Voice = best_voice
-                    print(f"🎤 使用语音: {best_voice.GetDescription()}")
+                    logger.debug("🎤 使用语音: %s", best_voice.GetDescription())
                 
                 self.engine_cache['sapi'] = sapi
             
@@ -138,11 +141,11 @@ class TTSEngine:
             
             # 同步播报，确保完成
             sapi.Speak(text, 0)  # 0 = 同步模式
-            print("✅ SAPI播报完成")
+            logger.debug("✅ SAPI播报完成")
             return True
             
         except Exception as e:
-            print(f"❌ SAPI播报失败: {e}")
+            logger.error("❌ SAPI播报失败: %s", e)
             # 清除缓存的实例
             if 'sapi' in self.engine_cache:
                 del self.engine_cache['sapi']
@@ -174,7 +177,7 @@ class TTSEngine:
                     )
                     
                     await communicate.save(cache_path)
-                    print(f"💾 缓存语音: {cache_path}")
+                    logger.debug("💾 缓存语音: %s", cache_path)
                 
                 # 初始化pygame音频
                 if not pygame.mixer.get_init():
@@ -191,7 +194,7 @@ class TTSEngine:
                 
                 if time.time() >= timeout:
                     pygame.mixer.music.stop()
-                    print("⚠️ 播放超时，强制停止")
+                    logger.warning("⚠️ 播放超时，强制停止")
             
             # 运行异步函数
             try:
@@ -213,11 +216,11 @@ class TTSEngine:
                     future = executor.submit(run_in_thread)
                     future.result(timeout=35)  # 35秒总超时
             
-            print("✅ Edge TTS播报完成")
+            logger.debug("✅ Edge TTS播报完成")
             return True
             
         except Exception as e:
-            print(f"❌ Edge TTS播报失败: {e}")
+            logger.error("❌ Edge TTS播报失败: %s", e)
             return False
     
     def _speak_pyttsx3(self, text: str) -> bool:
@@ -255,7 +258,7 @@ class TTSEngine:
                 
                 if best_voice:
                     engine.setProperty('voice', best_voice.id)
-                    print(f"🎤 使用pyttsx3语音: {best_voice.name}")
+                    logger.debug("🎤 使用pyttsx3语音: %s", best_voice.name)
                 
                 self.engine_cache['pyttsx3'] = engine
             
@@ -268,11 +271,11 @@ class TTSEngine:
             engine.say(text)
             engine.runAndWait()
             
-            print("✅ pyttsx3播报完成")
+            logger.debug("✅ pyttsx3播报完成")
             return True
             
         except Exception as e:
-            print(f"❌ pyttsx3播报失败: {e}")
+            logger.error("❌ pyttsx3播报失败: %s", e)
             # 清除缓存的实例
             if 'pyttsx3' in self.engine_cache:
                 try:
@@ -288,14 +291,14 @@ class TTSEngine:
         
         for i in range(current_index + 1, len(self.engines)):
             engine_name = self.engines[i]
-            print(f"🔄 尝试切换到 {engine_name}")
+            logger.info("🔄 尝试切换到 %s", engine_name)
             
             if self._test_engine(engine_name):
                 self.current_engine = engine_name
                 return self.speak(text)
         
         # 所有引擎都失败，使用备选方案
-        print(f"📢 所有TTS引擎都失败，控制台输出: {text}")
+        logger.warning("📢 所有TTS引擎都失败，控制台输出: %s", text)
         return True
     
     def get_engine_info(self) -> str:
@@ -326,7 +329,7 @@ class TTSEngine:
             if os.path.exists(self.cache_dir):
                 try:
                     shutil.rmtree(self.cache_dir)
-                    print(f"🧹 清理缓存目录: {self.cache_dir}")
+                    logger.debug("🧹 清理缓存目录: %s", self.cache_dir)
                 except:
                     pass
             
@@ -334,7 +337,7 @@ class TTSEngine:
             self.audio_cache.clear()
             
         except Exception as e:
-            print(f"⚠️ 清理资源时出错: {e}")
+            logger.warning("⚠️ 清理资源时出错: %s", e)
     
     def __del__(self):
         """析构函数"""
@@ -346,10 +349,10 @@ class TTSEngine:
             if self._test_engine(engine_name):
                 old_engine = self.current_engine
                 self.current_engine = engine_name
-                print(f"🔄 引擎切换: {old_engine} → {engine_name}")
+                logger.info("🔄 引擎切换: %s → %s", old_engine, engine_name)
                 return True
             else:
-                print(f"❌ 引擎 {engine_name} 不可用")
+                logger.error("❌ 引擎 %s 不可用", engine_name)
                 return False
         else:
             # 自动切换到下一个可用引擎
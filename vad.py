@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音活动检测（VAD）
+基类负责语音起止判定（起始确认 + 拖尾hangover），子类只需判断单帧是否为语音。
+默认实现 EnergyVAD 基于NumPy计算能量与过零率，并自适应跟踪背景噪声。
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+from config import VAD_BACKEND, VAD_HANGOVER_MS, VAD_MIN_SPEECH_MS, VAD_THRESHOLD_RATIO
+from xfyun_frames import FRAME_BYTES, FRAME_DURATION, SAMPLE_RATE
+
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+
+def pcm_to_samples(pcm) -> np.ndarray:
+    """16bit PCM字节转换为float32采样数组"""
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+
+
+def frame_features(samples: np.ndarray, frame_samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    """按帧批量计算能量(RMS)与过零率，不足一帧的尾部丢弃"""
+    count = len(samples) // frame_samples
+    frames = samples[:count * frame_samples].reshape(count, frame_samples)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return rms, zcr
+
+
+class VoiceActivityDetector:
+    """VAD基类
+
+    process() 每次输入一帧PCM，检测到语音开始/结束时返回 SPEECH_START / SPEECH_END，
+    其余情况返回 None。连续语音达到 min_speech_ms 才确认开始，
+    语音后静音持续 hangover_ms 才判定结束。
+    """
+
+    def __init__(self, frame_ms: float = FRAME_DURATION * 1000,
+                 hangover_ms: float = VAD_HANGOVER_MS,
+                 min_speech_ms: float = VAD_MIN_SPEECH_MS):
+        self.frame_ms = frame_ms
+        self.hangover_frames = max(1, int(round(hangover_ms / frame_ms)))
+        self.min_speech_frames = max(1, int(round(min_speech_ms / frame_ms)))
+        self.reset()
+
+    def is_speech_frame(self, pcm) -> bool:
+        """判断单帧是否为语音，由子类实现"""
+        raise NotImplementedError
+
+    def reset(self):
+        """重置起止状态，开始新的识别会话"""
+        self.in_speech = False
+        self.has_speech = False  # 本次会话是否出现过语音
+        self.frames = 0
+        self._speech_run = 0
+        self._silence_run = 0
+        self.speech_start_frame = None
+        self.speech_end_frame = None  # 最后一个语音帧之后的位置
+
+    def process(self, pcm) -> Optional[str]:
+        """输入一帧PCM，返回语音事件"""
+        return self.update(self.is_speech_frame(pcm))
+
+    def update(self, speech: bool) -> Optional[str]:
+        """用已判定的单帧结果推进起止状态"""
+        self.frames += 1
+
+        if speech:
+            self._speech_run += 1
+            self._silence_run = 0
+            if not self.in_speech and self._speech_run >= self.min_speech_frames:
+                self.in_speech = True
+                self.has_speech = True
+                self.speech_start_frame = self.frames - self._speech_run
+                return SPEECH_START
+            return None
+
+        self._speech_run = 0
+        if self.in_speech:
+            self._silence_run += 1
+            if self._silence_run >= self.hangover_frames:
+                self.in_speech = False
+                self.speech_end_frame = self.frames - self._silence_run
+                return SPEECH_END
+        return None
+
+    @property
+    def speech_end_time(self) -> Optional[float]:
+        """最近一段语音的结束时间（秒，相对会话开始）"""
+        if self.speech_end_frame is None:
+            return None
+        return self.speech_end_frame * self.frame_ms / 1000
+
+
+class EnergyVAD(VoiceActivityDetector):
+    """能量 + 过零率VAD，阈值跟随背景噪声自适应
+
+    噪声基底在安静帧时快速下降、在非语音帧时缓慢上升，语音帧期间以更慢的速度上升，
+    因此持续的车内噪声不会被长期误判为语音。
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE,
+                 threshold_ratio: float = VAD_THRESHOLD_RATIO,
+                 min_rms: float = 200.0,
+                 zcr_max: float = 0.35,
+                 init_frames: int = 5,
+                 noise_rise: float = 0.05,
+                 noise_fall: float = 0.5,
+                 speech_rise: float = 0.01,
+                 **kwargs):
+        self.sample_rate = sample_rate
+        self.threshold_ratio = threshold_ratio
+        self.min_rms = min_rms
+        self.zcr_max = zcr_max
+        self.init_frames = init_frames
+        self.noise_rise = noise_rise
+        self.noise_fall = noise_fall
+        self.speech_rise = speech_rise
+        self.noise_floor = None
+        self._init_levels = []
+        super().__init__(**kwargs)
+
+    def reset(self, keep_noise_floor: bool = True):
+        """重置会话状态，默认保留已学习的噪声基底"""
+        super().reset()
+        if not keep_noise_floor:
+            self.noise_floor = None
+            self._init_levels = []
+
+    @property
+    def threshold(self) -> float:
+        """当前语音能量阈值"""
+        if self.noise_floor is None:
+            return self.min_rms
+        return max(self.noise_floor * self.threshold_ratio, self.min_rms)
+
+    def classify(self, rms: float, zcr: float) -> bool:
+        """根据帧特征判断是否为语音，并更新噪声基底"""
+        # 初始若干帧只用于估计噪声基底
+        if self.noise_floor is None:
+            self._init_levels.append(rms)
+            if len(self._init_levels) >= self.init_frames:
+                self.noise_floor = float(min(self._init_levels))
+                self._init_levels = []
+            return False
+
+        threshold = self.threshold
+        # 过零率过高且能量不突出的帧多为风噪/摩擦噪声
+        speech = rms > threshold and (zcr < self.zcr_max or rms > threshold * 3)
+
+        if rms < self.noise_floor:
+            self.noise_floor += self.noise_fall * (rms - self.noise_floor)
+        else:
+            rise = self.speech_rise if speech else self.noise_rise
+            self.noise_floor += rise * (rms - self.noise_floor)
+        return speech
+
+    def is_speech_frame(self, pcm) -> bool:
+        samples = pcm_to_samples(pcm)
+        if len(samples) == 0:
+            return False
+        rms, zcr = frame_features(samples, len(samples))
+        return self.classify(float(rms[0]), float(zcr[0]))
+
+    def process_samples(self, samples: np.ndarray, frame_samples: int = None):
+        """离线处理整段音频：特征一次性向量化计算，返回 [(帧序号, 事件)]"""
+        frame_samples = frame_samples or int(self.sample_rate * self.frame_ms / 1000)
+        rms, zcr = frame_features(samples, frame_samples)
+        events = []
+        for level, rate in zip(rms.tolist(), zcr.tolist()):
+            event = self.update(self.classify(level, rate))
+            if event:
+                events.append((self.frames, event))
+        return events
+
+
+VAD_BACKENDS: Dict[str, Type[VoiceActivityDetector]] = {
+    "energy": EnergyVAD,
+}
+
+
+def register_vad(name: str, backend: Type[VoiceActivityDetector]):
+    """注册自定义VAD实现（例如基于模型的检测器）"""
+    VAD_BACKENDS[name] = backend
+
+
+def create_vad(backend: str = None, **kwargs) -> VoiceActivityDetector:
+    """按名称创建VAD，默认使用配置中的 VAD_BACKEND"""
+    name = backend or VAD_BACKEND
+    if name not in VAD_BACKENDS:
+        raise ValueError(f"未知的VAD实现: {name}，可选: {', '.join(VAD_BACKENDS)}")
+    return VAD_BACKENDS[name](**kwargs)
+
+
+def capture_utterance(reader, timeout: float, hangover_ms: float = VAD_HANGOVER_MS,
+                      max_ms: float = 10000, stop: threading.Event = None,
+                      vad: VoiceActivityDetector = None,
+                      deadline: Optional[float] = None) -> Tuple[Optional[bytes], int]:
+    """从录音读取游标中截取一句话（VAD端点检测）
+
+    返回 (语音PCM, 语音起始的绝对位置)，超时未说话或 stop 被置位时返回 (None, 当前位置)。
+    起始处多保留两帧，避免切掉辅音。
+    deadline: 绝对截止时刻(time.monotonic)，到达时即使还在说话也结束，返回已截取的部分
+    """
+    vad = vad or create_vad(hangover_ms=hangover_ms)
+    frames: List[bytes] = []
+    speech_start = None
+    event = None
+    onset_deadline = time.monotonic() + timeout
+    max_frames = int(max_ms / (FRAME_DURATION * 1000))
+
+    while True:
+        if stop is not None and stop.is_set():
+            return None, reader.position
+        if speech_start is None and time.monotonic() > onset_deadline:
+            return None, reader.position
+        if deadline is not None and time.monotonic() > deadline:
+            if speech_start is None:
+                return None, reader.position
+            break
+        buf = reader.read(FRAME_BYTES, timeout=1.0)
+        if len(buf) < FRAME_BYTES:
+            return None, reader.position
+        frames.append(buf)
+        event = vad.process(buf)
+
+        if event == SPEECH_START:
+            keep = vad.frames - vad.speech_start_frame + 2
+            frames = frames[-keep:]
+            speech_start = reader.position - len(frames) * FRAME_BYTES
+        elif speech_start is None:
+            frames = frames[-(vad.min_speech_frames + 2):]
+        elif event == SPEECH_END or len(frames) >= max_frames:
+            break
+
+    # 去掉拖尾静音
+    trailing = vad.frames - vad.speech_end_frame if event == SPEECH_END else 0
+    if trailing:
+        frames = frames[:-trailing]
+    return b"".join(frames), speech_start
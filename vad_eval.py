@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VAD离线评估
+对录制好的WAV文件逐个运行VAD，统计语音结束检测延迟，用于调整拖尾时长和能量阈值。
+
+标注文件为CSV，包含 file,speech_end 两列（speech_end 为人工标注的说完时刻，秒）；
+没有标注时以VAD自身判断的语音结束点为准，只统计拖尾带来的延迟。
+
+用法:
+    python vad_eval.py recordings/ --labels recordings/labels.csv --hangover 400,600,800 --ratio 2.5,3,4
+    python vad_eval.py --synthetic 30          # 无录音时用合成的车内噪声样本自检
+"""
+
+import argparse
+import csv
+import os
+import statistics
+import wave
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vad import SPEECH_END, SPEECH_START, EnergyVAD, VoiceActivityDetector, frame_features
+from xfyun_frames import SAMPLE_RATE
+
+
+def read_wav(path: str) -> np.ndarray:
+    """读取16bit WAV为16kHz单声道float32采样"""
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: 仅支持16bit PCM")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16).astype(np.float32)
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        duration = len(samples) / rate
+        target = np.linspace(0, duration, int(duration * SAMPLE_RATE), endpoint=False)
+        samples = np.interp(target, np.arange(len(samples)) / rate, samples).astype(np.float32)
+    return samples
+
+
+def load_labels(path: Optional[str]) -> Dict[str, float]:
+    """读取标注文件，键为WAV文件名"""
+    if not path:
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return {os.path.basename(row['file']): float(row['speech_end']) for row in csv.DictReader(f)}
+
+
+def collect_wavs(paths: List[str]) -> List[str]:
+    """展开目录，收集所有WAV文件"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith('.wav'))
+        else:
+            files.append(path)
+    return files
+
+
+def synthesize(count: int, seed: int = 0):
+    """合成测试样本：车内低频噪声 + 带音节包络的谐波"语音"，返回 [(名称, 采样, 说完时刻)]"""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(count):
+        noise_level = rng.uniform(50, 1200)
+        lead, speech, tail = rng.uniform(0.3, 1.0), rng.uniform(0.8, 2.5), 3.5
+        total = int((lead + speech + tail) * SAMPLE_RATE)
+
+        # 车内噪声能量集中在低频：对白噪声做滑动平均
+        noise = np.convolve(rng.normal(0, 1, total), np.ones(8) / 8, mode='same')
+        signal = noise / noise.std() * noise_level
+
+        t = np.arange(int(speech * SAMPLE_RATE)) / SAMPLE_RATE
+        pitch = rng.uniform(110, 240)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        syllables = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t), 0.15, None)  # 音节间短暂停顿
+        snr_db = rng.uniform(8, 25)
+        voice = voice * syllables
+        voice = voice / voice.std() * noise_level * 10 ** (snr_db / 20)
+
+        start = int(lead * SAMPLE_RATE)
+        signal[start:start + len(voice)] += voice
+        samples.append((f"synthetic_{i:03d}", signal.astype(np.float32), lead + speech))
+    return samples
+
+
+class LegacyRMSVAD(VoiceActivityDetector):
+    """旧实现基线：固定RMS阈值（说话前800、说话后300），静音约3秒才结束"""
+
+    def __init__(self):
+        super().__init__(hangover_ms=3000, min_speech_ms=0)
+
+    def process_samples(self, samples: np.ndarray):
+        rms, _ = frame_features(samples, int(SAMPLE_RATE * self.frame_ms / 1000))
+        events = []
+        for level in rms.tolist():
+            event = self.update(level >= (300 if self.has_speech else 800))
+            if event:
+                events.append((self.frames, event))
+        return events
+
+
+def evaluate(clips, hangover_ms: float, ratio: float, legacy: bool = False) -> Dict[str, float]:
+    """用一组参数评估全部样本"""
+    latencies = []
+    missed = truncated = false_starts = 0
+
+    for name, samples, label_end in clips:
+        if legacy:
+            vad = LegacyRMSVAD()
+        else:
+            vad = EnergyVAD(hangover_ms=hangover_ms, threshold_ratio=ratio)
+        events = vad.process_samples(samples)
+        end_events = [frame for frame, event in events if event == SPEECH_END]
+        starts = sum(1 for _, event in events if event == SPEECH_START)
+        false_starts += max(0, starts - 1)
+
+        if not end_events:
+            missed += 1
+            continue
+
+        # 以最后一次语音结束事件为准，比它早的结束事件会把一句话切断
+        detected_at = end_events[-1] * vad.frame_ms / 1000
+        reference = label_end if label_end is not None else vad.speech_end_time
+        if len(end_events) > 1 or detected_at < reference:
+            truncated += 1
+        latencies.append((detected_at - reference) * 1000)
+
+    result = {
+        "hangover_ms": hangover_ms,
+        "ratio": ratio,
+        "clips": len(clips),
+        "missed": missed,
+        "truncated": truncated,
+        "false_starts": false_starts,
+    }
+    if latencies:
+        latencies.sort()
+        result["p50_ms"] = statistics.median(latencies)
+        result["p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        result["mean_ms"] = statistics.fmean(latencies)
+    return result
+
+
+def parse_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD离线评估")
+    parser.add_argument("paths", nargs="*", help="WAV文件或目录")
+    parser.add_argument("--labels", help="标注CSV (file,speech_end)")
+    parser.add_argument("--hangover", default="400,600,800,1000", help="拖尾时长列表（毫秒）")
+    parser.add_argument("--ratio", default="2,2.5,3", help="能量阈值倍数列表")
+    parser.add_argument("--synthetic", type=int, default=0, help="生成合成样本数量")
+    parser.add_argument("--seed", type=int, default=0, help="合成样本随机种子")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    clips = [(os.path.basename(path), read_wav(path), labels.get(os.path.basename(path)))
+             for path in collect_wavs(args.paths)]
+    if args.synthetic:
+        clips.extend(synthesize(args.synthetic, args.seed))
+    if not clips:
+        parser.error("请指定WAV文件/目录，或使用 --synthetic 生成样本")
+
+    print(f"=== VAD离线评估 ({len(clips)} 个样本) ===")
+    print(f"{'hangover  ratio':>16} {'p50':>9} {'p95':>9} {'mean':>9} "
+          f"{'漏检':>4} {'截断':>4} {'误触发':>4}")
+    runs = [("固定阈值", evaluate(clips, 0, 0, legacy=True))]
+    for hangover in parse_list(args.hangover):
+        for ratio in parse_list(args.ratio):
+            runs.append((f"{hangover:7.0f}ms {ratio:6.2f}", evaluate(clips, hangover, ratio)))
+
+    for label, r in runs:
+        if "p50_ms" in r:
+            latency = f"{r['p50_ms']:7.0f}ms {r['p95_ms']:7.0f}ms {r['mean_ms']:7.0f}ms"
+        else:
+            latency = f"{'-':>9} {'-':>9} {'-':>9}"
+        print(f"{label:>16} {latency} {r['missed']:>6} {r['truncated']:>6} {r['false_starts']:>6}")
+
+
+if __name__ == "__main__":
+    main()
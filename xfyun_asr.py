@@ -4,56 +4,194 @@ import hashlib
 import base64
 import hmac
 import json
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 import time
 import ssl
 from wsgiref.handlers import format_date_time
 from datetime import datetime
 from time import mktime
-import _thread as thread
-import pyaudio
+import threading
 import wave
 import io
-from config import XFYUN_APP_ID, XFYUN_API_SECRET, XFYUN_API_KEY
+from config import XFYUN_APP_ID, XFYUN_API_SECRET, XFYUN_API_KEY, XFYUN_ASR_URL, AUDIO_PREROLL_MS
+from audio_capture import get_audio_capture
+from vad import create_vad
+from transcript import TranscriptBuffer
+from keyword_spotter import KEYWORD_PROFILES, get_spotter
+from xfyun_frames import (
+    STATUS_FIRST_FRAME, STATUS_CONTINUE_FRAME, STATUS_LAST_FRAME,
+    DEFAULT_BUSINESS, FRAME_BYTES, FRAME_DURATION, FRAME_SAMPLES, SAMPLE_RATE, XfyunFrameEncoder
+)
+from xfyun_connection import XfyunConnectionPool
+from tracing import get_tracer
+from app_logging import get_logger
+
+RESULT_TIMEOUT = 3.0  # 发送最后一帧后等待最终结果的最长时间（秒）
+READ_TIMEOUT = 1.0  # 从常驻录音读取一帧的最长等待时间（秒）
+STATUS_INTERVAL = 2.0  # 等待期间输出状态日志的间隔（秒）
+
+logger = get_logger(__name__)
+
+# 各会话类型的识别参数：确认回答很短，静音检测时间可以更短
+SESSION_BUSINESS = {
+    "command": DEFAULT_BUSINESS,
+    "confirm": dict(DEFAULT_BUSINESS, vad_eos=2000),
+}
+
+class _Session:
+    """单次识别会话的状态
+    
+    每次会话新建一个，后台线程和回调都持有所属会话的引用：上一会话迟到的接收循环、
+    连接关闭回调只会写入旧会话，不会提前结束下一会话或覆盖它的识别结果。
+    """
+    
+    def __init__(self, keyword_stream, preroll_ms=AUDIO_PREROLL_MS, business=DEFAULT_BUSINESS):
+        self.transcript = TranscriptBuffer()  # 按片段序号保存，原地应用动态修正
+        self.finished = threading.Event()  # 最终结果、关键词、错误或连接关闭时置位
+        self.keyword_stream = keyword_stream
+        self.preroll_ms = preroll_ms
+        self.business = business
+        self.ws = None
+        self.error = None
+        self.keyword_detected = False
+        self.keyword_match = None  # 命中的关键词（含分类，如 cancel / confirm）
+        self.final_received = False  # 是否收到服务端的最终结果 (status == 2)
+        self.timings = {"start": time.monotonic()}  # 各事件的时刻：start / first_partial / keyword / final
 
-STATUS_FIRST_FRAME = 0  # 第一帧的标识
-STATUS_CONTINUE_FRAME = 1  # 中间帧标识
-STATUS_LAST_FRAME = 2  # 最后一帧的标识
 
 class XfyunASR:
     def __init__(self):
         self.app_id = XFYUN_APP_ID
         self.api_secret = XFYUN_API_SECRET
         self.api_key = XFYUN_API_KEY
+        self.url = XFYUN_ASR_URL
         
         # 音频参数
-        self.chunk = 1024  # 每次读取的音频数据大小
-        self.format = pyaudio.paInt16  # 音频格式
+        self.chunk = FRAME_SAMPLES  # 每次读取一帧(40ms)的采样数
         self.channels = 1  # 单声道
-        self.rate = 16000  # 采样率
+        self.rate = SAMPLE_RATE  # 采样率
         
-        # 识别结果
-        self.result = ""
-        self.is_finished = False
-        self.ws = None
+        # 常驻录音：会话开始时从预录窗口读取，连接建立期间的语音不会丢失
+        self.capture = get_audio_capture()
+        self.preroll_ms = AUDIO_PREROLL_MS
+        
+        # 语音活动检测，噪声基底在会话之间保留
+        self.vad = create_vad()
         
-        # 智能处理参数
-        self.trigger_keywords = ["开始导航", "导航", "开始", "走吧", "出发"]
+        # 预热连接池：TTS播报期间提前签名并建立连接
+        self.connection_pool = XfyunConnectionPool(self.create_url)
+        
+        # 智能处理参数：关键词按会话类型使用对应的命名配置
+        self.spotter = get_spotter("command")
         self.auto_trigger_timeout = 12  # 12秒无语音自动触发
-        self.keyword_detected = False
         
+        # 当前会话的状态（识别结果、完成事件、连接等）
+        self._session = _Session(self.spotter.stream(), self.preroll_ms)
+    
+    # 当前会话状态的只读视图
+    @property
+    def transcript(self):
+        return self._session.transcript
+    
+    @property
+    def result(self):
+        """当前识别文本"""
+        return self._session.transcript.text
+    
+    @property
+    def error(self):
+        return self._session.error
+    
+    @property
+    def keyword_detected(self):
+        return self._session.keyword_detected
+    
+    @property
+    def keyword_match(self):
+        return self._session.keyword_match
+    
+    @property
+    def final_received(self):
+        return self._session.final_received
+    
+    @property
+    def timings(self):
+        return self._session.timings
+    
+    @property
+    def ws(self):
+        return self._session.ws
+    
+    @property
+    def is_finished(self):
+        """识别会话是否已结束"""
+        return self._session.finished.is_set()
+    
+    @is_finished.setter
+    def is_finished(self, value):
+        if value:
+            self._session.finished.set()
+        else:
+            self._session.finished.clear()
+    
+    def wait_finished(self, timeout=None):
+        """阻塞等待会话结束，返回是否在超时前结束"""
+        return self._session.finished.wait(timeout)
+    
+    def _reset_session(self, preroll_ms=None, session_type="command"):
+        """开始新的识别会话，返回会话对象"""
+        self._session = _Session(
+            self.spotter.stream(),
+            self.preroll_ms if preroll_ms is None else preroll_ms,
+            SESSION_BUSINESS.get(session_type, DEFAULT_BUSINESS),
+        )
+        return self._session
+    
+    def prewarm(self, session_type="command"):
+        """在后台预先建立指定会话类型的连接"""
+        if self._config_ready():
+            self.connection_pool.prewarm(session_type)
+    
+    def cancel(self, session=None):
+        """提前结束会话（例如并行识别中其他识别器已给出结果），默认为当前会话"""
+        session = session or self._session
+        session.finished.set()
+        self._close_ws(session)
+    
+    def use_keyword_profile(self, profile):
+        """切换关键词配置（未定义的会话类型使用 command 配置）"""
+        self.spotter = get_spotter(profile if profile in KEYWORD_PROFILES else "command")
+        self._session.keyword_stream = self.spotter.stream()
+    
+    def _config_ready(self):
+        """检查API配置是否完整"""
+        keys = [self.app_id, self.api_secret, self.api_key]
+        return all(keys) and not any(key.startswith('your-') for key in keys)
+    
+    def _close_ws(self, session=None):
+        """关闭会话的WebSocket连接（直接关闭套接字，唤醒阻塞在recv上的接收线程）"""
+        ws = (session or self._session).ws
+        if ws:
+            try:
+                ws.abort()
+                ws.shutdown()
+            except:
+                pass
+    
     def create_url(self):
         """生成鉴权URL"""
-        url = 'wss://ws-api.xfyun.cn/v2/iat'
+        url = self.url
+        parsed = urlparse(url)
+        host = parsed.netloc
         
         # 生成RFC1123格式的时间戳
         now = datetime.now()
         date = format_date_time(mktime(now.timetuple()))
         
         # 拼接字符串
-        signature_origin = "host: " + "ws-api.xfyun.cn" + "\n"
+        signature_origin = "host: " + host + "\n"
         signature_origin += "date: " + date + "\n"
-        signature_origin += "GET " + "/v2/iat " + "HTTP/1.1"
+        signature_origin += "GET " + parsed.path + " HTTP/1.1"
         
         # 进行hmac-sha256进行加密
         signature_sha = hmac.new(self.api_secret.encode('utf-8'), 
@@ -69,22 +207,24 @@ class XfyunASR:
         v = {
             "authorization": authorization,
             "date": date,
-            "host": "ws-api.xfyun.cn"
+            "host": host
         }
         
         # 拼接鉴权参数，生成url
         url = url + '?' + urlencode(v)
         return url
     
-    def on_message(self, ws, message):
-        """收到websocket消息的处理"""
+    def on_message(self, ws, message, session=None):
+        """收到websocket消息的处理（写入所属会话，默认为当前会话）"""
+        session = session or self._session
         try:
             data = json.loads(message)
             code = data.get("code", 0)
             
             if code != 0:
-                print(f'请求错误: {code}, {data.get("message", "未知错误")}')
-                self.is_finished = True
+                logger.error("请求错误: %s, %s", code, data.get("message", "未知错误"))
+                session.error = f'{code}: {data.get("message", "未知错误")}'
+                session.finished.set()
                 ws.close()
                 return
             
@@ -92,246 +232,210 @@ class XfyunASR:
             if "data" in data and "result" in data["data"]:
                 result = data["data"]["result"]
                 if result and "ws" in result:
-                    ws_list = result["ws"]
-                    for i in ws_list:
-                        for w in i["cw"]:
-                            self.result += w["w"]
-                    print(f"当前识别结果: {self.result}")
+                    # 追加(apd)或替换(rpl)对应片段，避免修正后的文字重复出现
+                    changed = session.transcript.apply(result)
+                    session.timings.setdefault("first_partial", time.monotonic())
+                    logger.debug("当前识别结果: %s", session.transcript)  # 只在输出时才拼接文本
                     
-                    # 检查是否包含触发关键词
-                    self.check_trigger_keywords()
+                    # 只在变化的片段（及其前文）中检查触发关键词
+                    self.check_trigger_keywords(changed, revised=result.get("pgs") == "rpl", session=session)
             
             # 检查是否是最终结果
             if "data" in data and data["data"].get("status") == 2:
-                print("收到最终识别结果")
-                # 立即标记完成，不需要延迟
-                self.is_finished = True
+                logger.debug("收到最终识别结果")
+                session.final_received = True
+                session.timings["final"] = time.monotonic()
+                # 立即通知等待方，并主动关闭连接结束 run_forever
+                session.finished.set()
+                ws.close()
                         
         except Exception as e:
-            print(f"消息处理错误: {e}")
-            print(f"原始消息: {message}")
+            logger.error("消息处理错误: %s", e)
+            logger.debug("原始消息: %s", message)
     
-    def on_error(self, ws, error):
+    def on_error(self, ws, error, session=None):
         """websocket错误处理"""
-        print(f"WebSocket连接错误: {error}")
+        session = session or self._session
+        logger.error("WebSocket连接错误: %s", error)
         # 不要立即标记完成，给重连机会
         if "Connection is already closed" not in str(error):
-            self.is_finished = True
+            session.error = str(error)
+            session.finished.set()
     
-    def on_close(self, ws, close_status_code, close_msg):
+    def on_close(self, ws, close_status_code, close_msg, session=None):
         """websocket关闭处理"""
-        print(f"WebSocket连接已关闭 (状态码: {close_status_code})")
-        # 立即标记完成
-        self.is_finished = True
+        logger.debug("WebSocket连接已关闭 (状态码: %s)", close_status_code)
+        # 立即标记所属会话完成
+        (session or self._session).finished.set()
     
-    def on_open(self, ws):
+    def on_open(self, ws, session=None):
         """websocket连接成功处理"""
+        session = session or self._session
+        
         def run(*args):
-            frameSize = 1280  # 每一帧的音频大小 (40ms * 16000 * 2 / 1000)
-            intervel = 0.04  # 发送音频间隔(单位:s)
             status = STATUS_FIRST_FRAME  # 音频的状态信息，标识音频是第一帧，还是中间帧、最后一帧
+            encoder = XfyunFrameEncoder(self.app_id, session.business)
             
-            # 录音参数
-            p = pyaudio.PyAudio()
-            stream = None
+            reader = None
             
             try:
-                stream = p.open(format=self.format,
-                              channels=self.channels,
-                              rate=self.rate,
-                              input=True,
-                              frames_per_buffer=self.chunk)
+                # 从常驻录音的预录窗口开始读取
+                reader = self.capture.open_reader(session.preroll_ms)
+                if not self.capture.running:
+                    raise RuntimeError(self.capture.error or "常驻录音未启动")
                 
-                print("开始录音，请说话...")
+                logger.debug("开始录音，请说话...")
                 
-                # 录音时长控制 - 延长录音时间
-                record_time = 0
+                # 录音时长控制 - 以已读取的音频帧计时（音频时钟），而不是墙上时间
+                frames_read = 0
                 max_record_time = 10  # 增加最大录音时长到10秒
-                silence_count = 0
-                max_silence = 75  # 增加最大静音帧数 (约3秒静音)
-                has_speech = False  # 是否检测到语音
+                max_frames = int(max_record_time / FRAME_DURATION)
                 min_speech_time = 1.0  # 最少录音时间1秒
+                self.vad.reset()  # 保留上次会话学习到的噪声基底
                 
-                while not self.is_finished and record_time < max_record_time:
+                while not session.finished.is_set() and frames_read < max_frames:
                     try:
-                        buf = stream.read(frameSize, exception_on_overflow=False)
-                        if not buf:
+                        # 阻塞读取恰好一帧(40ms)音频：预录部分立即返回，之后由声卡采样时钟决定发送节奏
+                        buf = reader.read_view(FRAME_BYTES, timeout=READ_TIMEOUT)
+                        if len(buf) < FRAME_BYTES:
+                            if status == STATUS_FIRST_FRAME:
+                                raise RuntimeError("未读取到录音数据")
+                            logger.warning("录音数据中断，发送最后一帧...")
+                            ws.send(encoder.encode(STATUS_LAST_FRAME, buf))
                             status = STATUS_LAST_FRAME
+                            break
+                        frames_read += 1
+                        record_time = frames_read * FRAME_DURATION
                         
-                        # 检测静音（简单的音量检测）
-                        import audioop
-                        volume = audioop.rms(buf, 2)
-                        
-                        # 动态调整静音阈值
-                        silence_threshold = 300 if has_speech else 800
-                        
-                        if volume < silence_threshold:
-                            silence_count += 1
-                        else:
-                            silence_count = 0
-                            has_speech = True  # 检测到语音
+                        # 语音活动检测（自适应噪声基底 + 拖尾）
+                        self.vad.process(buf)
                         
                         # 只有在检测到语音后且静音时间足够长才结束录音
-                        if (silence_count > max_silence and 
-                            has_speech and 
+                        if (self.vad.has_speech and 
+                            not self.vad.in_speech and 
                             record_time > min_speech_time and 
                             status != STATUS_FIRST_FRAME):
-                            print("检测到语音结束，正在处理...")
+                            logger.debug("检测到语音结束，正在处理...")
                             status = STATUS_LAST_FRAME
                         
                         # 检查WebSocket连接状态
-                        if ws.sock is None or not hasattr(ws.sock, 'connected') or not ws.sock.connected:
-                            print("WebSocket连接已断开")
+                        if not ws.connected:
+                            logger.debug("WebSocket连接已断开")
                             break
                         
                         try:
-                            # 第一帧处理
+                            ws.send(encoder.encode(status, buf))
+                            
                             if status == STATUS_FIRST_FRAME:
-                                d = {"common": {"app_id": self.app_id},
-                                     "business": {
-                                         "language": "zh_cn", 
-                                         "domain": "iat", 
-                                         "accent": "mandarin", 
-                                         "vinfo": 1, 
-                                         "vad_eos": 5000,  # 增加静音检测时间到5秒
-                                         "dwa": "wpgs",
-                                         "ptt": 0,  # 禁用标点符号
-                                         "rlang": "zh-cn",  # 返回语言
-                                         "nunum": 0  # 禁用数字转换
-                                     },
-                                     "data": {"status": 0, "format": "audio/L16;rate=16000",
-                                             "audio": str(base64.b64encode(buf), 'utf-8'),
-                                             "encoding": "raw"}}
-                                ws.send(json.dumps(d))
                                 status = STATUS_CONTINUE_FRAME
-                                print("发送第一帧数据...")
-                                
-                            # 中间帧处理
-                            elif status == STATUS_CONTINUE_FRAME:
-                                d = {"data": {"status": 1, "format": "audio/L16;rate=16000",
-                                             "audio": str(base64.b64encode(buf), 'utf-8'),
-                                             "encoding": "raw"}}
-                                ws.send(json.dumps(d))
-                                
-                            # 最后一帧处理
+                                logger.debug("发送第一帧数据...")
                             elif status == STATUS_LAST_FRAME:
-                                d = {"data": {"status": 2, "format": "audio/L16;rate=16000",
-                                             "audio": str(base64.b64encode(buf), 'utf-8'),
-                                             "encoding": "raw"}}
-                                ws.send(json.dumps(d))
-                                print("发送最后一帧数据...")
+                                logger.debug("发送最后一帧数据...")
                                 break
                                 
                         except Exception as send_error:
-                            print(f"发送数据失败: {send_error}")
+                            logger.error("发送数据失败: %s", send_error)
                             if "Connection is already closed" in str(send_error):
-                                print("连接已关闭，停止发送数据")
+                                logger.debug("连接已关闭，停止发送数据")
                                 break
                             # 其他错误继续尝试
                         
-                        # 间隔一段时间再发送
-                        time.sleep(intervel)
-                        record_time += intervel
-                        
                     except Exception as e:
-                        print(f"录音过程中出错: {e}")
+                        logger.error("录音过程中出错: %s", e)
                         break
                 
                 # 如果录音时间到了但还没发送最后一帧，发送最后一帧
-                if status != STATUS_LAST_FRAME and record_time >= max_record_time:
-                    print("录音时间到，发送最后一帧...")
-                    d = {"data": {"status": 2, "format": "audio/L16;rate=16000",
-                                 "audio": "",  # 空音频数据
-                                 "encoding": "raw"}}
-                    ws.send(json.dumps(d))
+                if status != STATUS_LAST_FRAME and frames_read >= max_frames:
+                    logger.debug("录音时间到，发送最后一帧...")
+                    ws.send(encoder.encode(STATUS_LAST_FRAME, b""))  # 空音频数据
                 
             except Exception as e:
-                print(f"录音初始化失败: {e}")
+                logger.error("录音初始化失败: %s", e)
             finally:
-                if stream:
-                    try:
-                        stream.stop_stream()
-                        stream.close()
-                    except:
-                        pass
-                try:
-                    p.terminate()
-                except:
-                    pass
-                
-                # 等待服务器响应，延长等待时间
-                print("等待识别结果...")
-                time.sleep(2.0)  # 等待2秒让服务器处理
+                if reader:
+                    reader.close()
                 
-                # 不要立即关闭WebSocket，让消息处理完成
-                # WebSocket会在收到最终结果后自动关闭
+                # 等待服务器返回最终结果（收到 status == 2 时立即结束等待）
+                if not session.finished.is_set():
+                    logger.debug("等待识别结果...")
+                    if not session.finished.wait(RESULT_TIMEOUT):
+                        logger.warning("等待最终结果超时，关闭连接")
+                        ws.close()
             
-        thread.start_new_thread(run, ())
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _receive_loop(self, ws, session):
+        """接收识别结果直到连接关闭"""
+        try:
+            while ws.connected:
+                message = ws.recv()
+                if not message:
+                    break
+                self.on_message(ws, message, session)
+        except websocket.WebSocketConnectionClosedException:
+            pass
+        except Exception as ws_error:
+            # 本地主动关闭连接时 recv 也会抛出异常，此时不视为错误
+            if not session.finished.is_set():
+                self.on_error(ws, ws_error, session)
+        finally:
+            close_status = getattr(ws, 'status', None)
+            self.on_close(ws, close_status, None, session)
+    
+    def _run_session(self, session, max_wait_time, session_type="command"):
+        """建立（或取出预热的）WebSocket连接，在后台收发数据，当前线程等待完成事件
+        
+        返回 True 表示会话在 max_wait_time 内结束（最终结果、关键词、错误或连接关闭）
+        """
+        try:
+            session.ws = self.connection_pool.acquire(session_type)
+        except Exception as ws_error:
+            logger.error("WebSocket连接失败: %s", ws_error)
+            session.error = str(ws_error)
+            session.finished.set()
+            return True
+        
+        threading.Thread(target=self._receive_loop, args=(session.ws, session), daemon=True).start()
+        self.on_open(session.ws, session)
+        
+        deadline = time.monotonic() + max_wait_time
+        while not session.finished.wait(min(STATUS_INTERVAL, max(deadline - time.monotonic(), 0))):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # 超时：通知录音线程停止
+                session.finished.set()
+                return False
+            logger.debug("⏳ 等待中... (剩余 %.1fs)", remaining)
+        return True
     
     def recognize_speech(self):
         """开始语音识别"""
         try:
-            self.result = ""
-            self.is_finished = False
+            session = self._reset_session()
             
             # 检查API配置
-            if not all([self.app_id, self.api_secret, self.api_key]) or \
-               any(key.startswith('your-') for key in [self.app_id, self.api_secret, self.api_key]):
-                print("错误: 科大讯飞API配置不完整，请检查环境变量")
+            if not self._config_ready():
+                logger.error("错误: 科大讯飞API配置不完整，请检查环境变量")
                 return None
             
-            print("正在连接科大讯飞语音识别服务...")
-            websocket.enableTrace(False)
-            wsUrl = self.create_url()
-            self.ws = websocket.WebSocketApp(wsUrl, 
-                                           on_message=self.on_message, 
-                                           on_error=self.on_error, 
-                                           on_close=self.on_close,
-                                           on_open=self.on_open)
-            
-            # 设置更长的超时时间和心跳
-            try:
-                self.ws.run_forever(
-                    sslopt={"cert_reqs": ssl.CERT_NONE}, 
-                    ping_interval=60,  # 增加心跳间隔
-                    ping_timeout=30    # 增加心跳超时
-                )
-            except Exception as ws_error:
-                print(f"WebSocket运行错误: {ws_error}")
-                if "run_loop already started" in str(ws_error):
-                    print("WebSocket运行循环已启动，等待完成...")
-                    # 如果运行循环已启动，直接等待结果
-                    pass
-                else:
-                    self.is_finished = True
-            
-            # 等待识别完成，减少等待时间
-            wait_time = 0
-            max_wait = 3  # 减少最大等待时间到3秒
-            check_interval = 0.1
-            
-            # 如果已经完成，不需要等待
-            if not self.is_finished:
-                print("等待识别完成...")
-                while not self.is_finished and wait_time < max_wait:
-                    time.sleep(check_interval)
-                    wait_time += check_interval
-                
-                if wait_time >= max_wait:
-                    print("识别处理完成")
-                    self.is_finished = True
+            logger.debug("正在连接科大讯飞语音识别服务...")
+            # 最长录音时间加上等待最终结果的时间
+            if not self._run_session(session, max_wait_time=10 + RESULT_TIMEOUT + 2):
+                logger.debug("识别处理完成")
+            self._close_ws(session)
             
             # 清理结果
-            final_result = self.result.strip() if self.result else None
+            text = session.transcript.text
+            final_result = text.strip() if text else None
             if final_result:
-                print(f"最终识别结果: {final_result}")
+                logger.info("最终识别结果: %s", final_result)
             else:
-                print("未获得有效识别结果")
+                logger.info("未获得有效识别结果")
                 
             return final_result
             
         except Exception as e:
-            print(f"科大讯飞语音识别错误: {e}")
+            logger.error("科大讯飞语音识别错误: %s", e)
             self.is_finished = True
             return None
     
@@ -346,10 +450,10 @@ class XfyunASR:
             
             # 简单的URL生成测试
             url = self.create_url()
-            if url and 'wss://ws-api.xfyun.cn' in url:
-                print(f"科大讯飞API配置检查通过")
-                print(f"APP_ID: {self.app_id}")
-                print(f"WebSocket URL已生成")
+            if url and url.startswith(self.url):
+                logger.info("科大讯飞API配置检查通过")
+                logger.debug("APP_ID: %s", self.app_id)
+                logger.debug("WebSocket URL已生成")
                 return True, "API配置正常"
             else:
                 return False, "URL生成失败"
@@ -357,105 +461,101 @@ class XfyunASR:
         except Exception as e:
             return False, f"连接测试失败: {e}"
     
-    def check_trigger_keywords(self):
-        """检查是否包含触发关键词"""
-        if self.keyword_detected:
+    def check_trigger_keywords(self, changed=None, revised=False, session=None):
+        """检查是否包含触发关键词
+        
+        changed: 本次变化的片段序号。末尾追加的片段直接续接流式匹配；
+        被修正的片段重新匹配该片段及足以覆盖跨片段关键词的前文。为 None 时扫描全文
+        """
+        session = session or self._session
+        if session.keyword_detected:
+            return True
+        
+        stream = session.keyword_stream
+        transcript = session.transcript
+        if changed is None:
+            stream.reset()
+            stream.feed(transcript.text)
+        elif revised or changed[-1] != transcript.last_sn:
+            # 自动机状态只取决于最近 max_length-1 个字符，带上这么多前文即可恢复
+            stream.reset()
+            stream.feed(transcript.window(changed, self.spotter.max_length - 1))
+        else:
+            stream.feed(transcript.window(changed))
+        
+        match = stream.best
+        if match:
+            logger.info("🎯 检测到触发关键词: '%s' (%s) - 立即结束识别", match.keyword, match.label)
+            session.keyword_detected = True
+            session.keyword_match = match
+            session.timings["keyword"] = time.monotonic()
+            # 立即结束录音并唤醒等待线程
+            session.finished.set()
+            self._close_ws(session)
             return True
-            
-        current_text = self.result.lower()
-        for keyword in self.trigger_keywords:
-            if keyword in current_text:
-                print(f"🎯 检测到触发关键词: '{keyword}' - 立即结束识别")
-                self.keyword_detected = True
-                # 立即结束录音，开始处理
-                self.is_finished = True
-                # 尝试关闭WebSocket连接
-                if self.ws:
-                    try:
-                        self.ws.close()
-                    except:
-                        pass
-                return True
         return False
     
-    def recognize_speech_with_smart_trigger(self, max_wait_time=12):
-        """智能语音识别：支持关键词触发和超时自动处理"""
+    def recognize_speech_with_smart_trigger(self, max_wait_time=12, session_type="command", preroll_ms=None):
+        """智能语音识别：支持关键词触发和超时自动处理
+        
+        session_type: 会话类型（command / confirm），决定识别参数、关键词配置和使用的预热连接
+        preroll_ms: 本次会话的预录窗口，默认 AUDIO_PREROLL_MS；本地识别不确定时可回溯到已说出的短语
+        """
         try:
-            self.result = ""
-            self.is_finished = False
-            self.keyword_detected = False
+            self.use_keyword_profile(session_type)
+            session = self._reset_session(preroll_ms, session_type)
             
             # 检查API配置
-            if not all([self.app_id, self.api_secret, self.api_key]) or \
-               any(key.startswith('your-') for key in [self.app_id, self.api_secret, self.api_key]):
-                print("错误: 科大讯飞API配置不完整，请检查环境变量")
+            if not self._config_ready():
+                logger.error("错误: 科大讯飞API配置不完整，请检查环境变量")
                 return None, "timeout"
             
-            print("🎤 智能语音识别启动...")
-            print(f"💡 提示: 说出包含 {self.trigger_keywords} 的话语可立即开始处理")
-            print(f"⏰ 或者等待 {max_wait_time} 秒后自动处理")
-            
-            websocket.enableTrace(False)
-            wsUrl = self.create_url()
-            self.ws = websocket.WebSocketApp(wsUrl, 
-                                           on_message=self.on_message, 
-                                           on_error=self.on_error, 
-                                           on_close=self.on_close,
-                                           on_open=self.on_open)
-            
-            # 启动WebSocket连接
-            try:
-                self.ws.run_forever(
-                    sslopt={"cert_reqs": ssl.CERT_NONE}, 
-                    ping_interval=60,
-                    ping_timeout=30
-                )
-            except Exception as ws_error:
-                print(f"WebSocket运行错误: {ws_error}")
-                if "run_loop already started" not in str(ws_error):
-                    self.is_finished = True
+            logger.info("🎤 智能语音识别启动...")
+            logger.info("💡 提示: 说出包含 %s 的话语可立即开始处理", self.spotter.keywords)
+            logger.info("⏰ 或者等待 %s 秒后自动处理", max_wait_time)
             
-            # 智能等待逻辑
-            wait_time = 0
-            check_interval = 0.1  # 减少检查间隔
-            
-            while not self.is_finished and wait_time < max_wait_time:
-                time.sleep(check_interval)
-                wait_time += check_interval
-                
-                # 检查是否检测到关键词（优先级最高）
-                if self.keyword_detected:
-                    print("🚀 关键词触发，立即结束等待...")
-                    self.is_finished = True
-                    break
-                
-                # 每2秒显示一次状态
-                if int(wait_time * 10) % 20 == 0:
-                    remaining = max_wait_time - wait_time
-                    print(f"⏳ 等待中... (剩余 {remaining:.1f}s)")
+            finished = self._run_session(session, max_wait_time, session_type)
+            self._close_ws(session)
+            self._record_timings(session, session_type)
             
             # 确定触发原因
-            trigger_reason = "keyword" if self.keyword_detected else "timeout"
+            if session.keyword_detected:
+                logger.info("🚀 关键词触发，立即结束等待...")
+                trigger_reason = "keyword"
+            else:
+                trigger_reason = "timeout"
+                if not finished:
+                    logger.info("⏰ 等待超时，自动开始处理...")
             
-            if wait_time >= max_wait_time and not self.keyword_detected:
-                print("⏰ 等待超时，自动开始处理...")
-                self.is_finished = True
+            text = session.transcript.text
+            if session.error and not text.strip():
+                logger.error("❌ 识别会话出错: %s", session.error)
+                return None, "error"
             
             # 获取最终结果
-            final_result = self.result.strip() if self.result else None
+            final_result = text.strip() if text else None
             
             if final_result:
-                print(f"📝 最终识别结果: {final_result}")
+                logger.info("📝 最终识别结果: %s", final_result)
             else:
-                print("🔇 未获得语音输入")
+                logger.info("🔇 未获得语音输入")
                 final_result = ""  # 返回空字符串而不是None
                 
             return final_result, trigger_reason
             
         except Exception as e:
-            print(f"智能语音识别错误: {e}")
+            logger.error("智能语音识别错误: %s", e)
             return None, "error"
     
+    def _record_timings(self, session, session_type):
+        """把本次会话的事件时刻记为计时span：从会话开始到首个中间结果、关键词触发、最终结果"""
+        tracer = get_tracer()
+        timings = session.timings
+        start = timings["start"]
+        for event in ("first_partial", "keyword", "final"):
+            if event in timings:
+                tracer.record(f"asr.{event}", start, timings[event], session=session_type)
+    
     def quick_test(self):
         """快速测试语音识别（3秒录音）"""
         print("=== 科大讯飞语音识别快速测试 ===")
@@ -463,8 +563,7 @@ class XfyunASR:
         
         try:
             # 重置状态
-            self.result = ""
-            self.is_finished = False
+            self._reset_session()
             
             # 创建简化的WebSocket连接
             wsUrl = self.create_url()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科大讯飞WebSocket连接预热
+在TTS提示音播放期间提前完成URL签名和TLS握手，识别开始时直接发送音频
+"""
+
+import ssl
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+import websocket
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# 讯飞服务端在连接建立后约10秒内收不到音频会断开，预热连接超过此时间即丢弃
+DEFAULT_MAX_IDLE = 8.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+
+
+class XfyunConnectionPool:
+    """按会话类型（如 command / confirm）各保留一个已就绪的WebSocket连接"""
+
+    def __init__(self, url_factory: Callable[[], str],
+                 max_idle: float = DEFAULT_MAX_IDLE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        self.url_factory = url_factory
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+
+        self._ready: Dict[str, Tuple[websocket.WebSocket, float]] = {}
+        self._pending: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+        # 统计
+        self.warm_hits = 0
+        self.cold_connects = 0
+
+    def _connect(self) -> websocket.WebSocket:
+        """签名URL并建立WebSocket连接"""
+        ws = websocket.create_connection(
+            self.url_factory(),
+            sslopt={"cert_reqs": ssl.CERT_NONE},
+            timeout=self.connect_timeout
+        )
+        ws.settimeout(None)  # 会话期间由上层控制超时
+        return ws
+
+    def _is_fresh(self, entry: Tuple[websocket.WebSocket, float]) -> bool:
+        ws, opened_at = entry
+        return ws.connected and time.monotonic() - opened_at < self.max_idle
+
+    @staticmethod
+    def _discard(ws: websocket.WebSocket):
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+    def prewarm(self, session_type: str):
+        """在后台为指定会话类型建立连接（已有可用连接或正在建立时忽略）"""
+        with self._lock:
+            entry = self._ready.get(session_type)
+            if entry and self._is_fresh(entry):
+                return
+            if entry:
+                self._discard(self._ready.pop(session_type)[0])
+            if session_type in self._pending:
+                return
+
+            thread = threading.Thread(
+                target=self._prewarm_worker, args=(session_type,),
+                name=f"xfyun-prewarm-{session_type}", daemon=True
+            )
+            self._pending[session_type] = thread
+            thread.start()
+
+    def _prewarm_worker(self, session_type: str):
+        try:
+            ws = self._connect()
+            with self._lock:
+                old = self._ready.pop(session_type, None)
+                self._ready[session_type] = (ws, time.monotonic())
+            if old:
+                self._discard(old[0])
+            logger.debug("🔌 科大讯飞连接已预热 (%s)", session_type)
+        except Exception as e:
+            logger.warning("⚠️ 科大讯飞连接预热失败 (%s): %s", session_type, e)
+        finally:
+            with self._lock:
+                self._pending.pop(session_type, None)
+
+    def acquire(self, session_type: str) -> websocket.WebSocket:
+        """取出一个可用连接：优先使用预热连接，正在预热则等待其完成，否则现场建立"""
+        with self._lock:
+            pending = self._pending.get(session_type)
+
+        if pending is not None:
+            pending.join(self.connect_timeout)
+
+        with self._lock:
+            entry = self._ready.pop(session_type, None)
+
+        if entry and self._is_fresh(entry):
+            self.warm_hits += 1
+            return entry[0]
+        if entry:
+            self._discard(entry[0])
+
+        self.cold_connects += 1
+        return self._connect()
+
+    def close_all(self):
+        """关闭所有预热连接"""
+        with self._lock:
+            entries = list(self._ready.values())
+            self._ready.clear()
+        for ws, _ in entries:
+            self._discard(ws)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取预热命中统计"""
+        return {"warm_hits": self.warm_hits, "cold_connects": self.cold_connects}
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科大讯飞iat音频帧编码
+预先生成每种帧状态的JSON头尾，每帧只需一次base64编码和一次拼接
+"""
+
+import binascii
+import json
+from typing import Any, Dict
+
+STATUS_FIRST_FRAME = 0  # 第一帧的标识
+STATUS_CONTINUE_FRAME = 1  # 中间帧标识
+STATUS_LAST_FRAME = 2  # 最后一帧的标识
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16bit
+FRAME_DURATION = 0.04  # 每帧40ms
+FRAME_SAMPLES = int(SAMPLE_RATE * FRAME_DURATION)  # 每帧采样数 (640)
+FRAME_BYTES = FRAME_SAMPLES * SAMPLE_WIDTH  # 每帧字节数 (1280)
+AUDIO_FORMAT = "audio/L16;rate=16000"
+
+# 默认识别参数
+DEFAULT_BUSINESS = {
+    "language": "zh_cn",
+    "domain": "iat",
+    "accent": "mandarin",
+    "vinfo": 1,
+    "vad_eos": 5000,  # 增加静音检测时间到5秒
+    "dwa": "wpgs",
+    "ptt": 0,  # 禁用标点符号
+    "rlang": "zh-cn",  # 返回语言
+    "nunum": 0  # 禁用数字转换
+}
+
+
+class XfyunFrameEncoder:
+    """讯飞iat帧编码器
+
+    帧JSON中除了audio字段都是固定内容，因此在初始化时把 audio 前后的
+    字节串准备好，发送时只拼接 前缀 + base64(PCM) + 后缀，
+    避免每40ms构造字典并调用 json.dumps。
+    """
+
+    def __init__(self, app_id: str, business: Dict[str, Any] = None,
+                 audio_format: str = AUDIO_FORMAT):
+        business = business or DEFAULT_BUSINESS
+        common = json.dumps({"app_id": app_id}, ensure_ascii=False)
+        business_json = json.dumps(business, ensure_ascii=False)
+
+        self._prefixes = {
+            STATUS_FIRST_FRAME: (
+                '{"common":%s,"business":%s,"data":{"status":0,"format":"%s","encoding":"raw","audio":"'
+                % (common, business_json, audio_format)
+            ).encode('utf-8'),
+            STATUS_CONTINUE_FRAME: (
+                '{"data":{"status":1,"format":"%s","encoding":"raw","audio":"' % audio_format
+            ).encode('utf-8'),
+            STATUS_LAST_FRAME: (
+                '{"data":{"status":2,"format":"%s","encoding":"raw","audio":"' % audio_format
+            ).encode('utf-8'),
+        }
+        self._suffix = b'"}}'
+
+    def encode(self, status: int, pcm) -> bytes:
+        """编码一帧音频，pcm 可以是 bytes / bytearray / memoryview"""
+        return b''.join((
+            self._prefixes[status],
+            binascii.b2a_base64(pcm, newline=False),
+            self._suffix
+        ))